@@ -10,6 +10,9 @@ let rawApiOffset = 0;
 let rawApiHasMore = false;
 let rawApiLoading = false;
 const rawApiLimit = 1000;
+let dataVersion = "";
+const changesWaitSec = 25;
+const changesRetryMs = 30000;
 let currentPage = 1;
 let currentView = "position";
 let sortKey = "close_time_vn";
@@ -57,6 +60,7 @@ async function loadSummaryRows() {
   if (API_BASE) {
     try {
       const body = await loadApiRows("/api/summary");
+      dataVersion = body.version || "";
       return body.rows;
     } catch (err) {
       console.warn("API summary load failed, fallback to CSV:", err);
@@ -109,6 +113,57 @@ function uniqueByEventId(baseRows, incomingRows) {
   return out;
 }
 
+function applyDelta(rows, delta, key) {
+  if (!delta) return rows;
+  const upserted = delta.upserted || [];
+  const drop = new Set([...(delta.deleted || []), ...upserted.map((r) => r[key])]);
+  return [...rows.filter((r) => !drop.has(r[key])), ...upserted];
+}
+
+async function reloadAll() {
+  summaryAll = await loadSummaryRows();
+  if (rawLoaded) hydrateRawData(await loadRawRows());
+  else applySummaryFilter();
+}
+
+async function applyChanges(body) {
+  if (body.reset) {
+    await reloadAll();
+    return;
+  }
+  dataVersion = body.version;
+  if (!body.count) return;
+  summaryAll = applyDelta(summaryAll, body.summary, "trade_date_vn").sort((a, b) =>
+    (a.trade_date_vn || "").localeCompare(b.trade_date_vn || "")
+  );
+  if (rawLoaded) {
+    rawEvents = enrichEventsWithPositionStats(applyDelta(rawEvents, body.raw, "event_id"));
+    groupedPositions = buildGroupedPositions(rawEvents);
+    fillDateFilter(rawEvents);
+    await applyDetailsFilter();
+  }
+  applySummaryFilter();
+}
+
+// Long-polls /api/changes and applies each delta in place; stops when the API has no change feed.
+async function watchChanges() {
+  while (API_BASE && dataVersion) {
+    try {
+      const qs = new URLSearchParams({ since: dataVersion, wait: String(changesWaitSec) });
+      const res = await fetch(`${API_BASE}/api/changes?${qs.toString()}`, {
+        cache: "no-store",
+        credentials: "include",
+      });
+      if (res.status === 404) return;
+      if (!res.ok) throw new Error(`Failed API /api/changes: ${res.status}`);
+      await applyChanges(await res.json());
+    } catch (err) {
+      console.warn("Change feed failed, retrying:", err);
+      await new Promise((resolve) => setTimeout(resolve, changesRetryMs));
+    }
+  }
+}
+
 function oldestLoadedTradeDate() {
   const dates = rawEvents.map((r) => r.trade_date_vn).filter(Boolean);
   if (!dates.length) return "";
@@ -1004,6 +1059,7 @@ async function start() {
 
     loadRawForAnalytics();
     initDetailsLazyLoad();
+    watchChanges();
   } catch (err) {
     document.getElementById("last-updated").textContent = err.message;
   }
@@ -0,0 +1,253 @@
+"""Vectorized trading analytics over the API history snapshot.
+
+Conventions:
+- A position is `account_id:position_id`; its PnL is profit + commission + swap
+  summed over its trade deals.
+- A position is dated by its last deal (close time, trade_date_vn, hour VN).
+- Date filters select positions by that close date; symbol/account filters
+  select deals before positions are grouped.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from api_data import RawColumns
+
+GRANULARITIES = ("event", "day", "week")
+
+
+@dataclass(frozen=True)
+class Filters:
+    from_date: str = ""
+    to_date: str = ""
+    symbol: str = ""
+    account_id: str = ""
+
+    def as_dict(self) -> dict[str, str]:
+        return {k: v for k, v in self.__dict__.items() if v}
+
+
+@dataclass(frozen=True)
+class Positions:
+    """One entry per closed position, ordered by close time ascending."""
+
+    pnl: np.ndarray
+    deals: np.ndarray
+    lots: np.ndarray
+    symbol: np.ndarray
+    trade_date_vn: np.ndarray
+    close_time_vn: np.ndarray
+    close_hour_vn: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.pnl.shape[0])
+
+
+def _num(value: Any) -> float | None:
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+    return value
+
+
+def _ratio(num: float, den: float) -> float | None:
+    if den == 0:
+        return None
+    return _num(num / den)
+
+
+def build_positions(cols: RawColumns, filters: Filters) -> Positions:
+    mask = (cols.event_type == "trade") & (cols.position_key != "")
+    if filters.symbol:
+        mask &= cols.symbol == filters.symbol
+    if filters.account_id:
+        mask &= cols.account_id == filters.account_id
+    idx = np.flatnonzero(mask)
+
+    keys, first_pos, inverse = np.unique(cols.position_key[idx], return_index=True, return_inverse=True)
+    n = len(keys)
+    net = cols.profit[idx] + cols.commission[idx] + cols.swap[idx]
+    last = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(last, inverse, idx)
+
+    pnl = np.bincount(inverse, weights=net, minlength=n)
+    deals = np.bincount(inverse, minlength=n)
+    lots = np.bincount(inverse, weights=cols.lots[idx], minlength=n)
+    symbol = cols.symbol[idx[first_pos]] if n else np.array([], dtype=np.str_)
+
+    order = np.argsort(last, kind="stable")
+    last = last[order]
+    trade_date = cols.trade_date_vn[last]
+    keep = np.ones(n, dtype=bool)
+    if filters.from_date:
+        keep &= trade_date >= filters.from_date
+    if filters.to_date:
+        keep &= trade_date <= filters.to_date
+    order = order[keep]
+    last = last[keep]
+
+    return Positions(
+        pnl=pnl[order],
+        deals=deals[order],
+        lots=lots[order],
+        symbol=symbol[order],
+        trade_date_vn=cols.trade_date_vn[last],
+        close_time_vn=cols.close_time_vn[last],
+        close_hour_vn=cols.close_hour_vn[last],
+    )
+
+
+def _runs(flags: np.ndarray) -> np.ndarray:
+    """Lengths of consecutive True runs."""
+    if not flags.any():
+        return np.array([], dtype=np.int64)
+    edges = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def _drawdown(equity: np.ndarray) -> np.ndarray:
+    peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+    return equity - peak
+
+
+def _group_stats(pnl: np.ndarray, inverse: np.ndarray, n: int) -> dict[str, np.ndarray]:
+    wins = pnl > 0
+    losses = pnl < 0
+    return {
+        "positions": np.bincount(inverse, minlength=n),
+        "wins": np.bincount(inverse, weights=wins, minlength=n).astype(np.int64),
+        "losses": np.bincount(inverse, weights=losses, minlength=n).astype(np.int64),
+        "net_profit": np.bincount(inverse, weights=pnl, minlength=n),
+        "gross_profit": np.bincount(inverse, weights=np.where(wins, pnl, 0.0), minlength=n),
+        "gross_loss": np.bincount(inverse, weights=np.where(losses, pnl, 0.0), minlength=n),
+    }
+
+
+def _group_row(stats: dict[str, np.ndarray], i: int) -> dict[str, Any]:
+    positions = int(stats["positions"][i])
+    wins = int(stats["wins"][i])
+    losses = int(stats["losses"][i])
+    net = float(stats["net_profit"][i])
+    gross_profit = float(stats["gross_profit"][i])
+    gross_loss = float(stats["gross_loss"][i])
+    return {
+        "positions": positions,
+        "wins": wins,
+        "losses": losses,
+        "win_rate": _ratio(wins, wins + losses),
+        "net_profit": net,
+        "gross_profit": gross_profit,
+        "gross_loss": gross_loss,
+        "profit_factor": _ratio(gross_profit, abs(gross_loss)),
+        "expectancy": _ratio(net, positions),
+    }
+
+
+def overview(cols: RawColumns, filters: Filters) -> dict[str, Any]:
+    pos = build_positions(cols, filters)
+    pnl = pos.pnl
+    wins = pnl > 0
+    losses = pnl < 0
+    n_win = int(wins.sum())
+    n_loss = int(losses.sum())
+    gross_profit = float(pnl[wins].sum())
+    gross_loss = float(pnl[losses].sum())
+    equity = np.cumsum(pnl)
+    win_runs = _runs(wins)
+    loss_runs = _runs(losses)
+
+    # Positive for a running win streak, negative for a running loss streak.
+    current_streak = 0
+    if len(pnl) and pnl[-1] > 0:
+        current_streak = int(win_runs[-1])
+    elif len(pnl) and pnl[-1] < 0:
+        current_streak = -int(loss_runs[-1])
+
+    return {
+        "positions": len(pos),
+        "deals": int(pos.deals.sum()),
+        "lots": float(pos.lots.sum()),
+        "wins": n_win,
+        "losses": n_loss,
+        "breakeven": len(pos) - n_win - n_loss,
+        "win_rate": _ratio(n_win, n_win + n_loss),
+        "net_profit": float(pnl.sum()),
+        "gross_profit": gross_profit,
+        "gross_loss": gross_loss,
+        "profit_factor": _ratio(gross_profit, abs(gross_loss)),
+        "avg_win": _ratio(gross_profit, n_win),
+        "avg_loss": _ratio(gross_loss, n_loss),
+        "expectancy": _ratio(float(pnl.sum()), len(pos)),
+        "largest_win": _num(pnl.max()) if n_win else None,
+        "largest_loss": _num(pnl.min()) if n_loss else None,
+        "max_win_streak": int(win_runs.max()) if len(win_runs) else 0,
+        "max_loss_streak": int(loss_runs.max()) if len(loss_runs) else 0,
+        "current_streak": current_streak,
+        "max_drawdown": float(-_drawdown(equity).min()) if len(equity) else 0.0,
+        "first_trade_date_vn": str(pos.trade_date_vn[0]) if len(pos) else None,
+        "last_trade_date_vn": str(pos.trade_date_vn[-1]) if len(pos) else None,
+    }
+
+
+def by_symbol(cols: RawColumns, filters: Filters) -> list[dict[str, Any]]:
+    pos = build_positions(cols, filters)
+    symbols, inverse = np.unique(pos.symbol, return_inverse=True)
+    n = len(symbols)
+    stats = _group_stats(pos.pnl, inverse, n)
+    deals = np.bincount(inverse, weights=pos.deals, minlength=n)
+    lots = np.bincount(inverse, weights=pos.lots, minlength=n)
+    rows = [
+        {"symbol": str(symbols[i]) or "N/A", **_group_row(stats, i), "deals": int(deals[i]), "lots": float(lots[i])}
+        for i in range(n)
+    ]
+    rows.sort(key=lambda r: r["net_profit"], reverse=True)
+    return rows
+
+
+def by_hour(cols: RawColumns, filters: Filters) -> list[dict[str, Any]]:
+    pos = build_positions(cols, filters)
+    valid = pos.close_hour_vn >= 0
+    stats = _group_stats(pos.pnl[valid], pos.close_hour_vn[valid].astype(np.int64), 24)
+    return [{"hour_vn": h, **_group_row(stats, h)} for h in range(24)]
+
+
+def _week_start(dates: np.ndarray) -> np.ndarray:
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    # 1970-01-01 was a Thursday; shift so Monday starts the week.
+    return (days - (days + 3) % 7).astype("datetime64[D]").astype(np.str_)
+
+
+def equity_curve(cols: RawColumns, filters: Filters, granularity: str = "day") -> list[dict[str, Any]]:
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    pos = build_positions(cols, filters)
+
+    if granularity == "event":
+        labels = pos.close_time_vn
+        pnl = pos.pnl
+        counts = np.ones(len(pos), dtype=np.int64)
+    else:
+        dated = pos.trade_date_vn != ""
+        dates = pos.trade_date_vn[dated]
+        if granularity == "week":
+            dates = _week_start(dates)
+        labels, inverse = np.unique(dates, return_inverse=True)
+        pnl = np.bincount(inverse, weights=pos.pnl[dated], minlength=len(labels))
+        counts = np.bincount(inverse, minlength=len(labels))
+
+    equity = np.cumsum(pnl)
+    drawdown = _drawdown(equity)
+    return [
+        {
+            "t": str(labels[i]),
+            "pnl": float(pnl[i]),
+            "equity": float(equity[i]),
+            "drawdown": float(drawdown[i]),
+            "positions": int(counts[i]),
+        }
+        for i in range(len(labels))
+    ]
@@ -0,0 +1,532 @@
+"""History snapshot data layer for the API server.
+
+- Publish a memory-mapped columnar snapshot once per data update
+  (`build_dashboard_data.py`); every worker maps it read-only
+- Fall back to parsing the history CSV files when no snapshot is published,
+  or when a CSV was written after the last publish (`--no-snapshot` runs)
+- Reload automatically when the snapshot pointer or CSV files change
+- Expose raw events as NumPy columns for vectorized analytics
+- Extra precomputed tables (per-account / portfolio summaries) ride along in
+  the same snapshot
+- Each publish also records what changed since the previous version
+  (`changes-<version>.json`: raw/summary rows upserted, keys deleted or
+  tombstoned), so clients can catch up from a version instead of reloading
+- Small thread-safe LRU cache keyed by snapshot version
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Callable, Hashable, Mapping
+
+import numpy as np
+
+from columnar_snapshot import MappedFile, MappedTable, write_file
+from journal_io import read_dicts, to_float
+from journal_schema import DAILY_SUMMARY_KEY, RAW_EVENT_KEY
+
+logger = logging.getLogger("api_data")
+
+TRUE_VALUES = {"true", "1", "yes"}
+POINTER_NAME = "current.json"
+SNAPSHOT_FORMAT = 1
+CHANGES_PREFIX = "changes-"
+# Versions whose change records are kept; older `since` values get a reset.
+CHANGES_KEEP = 200
+# A delta touching more than this share of the rows is recorded as a reset.
+CHANGES_MAX_FRACTION = 0.5
+# (snapshot table, key column) covered by change records.
+CHANGE_TABLES = (("raw", RAW_EVENT_KEY), ("summary", DAILY_SUMMARY_KEY))
+RAW_COLUMN_FIELDS = (
+    "event_id",
+    "event_type",
+    "symbol",
+    "account_id",
+    "position_key",
+    "trade_date_vn",
+    "close_time_vn",
+    "close_hour_vn",
+    "lots",
+    "profit",
+    "commission",
+    "swap",
+)
+
+
+@dataclass(frozen=True)
+class RawColumns:
+    """Raw events as typed columns, sorted by close time ascending."""
+
+    event_id: np.ndarray
+    event_type: np.ndarray
+    symbol: np.ndarray
+    account_id: np.ndarray
+    position_key: np.ndarray
+    trade_date_vn: np.ndarray
+    close_time_vn: np.ndarray
+    close_hour_vn: np.ndarray
+    lots: np.ndarray
+    profit: np.ndarray
+    commission: np.ndarray
+    swap: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.event_id.shape[0])
+
+
+class HistorySnapshot(ABC):
+    """Immutable view of one published data version."""
+
+    version: str
+    columns: RawColumns
+
+    @abstractmethod
+    def summary_rows(self) -> list[dict[str, str]]: ...
+
+    @abstractmethod
+    def raw_rows(self, from_date: str = "", to_date: str = "", offset: int = 0, limit: int = 0) -> list[dict[str, str]]: ...
+
+    @abstractmethod
+    def table_rows(self, name: str) -> list[dict[str, str]]:
+        """Rows of an extra table (e.g. "portfolio"); empty when not published."""
+
+    @abstractmethod
+    def changes_since(self, since: str) -> dict[str, Any]:
+        """Deltas from version `since` to this one (see `read_changes`)."""
+
+
+class CsvSnapshot(HistorySnapshot):
+    def __init__(
+        self,
+        version: str,
+        summary_rows: list[dict[str, str]],
+        raw_rows: list[dict[str, str]],
+        tables: Mapping[str, list[dict[str, str]]] | None = None,
+    ) -> None:
+        self.version = version
+        self._summary_rows = summary_rows
+        self._raw_rows = raw_rows
+        self._tables = dict(tables or {})
+        self.columns = build_raw_columns(raw_rows)
+
+    def summary_rows(self) -> list[dict[str, str]]:
+        return self._summary_rows
+
+    def table_rows(self, name: str) -> list[dict[str, str]]:
+        return self._tables.get(name, [])
+
+    def changes_since(self, since: str) -> dict[str, Any]:
+        # CSV versions are file tokens, not a sequence: no deltas to serve.
+        return no_changes() if since == self.version else {"reset": True}
+
+    def raw_rows(self, from_date: str = "", to_date: str = "", offset: int = 0, limit: int = 0) -> list[dict[str, str]]:
+        rows = self._raw_rows
+        if from_date or to_date:
+            rows = [
+                r
+                for r in rows
+                if (
+                    (not from_date or (r.get("trade_date_vn", "") >= from_date))
+                    and (not to_date or (r.get("trade_date_vn", "") <= to_date))
+                )
+            ]
+        return _page(rows, offset, limit)
+
+
+class MappedSnapshot(HistorySnapshot):
+    """Snapshot served straight from a read-only memory-mapped file."""
+
+    def __init__(self, path: Path) -> None:
+        self.file = MappedFile(path)
+        self.version = str(self.file.meta["version"])
+        arrays = self.file.arrays
+        self.columns = RawColumns(**{name: arrays[name] for name in RAW_COLUMN_FIELDS})
+
+    def summary_rows(self) -> list[dict[str, str]]:
+        return self.file.tables["summary"].materialize()
+
+    def table_rows(self, name: str) -> list[dict[str, str]]:
+        table = self.file.tables.get(name)
+        return table.materialize() if table is not None else []
+
+    def changes_since(self, since: str) -> dict[str, Any]:
+        try:
+            start = int(since)
+        except ValueError:
+            return {"reset": True}
+        return read_changes(self.file.path.parent, start, int(self.version))
+
+    def raw_rows(self, from_date: str = "", to_date: str = "", offset: int = 0, limit: int = 0) -> list[dict[str, str]]:
+        table = self.file.tables["raw"]
+        if from_date or to_date:
+            idx = np.flatnonzero(table.range_mask("trade_date_vn", from_date, to_date))
+        else:
+            idx = np.arange(len(table))
+        return table.materialize(_page(idx, offset, limit))
+
+
+def _page(rows: Any, offset: int, limit: int) -> Any:
+    if offset and offset > 0:
+        rows = rows[offset:]
+    if limit and limit > 0:
+        rows = rows[:limit]
+    return rows
+
+
+def read_csv_table(path: Path) -> tuple[list[str], list[dict[str, str]]]:
+    if not path.exists():
+        raise FileNotFoundError(path)
+    return read_dicts(path)
+
+
+def read_csv_rows(path: Path) -> list[dict[str, str]]:
+    return read_csv_table(path)[1]
+
+
+def _float_column(rows: list[dict[str, str]], key: str) -> np.ndarray:
+    return np.fromiter((to_float(r.get(key)) for r in rows), dtype=np.float64, count=len(rows))
+
+
+def _str_column(rows: list[dict[str, str]], key: str) -> np.ndarray:
+    return np.array([r.get(key) or "" for r in rows], dtype=np.str_)
+
+
+def build_raw_columns(raw_rows: list[dict[str, str]]) -> RawColumns:
+    rows = [r for r in raw_rows if (r.get("is_deleted") or "").strip().lower() not in TRUE_VALUES]
+    # Same offset on every close_time_vn, so string order is time order.
+    rows.sort(key=lambda r: (r.get("close_time_vn") or "", r.get("event_id") or ""))
+
+    account_id = _str_column(rows, "account_id")
+    position_id = _str_column(rows, "position_id")
+    position_key = np.where(
+        position_id != "",
+        np.char.add(np.char.add(account_id, ":"), position_id),
+        "",
+    )
+    close_time_vn = _str_column(rows, "close_time_vn")
+    hours = np.array([(r.get("close_time_vn") or "")[11:13] for r in rows], dtype=np.str_)
+    close_hour_vn = np.full(len(rows), -1, dtype=np.int16)
+    has_hour = np.char.isdigit(hours)
+    if has_hour.any():
+        close_hour_vn[has_hour] = hours[has_hour].astype(np.int16)
+
+    return RawColumns(
+        event_id=_str_column(rows, "event_id"),
+        event_type=_str_column(rows, "event_type"),
+        symbol=_str_column(rows, "symbol"),
+        account_id=account_id,
+        position_key=position_key,
+        trade_date_vn=_str_column(rows, "trade_date_vn"),
+        close_time_vn=close_time_vn,
+        close_hour_vn=close_hour_vn,
+        lots=_float_column(rows, "lots"),
+        profit=_float_column(rows, "profit"),
+        commission=_float_column(rows, "commission"),
+        swap=_float_column(rows, "swap"),
+    )
+
+
+def read_pointer(snapshot_dir: Path) -> dict[str, Any] | None:
+    path = snapshot_dir / POINTER_NAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def publish_snapshot(summary_path: Path, raw_path: Path, snapshot_dir: Path, keep: int = 2) -> dict[str, Any]:
+    """Build a snapshot file from the history CSVs and atomically make it current.
+
+    Each publish writes a new file (`history-<version>.snap`) and then replaces
+    the small pointer file, so readers holding an older mapping keep working
+    and no mapped file is ever overwritten (required on Windows).
+    """
+    summary_headers, summary_rows = read_csv_table(summary_path)
+    raw_headers, raw_rows = read_csv_table(raw_path)
+    return publish_tables(summary_headers, summary_rows, raw_headers, raw_rows, snapshot_dir, keep)
+
+
+def publish_tables(
+    summary_headers: list[str],
+    summary_rows: list[dict[str, str]],
+    raw_headers: list[str],
+    raw_rows: list[dict[str, str]],
+    snapshot_dir: Path,
+    keep: int = 2,
+    tables: Mapping[str, tuple[list[str], list[dict[str, str]]]] | None = None,
+) -> dict[str, Any]:
+    """publish_snapshot() for history rows already in memory; `tables` are extra named tables."""
+    columns = build_raw_columns(raw_rows)
+
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    previous = read_pointer(snapshot_dir) or {}
+    version = int(previous.get("version", 0)) + 1
+    file_name = f"history-{version:08d}.snap"
+    created_at = datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    tmp_path = snapshot_dir / (file_name + ".tmp")
+    write_file(
+        tmp_path,
+        meta={"format": SNAPSHOT_FORMAT, "version": version, "created_at_utc": created_at},
+        arrays={name: getattr(columns, name) for name in RAW_COLUMN_FIELDS},
+        tables={**(tables or {}), "raw": (raw_headers, raw_rows), "summary": (summary_headers, summary_rows)},
+    )
+    os.replace(tmp_path, snapshot_dir / file_name)
+
+    previous_file = snapshot_dir / previous["file"] if previous.get("file") else None
+    record = change_record(previous_file, {"raw": (raw_headers, raw_rows), "summary": (summary_headers, summary_rows)})
+    write_json(snapshot_dir / f"{CHANGES_PREFIX}{version:08d}.json", {"version": version, "created_at_utc": created_at, **record})
+
+    pointer = {
+        "version": version,
+        "file": file_name,
+        "created_at_utc": created_at,
+        "raw_rows": len(raw_rows),
+        "summary_rows": len(summary_rows),
+    }
+    write_json(snapshot_dir / POINTER_NAME, pointer, indent=2)
+
+    for old in sorted(snapshot_dir.glob("history-*.snap"))[:-max(keep, 1)]:
+        try:
+            old.unlink()
+        except OSError:
+            # Still mapped by a running worker (Windows); retried on the next publish.
+            pass
+    for old in sorted(snapshot_dir.glob(f"{CHANGES_PREFIX}*.json"))[:-CHANGES_KEEP]:
+        old.unlink(missing_ok=True)
+    return pointer
+
+
+def write_json(path: Path, payload: dict[str, Any], indent: int | None = None) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=True, indent=indent), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def is_tombstone(row: Mapping[str, str]) -> bool:
+    return (row.get("is_deleted") or "").strip().lower() in TRUE_VALUES
+
+
+def no_changes() -> dict[str, Any]:
+    return {"reset": False, **{name: {"upserted": [], "deleted": []} for name, _ in CHANGE_TABLES}}
+
+
+def _keyed_values(table: MappedTable, key: str) -> dict[str, tuple[str, ...]]:
+    columns = [table.column(h) for h in table.headers]
+    return dict(zip(table.column(key), zip(*columns)))
+
+
+def table_changes(
+    previous: MappedTable,
+    headers: list[str],
+    rows: list[dict[str, str]],
+    key: str,
+) -> dict[str, list[Any]]:
+    """Rows added or changed since `previous` (live rows only) and keys removed or tombstoned."""
+    before = _keyed_values(previous, key)
+    upserted: list[dict[str, str]] = []
+    deleted: list[str] = []
+    seen = set()
+    pick = itemgetter(*headers)
+    header_set = set(headers)
+    for row in rows:
+        k = row.get(key) or ""
+        seen.add(k)
+        old = before.get(k)
+        # Rows carrying every column compare as-is; the others after filling the gaps with "".
+        if row.keys() >= header_set and pick(row) == old:
+            continue
+        # Compared as stored in the snapshot (None -> "").
+        values = tuple(row.get(h) or "" for h in headers)
+        if values == old:
+            continue
+        if is_tombstone(row):
+            if old is not None and not is_tombstone(dict(zip(headers, old))):
+                deleted.append(k)
+        else:
+            upserted.append(dict(zip(headers, values)))
+    deleted.extend(k for k, old in before.items() if k not in seen and not is_tombstone(dict(zip(headers, old))))
+    return {"upserted": upserted, "deleted": deleted}
+
+
+def change_record(
+    previous_file: Path | None,
+    tables: Mapping[str, tuple[list[str], list[dict[str, str]]]],
+) -> dict[str, Any]:
+    """Change record of a publish against the previous snapshot file.
+
+    A reset when there is no previous file, a table's headers changed, or the
+    delta touches more than CHANGES_MAX_FRACTION of the rows.
+    """
+    if previous_file is None or not previous_file.exists():
+        return {"reset": True}
+    with MappedFile(previous_file) as previous:
+        return _changes_since(previous, tables)
+
+
+def _changes_since(previous: MappedFile, tables: Mapping[str, tuple[list[str], list[dict[str, str]]]]) -> dict[str, Any]:
+    # A function of its own so no view of the mapping outlives it when change_record unmaps the file.
+    record = no_changes()
+    touched = total = 0
+    for name, key in CHANGE_TABLES:
+        headers, rows = tables[name]
+        table = previous.tables.get(name)
+        if table is None or table.headers != list(headers) or key not in headers:
+            return {"reset": True}
+        record[name] = table_changes(table, list(headers), rows, key)
+        touched += len(record[name]["upserted"]) + len(record[name]["deleted"])
+        total += max(len(rows), len(table))
+    if touched > CHANGES_MAX_FRACTION * max(total, 1):
+        return {"reset": True}
+    return record
+
+
+def read_changes(snapshot_dir: Path, since: int, version: int) -> dict[str, Any]:
+    """Merge the change records of versions (since, version].
+
+    A key upserted and later deleted (or the reverse) ends up only in its
+    last state. Returns {"reset": True} when a record is missing (pruned,
+    `since` from another store) or is itself a reset: the client reloads.
+    """
+    if since == version:
+        return no_changes()
+    if since > version or version - since > CHANGES_KEEP:
+        return {"reset": True}
+    merged: dict[str, tuple[dict[str, dict[str, str]], dict[str, None]]] = {name: ({}, {}) for name, _ in CHANGE_TABLES}
+    for v in range(since + 1, version + 1):
+        path = snapshot_dir / f"{CHANGES_PREFIX}{v:08d}.json"
+        if not path.exists():
+            return {"reset": True}
+        record = json.loads(path.read_text(encoding="utf-8"))
+        if record.get("reset"):
+            return {"reset": True}
+        for name, key in CHANGE_TABLES:
+            upserted, deleted = merged[name]
+            for row in record[name]["upserted"]:
+                deleted.pop(row[key], None)
+                upserted[row[key]] = row
+            for k in record[name]["deleted"]:
+                upserted.pop(k, None)
+                deleted[k] = None
+    return {"reset": False, **{name: {"upserted": list(up.values()), "deleted": list(dl)} for name, (up, dl) in merged.items()}}
+
+
+def _file_token(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_mtime_ns:x}.{st.st_size:x}"
+
+
+class SnapshotStore:
+    """Holds the current history snapshot and reloads it when data changes.
+
+    When `snapshot_dir` holds a published pointer, the snapshot file is mapped;
+    otherwise the CSV files are parsed in-process. A pointer older than any of
+    the CSV files is stale (the CSVs were rewritten without publishing) and
+    the CSVs are served instead, until the next publish.
+    """
+
+    def __init__(
+        self,
+        summary_path: Path,
+        raw_path: Path,
+        snapshot_dir: Path | None = None,
+        on_load: Callable[[float], None] | None = None,
+        table_paths: Mapping[str, Path] | None = None,
+    ) -> None:
+        self.summary_path = summary_path
+        self.raw_path = raw_path
+        self.snapshot_dir = snapshot_dir
+        # Extra tables read from CSV when no snapshot is published; optional files.
+        self.table_paths = dict(table_paths or {})
+        self.on_load = on_load
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._snapshot: HistorySnapshot | None = None
+        self._token = ""
+
+    def _pointer_path(self) -> Path | None:
+        if self.snapshot_dir is None:
+            return None
+        path = self.snapshot_dir / POINTER_NAME
+        return path if path.exists() else None
+
+    def _pointer_is_stale(self, pointer: Path) -> bool:
+        published = pointer.stat().st_mtime_ns
+        paths = (self.summary_path, self.raw_path, *self.table_paths.values())
+        return any(p.exists() and p.stat().st_mtime_ns > published for p in paths)
+
+    def current_token(self) -> str:
+        pointer = self._pointer_path()
+        if pointer is not None and not self._pointer_is_stale(pointer):
+            return f"snap-{_file_token(pointer)}"
+        extra = "".join(f"-{_file_token(p)}" for p in self.table_paths.values() if p.exists())
+        return f"{_file_token(self.summary_path)}-{_file_token(self.raw_path)}{extra}"
+
+    def get(self) -> HistorySnapshot:
+        token = self.current_token()
+        snapshot = self._snapshot
+        if snapshot is not None and self._token == token:
+            self.hits += 1
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._token != token:
+                self.misses += 1
+                started = time.perf_counter()
+                snapshot = self._load(token)
+                self._snapshot = snapshot
+                self._token = token
+                if self.on_load is not None:
+                    self.on_load(time.perf_counter() - started)
+            else:
+                self.hits += 1
+            return snapshot
+
+    def _load(self, token: str) -> HistorySnapshot:
+        if self.snapshot_dir is not None and token.startswith("snap-"):
+            pointer = read_pointer(self.snapshot_dir)
+            if pointer is not None:
+                return MappedSnapshot(self.snapshot_dir / pointer["file"])
+        if self._pointer_path() is not None:
+            logger.warning("Snapshot in %s is older than the history CSVs; serving the CSVs until the next publish", self.snapshot_dir)
+        tables = {name: read_csv_rows(path) for name, path in self.table_paths.items() if path.exists()}
+        return CsvSnapshot(token, read_csv_rows(self.summary_path), read_csv_rows(self.raw_path), tables)
+
+
+class LRUCache:
+    """Thread-safe LRU memo; callers include the snapshot version in the key."""
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = max(maxsize, 1)
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,133 @@
+"""Request metrics for the API server in Prometheus text format.
+
+- Per-route latency and response size histograms
+- Request counter by route and status code
+- Cache hit/miss counters and snapshot reload durations
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Callable, Iterable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+RELOAD_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[Labels, list[float]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        # Layout: one cumulative count per bucket, then +Inf count, then sum.
+        series = self._series.get(labels)
+        if series is None:
+            series = [0.0] * (len(self.buckets) + 2)
+            self._series[labels] = series
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {_format_value(count)}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(series[-2])}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._series: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, value: float = 1.0) -> None:
+        self._series[labels] = self._series.get(labels, 0.0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class ApiMetrics:
+    """Process-local metrics registry; safe to call from the threadpool."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            "api_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS
+        )
+        self.response_size = Histogram("api_response_size_bytes", "Response body size by route.", SIZE_BUCKETS)
+        self.requests = Counter("api_requests_total", "Requests by route and status code.")
+        self.reload_duration = Histogram(
+            "api_snapshot_reload_duration_seconds", "Time spent loading a history snapshot.", RELOAD_BUCKETS
+        )
+        self._cache_sources: dict[str, Callable[[], tuple[int, int]]] = {}
+
+    def observe_request(self, method: str, route: str, status: int, duration_sec: float, size_bytes: int) -> None:
+        labels = (("method", method), ("route", route))
+        with self._lock:
+            self.request_duration.observe(labels, duration_sec)
+            self.response_size.observe(labels, float(size_bytes))
+            self.requests.inc(labels + (("status", str(status)),))
+
+    def observe_reload(self, duration_sec: float) -> None:
+        with self._lock:
+            self.reload_duration.observe((), duration_sec)
+
+    def register_cache(self, name: str, stats: Callable[[], tuple[int, int]]) -> None:
+        """Register a cache whose (hits, misses) are read at scrape time."""
+        self._cache_sources[name] = stats
+
+    def render(self) -> str:
+        hits = Counter("api_cache_hits_total", "Cache hits by cache name.")
+        misses = Counter("api_cache_misses_total", "Cache misses by cache name.")
+        for name, stats in sorted(self._cache_sources.items()):
+            hit_count, miss_count = stats()
+            hits.inc((("cache", name),), hit_count)
+            misses.inc((("cache", name),), miss_count)
+
+        with self._lock:
+            lines = (
+                self.requests.render()
+                + self.request_duration.render()
+                + self.response_size.render()
+                + self.reload_duration.render()
+            )
+        lines += hits.render() + misses.render()
+        return "\n".join(lines) + "\n"
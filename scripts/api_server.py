@@ -3,20 +3,45 @@
 
 Default behavior:
 - Read merged history CSV files from dashboard/data
-- Expose JSON endpoints for summary and raw events
+- Serve the published memory-mapped snapshot (shared by all workers), or
+  the CSV files when no snapshot is published; reload when data changes
+- Expose JSON endpoints for summary, per-account/portfolio summaries, raw events
+  and analytics
+- Change feed (`/api/changes?since=<version>`): the rows upserted or deleted
+  since a snapshot version, immediately, by long-poll (`wait`) or as
+  server-sent events (`stream=true`)
 - Optional token auth for sensitive deployments
+- Request metrics at /metrics (Prometheus text format)
+- Responses are encoded by json_codec (orjson/msgspec when installed) and
+  returned as-is, skipping FastAPI's jsonable_encoder pass over the rows
 """
 
 from __future__ import annotations
 
-import csv
+import asyncio
+import logging
 import os
+import sys
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Callable
 
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    # Allow sibling imports when served as `scripts.api_server:app`.
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import analytics  # noqa: E402
+import json_codec  # noqa: E402
+from api_data import POINTER_NAME, HistorySnapshot, LRUCache, SnapshotStore  # noqa: E402
+from api_metrics import ApiMetrics  # noqa: E402
+from portfolio import ACCOUNT_SUMMARY_FILE, PORTFOLIO_FILE  # noqa: E402
 
 
 def _split_csv_env(name: str) -> list[str]:
@@ -29,10 +54,39 @@ load_dotenv(encoding="utf-8-sig")
 DATA_DIR = Path(os.getenv("API_DATA_DIR", "dashboard/data"))
 SUMMARY_PATH = DATA_DIR / "daily_summary_history.csv"
 RAW_PATH = DATA_DIR / "raw_events_history.csv"
+TABLE_PATHS = {"account_summary": DATA_DIR / ACCOUNT_SUMMARY_FILE, "portfolio": DATA_DIR / PORTFOLIO_FILE}
+SNAPSHOT_DIR = Path(os.getenv("API_SNAPSHOT_DIR", "") or DATA_DIR / "snapshot")
 API_TOKEN = os.getenv("API_TOKEN", "").strip()
 CORS_ALLOW_ORIGINS = _split_csv_env("CORS_ALLOW_ORIGINS")
+ANALYTICS_CACHE_SIZE = int(os.getenv("API_ANALYTICS_CACHE_SIZE", "256"))
+SLOW_REQUEST_MS = float(os.getenv("API_SLOW_REQUEST_MS", "0") or 0)
+# Change feed: how often a waiting request checks for a new snapshot, and the longest long-poll.
+CHANGES_POLL_SEC = float(os.getenv("API_CHANGES_POLL_SEC", "1") or 1)
+CHANGES_MAX_WAIT_SEC = 60.0
+SSE_HEARTBEAT_SEC = 15.0
+# Held open by design; kept out of the slow-request log.
+LONG_LIVED_ROUTES = {"/api/changes"}
+
+logger = logging.getLogger("api_server")
+metrics = ApiMetrics()
+store = SnapshotStore(
+    SUMMARY_PATH,
+    RAW_PATH,
+    snapshot_dir=SNAPSHOT_DIR,
+    on_load=metrics.observe_reload,
+    table_paths=TABLE_PATHS,
+)
+analytics_cache = LRUCache(maxsize=ANALYTICS_CACHE_SIZE)
+metrics.register_cache("snapshot", lambda: (store.hits, store.misses))
+metrics.register_cache("analytics", lambda: (analytics_cache.hits, analytics_cache.misses))
+
 
-app = FastAPI(title="Trading Dashboard API", version="1.0.0")
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return json_codec.dumps(content)
+
+
+app = FastAPI(title="Trading Dashboard API", version="1.0.0", default_response_class=FastJSONResponse)
 
 if CORS_ALLOW_ORIGINS:
     app.add_middleware(
@@ -44,6 +98,33 @@ if CORS_ALLOW_ORIGINS:
     )
 
 
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    size = 0
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        size = int(response.headers.get("content-length", 0) or 0)
+        return response
+    finally:
+        duration = time.perf_counter() - started
+        # Use the route template (not the raw path) to keep label cardinality bounded.
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.observe_request(request.method, route, status, duration, size)
+        if SLOW_REQUEST_MS and duration * 1000 >= SLOW_REQUEST_MS and route not in LONG_LIVED_ROUTES:
+            logger.warning(
+                "Slow request: %s %s status=%s duration_ms=%.1f bytes=%s params=%s",
+                request.method,
+                route,
+                status,
+                duration * 1000,
+                size,
+                dict(request.query_params),
+            )
+
+
 def require_token(
     authorization: str | None = Header(default=None),
     x_api_key: str | None = Header(default=None),
@@ -58,11 +139,62 @@ def require_token(
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
-def read_csv_rows(path: Path) -> list[dict[str, str]]:
-    if not path.exists():
-        raise HTTPException(status_code=404, detail=f"Missing data file: {path}")
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        return list(csv.DictReader(f))
+def get_snapshot() -> HistorySnapshot:
+    try:
+        return store.get()
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=f"Missing data file: {exc.filename or exc}") from exc
+
+
+def get_filters(
+    from_date: str = "",
+    to_date: str = "",
+    symbol: str = "",
+    account_id: str = "",
+) -> analytics.Filters:
+    return analytics.Filters(from_date=from_date, to_date=to_date, symbol=symbol, account_id=account_id)
+
+
+def memoized(snapshot: HistorySnapshot, name: str, filters: analytics.Filters, compute: Callable[[], Any]) -> Any:
+    return analytics_cache.get_or_compute((snapshot.version, name, filters), compute)
+
+
+def filter_day_rows(rows: list[dict[str, str]], filters: analytics.Filters) -> list[dict[str, str]]:
+    """Rows of a per-day table within the date range (and account, when the table has one)."""
+    return [
+        r
+        for r in rows
+        if (not filters.from_date or (r.get("trade_date_vn") or "") >= filters.from_date)
+        and (not filters.to_date or (r.get("trade_date_vn") or "") <= filters.to_date)
+        and (not filters.account_id or r.get("account_id", filters.account_id) == filters.account_id)
+    ]
+
+
+def changes_body(snapshot: HistorySnapshot, since: str) -> dict[str, Any]:
+    changes = analytics_cache.get_or_compute((snapshot.version, "changes", since), lambda: snapshot.changes_since(since))
+    count = sum(len(t["upserted"]) + len(t["deleted"]) for k, t in changes.items() if k != "reset")
+    return {"version": snapshot.version, "since": since, **changes, "count": count}
+
+
+async def wait_for_version(since: str, deadline: float) -> HistorySnapshot:
+    """Current snapshot, once its version differs from `since` or at `deadline` (monotonic)."""
+    snapshot = await run_in_threadpool(get_snapshot)
+    while snapshot.version == since and time.monotonic() < deadline:
+        await asyncio.sleep(min(CHANGES_POLL_SEC, max(deadline - time.monotonic(), 0)))
+        snapshot = await run_in_threadpool(get_snapshot)
+    return snapshot
+
+
+async def change_events(request: Request, since: str) -> AsyncIterator[str]:
+    yield f"retry: {int(CHANGES_POLL_SEC * 5000)}\n\n"
+    while not await request.is_disconnected():
+        snapshot = await wait_for_version(since, time.monotonic() + SSE_HEARTBEAT_SEC)
+        if snapshot.version == since:
+            yield ": keep-alive\n\n"
+            continue
+        body = await run_in_threadpool(changes_body, snapshot, since)
+        yield f"id: {snapshot.version}\nevent: changes\ndata: {json_codec.dumps(body).decode()}\n\n"
+        since = snapshot.version
 
 
 @app.get("/health")
@@ -71,13 +203,43 @@ def health() -> dict[str, Any]:
         "status": "ok",
         "summary_exists": SUMMARY_PATH.exists(),
         "raw_exists": RAW_PATH.exists(),
+        "snapshot_published": (SNAPSHOT_DIR / POINTER_NAME).exists(),
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(_: None = Depends(require_token)) -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/summary")
-def get_summary(_: None = Depends(require_token)) -> dict[str, Any]:
-    rows = read_csv_rows(SUMMARY_PATH)
-    return {"rows": rows, "count": len(rows)}
+def get_summary(_: None = Depends(require_token)) -> FastJSONResponse:
+    snapshot = get_snapshot()
+    rows = snapshot.summary_rows()
+    return FastJSONResponse({"rows": rows, "count": len(rows), "version": snapshot.version})
+
+
+@app.get("/api/accounts/summary")
+def get_account_summary(
+    filters: analytics.Filters = Depends(get_filters),
+    _: None = Depends(require_token),
+) -> FastJSONResponse:
+    snapshot = get_snapshot()
+    rows = memoized(snapshot, "account_summary", filters, lambda: filter_day_rows(snapshot.table_rows("account_summary"), filters))
+    return FastJSONResponse({"rows": rows, "count": len(rows), "filters": filters.as_dict(), "version": snapshot.version})
+
+
+@app.get("/api/portfolio/summary")
+def get_portfolio_summary(
+    filters: analytics.Filters = Depends(get_filters),
+    _: None = Depends(require_token),
+) -> FastJSONResponse:
+    snapshot = get_snapshot()
+    rows = memoized(snapshot, "portfolio", filters, lambda: filter_day_rows(snapshot.table_rows("portfolio"), filters))
+    currency = rows[-1]["reporting_currency"] if rows else ""
+    return FastJSONResponse(
+        {"rows": rows, "count": len(rows), "reporting_currency": currency, "filters": filters.as_dict(), "version": snapshot.version}
+    )
 
 
 @app.get("/api/raw-events")
@@ -85,21 +247,96 @@ def get_raw_events(
     from_date: str = "",
     to_date: str = "",
     limit: int = 0,
+    offset: int = 0,
     _: None = Depends(require_token),
-) -> dict[str, Any]:
-    rows = read_csv_rows(RAW_PATH)
-
-    if from_date or to_date:
-        rows = [
-            r
-            for r in rows
-            if (
-                (not from_date or (r.get("trade_date_vn", "") >= from_date))
-                and (not to_date or (r.get("trade_date_vn", "") <= to_date))
-            )
-        ]
-    if limit and limit > 0:
-        rows = rows[:limit]
+) -> FastJSONResponse:
+    snapshot = get_snapshot()
+    rows = snapshot.raw_rows(from_date=from_date, to_date=to_date, offset=offset, limit=limit)
+    return FastJSONResponse({"rows": rows, "count": len(rows), "version": snapshot.version})
+
+
+@app.get("/api/changes", response_model=None)
+async def get_changes(
+    request: Request,
+    since: str = "",
+    wait: float = 0,
+    stream: bool = False,
+    last_event_id: str | None = Header(default=None),
+    _: None = Depends(require_token),
+) -> FastJSONResponse | StreamingResponse:
+    """Rows upserted/deleted since snapshot version `since`; `reset: true` means reload everything.
+
+    `wait` (seconds, up to 60) holds the request until a newer version is
+    published; `stream=true` sends one `changes` server-sent event per new
+    version instead (EventSource reconnects resume from `Last-Event-ID`).
+    """
+    if stream:
+        # Fail with a normal HTTP error, not inside the stream, when there is no data.
+        await run_in_threadpool(get_snapshot)
+        return StreamingResponse(
+            change_events(request, last_event_id or since),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    deadline = time.monotonic() + min(max(wait, 0.0), CHANGES_MAX_WAIT_SEC)
+    snapshot = await wait_for_version(since, deadline)
+    return FastJSONResponse(await run_in_threadpool(changes_body, snapshot, since))
 
-    return {"rows": rows, "count": len(rows)}
 
+@app.get("/api/analytics/overview")
+def get_analytics_overview(
+    filters: analytics.Filters = Depends(get_filters),
+    _: None = Depends(require_token),
+) -> FastJSONResponse:
+    snapshot = get_snapshot()
+    data = memoized(snapshot, "overview", filters, lambda: analytics.overview(snapshot.columns, filters))
+    return FastJSONResponse({"overview": data, "filters": filters.as_dict(), "version": snapshot.version})
+
+
+@app.get("/api/analytics/by-symbol")
+def get_analytics_by_symbol(
+    filters: analytics.Filters = Depends(get_filters),
+    _: None = Depends(require_token),
+) -> FastJSONResponse:
+    snapshot = get_snapshot()
+    rows = memoized(snapshot, "by_symbol", filters, lambda: analytics.by_symbol(snapshot.columns, filters))
+    return FastJSONResponse({"rows": rows, "count": len(rows), "filters": filters.as_dict(), "version": snapshot.version})
+
+
+@app.get("/api/analytics/by-hour")
+def get_analytics_by_hour(
+    filters: analytics.Filters = Depends(get_filters),
+    _: None = Depends(require_token),
+) -> FastJSONResponse:
+    snapshot = get_snapshot()
+    rows = memoized(snapshot, "by_hour", filters, lambda: analytics.by_hour(snapshot.columns, filters))
+    return FastJSONResponse({"rows": rows, "count": len(rows), "filters": filters.as_dict(), "version": snapshot.version})
+
+
+@app.get("/api/equity-curve")
+def get_equity_curve(
+    granularity: str = "day",
+    filters: analytics.Filters = Depends(get_filters),
+    _: None = Depends(require_token),
+) -> FastJSONResponse:
+    if granularity not in analytics.GRANULARITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"granularity must be one of: {', '.join(analytics.GRANULARITIES)}",
+        )
+    snapshot = get_snapshot()
+    rows = memoized(
+        snapshot,
+        f"equity_curve:{granularity}",
+        filters,
+        lambda: analytics.equity_curve(snapshot.columns, filters, granularity),
+    )
+    return FastJSONResponse(
+        {
+            "rows": rows,
+            "count": len(rows),
+            "granularity": granularity,
+            "filters": filters.as_dict(),
+            "version": snapshot.version,
+        }
+    )
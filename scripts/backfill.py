@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""Backfill a long date range in monthly windows, in parallel and resumable.
+
+- `--since-day` .. `--until-day` (XM days, inclusive) is split into calendar
+  month windows per account; each (account, window) is fetched in a worker
+  process and written to its own partition:
+  `<out-dir>/<account>/raw_events_<YYYY-MM>.csv`
+- windows of the same MT5 terminal run one at a time (a terminal holds one
+  login); different terminals and replayed deals (`--deals-file`) run in
+  parallel up to `--workers`
+- every finished window is appended to a JSONL checkpoint keyed by
+  (account, first day, last day); a rerun skips completed windows whose
+  partition still exists, so moving `--until-day` only refetches the windows
+  that changed (`--restart` ignores the checkpoint)
+- progress with rate and ETA is logged after each window
+- `--merge-history` merges all partitions into the history CSVs once at the
+  end, with daily summaries recomputed from the merged raw history; its
+  data-quality cache sits next to the checkpoint
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+from build_dashboard_data import DEFAULT_RATES_PATH, build_history, read_csv
+from deal_sources import file_source, mt5_source, replay_accounts
+from extract_mt5_events import (
+    UTC,
+    XM_TZ,
+    AccountConfig,
+    DailySummary,
+    RawEvent,
+    format_iso_utc,
+    full_day_window_utc_from_xm_date,
+    load_accounts,
+    setup_logging,
+    write_csv,
+)
+
+CHECKPOINT_VERSION = 2
+
+
+@dataclass(frozen=True)
+class Window:
+    account: str
+    month: str
+    first_day: date
+    last_day: date
+    # Windows sharing a lane never run concurrently (None = no limit).
+    lane: str | None
+
+
+@dataclass(frozen=True)
+class WindowJob:
+    window: Window
+    output: str
+    etl_run_id: str
+    synced_at_utc: str
+    deals_file: str = ""
+    mt5_account: AccountConfig | None = None
+    deal_cache_dir: str = ""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backfill MT5 history in monthly windows")
+    parser.add_argument("--since-day", required=True, help="First XM day (YYYY-MM-DD).")
+    parser.add_argument("--until-day", default="", help="Last XM day (YYYY-MM-DD); default yesterday XM.")
+    parser.add_argument("--accounts-file", default="", help="Multi-account config; default state/accounts.json if present.")
+    parser.add_argument("--deals-file", default="", help="Replay MT5 deals from JSONL instead of the terminal.")
+    parser.add_argument("--deal-cache-dir", default="state/deal_cache", help="Raw MT5 deal cache for renormalize.py (empty = off).")
+    parser.add_argument("--out-dir", default="out/backfill")
+    parser.add_argument(
+        "--checkpoint",
+        default="state/backfill_checkpoint.jsonl",
+        help="Finished windows; the data-quality cache of the merge is kept next to it.",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and fetch every window again.")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--merge-history", action="store_true", help="Merge all partitions into the history CSVs at the end.")
+    parser.add_argument("--summary-history", default="dashboard/data/daily_summary_history.csv")
+    parser.add_argument("--raw-history", default="dashboard/data/raw_events_history.csv")
+    parser.add_argument("--no-snapshot", action="store_true")
+    parser.add_argument("--fx-rates", default=DEFAULT_RATES_PATH, help="USD/VND rate cache for the *_vnd columns (fx_rates.py).")
+    parser.add_argument("--log-file", default="logs/backfill.log")
+    return parser.parse_args()
+
+
+def parse_day(value: str, flag: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise SystemExit(f"Invalid {flag} format. Use YYYY-MM-DD, e.g. 2026-02-22") from exc
+
+
+def month_windows(first: date, last: date) -> list[tuple[str, date, date]]:
+    """[(YYYY-MM, first day, last day)] covering first..last, cut at month boundaries."""
+    windows = []
+    cursor = first
+    while cursor <= last:
+        next_month = (cursor.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(last, next_month - timedelta(days=1))
+        windows.append((cursor.strftime("%Y-%m"), cursor, end))
+        cursor = next_month
+    return windows
+
+
+def safe_name(value: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in value)
+
+
+def window_key(window: Window) -> tuple[str, str, str]:
+    return window.account, window.first_day.isoformat(), window.last_day.isoformat()
+
+
+class BackfillCheckpoint:
+    """Append-only JSONL: a header line (source, out dir), then one line per finished window.
+
+    Windows are keyed by (account, first day, last day) rather than by the
+    run's range: a rerun with a later `--until-day` keeps every finished
+    month and only refetches the last, now longer, window.
+    """
+
+    def __init__(self, path: Path, header: dict[str, Any], restart: bool) -> None:
+        self.path = path
+        self.done: dict[tuple[str, str, str], dict[str, Any]] = {}
+        if path.exists() and not restart:
+            lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+            if lines and lines[0] == header:
+                for e in lines[1:]:
+                    self._add((e["account"], e["first_day"], e["last_day"]), e)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.done:
+            path.write_text(json.dumps(header, ensure_ascii=True) + "\n", encoding="utf-8")
+
+    def _add(self, key: tuple[str, str, str], entry: dict[str, Any]) -> None:
+        # A longer window of the same month rewrites its partition: the shorter one is gone.
+        self.done = {k: e for k, e in self.done.items() if e["output"] != entry["output"]}
+        self.done[key] = entry
+
+    def entry(self, window: Window) -> dict[str, Any] | None:
+        entry = self.done.get(window_key(window))
+        return entry if entry is not None and Path(entry["output"]).exists() else None
+
+    def is_done(self, window: Window) -> bool:
+        return self.entry(window) is not None
+
+    def mark(self, window: Window, entry: dict[str, Any]) -> None:
+        self._add(window_key(window), entry)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=True) + "\n")
+
+
+def run_window(job: WindowJob) -> dict[str, Any]:
+    """Worker process: fetch one (account, month) window and write its partition."""
+    window = job.window
+    since_utc = full_day_window_utc_from_xm_date(window.first_day)[0]
+    until_utc = full_day_window_utc_from_xm_date(window.last_day)[1]
+    if job.deals_file:
+        source = file_source(Path(job.deals_file), window.account)
+    else:
+        # deal_cache and fx_rates need NumPy: imported where used, not for --help.
+        from deal_cache import DealCache
+
+        source = mt5_source([job.mt5_account], DealCache(Path(job.deal_cache_dir)) if job.deal_cache_dir else None)
+    started = time.perf_counter()
+    events = source(since_utc, until_utc, job.etl_run_id, job.synced_at_utc)
+    output = Path(job.output)
+    tmp = output.with_name(output.name + ".tmp")
+    write_csv(tmp, events)
+    os.replace(tmp, output)
+    return {
+        "account": window.account,
+        "month": window.month,
+        "first_day": window.first_day.isoformat(),
+        "last_day": window.last_day.isoformat(),
+        "events": len(events),
+        "output": str(output),
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+    }
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+def merge_partitions(args: argparse.Namespace, outputs: list[str], synced_at_utc: str) -> dict[str, Any]:
+    from fx_rates import load_rate_table
+
+    raw_headers = list(RawEvent.__annotations__.keys())
+    raw_rows: list[dict[str, str]] = []
+    for output in sorted(outputs):
+        headers, rows = read_csv(Path(output))
+        raw_headers += [h for h in headers if h not in raw_headers]
+        raw_rows.extend(rows)
+    raw_dst = Path(args.raw_history)
+    # Per backfill state like the checkpoint: the shared cache belongs to the daily history, and a backfill into
+    # another history would keep overwriting it.
+    checkpoint = Path(args.checkpoint)
+    quality_cache = checkpoint.with_name(f"{checkpoint.stem}_quality_cache.json")
+    # Summaries cover every account of a day: rebuilt from the merged raw history, not the partitions.
+    history = build_history(
+        list(DailySummary.__annotations__.keys()),
+        [],
+        raw_headers,
+        raw_rows,
+        Path(args.summary_history),
+        raw_dst,
+        None if args.no_snapshot else raw_dst.parent / "snapshot",
+        load_rate_table(Path(args.fx_rates)),
+        quality_cache=quality_cache,
+        resummarize_at=synced_at_utc,
+    )
+    return {
+        "raw_rows_merged": len(raw_rows),
+        "raw_history_rows": len(history["raw_rows"]),
+        "summary_history_rows": len(history["summary_rows"]),
+        "snapshot_version": history["snapshot_version"],
+        "fx": history["fx"],
+        "quality": history["quality"],
+    }
+
+
+def main() -> int:
+    project_root = Path(__file__).resolve().parent.parent
+    load_dotenv(dotenv_path=project_root / ".env", override=False, encoding="utf-8-sig")
+    args = parse_args()
+    setup_logging(Path(args.log_file))
+
+    first = parse_day(args.since_day, "--since-day")
+    last = parse_day(args.until_day, "--until-day") if args.until_day else datetime.now(tz=XM_TZ).date() - timedelta(days=1)
+    if first > last:
+        raise SystemExit("Invalid range: --since-day must not be after --until-day")
+
+    accounts: dict[str, AccountConfig | None]
+    if args.deals_file:
+        accounts = {account: None for account in replay_accounts(Path(args.deals_file))}
+    else:
+        accounts_file = args.accounts_file
+        if not accounts_file and Path("state/accounts.json").exists():
+            accounts_file = "state/accounts.json"
+        accounts = {str(a.login): a for a in load_accounts(argparse.Namespace(accounts_file=accounts_file))}
+
+    out_dir = Path(args.out_dir)
+    windows = [
+        Window(
+            account=account,
+            month=month,
+            first_day=start,
+            last_day=end,
+            lane=None if config is None else f"terminal:{config.path or 'default'}",
+        )
+        for month, start, end in month_windows(first, last)
+        for account, config in accounts.items()
+    ]
+    header = {"version": CHECKPOINT_VERSION, "source": args.deals_file or "mt5", "out_dir": str(out_dir)}
+    checkpoint = BackfillCheckpoint(Path(args.checkpoint), header, restart=args.restart)
+    todo = [w for w in windows if not checkpoint.is_done(w)]
+    logging.info("Backfill windows: total=%s resumed=%s todo=%s", len(windows), len(windows) - len(todo), len(todo))
+
+    etl_run_id = str(uuid.uuid4())
+    synced_at_utc = format_iso_utc(datetime.now(tz=UTC))
+
+    def job(window: Window) -> WindowJob:
+        output = out_dir / safe_name(window.account) / f"raw_events_{window.month}.csv"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        return WindowJob(
+            window, str(output), etl_run_id, synced_at_utc, args.deals_file, accounts[window.account], args.deal_cache_dir
+        )
+
+    started = time.perf_counter()
+    events_total = 0
+    failed: list[dict[str, str]] = []
+    busy_lanes: set[str] = set()
+    running: dict[Future[dict[str, Any]], Window] = {}
+    queue = list(todo)
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        while queue or running:
+            for window in list(queue):
+                if len(running) >= max(args.workers, 1):
+                    break
+                if window.lane is not None and window.lane in busy_lanes:
+                    continue
+                queue.remove(window)
+                if window.lane is not None:
+                    busy_lanes.add(window.lane)
+                running[pool.submit(run_window, job(window))] = window
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                window = running.pop(future)
+                busy_lanes.discard(window.lane or "")
+                try:
+                    entry = future.result()
+                except (Exception, SystemExit) as exc:
+                    failed.append({"account": window.account, "month": window.month, "error": f"{type(exc).__name__}: {exc}"})
+                    logging.error("Window failed: account=%s month=%s error=%s", window.account, window.month, exc)
+                    continue
+                checkpoint.mark(window, entry)
+                events_total += entry["events"]
+                finished = len(todo) - len(queue) - len(running)
+                elapsed = time.perf_counter() - started
+                eta = elapsed / finished * (len(todo) - finished)
+                logging.info(
+                    "Backfill %s/%s windows (%.0f%%) account=%s month=%s events=%s rate=%.0f events/s elapsed=%s eta=%s",
+                    finished,
+                    len(todo),
+                    100 * finished / len(todo),
+                    window.account,
+                    window.month,
+                    entry["events"],
+                    events_total / elapsed if elapsed > 0 else 0.0,
+                    format_duration(elapsed),
+                    format_duration(eta),
+                )
+
+    merged = None
+    if args.merge_history and not failed:
+        outputs = {entry["output"] for entry in map(checkpoint.entry, windows) if entry is not None}
+        merged = merge_partitions(args, sorted(outputs), synced_at_utc)
+
+    print(
+        json.dumps(
+            {
+                "status": "failed" if failed else "ok",
+                "since_day": first.isoformat(),
+                "until_day": last.isoformat(),
+                "accounts": len(accounts),
+                "windows": len(windows),
+                "windows_resumed": len(windows) - len(todo),
+                "windows_fetched": len(todo) - len(failed),
+                "windows_failed": failed,
+                "events_fetched": events_total,
+                "elapsed_sec": round(time.perf_counter() - started, 3),
+                "out_dir": str(out_dir),
+                "merged": merged,
+            },
+            ensure_ascii=True,
+        )
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
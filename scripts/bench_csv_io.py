@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Benchmark journal_io.py against the csv.DictReader/DictWriter code it replaced.
+
+- generates a synthetic raw_events history (load_test_api.generate_history)
+  or uses `--data-dir`
+- read cases: DictReader, DictReader + per-consumer type conversion,
+  read_dicts (compat API), read_table untyped/typed, lazy projected iter_rows
+- write cases: DictWriter vs write_table
+- checks that read_dicts returns exactly what DictReader returns and that
+  write_table output is byte-identical to DictWriter output
+- best of `--repeat` runs; prints one JSON report
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from journal_io import PARSERS, iter_rows, read_dicts, read_table, write_table
+from journal_schema import RAW_EVENTS
+from load_test_api import generate_history
+
+PROJECTED = ["trade_date_vn", "account_id", "profit"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the shared CSV I/O layer")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--data-dir", default="", help="Use an existing raw_events_history.csv instead of synthetic data.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def dictreader_rows(path: Path) -> list[dict[str, str]]:
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def dictreader_typed(path: Path) -> list[dict[str, Any]]:
+    """What consumers do today: DictReader, then convert the typed columns themselves."""
+    parsers = {name: PARSERS[kind] for name, kind in RAW_EVENTS.columns if kind in PARSERS}
+    rows = dictreader_rows(path)
+    for row in rows:
+        for name, parse in parsers.items():
+            if name in row:
+                row[name] = parse(row[name] or "")
+    return rows
+
+
+def dictwriter(path: Path, headers: list[str], rows: list[dict[str, str]]) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def projected_sum(path: Path) -> float:
+    return sum(profit or 0.0 for _, _, profit in iter_rows(path, RAW_EVENTS, columns=PROJECTED))
+
+
+def best_of(repeat: int, fn: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="bench_csv_io_") as tmp:
+        tmp_dir = Path(tmp)
+        if args.data_dir:
+            path = Path(args.data_dir) / "raw_events_history.csv"
+        else:
+            generate_history(tmp_dir, args.events, accounts=2, seed=args.seed)
+            path = tmp_dir / "raw_events_history.csv"
+
+        size_mb = round(path.stat().st_size / 1e6, 2)
+        headers, rows = read_dicts(path)
+        if rows != dictreader_rows(path):
+            raise SystemExit("read_dicts() differs from csv.DictReader")
+        dictwriter(tmp_dir / "a.csv", headers, rows)
+        write_table(tmp_dir / "b.csv", headers, rows)
+        if (tmp_dir / "a.csv").read_bytes() != (tmp_dir / "b.csv").read_bytes():
+            raise SystemExit("write_table() output differs from csv.DictWriter")
+
+        cases: dict[str, Callable[[], Any]] = {
+            "dictreader": lambda: dictreader_rows(path),
+            "dictreader_typed": lambda: dictreader_typed(path),
+            "read_dicts": lambda: read_dicts(path),
+            "read_table_str": lambda: read_table(path, typed=False),
+            "read_table_typed": lambda: read_table(path, RAW_EVENTS),
+            "iter_rows_projected_typed": lambda: projected_sum(path),
+            "dictwriter": lambda: dictwriter(tmp_dir / "a.csv", headers, rows),
+            "write_table": lambda: write_table(tmp_dir / "b.csv", headers, rows),
+        }
+        timings = {name: best_of(args.repeat, fn) for name, fn in cases.items()}
+
+    report = {
+        "rows": len(rows),
+        "columns": len(headers),
+        "file_mb": size_mb,
+        "seconds": {name: round(sec, 4) for name, sec in timings.items()},
+        "rows_per_sec": {name: int(len(rows) / sec) if sec else None for name, sec in timings.items()},
+        "speedup": {
+            "read_dicts_vs_dictreader": round(timings["dictreader"] / timings["read_dicts"], 2),
+            "read_table_typed_vs_dictreader_typed": round(timings["dictreader_typed"] / timings["read_table_typed"], 2),
+            "projected_vs_dictreader_typed": round(timings["dictreader_typed"] / timings["iter_rows_projected_typed"], 2),
+            "write_table_vs_dictwriter": round(timings["dictwriter"] / timings["write_table"], 2),
+        },
+    }
+    print(json.dumps(report, ensure_ascii=True))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Benchmark json_codec.py against the stdlib json code it replaced.
+
+- generates a synthetic raw_events history (load_test_api.generate_history)
+  or uses `--data-dir`
+- jsonl: `json.dumps(asdict(event), ensure_ascii=True)` per RawEvent vs
+  extract_mt5_events.write_jsonl (dataclass encoded without asdict)
+- api: FastAPI's JSONResponse(jsonable_encoder(body)) vs api_server's
+  FastJSONResponse for a full /api/raw-events body
+- sync: per-row `json.dumps(..., ensure_ascii=True)` fragments joined as str
+  vs sync_payload's EncodedRows + ChunkPlanner, plain JSON and columnar
+- the new paths run once per installed backend (json_codec.use); every output
+  is checked to decode to the same values as the legacy one
+- best of `--repeat` runs; prints one JSON report
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable
+
+import json_codec
+from journal_io import read_dicts, read_table
+from journal_schema import RAW_EVENTS
+from load_test_api import generate_history
+
+SYNC_CHUNK_BYTES = 256 * 1024
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the JSON serialization backends")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--data-dir", default="", help="Use an existing raw_events_history.csv instead of synthetic data.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", action="append", choices=json_codec.BACKENDS, help="Backends to time (repeatable); default all installed.")
+    return parser.parse_args()
+
+
+def _legacy_dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=True, separators=(",", ":"))
+
+
+def legacy_jsonl(path: Path, events: list[Any]) -> None:
+    with path.open("w", encoding="utf-8", newline="\n") as f:
+        for event in events:
+            f.write(json.dumps(asdict(event), ensure_ascii=True) + "\n")
+
+
+def legacy_sync(rows: list[dict[str, str]], columnar: bool) -> list[bytes]:
+    """The old EncodedRows: str fragments, cut at SYNC_CHUNK_BYTES, each chunk joined and encoded."""
+    if columnar:
+        cols = list(dict.fromkeys(k for r in rows for k in r))
+        fragments = [_legacy_dumps([r.get(c) for c in cols]) for r in rows]
+        prefix, suffix = f'{{"raw":{{"columns":{_legacy_dumps(cols)},"rows":[', "]}}"
+    else:
+        fragments = [_legacy_dumps(r) for r in rows]
+        prefix, suffix = '{"raw_rows":[', '],"summary_rows":[]}'
+    bodies, start, size = [], 0, 0
+    for i, fragment in enumerate(fragments):
+        if size and size + len(fragment) + 1 > SYNC_CHUNK_BYTES - len(prefix) - len(suffix):
+            bodies.append((prefix + ",".join(fragments[start:i]) + suffix).encode("utf-8"))
+            start, size = i, 0
+        size += len(fragment) + 1
+    bodies.append((prefix + ",".join(fragments[start:]) + suffix).encode("utf-8"))
+    return bodies
+
+
+def codec_sync(rows: list[dict[str, str]], columnar: bool) -> list[bytes]:
+    from sync_payload import ByteBudget, ChunkPlanner, EncodedRows, WireFormat
+
+    budget = ByteBudget(SYNC_CHUNK_BYTES, SYNC_CHUNK_BYTES, SYNC_CHUNK_BYTES, 1.0)
+    return [c.body for c in ChunkPlanner([EncodedRows("raw", rows, WireFormat(columnar=columnar))], budget).plan()]
+
+
+def decoded_rows(bodies: list[bytes], columnar: bool) -> list[dict[str, Any]]:
+    from sync_payload import COLUMNAR_CONTENT_TYPE, JSON_CONTENT_TYPE, decode_payload
+
+    content_type = COLUMNAR_CONTENT_TYPE if columnar else JSON_CONTENT_TYPE
+    return [row for body in bodies for row in decode_payload(body, content_type)["raw_rows"]]
+
+
+def best_of(repeat: int, fn: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    args = parse_args()
+    # Heavy imports after parsing, so `--help` stays fast.
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from api_server import FastJSONResponse
+    from extract_mt5_events import RawEvent, write_jsonl
+
+    backends = args.backend or json_codec.available()
+    with tempfile.TemporaryDirectory(prefix="bench_json_") as tmp:
+        tmp_dir = Path(tmp)
+        if args.data_dir:
+            path = Path(args.data_dir) / "raw_events_history.csv"
+        else:
+            generate_history(tmp_dir, args.events, accounts=2, seed=args.seed)
+            path = tmp_dir / "raw_events_history.csv"
+        _, rows = read_dicts(path)
+        table = read_table(path, RAW_EVENTS, columns=RAW_EVENTS.names)
+        events = [RawEvent(*row) for row in table.rows]
+        body = {"rows": rows, "count": len(rows), "version": "1"}
+
+        def legacy_api() -> bytes:
+            return JSONResponse(jsonable_encoder(body)).body
+
+        expected_events = [asdict(e) for e in events]
+        expected_body = json.loads(legacy_api())
+        for columnar in (False, True):
+            if decoded_rows(legacy_sync(rows, columnar), columnar) != rows:
+                raise SystemExit("legacy sync payload does not round-trip")
+
+        cases: dict[str, Callable[[], Any]] = {
+            "jsonl_legacy": lambda: legacy_jsonl(tmp_dir / "legacy.jsonl", events),
+            "api_legacy": legacy_api,
+            "sync_json_legacy": lambda: legacy_sync(rows, False),
+            "sync_columnar_legacy": lambda: legacy_sync(rows, True),
+        }
+        timings = {name: best_of(args.repeat, fn) for name, fn in cases.items()}
+
+        for backend in backends:
+            if json_codec.use(backend).name != backend:
+                raise SystemExit(f"JSON backend not installed: {backend}")
+            jsonl = tmp_dir / f"{backend}.jsonl"
+            write_jsonl(jsonl, events)
+            if [json.loads(line) for line in jsonl.read_bytes().splitlines()] != expected_events:
+                raise SystemExit(f"write_jsonl output differs ({backend})")
+            if json.loads(FastJSONResponse(body).body) != expected_body:
+                raise SystemExit(f"FastJSONResponse body differs ({backend})")
+            for columnar in (False, True):
+                if decoded_rows(codec_sync(rows, columnar), columnar) != rows:
+                    raise SystemExit(f"sync payload does not round-trip ({backend})")
+            cases = {
+                f"jsonl_{backend}": lambda: write_jsonl(jsonl, events),
+                f"api_{backend}": lambda: FastJSONResponse(body).body,
+                f"sync_json_{backend}": lambda: codec_sync(rows, False),
+                f"sync_columnar_{backend}": lambda: codec_sync(rows, True),
+            }
+            timings.update({name: best_of(args.repeat, fn) for name, fn in cases.items()})
+
+    paths = ("jsonl", "api", "sync_json", "sync_columnar")
+    report = {
+        "rows": len(rows),
+        "backends": backends,
+        "seconds": {name: round(sec, 4) for name, sec in timings.items()},
+        "rows_per_sec": {name: int(len(rows) / sec) if sec else None for name, sec in timings.items()},
+        "speedup_vs_legacy": {
+            backend: {p: round(timings[f"{p}_legacy"] / timings[f"{p}_{backend}"], 2) for p in paths} for backend in backends
+        },
+    }
+    print(json.dumps(report, ensure_ascii=True))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,45 +4,78 @@
 Outputs:
 - dashboard/data/daily_summary_history.csv (merge by trade_date_vn)
 - dashboard/data/raw_events_history.csv (merge by event_id)
+  - USD/VND enrichment from the local rate cache (fx_rates.py), when present
+- dashboard/data/raw_events_digest.json (digest tree for reconcile.py)
+- dashboard/data/account_daily_summary_history.csv and
+  portfolio_daily_summary_history.csv (per account / consolidated in the
+  reporting currency, see portfolio.py)
+- dashboard/data/snapshot/ (memory-mapped snapshot for the API server)
+- dashboard/data/data_quality_report.json (data_quality.py; unchanged days
+  come from the per-day cache)
 """
 
 from __future__ import annotations
 
 import argparse
-import csv
+from datetime import datetime
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Iterable
+
+from digest_tree import DigestTree, digest_path
+from extract_mt5_events import UTC, DailySummary, build_daily_summaries, format_iso_utc, summary_input
+from journal_io import TRUE_VALUES, as_csv_rows, read_dicts, write_table
+
+if TYPE_CHECKING:
+    from fx_rates import RateTable
 
 SUMMARY_KEY = "trade_date_vn"
 EVENT_KEY = "event_id"
+# data_quality.CACHE_PATH / fx_rates.RATES_PATH: those modules need NumPy, so
+# they are imported inside build_history, off the import path of --help and of
+# the scripts that import this module.
+QUALITY_CACHE_PATH = Path("state/data_quality_cache.json")
+DEFAULT_RATES_PATH = "state/fx/usd_vnd.rates"
+# Not compared when summaries are recomputed from raw rows: the VND totals
+# (fx_rates.SUMMARY_VND_FIELDS) are refreshed by the FX roll-up, updated_at_utc per run.
+RESUMMARY_IGNORED = {"updated_at_utc", "net_profit_vnd", "total_commission_vnd", "total_swap_vnd"}
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Build dashboard data csv files")
-    parser.add_argument("--summary-input", default="out/daily_summary_latest.csv")
+    parser.add_argument(
+        "--summary-input",
+        default="out/daily_summary_latest.csv",
+        help="Not read: summaries of the touched days are recomputed from the merged raw history.",
+    )
     parser.add_argument("--summary-output", default="dashboard/data/daily_summary_history.csv")
     parser.add_argument("--raw-input", default="")
     parser.add_argument("--raw-output", default="dashboard/data/raw_events_history.csv")
+    parser.add_argument(
+        "--snapshot-dir",
+        default="",
+        help="API snapshot directory; default <raw-output dir>/snapshot.",
+    )
+    parser.add_argument("--no-snapshot", action="store_true", help="Skip publishing the API snapshot.")
+    parser.add_argument("--fx-rates", default=DEFAULT_RATES_PATH, help="USD/VND rate cache used for the *_vnd columns.")
+    parser.add_argument(
+        "--reporting-currency",
+        default="",
+        help="Currency of the consolidated portfolio table (USD or VND); fallback env REPORTING_CURRENCY, default USD.",
+    )
     return parser.parse_args()
 
 
 def read_csv(path: Path) -> tuple[list[str], list[dict[str, str]]]:
     if not path.exists():
         raise SystemExit(f"Missing source file: {path}")
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-        if reader.fieldnames is None:
-            raise SystemExit(f"Invalid csv header: {path}")
-        return list(reader.fieldnames), rows
+    headers, rows = read_dicts(path)
+    if not headers:
+        raise SystemExit(f"Invalid csv header: {path}")
+    return headers, rows
 
 
 def write_csv(path: Path, headers: list[str], rows: list[dict[str, str]]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        writer.writeheader()
-        writer.writerows(rows)
+    write_table(path, headers, rows)
 
 
 def merge_rows(
@@ -52,7 +85,9 @@ def merge_rows(
     key: str,
     sort_key: str,
     reverse: bool = False,
+    replaced: dict[str, dict[str, str]] | None = None,
 ) -> tuple[list[str], list[dict[str, str]]]:
+    """Upsert `new_rows` into the CSV rows by `key`; `replaced` collects the existing rows that were overwritten."""
     merged: dict[str, dict[str, str]] = {}
     headers = list(new_headers)
 
@@ -71,6 +106,8 @@ def merge_rows(
     for row in new_rows:
         k = row.get(key)
         if k:
+            if replaced is not None and k in merged:
+                replaced.setdefault(k, merged[k])
             if headers:
                 merged[k] = {h: row.get(h, merged.get(k, {}).get(h, "")) for h in headers}
             else:
@@ -80,6 +117,44 @@ def merge_rows(
     return headers, out_rows
 
 
+def _same_value(a: str | None, b: str | None) -> bool:
+    if (a or "") == (b or ""):
+        return True
+    try:
+        return abs(float(a or 0) - float(b or 0)) < 1e-9
+    except ValueError:
+        return False
+
+
+def resummarize(
+    existing: list[dict[str, str]],
+    raw_rows: list[dict[str, str]],
+    updated_at_utc: str,
+    days: set[str] | None = None,
+) -> tuple[list[dict[str, str]], set[str]]:
+    """daily_summary of `days` (None = all) recomputed from the merged raw history.
+
+    Returns (rows that differ from `existing`, days left without events). A
+    summary row covers every account of its VN day, so a batch holding part
+    of a day (one XM day, one account, a day range) cannot build it from its
+    own rows.
+    """
+    live = [
+        summary_input(r)
+        for r in raw_rows
+        if (days is None or (r.get(SUMMARY_KEY) or "") in days) and (r.get("is_deleted") or "").strip().lower() not in TRUE_VALUES
+    ]
+    headers = list(DailySummary.__annotations__.keys())
+    rows = as_csv_rows(build_daily_summaries(live, updated_at_utc), headers)  # type: ignore[arg-type]
+    before = {r.get(SUMMARY_KEY) or "": r for r in existing}
+    compared = [h for h in headers if h not in RESUMMARY_IGNORED]
+    changed = [
+        r for r in rows if r[SUMMARY_KEY] not in before or not all(_same_value(r[h], before[r[SUMMARY_KEY]].get(h)) for h in compared)
+    ]
+    checked = set(before) if days is None else set(before) & days
+    return changed, checked - {r[SUMMARY_KEY] for r in rows}
+
+
 def pick_latest_raw_input(raw_arg: str) -> Path:
     if raw_arg:
         return Path(raw_arg)
@@ -95,13 +170,65 @@ def pick_latest_raw_input(raw_arg: str) -> Path:
     raise SystemExit("Missing raw input. Use --raw-input or generate out/raw_events_*.csv first.")
 
 
-def main() -> int:
-    args = parse_args()
+def build_history(
+    summary_headers: list[str],
+    summary_rows: Iterable[dict[str, str]],
+    raw_headers: list[str],
+    raw_rows: Iterable[dict[str, str]],
+    summary_dst: Path,
+    raw_dst: Path,
+    snapshot_dir: Path | None,
+    fx_rates: RateTable | None = None,
+    reporting: str | None = None,
+    quality_cache: Path | None = QUALITY_CACHE_PATH,
+    resummarize_at: str | None = None,
+) -> dict:
+    """Merge new rows into both history CSVs and publish the API snapshot (None = skip).
 
-    summary_src = Path(args.summary_input)
-    summary_dst = Path(args.summary_output)
+    With `resummarize_at` (the updated_at_utc of rebuilt rows), `summary_rows`
+    is ignored: the summaries of the days the new raw rows touch (their day
+    and, for replaced rows, the day they had) are recomputed from the merged
+    raw history, only days whose figures changed are rewritten, and days with
+    no events left are dropped. Batches hold part of a VN day (one XM day, an
+    account, a day range), so their own summaries would overwrite it.
+
+    With `fx_rates`, raw rows whose USD/VND rate changed are re-enriched and
+    the VND totals of their days, and of the summary rows merged in this
+    run, rolled up before anything is written. The
+    per-account and portfolio tables are refreshed for the changed
+    (account, day) leaves of the digest tree. The data-quality report is
+    rewritten next to the raw history (`quality_cache` None = check every day).
+    """
+    from api_data import publish_tables
+    from data_quality import build_report, report_path, run_checks, write_report
+    from fx_rates import enrich_history
+    from portfolio import (
+        ACCOUNT_SUMMARY_COLUMNS,
+        ACCOUNT_SUMMARY_FILE,
+        PORTFOLIO_COLUMNS,
+        PORTFOLIO_FILE,
+        reporting_currency,
+        update_portfolio,
+    )
 
-    summary_headers, summary_rows = read_csv(summary_src)
+    raw_rows = list(raw_rows)
+    replaced: dict[str, dict[str, str]] = {}
+    raw_headers, raw_out_rows = merge_rows(
+        existing_path=raw_dst,
+        new_headers=raw_headers,
+        new_rows=raw_rows,
+        key=EVENT_KEY,
+        sort_key="close_time_vn",
+        reverse=True,
+        replaced=replaced,
+    )
+    emptied: set[str] = set()
+    if resummarize_at is not None:
+        touched = {r.get(SUMMARY_KEY) or "" for r in [*raw_rows, *replaced.values()]}
+        existing = read_csv(summary_dst)[1] if summary_dst.exists() else []
+        summary_rows, emptied = resummarize(existing, raw_out_rows, resummarize_at, touched)
+        summary_headers = list(DailySummary.__annotations__.keys())
+    summary_rows = list(summary_rows)
     summary_headers, summary_out_rows = merge_rows(
         existing_path=summary_dst,
         new_headers=summary_headers,
@@ -110,29 +237,100 @@ def main() -> int:
         sort_key=SUMMARY_KEY,
         reverse=False,
     )
+    if emptied:
+        summary_out_rows = [r for r in summary_out_rows if r.get(SUMMARY_KEY) not in emptied]
+    fx = None
+    if fx_rates is not None:
+        rewritten = {r.get(SUMMARY_KEY) or "" for r in summary_rows}
+        fx = enrich_history(summary_headers, summary_out_rows, raw_out_rows, fx_rates, rewritten)
     write_csv(summary_dst, summary_headers, summary_out_rows)
+    write_csv(raw_dst, raw_headers, raw_out_rows)
+    digest = DigestTree.from_rows(raw_out_rows)
+    digest.save(digest_path(raw_dst))
+    quality_report = build_report(run_checks(summary_out_rows, raw_out_rows, digest, quality_cache), max_findings=100)
+    write_report(report_path(raw_dst), quality_report)
+
+    account_dst = raw_dst.with_name(ACCOUNT_SUMMARY_FILE)
+    portfolio_dst = raw_dst.with_name(PORTFOLIO_FILE)
+    account_rows, portfolio_rows, portfolio_report = update_portfolio(
+        raw_out_rows,
+        digest.leaves(),
+        read_csv(account_dst)[1] if account_dst.exists() else [],
+        read_csv(portfolio_dst)[1] if portfolio_dst.exists() else [],
+        fx_rates,
+        reporting_currency(reporting),
+    )
+    write_csv(account_dst, ACCOUNT_SUMMARY_COLUMNS, account_rows)
+    write_csv(portfolio_dst, PORTFOLIO_COLUMNS, portfolio_rows)
+
+    snapshot_version = None
+    if snapshot_dir is not None:
+        snapshot_version = publish_tables(
+            summary_headers,
+            summary_out_rows,
+            raw_headers,
+            raw_out_rows,
+            snapshot_dir,
+            tables={
+                "account_summary": (ACCOUNT_SUMMARY_COLUMNS, account_rows),
+                "portfolio": (PORTFOLIO_COLUMNS, portfolio_rows),
+            },
+        )["version"]
+
+    return {
+        "summary_headers": summary_headers,
+        "summary_rows": summary_out_rows,
+        "raw_headers": raw_headers,
+        "raw_rows": raw_out_rows,
+        "snapshot_version": snapshot_version,
+        "fx": fx,
+        "digest_root": digest.root,
+        "portfolio": portfolio_report,
+        "quality": {
+            "report": str(report_path(raw_dst)),
+            **{k: quality_report[k] for k in ("days_checked", "days_cached", "counts", "by_rule")},
+        },
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    from fx_rates import load_rate_table
+
+    summary_dst = Path(args.summary_output)
 
     raw_src = pick_latest_raw_input(args.raw_input)
     raw_dst = Path(args.raw_output)
     raw_headers, raw_rows = read_csv(raw_src)
-    raw_headers, raw_out_rows = merge_rows(
-        existing_path=raw_dst,
-        new_headers=raw_headers,
-        new_rows=raw_rows,
-        key=EVENT_KEY,
-        sort_key="close_time_vn",
-        reverse=True,
+
+    snapshot_dir = None
+    if not args.no_snapshot:
+        snapshot_dir = Path(args.snapshot_dir) if args.snapshot_dir else raw_dst.parent / "snapshot"
+    history = build_history(
+        list(DailySummary.__annotations__.keys()),
+        [],
+        raw_headers,
+        raw_rows,
+        summary_dst,
+        raw_dst,
+        snapshot_dir,
+        load_rate_table(Path(args.fx_rates)),
+        args.reporting_currency or None,
+        resummarize_at=format_iso_utc(datetime.now(tz=UTC)),
     )
-    write_csv(raw_dst, raw_headers, raw_out_rows)
 
     print(
         {
             "status": "ok",
-            "summary_rows": len(summary_out_rows),
+            "summary_rows": len(history["summary_rows"]),
             "summary_output": str(summary_dst),
-            "raw_rows": len(raw_out_rows),
+            "raw_rows": len(history["raw_rows"]),
             "raw_output": str(raw_dst),
             "raw_input_used": str(raw_src),
+            "snapshot_version": history["snapshot_version"],
+            "fx": history["fx"],
+            "portfolio": history["portfolio"],
+            "quality": history["quality"],
         }
     )
     return 0
@@ -0,0 +1,225 @@
+"""Memory-mapped columnar file format for history snapshots.
+
+Layout (little endian):
+- 8 bytes magic, 8 bytes metadata length, JSON metadata
+- data segments, each aligned to 64 bytes
+
+A file holds:
+- typed arrays (numeric or fixed-width unicode), mapped zero-copy with NumPy
+- string tables: per column int32 codes into a sorted dictionary, the
+  dictionary stored as one UTF-8 blob plus int64 offsets
+
+Readers map the file read-only, so every process serving the same file
+shares one copy in the OS page cache.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Sequence
+
+import numpy as np
+
+MAGIC = b"TDJSNAP1"
+ALIGN = 64
+# Dictionaries up to this size are decoded once per process and reused.
+DECODE_CACHE_LIMIT = 4096
+
+
+def _pad(f: BinaryIO) -> None:
+    pos = f.tell()
+    if pos % ALIGN:
+        f.write(b"\0" * (ALIGN - pos % ALIGN))
+
+
+def _write_segment(f: BinaryIO, arr: np.ndarray) -> dict[str, Any]:
+    _pad(f)
+    arr = np.ascontiguousarray(arr)
+    offset = f.tell()
+    f.write(arr.tobytes())
+    return {"offset": offset, "dtype": arr.dtype.str, "count": int(arr.shape[0])}
+
+
+def encode_strings(values: Sequence[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (codes, dict_offsets, dict_blob) with a sorted dictionary."""
+    dictionary = sorted(set(values))
+    lookup = {v: i for i, v in enumerate(dictionary)}
+    codes = np.fromiter((lookup[v] for v in values), dtype=np.int32, count=len(values))
+    encoded = [v.encode("utf-8") for v in dictionary]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return codes, offsets, blob
+
+
+def write_file(
+    path: Path,
+    meta: dict[str, Any],
+    arrays: dict[str, np.ndarray],
+    tables: dict[str, tuple[list[str], Iterable[dict[str, str]]]],
+) -> None:
+    """Write arrays and string tables (name -> (headers, rows)) to `path`."""
+    body_meta: dict[str, Any] = {**meta, "arrays": {}, "tables": {}}
+    tmp_body = path.with_name(path.name + ".body")
+    with tmp_body.open("w+b") as body:
+        # Segments are written relative to the body; shifted once the header size is known.
+        for name, arr in arrays.items():
+            if arr.dtype.kind == "U" and arr.dtype.itemsize == 0:
+                arr = arr.astype("<U1")
+            body_meta["arrays"][name] = _write_segment(body, arr)
+        for name, (headers, rows) in tables.items():
+            rows = list(rows)
+            columns: dict[str, Any] = {}
+            for h in headers:
+                codes, offsets, blob = encode_strings([r.get(h) or "" for r in rows])
+                columns[h] = {
+                    "ascii": bool(blob.size == 0 or int(blob.max()) < 0x80),
+                    "codes": _write_segment(body, codes),
+                    "dict_offsets": _write_segment(body, offsets),
+                    "dict_blob": _write_segment(body, blob),
+                }
+            body_meta["tables"][name] = {"rows": len(rows), "headers": list(headers), "columns": columns}
+
+        # Header size depends on the offsets it contains; iterate until stable.
+        base = 0
+        while True:
+            header = json.dumps(_shift(body_meta, base), ensure_ascii=True).encode("utf-8")
+            needed = len(MAGIC) + 8 + len(header)
+            needed += (-needed) % ALIGN
+            if needed == base:
+                break
+            base = needed
+
+        with path.open("wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            _pad(f)
+            body.seek(0)
+            while True:
+                chunk = body.read(1 << 20)
+                if not chunk:
+                    break
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    tmp_body.unlink()
+
+
+def _shift(node: Any, base: int) -> Any:
+    if isinstance(node, dict):
+        if "offset" in node and "dtype" in node:
+            return {**node, "offset": node["offset"] + base}
+        return {k: _shift(v, base) for k, v in node.items()}
+    return node
+
+
+class _Dictionary:
+    """Sorted string dictionary decoded lazily from the mapped blob."""
+
+    def __init__(self, offsets: np.ndarray, blob: memoryview, ascii: bool = False) -> None:
+        self.offsets = offsets
+        self.blob = blob
+        self.ascii = ascii
+        self._decoded: list[str] | None = None
+        if len(self) <= DECODE_CACHE_LIMIT:
+            self._decoded = [self._decode(i) for i in range(len(self))]
+
+    def __len__(self) -> int:
+        return int(self.offsets.shape[0]) - 1
+
+    def _decode(self, i: int) -> str:
+        return str(self.blob[int(self.offsets[i]) : int(self.offsets[i + 1])], "utf-8")
+
+    def __getitem__(self, i: int) -> str:
+        if self._decoded is not None:
+            return self._decoded[i]
+        return self._decode(i)
+
+    def take(self, codes: np.ndarray) -> list[str]:
+        if self._decoded is not None:
+            decoded = self._decoded
+            return [decoded[c] for c in codes.tolist()]
+        if self.ascii and len(codes) * 8 >= len(self):
+            # Bulk read: decode the blob once and slice it (byte offsets == char offsets).
+            text = str(self.blob, "ascii")
+            starts = self.offsets[codes].tolist()
+            ends = self.offsets[codes + 1].tolist()
+            return [text[s:e] for s, e in zip(starts, ends)]
+        return [self._decode(c) for c in codes.tolist()]
+
+
+class MappedTable:
+    def __init__(self, meta: dict[str, Any], file: "MappedFile") -> None:
+        self.rows = int(meta["rows"])
+        self.headers: list[str] = list(meta["headers"])
+        self.codes: dict[str, np.ndarray] = {}
+        self.dictionaries: dict[str, _Dictionary] = {}
+        for h in self.headers:
+            col = meta["columns"][h]
+            self.codes[h] = file.segment(col["codes"])
+            blob = file.segment(col["dict_blob"])
+            self.dictionaries[h] = _Dictionary(
+                file.segment(col["dict_offsets"]), memoryview(blob), ascii=bool(col.get("ascii"))
+            )
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def range_mask(self, column: str, lo: str = "", hi: str = "") -> np.ndarray:
+        """Rows where lo <= value <= hi; compares codes since dictionaries are sorted."""
+        dictionary = self.dictionaries[column]
+        codes = self.codes[column]
+        mask = np.ones(self.rows, dtype=bool)
+        if lo:
+            mask &= codes >= bisect_left(dictionary, lo)
+        if hi:
+            mask &= codes < bisect_right(dictionary, hi)
+        return mask
+
+    def column(self, name: str) -> list[str]:
+        return self.dictionaries[name].take(self.codes[name])
+
+    def materialize(self, idx: np.ndarray | None = None) -> list[dict[str, str]]:
+        columns = []
+        for h in self.headers:
+            codes = self.codes[h] if idx is None else self.codes[h][idx]
+            columns.append(self.dictionaries[h].take(codes))
+        headers = self.headers
+        return [dict(zip(headers, values)) for values in zip(*columns)]
+
+
+class MappedFile:
+    """Read-only view of a snapshot file; arrays reference the mapping directly."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a snapshot file: {path}")
+        header_len = int.from_bytes(self._mm[len(MAGIC) : len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        self.meta: dict[str, Any] = json.loads(self._mm[start : start + header_len].decode("utf-8"))
+        self.arrays = {name: self.segment(seg) for name, seg in self.meta["arrays"].items()}
+        self.tables = {name: MappedTable(t, self) for name, t in self.meta["tables"].items()}
+
+    def segment(self, seg: dict[str, Any]) -> np.ndarray:
+        return np.frombuffer(self._mm, dtype=np.dtype(seg["dtype"]), count=seg["count"], offset=seg["offset"])
+
+    def close(self) -> None:
+        """Unmap the file; arrays and tables taken from it must no longer be referenced."""
+        self.arrays = {}
+        self.tables = {}
+        self._mm.close()
+
+    def __enter__(self) -> "MappedFile":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""Data-quality checks over the full raw_events / daily_summary history.
+
+- the history is loaded once into NumPy columns; every rule is a vectorized
+  expression over them, not a loop over rows
+- per-day rules, cached per partition (`trade_date_vn`):
+  - `event_id_account_mismatch`: event_id not prefixed by its account_id, so
+    it can collide with another account's deal
+  - `missing_position_id`: trade deal without a position
+  - `missing_time`, `trade_date_mismatch`, `timezone_mismatch`,
+    `open_after_close`: time-ordering anomalies within a row
+  - `summary_mismatch`, `summary_missing`, `summary_orphan`: daily_summary
+    disagrees with the live raw events of its day
+- full-history rules, run every time (they compare rows across days):
+  - `duplicate_event_id` (same source_hash) / `event_id_collision` (different
+    content under one event_id)
+  - `unbalanced_position`: buy and sell lots of a position differ and its last
+    deal is older than `--open-days`
+  - `ticket_time_inversion`: a later deal ticket of an account closed earlier
+  - `coverage_gap`: more than `--max-gap-days` weekdays without events for an
+    account
+  - `outlier`: daily net profit, deals or lots of an account more than
+    `--z-max` standard deviations from its trailing `--window` active days
+- cache (`state/data_quality_cache.json`): per day a content hash (digest
+  tree leaf digests of the day + summary row fingerprint + rule version) and
+  its findings; unchanged days are not checked again
+- report (`data_quality_report.json` next to the raw history): counts per
+  rule and severity, plus the findings (at most `--max-findings` per rule);
+  exits 1 when a finding reaches `--fail-on`
+- also run by build_dashboard_data.build_history on every build
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from digest_tree import UNDATED, DigestTree
+from fx_rates import iso_epochs
+from journal_io import read_table, to_float
+from journal_schema import DAILY_SUMMARY, RAW_EVENTS
+from sync_ledger import TRUE_VALUES, summary_fingerprint
+
+RULES_VERSION = 1
+CACHE_FORMAT = 1
+REPORT_FORMAT = 1
+CACHE_PATH = Path("state/data_quality_cache.json")
+REPORT_FILE = "data_quality_report.json"
+
+ERROR = "error"
+WARNING = "warning"
+SEVERITIES = (ERROR, WARNING)
+
+RAW_TEXT = (
+    "event_id",
+    "position_id",
+    "event_type",
+    "action",
+    "account_id",
+    "open_time_vn",
+    "close_time_vn",
+    "close_time_xm",
+    "trade_date_vn",
+    "trade_date_xm",
+    "source_hash",
+    "is_deleted",
+)
+RAW_NUMBERS = ("lots", "profit", "commission", "swap")
+SUMMARY_COUNTS = ("total_positions", "total_deals", "buy_deals", "sell_deals", "win_positions", "loss_positions")
+SUMMARY_MONEY = (
+    "net_profit",
+    "gross_profit",
+    "gross_loss",
+    "total_commission",
+    "total_swap",
+    "total_deposit",
+    "total_withdrawal",
+)
+# Raw columns the rules and the per-day digest (sync_ledger.raw_fingerprint) read.
+QUALITY_COLUMNS = (*RAW_TEXT, *RAW_NUMBERS, "usd_vnd_rate", "fx_rate_time_utc")
+MONEY_TOLERANCE = 0.01
+LOTS_TOLERANCE = 1e-6
+OUTLIER_METRICS = ("net_profit", "deals", "lots")
+
+
+def finding(rule: str, severity: str, partition: str, key: str, **detail: Any) -> dict[str, Any]:
+    return {"rule": rule, "severity": severity, "partition": partition, "key": key, **detail}
+
+
+def raw_columns(rows: list[dict[str, Any]]) -> dict[str, np.ndarray]:
+    """Rule columns of raw rows, read as strings (history CSV rows) or typed (read_table with RAW_EVENTS)."""
+    names = (*RAW_TEXT, *RAW_NUMBERS)
+    if rows and all(name in rows[0] for name in names):
+        # History rows share one header: pull every column in a single pass.
+        values = list(zip(*map(itemgetter(*names), rows)))
+    else:
+        values = [[r.get(name) or "" for r in rows] for name in names]
+    cols = {name: np.array([v or "" for v in column], dtype=np.str_) for name, column in zip(RAW_TEXT, values)}
+    for name, column in zip(RAW_NUMBERS, values[len(RAW_TEXT):]):
+        cols[name] = np.fromiter(map(to_float, column), dtype=np.float64, count=len(column))
+    cols["trade_date_vn"] = np.where(cols["trade_date_vn"] == "", UNDATED, cols["trade_date_vn"])
+    deleted = np.array([str(v or "").strip().lower() in TRUE_VALUES for v in values[RAW_TEXT.index("is_deleted")]], dtype=bool)
+    cols["live"] = (cols["event_id"] != "") & ~deleted
+    return cols
+
+
+def select(cols: Mapping[str, np.ndarray], mask: np.ndarray) -> dict[str, np.ndarray]:
+    return {name: values[mask] for name, values in cols.items()}
+
+
+def _group_ends(sorted_keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) index of each run of equal keys in a sorted array."""
+    if not len(sorted_keys):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    breaks = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    return np.r_[0, breaks], np.r_[breaks, len(sorted_keys)]
+
+
+# --- per-day rules -----------------------------------------------------------
+
+
+def check_event_ids(c: Mapping[str, np.ndarray]) -> list[dict[str, Any]]:
+    out = []
+    prefix = np.char.add(c["account_id"], ":")
+    bad = np.flatnonzero(np.char.find(c["event_id"], prefix) != 0)
+    for i in bad.tolist():
+        out.append(
+            finding("event_id_account_mismatch", ERROR, str(c["trade_date_vn"][i]), str(c["event_id"][i]), account_id=str(c["account_id"][i]))
+        )
+    no_position = np.flatnonzero((c["event_type"] == "trade") & (c["position_id"] == ""))
+    for i in no_position.tolist():
+        out.append(finding("missing_position_id", WARNING, str(c["trade_date_vn"][i]), str(c["event_id"][i])))
+    return out
+
+
+def check_times(c: Mapping[str, np.ndarray]) -> list[dict[str, Any]]:
+    out = []
+    vn, xm, open_vn = c["close_time_vn"], c["close_time_xm"], c["open_time_vn"]
+    day, ids = c["trade_date_vn"], c["event_id"]
+    has_vn, has_xm = vn != "", xm != ""
+    for i in np.flatnonzero(~has_vn).tolist():
+        out.append(finding("missing_time", ERROR, str(day[i]), str(ids[i])))
+    # astype("<U10") keeps the YYYY-MM-DD prefix of the ISO timestamp.
+    wrong_vn = has_vn & (day != vn.astype("<U10"))
+    wrong_xm = has_xm & (c["trade_date_xm"] != xm.astype("<U10"))
+    for i in np.flatnonzero(wrong_vn | wrong_xm).tolist():
+        out.append(
+            finding(
+                "trade_date_mismatch",
+                ERROR,
+                str(day[i]),
+                str(ids[i]),
+                trade_date_vn=str(day[i]),
+                close_time_vn=str(vn[i]),
+                trade_date_xm=str(c["trade_date_xm"][i]),
+                close_time_xm=str(xm[i]),
+            )
+        )
+    close_at = iso_epochs(vn)
+    xm_at = iso_epochs(xm)
+    open_at = iso_epochs(open_vn)
+    for i in np.flatnonzero(has_vn & has_xm & (close_at != xm_at)).tolist():
+        out.append(finding("timezone_mismatch", ERROR, str(day[i]), str(ids[i]), close_time_vn=str(vn[i]), close_time_xm=str(xm[i])))
+    for i in np.flatnonzero(has_vn & (open_at >= 0) & (open_at > close_at)).tolist():
+        out.append(finding("open_after_close", ERROR, str(day[i]), str(ids[i]), open_time_vn=str(open_vn[i]), close_time_vn=str(vn[i])))
+    return out
+
+
+def recompute_summaries(c: Mapping[str, np.ndarray]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """build_daily_summaries' count and money fields per day, as columns (days sorted)."""
+    days, day_idx = np.unique(c["trade_date_vn"], return_inverse=True)
+    n = len(days)
+    profit = c["profit"]
+    trade = c["event_type"] == "trade"
+
+    def per_day(weights: np.ndarray, where: np.ndarray | None = None) -> np.ndarray:
+        return np.bincount(day_idx, weights=weights if where is None else weights * where, minlength=n)
+
+    has_position = trade & (c["position_id"] != "")
+    keys = np.char.add(np.char.add(np.char.add(c["trade_date_vn"], "|"), np.char.add(c["account_id"], ":")), c["position_id"])
+    positions, first, position_idx = np.unique(keys[has_position], return_index=True, return_inverse=True)
+    position_pnl = np.bincount(position_idx, weights=profit[has_position], minlength=len(positions))
+    position_day = day_idx[has_position][first]
+    out = {
+        "total_positions": np.bincount(position_day, minlength=n).astype(np.float64),
+        "total_deals": per_day(trade.astype(np.float64)),
+        "buy_deals": per_day((trade & (c["action"] == "Buy")).astype(np.float64)),
+        "sell_deals": per_day((trade & (c["action"] == "Sell")).astype(np.float64)),
+        "win_positions": np.bincount(position_day, weights=position_pnl > 0, minlength=n),
+        "loss_positions": np.bincount(position_day, weights=position_pnl < 0, minlength=n),
+        "net_profit": per_day(profit),
+        "gross_profit": per_day(profit, profit > 0),
+        "gross_loss": per_day(profit, profit < 0),
+        "total_commission": per_day(c["commission"]),
+        "total_swap": per_day(c["swap"]),
+        "total_deposit": per_day(profit, c["event_type"] == "deposit"),
+        "total_withdrawal": per_day(-profit, c["event_type"] == "withdrawal"),
+    }
+    return days, out
+
+
+def check_summaries(c: Mapping[str, np.ndarray], summaries: Mapping[str, dict[str, str]], days: Iterable[str]) -> list[dict[str, Any]]:
+    """Compare the summary rows of `days` with the live raw rows `c` of those days."""
+    out = []
+    raw_days, expected = recompute_summaries(c)
+    raw_pos = {day: i for i, day in enumerate(raw_days.tolist())}
+    checked = sorted(d for d in set(days) if d in summaries and d in raw_pos)
+    for day in sorted(set(days) - set(summaries)):
+        if day in raw_pos:
+            out.append(finding("summary_missing", ERROR, day, day, raw_events=int(np.sum(c["trade_date_vn"] == day))))
+    for day in sorted(d for d in set(days) & set(summaries) if d not in raw_pos):
+        row = summaries[day]
+        if any(to_float(row.get(f)) for f in (*SUMMARY_COUNTS, *SUMMARY_MONEY)):
+            out.append(finding("summary_orphan", ERROR, day, day))
+    if not checked:
+        return out
+    idx = np.array([raw_pos[d] for d in checked])
+    fields = (*SUMMARY_COUNTS, *SUMMARY_MONEY)
+    stored = {f: np.array([to_float(summaries[d].get(f)) for d in checked], dtype=np.float64) for f in fields}
+    tolerance = {f: 0.5 if f in SUMMARY_COUNTS else MONEY_TOLERANCE for f in fields}
+    diff = {f: np.abs(stored[f] - expected[f][idx]) > tolerance[f] for f in fields}
+    for j in np.flatnonzero(np.logical_or.reduce([diff[f] for f in fields])).tolist():
+        fields_off = {
+            f: {"summary": float(stored[f][j]), "raw_events": round(float(expected[f][idx[j]]), 2)} for f in fields if diff[f][j]
+        }
+        out.append(finding("summary_mismatch", ERROR, checked[j], checked[j], fields=fields_off))
+    return out
+
+
+def day_findings(c: Mapping[str, np.ndarray], summaries: Mapping[str, dict[str, str]], days: Iterable[str]) -> list[dict[str, Any]]:
+    """Per-day rules over the live rows `c` (already restricted to `days`)."""
+    return [*check_event_ids(c), *check_times(c), *check_summaries(c, summaries, days)]
+
+
+# --- full-history rules ------------------------------------------------------
+
+
+def check_duplicates(c: Mapping[str, np.ndarray]) -> list[dict[str, Any]]:
+    """Repeated event_ids over every row, tombstones included."""
+    order = np.argsort(c["event_id"], kind="stable")
+    ids = c["event_id"][order]
+    starts, ends = _group_ends(ids)
+    repeated = (ends - starts > 1) & (ids[starts] != "")
+    out = []
+    for start, end in zip(starts[repeated].tolist(), ends[repeated].tolist()):
+        rows = order[start:end]
+        hashes = set(c["source_hash"][rows].tolist())
+        rule, severity = ("duplicate_event_id", WARNING) if len(hashes) == 1 else ("event_id_collision", ERROR)
+        out.append(
+            finding(
+                rule,
+                severity,
+                str(c["trade_date_vn"][rows[0]]),
+                str(ids[start]),
+                rows=end - start,
+                trade_dates=sorted(set(c["trade_date_vn"][rows].tolist())),
+            )
+        )
+    return out
+
+
+def check_positions(c: Mapping[str, np.ndarray], open_days: int) -> list[dict[str, Any]]:
+    has_position = (c["event_type"] == "trade") & (c["position_id"] != "")
+    if not has_position.any():
+        return []
+    keys = np.char.add(np.char.add(c["account_id"][has_position], ":"), c["position_id"][has_position])
+    close_vn = c["close_time_vn"][has_position]
+    sign = np.where(c["action"][has_position] == "Buy", 1.0, np.where(c["action"][has_position] == "Sell", -1.0, 0.0))
+    positions, position_idx = np.unique(keys, return_inverse=True)
+    net = np.bincount(position_idx, weights=sign * c["lots"][has_position], minlength=len(positions))
+    deals = np.bincount(position_idx, minlength=len(positions))
+    unbalanced = np.flatnonzero(np.abs(net) > LOTS_TOLERANCE)
+    if not len(unbalanced):
+        return []
+    # VN times share the +07:00 offset, so the string order is the time order.
+    order = np.lexsort((close_vn, position_idx))
+    _, ends = _group_ends(position_idx[order])
+    last_vn = close_vn[order][ends - 1]
+    last_at = iso_epochs(last_vn[unbalanced])
+    latest = max(last_vn.tolist())
+    cutoff = int(iso_epochs(np.array([latest], dtype=np.str_))[0]) - open_days * 86400
+    out = []
+    for p, last in zip(unbalanced.tolist(), last_at.tolist()):
+        if last > cutoff:
+            continue  # may still be open
+        out.append(
+            finding(
+                "unbalanced_position",
+                WARNING,
+                str(last_vn[p])[:10] or UNDATED,
+                str(positions[p]),
+                net_lots=round(float(net[p]), 6),
+                deals=int(deals[p]),
+                last_close_time_vn=str(last_vn[p]),
+            )
+        )
+    return out
+
+
+def check_ticket_order(c: Mapping[str, np.ndarray]) -> list[dict[str, Any]]:
+    """Deal tickets grow with time per account; flag a ticket closed before the one below it."""
+    if len(c["event_id"]) < 2:
+        return []
+    suffix = np.char.rpartition(c["event_id"], ":")[:, 2]
+    valid = np.char.isdigit(suffix) & (c["close_time_vn"] != "")
+    if valid.sum() < 2:
+        return []
+    tickets = suffix[valid].astype(np.int64)
+    accounts = c["account_id"][valid]
+    close_vn = c["close_time_vn"][valid]
+    ids = c["event_id"][valid]
+    order = np.lexsort((tickets, accounts))
+    accounts, close_vn, ids = accounts[order], close_vn[order], ids[order]
+    inverted = np.flatnonzero((accounts[1:] == accounts[:-1]) & (close_vn[1:] < close_vn[:-1])) + 1
+    return [
+        finding(
+            "ticket_time_inversion",
+            WARNING,
+            str(close_vn[i])[:10],
+            str(ids[i]),
+            close_time_vn=str(close_vn[i]),
+            previous_event_id=str(ids[i - 1]),
+            previous_close_time_vn=str(close_vn[i - 1]),
+        )
+        for i in inverted.tolist()
+    ]
+
+
+def _account_days(c: Mapping[str, np.ndarray], mask: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sorted unique (account, day) pairs of `mask` and the inverse index of the masked rows."""
+    keys = np.char.add(np.char.add(c["account_id"][mask], "|"), c["trade_date_vn"][mask])
+    pairs, inverse = np.unique(keys, return_inverse=True)
+    if not len(pairs):
+        return pairs, pairs, inverse
+    split = np.char.partition(pairs, "|")
+    return split[:, 0], split[:, 2], inverse
+
+
+def check_coverage(c: Mapping[str, np.ndarray], max_gap_days: int) -> list[dict[str, Any]]:
+    accounts, days, _ = _account_days(c, c["trade_date_vn"] != UNDATED)
+    if len(days) < 2:
+        return []
+    dates = days.astype("datetime64[D]")
+    same = accounts[1:] == accounts[:-1]
+    missing = np.busday_count(dates[:-1] + 1, dates[1:])
+    gaps = np.flatnonzero(same & (missing > max_gap_days))
+    return [
+        finding(
+            "coverage_gap",
+            WARNING,
+            str(days[i + 1]),
+            str(accounts[i + 1]),
+            after=str(days[i]),
+            before=str(days[i + 1]),
+            missing_weekdays=int(missing[i]),
+        )
+        for i in gaps.tolist()
+    ]
+
+
+def check_outliers(c: Mapping[str, np.ndarray], window: int, min_periods: int, z_max: float) -> list[dict[str, Any]]:
+    trade = (c["event_type"] == "trade") & (c["trade_date_vn"] != UNDATED)
+    accounts, days, inverse = _account_days(c, trade)
+    n = len(days)
+    if n <= min_periods:
+        return []
+    metrics = {
+        "net_profit": np.bincount(inverse, weights=c["profit"][trade], minlength=n),
+        "deals": np.bincount(inverse, minlength=n).astype(np.float64),
+        "lots": np.bincount(inverse, weights=c["lots"][trade], minlength=n),
+    }
+    # Trailing window over the previous `window` active days of the same account.
+    starts, ends = _group_ends(accounts)
+    segment_start = np.repeat(starts, ends - starts)
+    pos = np.arange(n)
+    lo = np.maximum(segment_start, pos - window)
+    count = pos - lo
+    ok = count >= max(min_periods, 2)
+    out = []
+    for name in OUTLIER_METRICS:
+        x = metrics[name]
+        s1 = np.r_[0.0, np.cumsum(x)]
+        s2 = np.r_[0.0, np.cumsum(x * x)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = (s1[pos] - s1[lo]) / count
+            var = (s2[pos] - s2[lo] - count * mean * mean) / (count - 1)
+            std = np.sqrt(np.maximum(var, 0.0))
+            z = (x - mean) / std
+        flagged = np.flatnonzero(ok & (std > 1e-9) & (np.abs(z) > z_max))
+        for i in flagged.tolist():
+            out.append(
+                finding(
+                    "outlier",
+                    WARNING,
+                    str(days[i]),
+                    str(accounts[i]),
+                    metric=name,
+                    value=round(float(x[i]), 2),
+                    trailing_mean=round(float(mean[i]), 2),
+                    trailing_std=round(float(std[i]), 2),
+                    z=round(float(z[i]), 1),
+                )
+            )
+    return out
+
+
+# --- engine ------------------------------------------------------------------
+
+
+def load_cache(path: Path | None) -> dict[str, dict[str, Any]]:
+    if path is None or not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("format") != CACHE_FORMAT or data.get("rules_version") != RULES_VERSION:
+        return {}
+    return data.get("days") or {}
+
+
+def save_cache(path: Path, days: Mapping[str, dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    payload = {"format": CACHE_FORMAT, "rules_version": RULES_VERSION, "days": dict(sorted(days.items()))}
+    tmp.write_text(json.dumps(payload, ensure_ascii=True, separators=(",", ":")), encoding="utf-8")
+    tmp.replace(path)
+
+
+def partition_hashes(digest: DigestTree, summaries: Mapping[str, dict[str, str]]) -> dict[str, str]:
+    """Content hash per day: its digest tree leaves, its summary row and the rule version."""
+    parts: dict[str, list[str]] = {}
+    for (account, day), leaf in digest.leaves().items():
+        parts.setdefault(day, []).append(f"{account}={leaf}")
+    for day, row in summaries.items():
+        parts.setdefault(day, []).append(f"summary={summary_fingerprint(row)}")
+    return {
+        day: hashlib.sha256("\n".join([f"rules={RULES_VERSION}", *sorted(lines)]).encode("utf-8")).hexdigest()[:32]
+        for day, lines in parts.items()
+    }
+
+
+def run_checks(
+    summary_rows: Iterable[dict[str, str]],
+    raw_rows: list[dict[str, str]],
+    digest: DigestTree | None = None,
+    cache_path: Path | None = CACHE_PATH,
+    open_days: int = 30,
+    max_gap_days: int = 5,
+    window: int = 20,
+    min_periods: int = 10,
+    z_max: float = 4.0,
+) -> dict[str, Any]:
+    """All rules over the history; returns {"findings": [...], "days": n, "days_checked": n, ...}.
+
+    `digest` is the digest tree of `raw_rows` (built here when None); with
+    `cache_path`, per-day findings of days whose content hash is unchanged are
+    reused and the cache is rewritten.
+    """
+    started = time.perf_counter()
+    summaries = {row.get("trade_date_vn") or "": row for row in summary_rows if row.get("trade_date_vn")}
+    cols = raw_columns(raw_rows)
+    live = select(cols, cols["live"])
+    hashes = partition_hashes(digest or DigestTree.from_rows(raw_rows), summaries)
+
+    cached = load_cache(cache_path)
+    fresh = {day: cached[day] for day, h in hashes.items() if day in cached and cached[day].get("hash") == h}
+    stale = sorted(set(hashes) - set(fresh))
+    per_day: dict[str, list[dict[str, Any]]] = {day: entry.get("findings") or [] for day, entry in fresh.items()}
+    if stale:
+        subset = select(live, np.isin(live["trade_date_vn"], stale))
+        for item in day_findings(subset, summaries, stale):
+            per_day.setdefault(item["partition"], []).append(item)
+    if cache_path is not None:
+        save_cache(cache_path, {day: {"hash": hashes[day], "findings": per_day.get(day, [])} for day in hashes})
+
+    findings = [item for day in sorted(per_day) for item in per_day[day]]
+    findings += check_duplicates(cols)
+    findings += check_positions(live, open_days)
+    findings += check_ticket_order(live)
+    findings += check_coverage(live, max_gap_days)
+    findings += check_outliers(live, window, min_periods, z_max)
+    return {
+        "rows": len(raw_rows),
+        "live_rows": int(cols["live"].sum()),
+        "days": len(hashes),
+        "days_checked": len(stale),
+        "days_cached": len(fresh),
+        "seconds": round(time.perf_counter() - started, 3),
+        "findings": findings,
+    }
+
+
+def report_path(raw_history: Path) -> Path:
+    return raw_history.with_name(REPORT_FILE)
+
+
+def build_report(result: Mapping[str, Any], max_findings: int) -> dict[str, Any]:
+    findings = result["findings"]
+    by_rule: dict[str, int] = {}
+    for item in findings:
+        by_rule[item["rule"]] = by_rule.get(item["rule"], 0) + 1
+    kept: list[dict[str, Any]] = []
+    seen: dict[str, int] = {}
+    for item in sorted(findings, key=lambda f: (SEVERITIES.index(f["severity"]), f["rule"], f["partition"], f["key"])):
+        seen[item["rule"]] = seen.get(item["rule"], 0) + 1
+        if max_findings <= 0 or seen[item["rule"]] <= max_findings:
+            kept.append(item)
+    return {
+        "format": REPORT_FORMAT,
+        "rules_version": RULES_VERSION,
+        "generated_at_utc": datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        **{k: v for k, v in result.items() if k != "findings"},
+        "counts": {severity: sum(1 for f in findings if f["severity"] == severity) for severity in SEVERITIES},
+        "by_rule": dict(sorted(by_rule.items())),
+        "findings_truncated": len(findings) - len(kept),
+        "findings": kept,
+    }
+
+
+def report_summary(report: Mapping[str, Any]) -> dict[str, Any]:
+    """The report without its findings, for status lines."""
+    return {k: v for k, v in report.items() if k != "findings"}
+
+
+def write_report(path: Path, report: Mapping[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(report, ensure_ascii=True, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Vectorized data-quality checks over the journal history")
+    parser.add_argument("--raw-history", default="dashboard/data/raw_events_history.csv")
+    parser.add_argument("--summary-history", default="dashboard/data/daily_summary_history.csv")
+    parser.add_argument("--report", default="", help="Default: data_quality_report.json next to the raw history.")
+    parser.add_argument("--cache", default=str(CACHE_PATH), help="Per-day findings cache; '' = check every day.")
+    parser.add_argument("--max-findings", type=int, default=100, help="Findings listed per rule (0 = all); counts cover all.")
+    parser.add_argument("--fail-on", choices=[*SEVERITIES, "never"], default=ERROR)
+    parser.add_argument("--open-days", type=int, default=30, help="Unbalanced positions younger than this may still be open.")
+    parser.add_argument("--max-gap-days", type=int, default=5, help="Weekdays without events tolerated per account.")
+    parser.add_argument("--window", type=int, default=20, help="Trailing active days for the outlier statistics.")
+    parser.add_argument("--min-periods", type=int, default=10)
+    parser.add_argument("--z-max", type=float, default=4.0)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    raw_path = Path(args.raw_history)
+    if not raw_path.exists():
+        raise SystemExit(f"Missing raw history: {raw_path}")
+    summary_path = Path(args.summary_history)
+    # Summary cells stay as written: their fingerprints are the day hashes build_history caches.
+    summary_rows = read_table(summary_path, DAILY_SUMMARY, typed=False).as_dicts() if summary_path.exists() else []
+    raw_rows = read_table(raw_path, RAW_EVENTS, columns=QUALITY_COLUMNS).as_dicts()
+    result = run_checks(
+        summary_rows,
+        raw_rows,
+        cache_path=Path(args.cache) if args.cache else None,
+        open_days=args.open_days,
+        max_gap_days=args.max_gap_days,
+        window=args.window,
+        min_periods=args.min_periods,
+        z_max=args.z_max,
+    )
+    report = build_report(result, args.max_findings)
+    out_path = Path(args.report) if args.report else report_path(raw_path)
+    write_report(out_path, report)
+    print(json.dumps({"status": "ok", "report": str(out_path), **report_summary(report)}, ensure_ascii=True))
+    if args.fail_on == "never":
+        return 0
+    failing = SEVERITIES[: SEVERITIES.index(args.fail_on) + 1]
+    return 1 if any(report["counts"][s] for s in failing) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
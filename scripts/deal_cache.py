@@ -0,0 +1,192 @@
+"""Local cache of untouched MT5 deal records, for re-normalizing without a terminal.
+
+- every MT5 fetch stores the deals it returned, before `normalize_deal`,
+  partitioned by account and XM day:
+  `<root>/<account_id>/<YYYY-MM>/<YYYY-MM-DD>.deals`
+- files use the columnar snapshot format (`columnar_snapshot.py`): typed
+  numeric arrays plus dictionary-encoded strings; the metadata records the
+  cache schema version, the stored fields and the account label/currency
+- a fetch that covers part of a day is merged into the day file by deal
+  ticket, so overlapping windows never drop deals already cached
+- fields added in a later schema version read as 0 / "" from older files
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+from columnar_snapshot import MappedFile, write_file
+
+CACHE_SCHEMA = 1
+# MT5 TradeDeal fields (MetaTrader5.history_deals_get) and their storage types.
+NUMERIC_FIELDS: dict[str, str] = {
+    "ticket": "<i8",
+    "order": "<i8",
+    "time": "<i8",
+    "time_msc": "<i8",
+    "type": "<i4",
+    "entry": "<i4",
+    "magic": "<i8",
+    "position_id": "<i8",
+    "reason": "<i4",
+    "volume": "<f8",
+    "price": "<f8",
+    "commission": "<f8",
+    "swap": "<f8",
+    "profit": "<f8",
+    "fee": "<f8",
+}
+TEXT_FIELDS = ("symbol", "comment", "external_id")
+# Deal times are server epochs; XM server days run on GMT+2 (see extract_mt5_events.XM_TZ).
+XM_TZ = timezone(timedelta(hours=2))
+
+
+@dataclass(frozen=True)
+class CachedDay:
+    account_id: str
+    day_xm: date
+    path: Path
+
+
+def deal_record(deal: Any) -> dict[str, Any]:
+    """Plain dict of the cached fields of an MT5 deal (namedtuple or object)."""
+    values = deal._asdict() if hasattr(deal, "_asdict") else vars(deal)
+    record: dict[str, Any] = {}
+    for name, dtype in NUMERIC_FIELDS.items():
+        value = values.get(name) or 0
+        record[name] = float(value) if dtype.startswith("<f") else int(value)
+    for name in TEXT_FIELDS:
+        record[name] = str(values.get(name) or "")
+    return record
+
+
+def deal_day_xm(record: dict[str, Any]) -> date:
+    return datetime.fromtimestamp(record["time"], tz=timezone.utc).astimezone(XM_TZ).date()
+
+
+class DealCache:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def day_path(self, account_id: str, day_xm: date) -> Path:
+        return self.root / account_id / day_xm.strftime("%Y-%m") / f"{day_xm.isoformat()}.deals"
+
+    def store(
+        self,
+        account_id: str,
+        account_label: str,
+        account_currency: str,
+        deals: Iterable[Any],
+        fetched_at_utc: str,
+    ) -> int:
+        """Merge fetched deals into their day files; returns the number of files rewritten."""
+        by_day: dict[date, dict[int, dict[str, Any]]] = {}
+        for deal in deals:
+            record = deal_record(deal)
+            by_day.setdefault(deal_day_xm(record), {})[record["ticket"]] = record
+
+        written = 0
+        for day_xm, fetched in sorted(by_day.items()):
+            path = self.day_path(account_id, day_xm)
+            meta: dict[str, Any] = {}
+            merged: dict[int, dict[str, Any]] = {}
+            if path.exists():
+                meta, records = read_day(path)
+                merged = {r["ticket"]: r for r in records}
+            if (
+                all(merged.get(ticket) == record for ticket, record in fetched.items())
+                and meta.get("account_label") == account_label
+                and meta.get("account_currency") == account_currency
+            ):
+                continue
+            merged.update(fetched)
+            write_day(
+                path,
+                {
+                    "account_id": account_id,
+                    "account_label": account_label,
+                    "account_currency": account_currency,
+                    "day_xm": day_xm.isoformat(),
+                    "fetched_at_utc": fetched_at_utc,
+                },
+                [merged[t] for t in sorted(merged)],
+            )
+            written += 1
+        return written
+
+    def days(
+        self,
+        account_ids: Iterable[str] | None = None,
+        first_day: date | None = None,
+        last_day: date | None = None,
+    ) -> list[CachedDay]:
+        """Cached (account, day) files in account then day order, optionally filtered."""
+        if not self.root.exists():
+            return []
+        wanted = set(account_ids) if account_ids is not None else None
+        out: list[CachedDay] = []
+        for account_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            if wanted is not None and account_dir.name not in wanted:
+                continue
+            for path in sorted(account_dir.glob("*/*.deals")):
+                try:
+                    day_xm = date.fromisoformat(path.stem)
+                except ValueError:
+                    continue
+                if (first_day and day_xm < first_day) or (last_day and day_xm > last_day):
+                    continue
+                out.append(CachedDay(account_dir.name, day_xm, path))
+        return out
+
+    def read(self, cached: Iterable[CachedDay]) -> Iterator[tuple[dict[str, Any], list[SimpleNamespace]]]:
+        """(day metadata, deals as attribute objects like MT5 TradeDeal) per cached day."""
+        for item in cached:
+            meta, records = read_day(item.path)
+            yield meta, [SimpleNamespace(**r) for r in records]
+
+
+def write_day(path: Path, meta: dict[str, Any], records: list[dict[str, Any]]) -> None:
+    arrays = {
+        name: np.array([r[name] for r in records], dtype=np.dtype(dtype))
+        for name, dtype in NUMERIC_FIELDS.items()
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    write_file(
+        tmp,
+        meta={**meta, "schema": CACHE_SCHEMA, "fields": [*NUMERIC_FIELDS, *TEXT_FIELDS]},
+        arrays=arrays,
+        tables={"text": (list(TEXT_FIELDS), records)},
+    )
+    os.replace(tmp, path)
+
+
+def read_day(path: Path) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    with MappedFile(path) as mapped:
+        meta = mapped.meta
+        if int(meta.get("schema", 0)) > CACHE_SCHEMA:
+            raise SystemExit(
+                f"Deal cache file {path} has schema {meta['schema']}; this version reads up to {CACHE_SCHEMA}"
+            )
+        text = mapped.tables["text"].materialize()
+        count = len(text)
+        # tolist() copies out of the mapping, which is closed before the next build replaces the file.
+        columns = {
+            name: (mapped.arrays[name].tolist() if name in mapped.arrays else [np.dtype(dtype).type(0).item()] * count)
+            for name, dtype in NUMERIC_FIELDS.items()
+        }
+    records = []
+    for i in range(count):
+        record = {name: values[i] for name, values in columns.items()}
+        for name in TEXT_FIELDS:
+            record[name] = text[i].get(name, "")
+        records.append(record)
+    info = {k: v for k, v in meta.items() if k not in {"arrays", "tables"}}
+    return info, records
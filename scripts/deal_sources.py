@@ -0,0 +1,84 @@
+"""Where normalized events come from: the MT5 terminal or a JSONL replay file.
+
+An `EventSource` is called with (since_utc, until_utc, etl_run_id,
+synced_at_utc) and returns normalized `RawEvent`s for that window.
+- mt5_source: `history_deals_get` per account (extract_mt5_events.extract_events),
+  optionally storing the untouched deals in a `DealCache`
+- file_source: JSONL of MT5 TradeDeal fields plus optional `account_id`,
+  `account_label`, `account_currency`; lets the pipeline and backfill run on
+  machines without a terminal (e.g. Linux for testing)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Callable
+
+from extract_mt5_events import AccountConfig, RawEvent, extract_events, normalize_deal
+
+if TYPE_CHECKING:
+    from deal_cache import DealCache
+
+EventSource = Callable[[datetime, datetime, str, str], list[RawEvent]]
+REPLAY_ACCOUNT = "replay"
+
+
+def mt5_source(accounts: list[AccountConfig], deal_cache: DealCache | None = None) -> EventSource:
+    def fetch(since_utc: datetime, until_utc: datetime, etl_run_id: str, synced_at_utc: str) -> list[RawEvent]:
+        logging.info("Accounts configured: %s", ", ".join([a.label for a in accounts]))
+        return extract_events(accounts, since_utc, until_utc, etl_run_id, synced_at_utc, deal_cache)
+
+    return fetch
+
+
+def _replay_account(deal: dict) -> str:
+    return str(deal.get("account_id") or REPLAY_ACCOUNT)
+
+
+def file_source(path: Path, account_id: str | None = None) -> EventSource:
+    """Replay deals from `path`; `account_id` keeps only that account's deals."""
+    if not path.exists():
+        raise SystemExit(f"Deals file not found: {path}")
+
+    def fetch(since_utc: datetime, until_utc: datetime, etl_run_id: str, synced_at_utc: str) -> list[RawEvent]:
+        since, until = since_utc.timestamp(), until_utc.timestamp()
+        events: list[RawEvent] = []
+        with path.open("r", encoding="utf-8-sig") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                deal = json.loads(line)
+                if not since <= float(deal.get("time") or 0) < until:
+                    continue
+                if account_id is not None and _replay_account(deal) != account_id:
+                    continue
+                events.append(
+                    normalize_deal(
+                        deal=SimpleNamespace(**deal),
+                        account_id=_replay_account(deal),
+                        account_label=str(deal.get("account_label") or REPLAY_ACCOUNT),
+                        account_currency=str(deal.get("account_currency") or "USD"),
+                        etl_run_id=etl_run_id,
+                        synced_at_utc=synced_at_utc,
+                    )
+                )
+        logging.info("Replayed deals: file=%s account=%s count=%s", path, account_id or "*", len(events))
+        return events
+
+    return fetch
+
+
+def replay_accounts(path: Path) -> list[str]:
+    """Distinct account ids in a replay file, in first-seen order."""
+    if not path.exists():
+        raise SystemExit(f"Deals file not found: {path}")
+    seen: dict[str, None] = {}
+    with path.open("r", encoding="utf-8-sig") as f:
+        for line in f:
+            if line.strip():
+                seen.setdefault(_replay_account(json.loads(line)), None)
+    return list(seen)
@@ -0,0 +1,146 @@
+"""Digest tree of raw events for reconciling local history with the Worker/D1 and Sheets.
+
+- leaf: one digest per (account_id, trade_date_vn) over the sorted
+  `event_id` + row fingerprint (sync_ledger.raw_fingerprint) of live rows
+- month: digest of the month's leaves; root: digest of all months
+- written next to the history CSV (`raw_events_digest.json`) on every build
+- two copies are compared top-down: root, then month digests, then the leaves
+  of differing months only, so finding the diverging days takes a fixed number
+  of round trips whatever the history size
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Collection, Iterable, Mapping
+
+from sync_ledger import TRUE_VALUES, raw_fingerprint
+
+DIGEST_FORMAT = 1
+DIGEST_FILE = "raw_events_digest.json"
+UNDATED = "undated"
+NO_ACCOUNT = "-"
+
+Leaf = tuple[str, str]  # (account_id, trade_date_vn)
+
+
+def digest_path(raw_history: Path) -> Path:
+    return raw_history.with_name(DIGEST_FILE)
+
+
+def _digest(lines: Iterable[str]) -> str:
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:32]
+
+
+def is_live(row: Mapping[str, Any]) -> bool:
+    return str(row.get("is_deleted") or "").strip().lower() not in TRUE_VALUES
+
+
+def leaf_of(row: Mapping[str, Any]) -> Leaf:
+    return str(row.get("account_id") or NO_ACCOUNT), str(row.get("trade_date_vn") or UNDATED)
+
+
+def month_of(day: str) -> str:
+    return day[:7] if day != UNDATED else UNDATED
+
+
+@dataclass
+class DigestTree:
+    root: str = ""
+    rows: int = 0
+    months: dict[str, str] = field(default_factory=dict)
+    # month -> day -> account -> leaf digest
+    days: dict[str, dict[str, dict[str, str]]] = field(default_factory=dict)
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Mapping[str, Any]],
+        fingerprint: Callable[[Mapping[str, Any]], str] = raw_fingerprint,  # type: ignore[assignment]
+    ) -> "DigestTree":
+        lines: dict[Leaf, list[str]] = {}
+        count = 0
+        for row in rows:
+            if not row.get("event_id") or not is_live(row):
+                continue
+            lines.setdefault(leaf_of(row), []).append(f"{row['event_id']}\t{fingerprint(row)}")
+            count += 1
+        tree = cls(rows=count)
+        for (account, day), leaf_lines in lines.items():
+            tree.days.setdefault(month_of(day), {}).setdefault(day, {})[account] = _digest(sorted(leaf_lines))
+        for month, month_days in tree.days.items():
+            tree.months[month] = _digest(
+                f"{day}/{account}={digest}"
+                for day in sorted(month_days)
+                for account, digest in sorted(month_days[day].items())
+            )
+        tree.root = _digest(f"{m}={d}" for m, d in sorted(tree.months.items()))
+        return tree
+
+    def leaves(self, months: Collection[str] | None = None) -> dict[Leaf, str]:
+        return {
+            (account, day): digest
+            for month, month_days in self.days.items()
+            if months is None or month in months
+            for day, accounts in month_days.items()
+            for account, digest in accounts.items()
+        }
+
+    def as_dict(self, months: Collection[str] | None = ()) -> dict[str, Any]:
+        """Root and month digests, plus the leaves of `months` (None = all)."""
+        return {
+            "format": DIGEST_FORMAT,
+            "root": self.root,
+            "rows": self.rows,
+            "months": dict(sorted(self.months.items())),
+            "days": {m: self.days[m] for m in sorted(self.days) if months is None or m in months},
+        }
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.as_dict(None), ensure_ascii=True, sort_keys=True), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "DigestTree | None":
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("format") != DIGEST_FORMAT:
+            return None
+        return cls(root=data["root"], rows=int(data["rows"]), months=data["months"], days=data["days"])
+
+
+def diverging_keys(local: Mapping[Any, str], remote: Mapping[Any, str]) -> list[Any]:
+    """Keys whose digest differs or that exist on one side only."""
+    return sorted(k for k in set(local) | set(remote) if local.get(k) != remote.get(k))
+
+
+def flatten_days(days: Mapping[str, Mapping[str, Mapping[str, str]]]) -> dict[Leaf, str]:
+    return {
+        (account, day): digest
+        for month_days in days.values()
+        for day, accounts in month_days.items()
+        for account, digest in accounts.items()
+    }
+
+
+def rows_in(rows: Iterable[dict[str, str]], leaves: Collection[Leaf]) -> list[dict[str, str]]:
+    wanted = set(leaves)
+    return [r for r in rows if leaf_of(r) in wanted]
+
+
+def compare_rows(
+    local_rows: Iterable[dict[str, str]],
+    remote: Mapping[str, str],
+    fingerprint: Callable[[Mapping[str, Any]], str] = raw_fingerprint,  # type: ignore[assignment]
+) -> tuple[list[dict[str, str]], list[str]]:
+    """(local rows missing or different remotely, remote event_ids not live locally)."""
+    local_live = {r["event_id"]: r for r in local_rows if r.get("event_id") and is_live(r)}
+    changed = [r for event_id, r in local_live.items() if remote.get(event_id) != fingerprint(r)]
+    stale = sorted(event_id for event_id in remote if event_id not in local_live)
+    return changed, stale
@@ -14,33 +14,55 @@ Google Sheets upsert is intentionally deferred to Step 3.
 from __future__ import annotations
 
 import argparse
-import csv
 import hashlib
 import json
 import logging
 import os
 import sys
 import uuid
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Iterable
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Iterable
 
 from dotenv import load_dotenv
 
-try:
-    import MetaTrader5 as mt5
-except Exception as exc:  # pragma: no cover
-    msg = str(exc)
-    if "_ARRAY_API" in msg or "NumPy" in msg or "numpy" in msg:
+import json_codec
+from journal_io import write_table
+
+if TYPE_CHECKING:
+    from deal_cache import DealCache
+
+# Loaded by load_mt5() so normalization and the pipeline can run without a terminal.
+mt5: Any = None
+
+# MetaTrader5 ENUM_DEAL_TYPE values.
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_TYPE_BALANCE = 2
+DEAL_TYPE_CREDIT = 3
+
+
+def load_mt5() -> Any:
+    global mt5
+    if mt5 is not None:
+        return mt5
+    try:
+        import MetaTrader5
+    except Exception as exc:  # pragma: no cover
+        msg = str(exc)
+        if "_ARRAY_API" in msg or "NumPy" in msg or "numpy" in msg:
+            raise SystemExit(
+                "MetaTrader5 failed to import due to NumPy compatibility. "
+                "Please install dependencies with `pip install -r requirements.txt` "
+                "so NumPy is pinned below 2."
+            ) from exc
         raise SystemExit(
-            "MetaTrader5 failed to import due to NumPy compatibility. "
-            "Please install dependencies with `pip install -r requirements.txt` "
-            "so NumPy is pinned below 2."
+            "MetaTrader5 package is unavailable. Run: pip install -r requirements.txt"
         ) from exc
-    raise SystemExit(
-        "MetaTrader5 package is unavailable. Run: pip install -r requirements.txt"
-    ) from exc
+    mt5 = MetaTrader5
+    return mt5
 
 
 XM_TZ = timezone(timedelta(hours=2))
@@ -107,6 +129,9 @@ class DailySummary:
     total_swap: float
     total_deposit: float
     total_withdrawal: float
+    net_profit_vnd: float | None
+    total_commission_vnd: float | None
+    total_swap_vnd: float | None
     updated_at_utc: str
 
 
@@ -127,6 +152,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output-format", choices=["jsonl", "csv"], default="jsonl")
     parser.add_argument("--summary-output", default="out/daily_summary_latest.csv")
     parser.add_argument("--log-file", default="logs/extract_mt5_events.log")
+    parser.add_argument(
+        "--deal-cache-dir",
+        default="state/deal_cache",
+        help="Also store untouched deals here for scripts/renormalize.py (empty = off).",
+    )
     parser.add_argument(
         "--warn-position-delta-ratio",
         type=float,
@@ -265,13 +295,13 @@ def setup_logging(log_file: Path) -> None:
 
 def deal_type_to_event_type(deal_type: int, profit: float) -> tuple[str, str]:
     # Mapping based on MT5 DealType constants
-    if deal_type == mt5.DEAL_TYPE_BUY:
+    if deal_type == DEAL_TYPE_BUY:
         return "trade", "Buy"
-    if deal_type == mt5.DEAL_TYPE_SELL:
+    if deal_type == DEAL_TYPE_SELL:
         return "trade", "Sell"
-    if deal_type == mt5.DEAL_TYPE_BALANCE:
+    if deal_type == DEAL_TYPE_BALANCE:
         return ("deposit", "Deposit") if profit >= 0 else ("withdrawal", "Withdrawal")
-    if deal_type == mt5.DEAL_TYPE_CREDIT:
+    if deal_type == DEAL_TYPE_CREDIT:
         return "credit", "Credit"
     return "balance_adjustment", "BalanceAdjustment"
 
@@ -388,33 +418,18 @@ def get_deals(since_utc: datetime, until_utc: datetime) -> Iterable[Any]:
 
 def write_jsonl(path: Path, events: list[RawEvent]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8", newline="\n") as f:
-        for event in events:
-            f.write(json.dumps(asdict(event), ensure_ascii=True) + "\n")
+    with path.open("wb") as f:
+        f.writelines(json_codec.dumps(event) + b"\n" for event in events)
 
 
 def write_csv(path: Path, events: list[RawEvent]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    rows = [asdict(e) for e in events]
-    if not rows:
-        rows = [asdict(RawEvent(**{k: None for k in RawEvent.__annotations__.keys()}))]  # type: ignore[arg-type]
-        rows = []
     headers = list(RawEvent.__annotations__.keys())
-    with path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
+    write_table(path, headers, (tuple(getattr(e, h) for h in headers) for e in events))
 
 
 def write_daily_summary_csv(path: Path, summaries: list[DailySummary]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
     headers = list(DailySummary.__annotations__.keys())
-    with path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        writer.writeheader()
-        for summary in summaries:
-            writer.writerow(asdict(summary))
+    write_table(path, headers, (tuple(getattr(s, h) for h in headers) for s in summaries))
 
 
 def health_check_preflight(account_id: str, account_currency: str) -> None:
@@ -455,6 +470,8 @@ def build_daily_summaries(events: list[RawEvent], updated_at_utc: str) -> list[D
         gross_loss = sum(e.profit for e in day_events if e.profit < 0)
         total_deposit = sum(e.profit for e in day_events if e.event_type == "deposit")
         total_withdrawal = sum(-e.profit for e in day_events if e.event_type == "withdrawal")
+        # Filled by the FX enrichment (fx_rates.py); None until a rate is known.
+        vnd_events = [e for e in day_events if getattr(e, "usd_vnd_rate", None) is not None]
 
         summaries.append(
             DailySummary(
@@ -472,6 +489,9 @@ def build_daily_summaries(events: list[RawEvent], updated_at_utc: str) -> list[D
                 total_swap=sum(e.swap for e in day_events),
                 total_deposit=total_deposit,
                 total_withdrawal=total_withdrawal,
+                net_profit_vnd=sum(e.profit_vnd or 0.0 for e in vnd_events) if vnd_events else None,
+                total_commission_vnd=sum(e.commission_vnd or 0.0 for e in vnd_events) if vnd_events else None,
+                total_swap_vnd=sum(e.swap_vnd or 0.0 for e in vnd_events) if vnd_events else None,
                 updated_at_utc=updated_at_utc,
             )
         )
@@ -479,6 +499,27 @@ def build_daily_summaries(events: list[RawEvent], updated_at_utc: str) -> list[D
     return summaries
 
 
+def summary_input(row: dict[str, str]) -> SimpleNamespace:
+    """The RawEvent fields build_daily_summaries reads, typed from a CSV row."""
+
+    def num(key: str) -> float:
+        try:
+            return float(row.get(key) or 0.0)
+        except ValueError:
+            return 0.0
+
+    return SimpleNamespace(
+        trade_date_vn=row.get("trade_date_vn", ""),
+        event_type=row.get("event_type", ""),
+        action=row.get("action", ""),
+        position_id=row.get("position_id") or None,
+        account_id=row.get("account_id", ""),
+        profit=num("profit"),
+        commission=num("commission"),
+        swap=num("swap"),
+    )
+
+
 def full_day_window_utc_from_vn_date(day_vn: datetime.date) -> tuple[datetime, datetime]:
     start_vn = datetime.combine(day_vn, datetime.min.time(), tzinfo=VN_TZ)
     end_vn = start_vn + timedelta(days=1)
@@ -563,33 +604,24 @@ def warn_if_abnormal_positions(
         )
 
 
-def main() -> int:
-    project_root = Path(__file__).resolve().parent.parent
-    dotenv_path = project_root / ".env"
-    load_dotenv(dotenv_path=dotenv_path, override=False, encoding="utf-8-sig")
-
-    args = parse_args()
-    state_path = Path(args.state_file)
-    output_path = Path(args.output)
-    summary_output_path = Path(args.summary_output)
-    log_file = Path(args.log_file)
-    setup_logging(log_file)
-
-    state = load_state(state_path)
-    since_utc, until_utc = resolve_window(args, state)
-    logging.info("Run window: since_utc=%s until_utc=%s", format_iso_utc(since_utc), format_iso_utc(until_utc))
-
-    etl_run_id = str(uuid.uuid4())
-    synced_at_utc = format_iso_utc(datetime.now(tz=UTC))
-    accounts = load_accounts(args)
-    logging.info("Accounts configured: %s", ", ".join([a.label for a in accounts]))
-
+def extract_events(
+    accounts: list[AccountConfig],
+    since_utc: datetime,
+    until_utc: datetime,
+    etl_run_id: str,
+    synced_at_utc: str,
+    deal_cache: DealCache | None = None,
+) -> list[RawEvent]:
+    """Fetch and normalize deals of every account in one window (one terminal login each)."""
+    load_mt5()
     events: list[RawEvent] = []
     for account in accounts:
         account_id, account_currency = init_mt5(account)
         health_check_preflight(account_id, account_currency)
         deals = list(get_deals(since_utc, until_utc))
         logging.info("Fetched deals: account=%s count=%s", account.label, len(deals))
+        if deal_cache is not None:
+            deal_cache.store(account_id, account.label, account_currency, deals, synced_at_utc)
         events.extend(
             [
                 normalize_deal(
@@ -606,6 +638,51 @@ def main() -> int:
         mt5.shutdown()
 
     logging.info("Fetched deals total across accounts: %s", len(events))
+    return events
+
+
+def record_run_state(
+    state: dict[str, Any],
+    until_utc: datetime,
+    events_count: int,
+    etl_run_id: str,
+    summaries: list[DailySummary],
+) -> None:
+    state["last_sync_time_utc"] = format_iso_utc(until_utc)
+    state["last_run_event_count"] = events_count
+    state["last_run_id"] = etl_run_id
+    state["last_positions_by_day"] = {s.trade_date_vn: s.total_positions for s in summaries}
+
+
+def main() -> int:
+    project_root = Path(__file__).resolve().parent.parent
+    dotenv_path = project_root / ".env"
+    load_dotenv(dotenv_path=dotenv_path, override=False, encoding="utf-8-sig")
+
+    args = parse_args()
+    state_path = Path(args.state_file)
+    output_path = Path(args.output)
+    summary_output_path = Path(args.summary_output)
+    log_file = Path(args.log_file)
+    setup_logging(log_file)
+
+    state = load_state(state_path)
+    since_utc, until_utc = resolve_window(args, state)
+    logging.info("Run window: since_utc=%s until_utc=%s", format_iso_utc(since_utc), format_iso_utc(until_utc))
+
+    etl_run_id = str(uuid.uuid4())
+    synced_at_utc = format_iso_utc(datetime.now(tz=UTC))
+    accounts = load_accounts(args)
+    logging.info("Accounts configured: %s", ", ".join([a.label for a in accounts]))
+
+    deal_cache = None
+    if args.deal_cache_dir:
+        # deal_cache needs NumPy; keep it off the import path of --help and the
+        # modules that only use the normalization helpers.
+        from deal_cache import DealCache
+
+        deal_cache = DealCache(Path(args.deal_cache_dir))
+    events = extract_events(accounts, since_utc, until_utc, etl_run_id, synced_at_utc, deal_cache)
 
     if args.output_format == "jsonl":
         write_jsonl(output_path, events)
@@ -619,10 +696,7 @@ def main() -> int:
         logging.warning("No events returned for window")
 
     if not args.dry_run:
-        state["last_sync_time_utc"] = format_iso_utc(until_utc)
-        state["last_run_event_count"] = len(events)
-        state["last_run_id"] = etl_run_id
-        state["last_positions_by_day"] = {s.trade_date_vn: s.total_positions for s in summaries}
+        record_run_state(state, until_utc, len(events), etl_run_id, summaries)
         save_state(state_path, state)
 
     print(
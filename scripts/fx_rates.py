@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""USD/VND rate cache and VND enrichment of raw events.
+
+- the operator imports a rate history CSV (no live FX service):
+  `python scripts/fx_rates.py --import rates.csv --source vcb`
+  columns: `time_utc` (ISO UTC) or `date` (a VN day, rate valid from 00:00 VN),
+  `usd_vnd_rate` (or `rate`), optional `source`
+- rates are merged into one sorted on-disk cache (`state/fx/usd_vnd.rates`,
+  columnar snapshot format); the sorted time column is the index
+- each event gets the last rate at or before its close time (as-of join with
+  `np.searchsorted`); rates older than MAX_RATE_AGE_DAYS are not used
+- only rows whose rate or rate time changed are rewritten, and only the days
+  of those rows get their VND totals rolled up again
+- `--enrich-history` re-enriches the history CSVs right after an import
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from columnar_snapshot import MappedFile, write_file
+from journal_io import to_float
+
+RATES_PATH = Path("state/fx/usd_vnd.rates")
+RATES_FORMAT = 1
+MAX_RATE_AGE_DAYS = 7
+# Account currencies converted with the USD/VND rate.
+USD_CURRENCIES = {"USD"}
+VN_TZ = timezone(timedelta(hours=7))
+UTC = timezone.utc
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+TRUE_VALUES = {"true", "1", "yes"}
+VND_FIELDS = (("profit", "profit_vnd"), ("commission", "commission_vnd"), ("swap", "swap_vnd"))
+SUMMARY_VND_FIELDS = (
+    ("profit_vnd", "net_profit_vnd"),
+    ("commission_vnd", "total_commission_vnd"),
+    ("swap_vnd", "total_swap_vnd"),
+)
+
+
+@dataclass(frozen=True)
+class RateTable:
+    """Rates sorted by time; `source_code` indexes `sources`."""
+
+    version: int
+    times: np.ndarray
+    rates: np.ndarray
+    source_code: np.ndarray
+    sources: list[str]
+
+    def __len__(self) -> int:
+        return int(self.times.shape[0])
+
+
+def load_rate_table(path: Path = RATES_PATH) -> RateTable | None:
+    if not path.exists():
+        return None
+    with MappedFile(path) as mapped:
+        # Copies (no view may outlive the mapping), so the cache file can be replaced while this table is in use.
+        return RateTable(
+            version=int(mapped.meta["version"]),
+            times=np.array(mapped.arrays["time"], dtype=np.int64),
+            rates=np.array(mapped.arrays["rate"], dtype=np.float64),
+            source_code=np.array(mapped.arrays["source_code"], dtype=np.int32),
+            sources=list(mapped.meta["sources"]),
+        )
+
+
+def save_rate_table(path: Path, table: RateTable) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    write_file(
+        tmp,
+        meta={
+            "format": RATES_FORMAT,
+            "pair": "USDVND",
+            "version": table.version,
+            "sources": table.sources,
+            "updated_at_utc": datetime.now(tz=UTC).strftime(ISO_FORMAT),
+        },
+        arrays={"time": table.times, "rate": table.rates, "source_code": table.source_code},
+        tables={},
+    )
+    os.replace(tmp, path)
+
+
+def _parse_rate_time(row: dict[str, str]) -> int:
+    if row.get("time_utc"):
+        value = row["time_utc"].strip()
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return int((dt if dt.tzinfo else dt.replace(tzinfo=UTC)).timestamp())
+    day = date.fromisoformat((row.get("date") or "").strip())
+    return int(datetime.combine(day, datetime.min.time(), tzinfo=VN_TZ).timestamp())
+
+
+def read_rate_csv(path: Path, default_source: str) -> list[tuple[int, float, str]]:
+    if not path.exists():
+        raise SystemExit(f"Rate file not found: {path}")
+    out = []
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                rate = float(row.get("usd_vnd_rate") or row.get("rate") or "")
+                out.append((_parse_rate_time(row), rate, (row.get("source") or default_source).strip()))
+            except ValueError as exc:
+                raise SystemExit(f"Invalid rate row {path}:{line_no}: {exc}") from exc
+    return out
+
+
+def import_rates(csv_path: Path, cache_path: Path, default_source: str) -> dict[str, Any]:
+    """Merge a rate CSV into the cache (same time: the imported rate wins)."""
+    current = load_rate_table(cache_path)
+    merged: dict[int, tuple[float, str]] = {}
+    if current is not None:
+        for t, r, c in zip(current.times.tolist(), current.rates.tolist(), current.source_code.tolist()):
+            merged[t] = (r, current.sources[c])
+    added = changed = 0
+    for t, r, source in read_rate_csv(csv_path, default_source):
+        previous = merged.get(t)
+        if previous is None:
+            added += 1
+        elif previous != (r, source):
+            changed += 1
+        merged[t] = (r, source)
+
+    version = current.version if current is not None else 0
+    if added or changed or current is None:
+        times = sorted(merged)
+        sources = sorted({s for _, s in merged.values()})
+        lookup = {s: i for i, s in enumerate(sources)}
+        version += 1
+        save_rate_table(
+            cache_path,
+            RateTable(
+                version=version,
+                times=np.array(times, dtype=np.int64),
+                rates=np.array([merged[t][0] for t in times], dtype=np.float64),
+                source_code=np.array([lookup[merged[t][1]] for t in times], dtype=np.int32),
+                sources=sources,
+            ),
+        )
+    return {"added": added, "changed": changed, "rates": len(merged), "version": version}
+
+
+def iso_epochs(values: np.ndarray) -> np.ndarray:
+    """ISO-8601 timestamps (with offset or Z) as UTC epoch seconds; -1 when missing."""
+    out = np.full(len(values), -1, dtype=np.int64)
+    if not len(values):
+        return out
+    has_time = np.char.str_len(values) >= 19
+    if not has_time.any():
+        return out
+    stamps = values[has_time]
+    local = np.array([s[:19] for s in stamps.tolist()], dtype="datetime64[s]").astype(np.int64)
+    # Offsets repeat (+07:00 for every VN time), so each distinct suffix is parsed once.
+    suffixes, inverse = np.unique(np.array([s[19:] for s in stamps.tolist()], dtype=np.str_), return_inverse=True)
+    offsets = np.array(
+        [0 if s in {"", "Z"} else int(datetime.strptime(s, "%z").utcoffset().total_seconds()) for s in suffixes.tolist()],
+        dtype=np.int64,
+    )
+    out[has_time] = local - offsets[inverse]
+    return out
+
+
+def event_times(rows: list[dict[str, str]]) -> np.ndarray:
+    """Close (else open) time of each row as UTC epoch seconds; -1 when missing."""
+    return iso_epochs(np.array([r.get("close_time_vn") or r.get("open_time_vn") or "" for r in rows], dtype=np.str_))
+
+
+def asof_join(table: RateTable, times: np.ndarray, max_age_days: int = MAX_RATE_AGE_DAYS) -> np.ndarray:
+    """Index of the last rate at or before each time; -1 when none or too old."""
+    idx = np.searchsorted(table.times, times, side="right") - 1
+    valid = (times >= 0) & (idx >= 0)
+    if max_age_days > 0:
+        valid &= times - table.times[np.clip(idx, 0, None)] <= max_age_days * 86400
+    return np.where(valid, idx, -1)
+
+
+def _format_vnd(value: float) -> str:
+    return f"{value:.0f}"
+
+
+def enrich_rows(rows: list[dict[str, str]], table: RateTable | None) -> list[int]:
+    """Fill the fx / *_vnd columns in place; returns indices of rows that changed."""
+    if not rows:
+        return []
+    if table is None or not len(table):
+        idx = np.full(len(rows), -1, dtype=np.int64)
+    else:
+        idx = asof_join(table, event_times(rows))
+    currency = np.array([(r.get("account_currency") or "").upper() for r in rows], dtype=np.str_)
+    idx = np.where(np.isin(currency, list(USD_CURRENCIES)), idx, -1)
+
+    # Compare as the CSV stores them, so only rows whose rate actually moved are touched.
+    rate_text = np.array([str(float(v)) for v in table.rates.tolist()] if table is not None else [], dtype=np.str_)
+    time_text = np.array(
+        [datetime.fromtimestamp(t, tz=UTC).strftime(ISO_FORMAT) for t in table.times.tolist()] if table is not None else [],
+        dtype=np.str_,
+    )
+    has_rate = idx >= 0
+    new_rate = np.full(len(rows), "", dtype=object)
+    new_time = np.full(len(rows), "", dtype=object)
+    if has_rate.any():
+        new_rate[has_rate] = rate_text[idx[has_rate]]
+        new_time[has_rate] = time_text[idx[has_rate]]
+    old_rate = np.array([r.get("usd_vnd_rate") or "" for r in rows], dtype=object)
+    old_time = np.array([r.get("fx_rate_time_utc") or "" for r in rows], dtype=object)
+    changed = np.flatnonzero((old_rate != new_rate) | (old_time != new_time)).tolist()
+
+    for i in changed:
+        row = rows[i]
+        j = int(idx[i])
+        if j < 0:
+            row["usd_vnd_rate"] = row["fx_rate_time_utc"] = row["fx_rate_source"] = ""
+            for _, vnd in VND_FIELDS:
+                row[vnd] = ""
+            continue
+        rate = float(table.rates[j])  # type: ignore[union-attr]
+        row["usd_vnd_rate"] = str(new_rate[i])
+        row["fx_rate_time_utc"] = str(new_time[i])
+        row["fx_rate_source"] = table.sources[int(table.source_code[j])]  # type: ignore[union-attr]
+        for usd, vnd in VND_FIELDS:
+            row[vnd] = _format_vnd(to_float(row.get(usd)) * rate)
+    return changed
+
+
+def roll_up_vnd(summary_rows: list[dict[str, str]], raw_rows: list[dict[str, str]], days: set[str]) -> int:
+    """Recompute the VND totals of `days` in summary_rows from raw_rows; returns rows updated."""
+    if not days:
+        return 0
+    totals: dict[str, dict[str, float]] = {}
+    for row in raw_rows:
+        day = row.get("trade_date_vn") or ""
+        if day not in days or (row.get("is_deleted") or "").strip().lower() in TRUE_VALUES:
+            continue
+        if not row.get("usd_vnd_rate"):
+            continue
+        day_totals = totals.setdefault(day, {total: 0.0 for _, total in SUMMARY_VND_FIELDS})
+        for vnd, total in SUMMARY_VND_FIELDS:
+            day_totals[total] += to_float(row.get(vnd))
+    updated = 0
+    for row in summary_rows:
+        day = row.get("trade_date_vn") or ""
+        if day not in days:
+            continue
+        day_totals = totals.get(day)
+        for _, total in SUMMARY_VND_FIELDS:
+            row[total] = "" if day_totals is None else _format_vnd(day_totals[total])
+        updated += 1
+    return updated
+
+
+def enrich_history(
+    summary_headers: list[str],
+    summary_rows: list[dict[str, str]],
+    raw_rows: list[dict[str, str]],
+    table: RateTable | None,
+    rewritten_days: set[str] | frozenset[str] = frozenset(),
+) -> dict[str, Any]:
+    """Enrich raw rows and refresh VND totals of the affected days (all in place).
+
+    Affected days are those of re-enriched raw rows plus `rewritten_days`,
+    whose summary rows were merged in this run without VND totals.
+    """
+    for _, total in SUMMARY_VND_FIELDS:
+        if total not in summary_headers:
+            summary_headers.insert(max(len(summary_headers) - 1, 0), total)
+    changed = enrich_rows(raw_rows, table)
+    days = {raw_rows[i].get("trade_date_vn") or "" for i in changed} | set(rewritten_days)
+    return {
+        "fx_rates_version": None if table is None else table.version,
+        "raw_rows_enriched": len(changed),
+        "summary_days_rolled_up": roll_up_vnd(summary_rows, raw_rows, days),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Import USD/VND rates and enrich history with VND amounts")
+    parser.add_argument("--import", dest="import_csv", default="", help="Rate history CSV to merge into the cache.")
+    parser.add_argument("--source", default="manual", help="Source name for rows without a `source` column.")
+    parser.add_argument("--rates", default=str(RATES_PATH))
+    parser.add_argument("--enrich-history", action="store_true", help="Re-enrich the history CSVs with the cached rates.")
+    parser.add_argument("--summary-history", default="dashboard/data/daily_summary_history.csv")
+    parser.add_argument("--raw-history", default="dashboard/data/raw_events_history.csv")
+    parser.add_argument("--no-snapshot", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if not args.import_csv and not args.enrich_history:
+        raise SystemExit("Nothing to do: pass --import and/or --enrich-history")
+    rates_path = Path(args.rates)
+    result: dict[str, Any] = {"status": "ok", "rates": str(rates_path)}
+    if args.import_csv:
+        result["import"] = import_rates(Path(args.import_csv), rates_path, args.source)
+    if args.enrich_history:
+        from build_dashboard_data import build_history
+
+        table = load_rate_table(rates_path)
+        if table is None:
+            raise SystemExit(f"No rate cache at {rates_path}; import rates first")
+        raw_dst = Path(args.raw_history)
+        history = build_history(
+            [],
+            [],
+            [],
+            [],
+            Path(args.summary_history),
+            raw_dst,
+            None if args.no_snapshot else raw_dst.parent / "snapshot",
+            fx_rates=table,
+        )
+        result["enrich"] = history["fx"]
+    print(json.dumps(result, ensure_ascii=True))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+"""In-memory stand-in for the gspread Spreadsheet / Worksheet API.
+
+Covers the calls made by push_to_gsheet.py and sheet_sync.py so the Sheets
+upload can be run and inspected locally without Google credentials:
+
+    python scripts/push_to_gsheet.py --fake-sheet state/fake_sheet.json ...
+
+- values are kept as strings (no USER_ENTERED conversion)
+- reads return trimmed ranges like the Sheets API (trailing blanks dropped)
+- writes outside the grid fail with 400 unless it was resized (append grows it)
+- every API call is recorded in `Worksheet.calls` / `FakeSpreadsheet.calls`
+- optional per-minute quota answering 429 like the real API (`quota_per_minute`)
+- `load()` / `save()` persist all worksheets to a JSON file
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Iterable, Sequence
+
+from gspread.exceptions import APIError, WorksheetNotFound
+
+from sheet_sync import parse_a1
+
+
+class _ErrorResponse:
+    """Minimal `requests.Response` for constructing gspread's APIError."""
+
+    def __init__(self, status_code: int, message: str, status: str) -> None:
+        self.status_code = status_code
+        self.text = message
+        self.status = status
+
+    def json(self) -> dict[str, Any]:
+        return {"error": {"code": self.status_code, "message": self.text, "status": self.status}}
+
+
+class FakeWorksheet:
+    def __init__(
+        self,
+        title: str,
+        rows: int = 1000,
+        cols: int = 26,
+        values: list[list[str]] | None = None,
+        spreadsheet: "FakeSpreadsheet | None" = None,
+        sheet_id: int = 0,
+    ) -> None:
+        self.title = title
+        self.id = sheet_id
+        self.spreadsheet = spreadsheet
+        self.row_count = rows
+        self.col_count = cols
+        self.grid: list[list[str]] = [[str(v) for v in row] for row in (values or [])]
+        self.calls: list[str] = []
+        self._fit(len(self.grid), max((len(r) for r in self.grid), default=0))
+
+    def _record(self, call: str) -> None:
+        if self.spreadsheet is not None:
+            self.spreadsheet.check_quota()
+        self.calls.append(call)
+
+    def _fit(self, rows: int, cols: int) -> None:
+        self.row_count = max(self.row_count, rows)
+        self.col_count = max(self.col_count, cols)
+
+    def _set(self, row: int, col: int, values: Sequence[Sequence[Any]], grow: bool = False) -> None:
+        """Write a block with its top-left cell at 1-based (row, col)."""
+        last_row = row - 1 + len(values)
+        last_col = col - 1 + max((len(line) for line in values), default=0)
+        if not grow and (last_row > self.row_count or last_col > self.col_count):
+            raise APIError(
+                _ErrorResponse(400, f"Range exceeds grid limits ({self.row_count}x{self.col_count})", "INVALID_ARGUMENT")
+            )
+        for r, line in enumerate(values):
+            target_row = row - 1 + r
+            while len(self.grid) <= target_row:
+                self.grid.append([])
+            cells = self.grid[target_row]
+            for c, value in enumerate(line):
+                target_col = col - 1 + c
+                while len(cells) <= target_col:
+                    cells.append("")
+                cells[target_col] = "" if value is None else str(value)
+        self._fit(last_row, last_col)
+
+    def _read(self, a1: str) -> list[list[str]]:
+        start, _, end = a1.partition(":")
+        r1, c1 = parse_a1(start)
+        r2, c2 = parse_a1(end or start)
+        r1, c1 = r1 or 1, c1 or 1
+        r2 = r2 or self.row_count
+        c2 = c2 or self.col_count
+        out = [[cell for cell in row[c1 - 1 : c2]] for row in self.grid[r1 - 1 : r2]]
+        for row in out:
+            while row and row[-1] == "":
+                row.pop()
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def get_all_values(self, **_: Any) -> list[list[str]]:
+        self._record("get_all_values")
+        width = max((len(r) for r in self.grid), default=0)
+        rows = [row + [""] * (width - len(row)) for row in self.grid]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return rows
+
+    def batch_get(self, ranges: Iterable[str], **_: Any) -> list[list[list[str]]]:
+        ranges = list(ranges)
+        self._record(f"batch_get:{len(ranges)}")
+        return [self._read(a1) for a1 in ranges]
+
+    def update(self, values: Sequence[Sequence[Any]], range_name: str | None = None, **_: Any) -> dict[str, Any]:
+        self._record("update")
+        row, col = parse_a1((range_name or "A1").partition(":")[0])
+        self._set(row or 1, col or 1, values)
+        return {"updatedRows": len(values)}
+
+    def batch_update(self, data: Iterable[dict[str, Any]], **_: Any) -> dict[str, Any]:
+        data = list(data)
+        self._record(f"batch_update:{len(data)}")
+        for item in data:
+            row, col = parse_a1(item["range"].partition(":")[0])
+            self._set(row or 1, col or 1, item["values"])
+        return {"totalUpdatedRanges": len(data)}
+
+    def append_rows(self, values: Sequence[Sequence[Any]], **_: Any) -> dict[str, Any]:
+        self._record("append_rows")
+        last = len(self.grid)
+        while last and not any(self.grid[last - 1]):
+            last -= 1
+        self._set(last + 1, 1, values, grow=True)
+        return {"updates": {"updatedRows": len(values)}}
+
+    def delete_rows(self, start_index: int, end_index: int | None = None) -> dict[str, Any]:
+        self._record("delete_rows")
+        end_index = end_index or start_index
+        del self.grid[start_index - 1 : end_index]
+        self.row_count -= end_index - start_index + 1
+        return {}
+
+    def clear(self) -> dict[str, Any]:
+        self._record("clear")
+        self.grid = []
+        return {}
+
+    def resize(self, rows: int | None = None, cols: int | None = None) -> dict[str, Any]:
+        self._record("resize")
+        if rows is not None:
+            del self.grid[rows:]
+            self.row_count = rows
+        if cols is not None:
+            self.grid = [row[:cols] for row in self.grid]
+            self.col_count = cols
+        return {}
+
+
+class FakeSpreadsheet:
+    def __init__(
+        self,
+        path: Path | None = None,
+        quota_per_minute: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.path = path
+        self.id = f"fake:{path}" if path else "fake"
+        self.worksheets_by_title: dict[str, FakeWorksheet] = {}
+        self.calls: list[str] = []
+        self.quota_per_minute = quota_per_minute
+        self.clock = clock
+        self.rejected = 0
+        self._window: deque[float] = deque()
+
+    def check_quota(self) -> None:
+        if not self.quota_per_minute:
+            return
+        now = self.clock()
+        while self._window and now - self._window[0] >= 60:
+            self._window.popleft()
+        if len(self._window) >= self.quota_per_minute:
+            self.rejected += 1
+            raise APIError(_ErrorResponse(429, "Quota exceeded", "RESOURCE_EXHAUSTED"))
+        self._window.append(now)
+
+    @classmethod
+    def load(cls, path: Path, **options: Any) -> "FakeSpreadsheet":
+        sh = cls(path, **options)
+        if path.exists():
+            state = json.loads(path.read_text(encoding="utf-8"))
+            for title, ws in state.get("worksheets", {}).items():
+                sh.worksheets_by_title[title] = FakeWorksheet(
+                    title, ws["rows"], ws["cols"], ws["values"], spreadsheet=sh, sheet_id=len(sh.worksheets_by_title)
+                )
+        return sh
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "worksheets": {
+                title: {"rows": ws.row_count, "cols": ws.col_count, "values": ws.grid}
+                for title, ws in self.worksheets_by_title.items()
+            }
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=True), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.check_quota()
+        self.calls.append("worksheet")
+        try:
+            return self.worksheets_by_title[title]
+        except KeyError:
+            raise WorksheetNotFound(title) from None
+
+    def worksheets(self) -> list[FakeWorksheet]:
+        return list(self.worksheets_by_title.values())
+
+    def add_worksheet(self, title: str, rows: int, cols: int, **_: Any) -> FakeWorksheet:
+        self.check_quota()
+        self.calls.append("add_worksheet")
+        ws = FakeWorksheet(title, rows, cols, spreadsheet=self, sheet_id=len(self.worksheets_by_title))
+        self.worksheets_by_title[title] = ws
+        return ws
+
+    def batch_update(self, body: dict[str, Any]) -> dict[str, Any]:
+        """Supports the deleteDimension (ROWS) and sortRange requests issued by sheet_sync.py."""
+        self.check_quota()
+        self.calls.append(f"batch_update:{len(body.get('requests', []))}")
+        by_id = {ws.id: ws for ws in self.worksheets_by_title.values()}
+        for request in body.get("requests", []):
+            if "sortRange" in request:
+                self._sort_range(by_id, request["sortRange"])
+                continue
+            rng = request["deleteDimension"]["range"]
+            if rng["dimension"] != "ROWS":
+                raise NotImplementedError(rng["dimension"])
+            ws = by_id[rng["sheetId"]]
+            del ws.grid[rng["startIndex"] : rng["endIndex"]]
+            ws.row_count -= rng["endIndex"] - rng["startIndex"]
+        return {"replies": [{} for _ in body.get("requests", [])]}
+
+    @staticmethod
+    def _sort_range(by_id: dict[int, FakeWorksheet], sort: dict[str, Any]) -> None:
+        """Whole-row sort of the range by its sortSpecs (values compared as strings, stable)."""
+        rng = sort["range"]
+        ws = by_id[rng["sheetId"]]
+        start, end = rng.get("startRowIndex", 0), rng.get("endRowIndex", len(ws.grid))
+        rows = ws.grid[start:end]
+        for spec in reversed(sort.get("sortSpecs", [])):
+            col = spec["dimensionIndex"]
+            rows.sort(key=lambda row: row[col] if col < len(row) else "", reverse=spec.get("sortOrder") == "DESCENDING")
+        ws.grid[start:end] = rows
+
+    def api_calls(self) -> int:
+        return len(self.calls) + sum(len(ws.calls) for ws in self.worksheets_by_title.values())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Single entry point for the journal scripts: `python scripts/journal.py <command> [args]`.
+
+- each command runs the `main()` of one script with the remaining arguments,
+  so `journal push-gsheet --help` prints push_to_gsheet.py's help
+- only the chosen command's module is imported, after the command is known;
+  gspread, FastAPI/uvicorn, MetaTrader5 and NumPy load only inside the
+  commands that need them
+- `journal api` / `journal sync-server` serve api_server.py / sync_server.py
+  under uvicorn
+- `journal startup` measures cold start (`<command> --help` in a fresh
+  interpreter), summarizes `python -X importtime`, and exits 1 when a command
+  is slower than `--max-ms` or imports a heavy dependency at startup
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# command -> (module, description)
+COMMANDS: dict[str, tuple[str, str]] = {
+    "extract": ("extract_mt5_events", "Extract MT5 deals into raw_events / daily_summary CSVs"),
+    "build": ("build_dashboard_data", "Merge extract outputs into the dashboard history"),
+    "push-gsheet": ("push_to_gsheet", "Push CSV outputs to Google Sheets"),
+    "push-worker": ("push_to_cloudflare_worker", "Push the history to the Cloudflare Worker"),
+    "pipeline": ("pipeline", "Full daily pipeline: extract, build, push"),
+    "backfill": ("backfill", "Multi-month backfill in parallel month windows"),
+    "renormalize": ("renormalize", "Rebuild raw events from the deal cache"),
+    "fx-rates": ("fx_rates", "Import USD/VND rates, enrich the history"),
+    "reconcile": ("reconcile", "Compare the local history with the Worker and Sheets"),
+    "quality": ("data_quality", "Data-quality checks over the full history"),
+    "load-test": ("load_test_api", "Load-test the API server"),
+    "bench-csv": ("bench_csv_io", "Benchmark the CSV I/O layer"),
+    "bench-json": ("bench_json", "Benchmark the JSON serialization backends"),
+}
+LOCAL_COMMANDS = {
+    "api": "Serve the dashboard JSON API (api_server.py) under uvicorn",
+    "sync-server": "Serve the SQLite reference Worker API (sync_server.py) under uvicorn",
+    "startup": "Measure cold start per command; exit 1 over budget",
+}
+# Served by import string, so FastAPI is imported by uvicorn, not at startup.
+SERVERS = {"api": ("scripts.api_server:app", 8787), "sync-server": ("scripts.sync_server:app", 8788)}
+
+# Modules a command must not import before it has parsed its arguments.
+DEFERRED_IMPORTS = ("MetaTrader5", "gspread", "google.auth", "fastapi", "uvicorn")
+DEFERRED_BY_COMMAND = {
+    "": (*DEFERRED_IMPORTS, "numpy"),
+    "api": (*DEFERRED_IMPORTS, "numpy"),
+    "backfill": (*DEFERRED_IMPORTS, "numpy"),
+    "build": (*DEFERRED_IMPORTS, "numpy"),
+    "extract": (*DEFERRED_IMPORTS, "numpy"),
+    "pipeline": (*DEFERRED_IMPORTS, "numpy"),
+    "push-gsheet": (*DEFERRED_IMPORTS, "numpy"),
+    "push-worker": (*DEFERRED_IMPORTS, "numpy"),
+    "reconcile": (*DEFERRED_IMPORTS, "numpy"),
+    "renormalize": (*DEFERRED_IMPORTS, "numpy"),
+    "sync-server": (*DEFERRED_IMPORTS, "numpy"),
+}
+DEFAULT_STARTUP_BUDGET_MS = 500.0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    commands = "\n".join(
+        f"  {name:<13} {desc}" for name, desc in [*((n, d) for n, (_, d) in COMMANDS.items()), *LOCAL_COMMANDS.items()]
+    )
+    parser = argparse.ArgumentParser(
+        prog="journal",
+        description="Trading journal pipeline commands",
+        epilog=f"commands:\n{commands}\n\n`journal <command> --help` shows the options of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=[*COMMANDS, *LOCAL_COMMANDS], metavar="command", help="One of the commands below.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments passed to the command.")
+    return parser.parse_args(argv)
+
+
+def run_script(command: str, argv: list[str]) -> int:
+    module = importlib.import_module(COMMANDS[command][0])
+    # The scripts parse sys.argv; prog shows up as "journal <command>" in their help.
+    sys.argv = [f"journal {command}", *argv]
+    return module.main()
+
+
+def run_server(command: str, argv: list[str]) -> int:
+    app, port = SERVERS[command]
+    parser = argparse.ArgumentParser(prog=f"journal {command}", description=LOCAL_COMMANDS[command])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--workers", type=int, default=1)
+    if command == "sync-server":
+        parser.add_argument("--db", default="", help="SQLite path; fallback env SYNC_DB_PATH")
+    args = parser.parse_args(argv)
+    if getattr(args, "db", ""):
+        os.environ["SYNC_DB_PATH"] = args.db
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, workers=args.workers, app_dir=str(SCRIPTS_DIR.parent))
+    return 0
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) from `python -X importtime` output."""
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            out.append((name, int(self_us), int(cumulative_us)))
+    return out
+
+
+def command_argv(command: str) -> list[str]:
+    return [str(SCRIPTS_DIR / "journal.py"), *([command] if command else []), "--help"]
+
+
+def measure_startup(command: str, runs: int, top: int) -> dict[str, object]:
+    argv = command_argv(command)
+    timings = []
+    for _ in range(max(runs, 1)):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *argv], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    traced = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+    imports = parse_importtime(traced.stderr)
+    loaded = {name for name, _, _ in imports}
+    deferred = DEFERRED_BY_COMMAND.get(command, DEFERRED_IMPORTS)
+    return {
+        "command": command or "(none)",
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "import_ms": round(sum(self_us for _, self_us, _ in imports) / 1000, 1),
+        "modules": len(imports),
+        "top_imports_ms": [[name, round(cum / 1000, 1)] for name, _, cum in sorted(imports, key=lambda i: -i[2])[:top]],
+        "eager_heavy_imports": [m for m in deferred if m in loaded],
+    }
+
+
+def run_startup(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="journal startup", description=LOCAL_COMMANDS["startup"])
+    parser.add_argument(
+        "--command",
+        dest="commands",
+        action="append",
+        choices=["", *COMMANDS, *SERVERS],
+        help="Command to measure (repeatable; \"\" = bare `journal --help`); default all.",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per command; the median is checked.")
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_STARTUP_BUDGET_MS, help="Budget for the median; 0 = report only.")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports (cumulative) listed per command.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for command in args.commands if args.commands is not None else ["", *COMMANDS, *SERVERS]:
+        report = measure_startup(command, args.runs, args.top)
+        slow = args.max_ms > 0 and report["median_ms"] > args.max_ms  # type: ignore[operator]
+        eager = bool(report["eager_heavy_imports"])
+        report["status"] = "slow" if slow else "eager_import" if eager else "ok"
+        failed = failed or slow or eager
+        print(json.dumps(report, ensure_ascii=True))
+    return 1 if failed else 0
+
+
+def main() -> int:
+    args = parse_args()
+    if args.command in SERVERS:
+        return run_server(args.command, args.args)
+    if args.command == "startup":
+        return run_startup(args.args)
+    return run_script(args.command, args.args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
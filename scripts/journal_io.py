@@ -0,0 +1,222 @@
+"""Shared CSV I/O for the journal tables (history, extract outputs, partitions).
+
+- typed reads use the schema registry in journal_schema.py: each cell is
+  converted once, by column type, and rows are tuples (no dict per row)
+- `iter_rows()` is lazy; `columns=` projects to a subset (missing columns
+  read as None / "")
+- `write_table()` writes a temp file and renames it into place, so readers
+  never see a half-written CSV
+- `read_dicts()` keeps the csv.DictReader row-dict API (string values) for
+  existing callers (short rows are padded with "" rather than None)
+- `as_csv_rows()` / `as_lists()` convert records to those string rows and
+  rows to header-ordered lists, without importing the pipeline
+- `to_float()` reads a number from either kind of row (typed or string cell)
+
+`scripts/bench_csv_io.py` compares these paths with csv.DictReader.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from dataclasses import dataclass
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Mapping, Sequence
+
+from journal_schema import TableSchema
+
+TRUE_VALUES = {"true", "1", "yes"}
+FALSE_VALUES = {"false", "0", "no"}
+
+
+def _parse_int(value: str) -> int | None:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        # Written from a float column (e.g. "3.0").
+        return int(float(value))
+
+
+def _parse_float(value: str) -> float | None:
+    return float(value) if value else None
+
+
+def _parse_bool(value: str) -> bool | None:
+    lowered = value.strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    if not lowered:
+        return None
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+PARSERS: dict[str, Callable[[str], Any]] = {"int": _parse_int, "float": _parse_float, "bool": _parse_bool}
+
+
+def to_float(value: Any) -> float:
+    """A typed or string cell as float; None, "" and unparsable text read as 0."""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass
+class Table:
+    """Rows as tuples in `headers` order; values typed when read with a schema."""
+
+    headers: list[str]
+    rows: list[tuple[Any, ...]]
+    schema: TableSchema | None = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def column(self, name: str) -> list[Any]:
+        idx = self.headers.index(name)
+        return [row[idx] for row in self.rows]
+
+    def as_dicts(self) -> list[dict[str, Any]]:
+        headers = self.headers
+        return [dict(zip(headers, row)) for row in self.rows]
+
+
+def _read_header(reader: Iterator[list[str]]) -> list[str]:
+    for row in reader:
+        if row:
+            return row
+    return []
+
+
+def _projection(header: list[str], columns: Sequence[str] | None) -> tuple[list[str], Callable[[list[str]], tuple[str, ...]], bool]:
+    """Output headers, a row picker, and whether rows need a trailing "" for columns absent from the file."""
+    if columns is None:
+        return list(header), tuple, False
+    positions = {name: i for i, name in enumerate(header)}
+    idx = [positions.get(name, len(header)) for name in columns]
+    if len(idx) == 1:
+        only = idx[0]
+        return list(columns), lambda row: (row[only],), len(header) in idx
+    return list(columns), itemgetter(*idx), len(header) in idx
+
+
+def _converters(headers: list[str], schema: TableSchema | None) -> list[tuple[int, Callable[[str], Any]]]:
+    types = schema.types if schema is not None else {}
+    return [(i, PARSERS[types[name]]) for i, name in enumerate(headers) if types.get(name, "str") in PARSERS]
+
+
+def _conversion_error(path: Path, line: int, column: str, exc: Exception) -> SystemExit:
+    return SystemExit(f"{path}:{line}: column {column}: {exc}")
+
+
+def iter_rows(
+    path: Path,
+    schema: TableSchema | None = None,
+    columns: Sequence[str] | None = None,
+    typed: bool = True,
+) -> Iterator[tuple[Any, ...]]:
+    """Lazily yield row tuples (see `read_table`); the header is not yielded."""
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = _read_header(reader)
+        width = len(header)
+        headers, pick, needs_blank = _projection(header, columns)
+        converters = _converters(headers, schema) if typed else []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != width:
+                # Short rows are padded with "", extra cells dropped.
+                row = (row + [""] * width)[:width]
+            if needs_blank:
+                row.append("")
+            values = pick(row)
+            if converters:
+                cells = list(values)
+                for i, parse in converters:
+                    try:
+                        cells[i] = parse(cells[i])
+                    except ValueError as exc:
+                        raise _conversion_error(path, reader.line_num, headers[i], exc) from exc
+                values = tuple(cells)
+            yield values
+
+
+def read_header(path: Path) -> list[str]:
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        return _read_header(csv.reader(f))
+
+
+def read_table(
+    path: Path,
+    schema: TableSchema | None = None,
+    columns: Sequence[str] | None = None,
+    typed: bool = True,
+) -> Table:
+    """Read `path` into tuples; with `schema` and `typed`, cells are converted by column type.
+
+    Empty non-str cells become None. `columns` selects and orders the columns.
+    """
+    header = read_header(path)
+    headers = list(columns) if columns is not None else header
+    return Table(headers, list(iter_rows(path, schema, columns, typed)), schema)
+
+
+def read_dicts(path: Path) -> tuple[list[str], list[dict[str, str]]]:
+    """(header, rows) like csv.DictReader: string values, one dict per non-blank row."""
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = _read_header(reader)
+        width = len(header)
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            rows.append(dict(zip(header, row)))
+    return header, rows
+
+
+def write_table(
+    path: Path,
+    headers: Sequence[str],
+    rows: Iterable[Mapping[str, Any] | Sequence[Any]],
+) -> int:
+    """Atomically write header + rows (dicts by `headers`, or sequences in `headers` order); returns rows written.
+
+    Values are written like csv.DictWriter writes them: None as "", others via str().
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    rows = rows if isinstance(rows, list) else list(rows)
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        # Rows are all dicts or all sequences; decide once, not per row.
+        if rows and isinstance(rows[0], Mapping):
+            writer.writerows([row.get(h) for h in headers] for row in rows)
+        else:
+            writer.writerows(rows)
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def as_csv_rows(items: Iterable[Any], headers: Sequence[str]) -> list[dict[str, str]]:
+    """Dataclass records (RawEvent, DailySummary) -> the string rows csv.DictWriter would have written (None as "")."""
+    rows = []
+    for item in items:
+        values = (getattr(item, h) for h in headers)
+        rows.append({h: "" if v is None else str(v) for h, v in zip(headers, values)})
+    return rows
+
+
+def as_lists(headers: Sequence[str], rows: Iterable[Mapping[str, Any]]) -> list[list[Any]]:
+    return [[row.get(h, "") for h in headers] for row in rows]
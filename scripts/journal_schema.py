@@ -0,0 +1,119 @@
+"""Column contracts of the journal tables, with no imports of their own.
+
+Mirrors `RawEvent` / `DailySummary` in extract_mt5_events.py and
+docs/mt5_to_gsheet_mapping.md. Kept apart from them because journal_io.py,
+which extract_mt5_events imports, needs the types, and readers such as the
+API server and the Sheets push should not load the extractor.
+
+SCHEMAS is the registry used by journal_io.py: per table the ordered columns
+with their types, the key, the history sort order and a version (bump it when
+columns are added, removed or change type).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+# Cell types understood by journal_io; empty cells of non-str columns read as None.
+COLUMN_TYPES = ("str", "int", "float", "bool")
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    name: str
+    version: int
+    columns: tuple[tuple[str, str], ...]  # (name, type)
+    key: str
+    sort_key: str
+    descending: bool = False
+
+    @property
+    def names(self) -> list[str]:
+        return [name for name, _ in self.columns]
+
+    @property
+    def types(self) -> dict[str, str]:
+        return dict(self.columns)
+
+
+RAW_EVENTS = TableSchema(
+    name="raw_events",
+    version=1,
+    columns=(
+        ("event_id", "str"),
+        ("ticket", "str"),
+        ("position_id", "str"),
+        ("event_type", "str"),
+        ("action", "str"),
+        ("symbol", "str"),
+        ("lots", "float"),
+        ("open_price", "float"),
+        ("close_price", "float"),
+        ("sl", "float"),
+        ("tp", "float"),
+        ("commission", "float"),
+        ("swap", "float"),
+        ("pips", "float"),
+        ("profit", "float"),
+        ("comment", "str"),
+        ("magic_number", "str"),
+        ("duration_sec", "int"),
+        ("account_id", "str"),
+        ("account_label", "str"),
+        ("account_currency", "str"),
+        ("open_time_xm", "str"),
+        ("close_time_xm", "str"),
+        ("open_time_vn", "str"),
+        ("close_time_vn", "str"),
+        ("trade_date_xm", "str"),
+        ("trade_date_vn", "str"),
+        ("usd_vnd_rate", "float"),
+        ("profit_vnd", "float"),
+        ("commission_vnd", "float"),
+        ("swap_vnd", "float"),
+        ("fx_rate_source", "str"),
+        ("fx_rate_time_utc", "str"),
+        ("source_system", "str"),
+        ("etl_run_id", "str"),
+        ("synced_at_utc", "str"),
+        ("source_hash", "str"),
+        ("is_deleted", "bool"),
+    ),
+    key="event_id",
+    sort_key="close_time_vn",
+    descending=True,
+)
+
+DAILY_SUMMARY = TableSchema(
+    name="daily_summary",
+    version=1,
+    columns=(
+        ("trade_date_vn", "str"),
+        ("total_positions", "int"),
+        ("total_deals", "int"),
+        ("buy_deals", "int"),
+        ("sell_deals", "int"),
+        ("win_positions", "int"),
+        ("loss_positions", "int"),
+        ("net_profit", "float"),
+        ("gross_profit", "float"),
+        ("gross_loss", "float"),
+        ("total_commission", "float"),
+        ("total_swap", "float"),
+        ("total_deposit", "float"),
+        ("total_withdrawal", "float"),
+        ("net_profit_vnd", "float"),
+        ("total_commission_vnd", "float"),
+        ("total_swap_vnd", "float"),
+        ("updated_at_utc", "str"),
+    ),
+    key="trade_date_vn",
+    sort_key="trade_date_vn",
+)
+
+SCHEMAS = {schema.name: schema for schema in (RAW_EVENTS, DAILY_SUMMARY)}
+
+RAW_EVENT_KEY = RAW_EVENTS.key
+DAILY_SUMMARY_KEY = DAILY_SUMMARY.key
+RAW_EVENT_COLUMNS = RAW_EVENTS.names
+DAILY_SUMMARY_COLUMNS = DAILY_SUMMARY.names
@@ -0,0 +1,122 @@
+"""JSON encoding for the JSONL extract output, API responses and Worker sync payloads.
+
+- backend: orjson when installed, else msgspec, else the stdlib json module;
+  `JOURNAL_JSON_BACKEND=orjson|msgspec|json` forces one (an uninstalled
+  choice falls back to json)
+- `dumps` returns compact UTF-8 bytes with the same content on every backend
+  (non-ASCII text is written as UTF-8, not `\\u` escapes; NaN and infinities
+  as null, like orjson and msgspec); `loads` accepts bytes or str
+- dataclass records (RawEvent, DailySummary, ...) are encoded straight from
+  their fields, without the dataclasses.asdict() deep copy
+- callers look up `json_codec.dumps` at call time, so `use(name)` switches the
+  backend everywhere (bench_json.py compares them in one process)
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import importlib
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Callable
+
+BACKENDS = ("orjson", "msgspec", "json")
+BACKEND_ENV = "JOURNAL_JSON_BACKEND"
+
+
+@dataclass(frozen=True)
+class Codec:
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes | str], Any]
+
+
+def _record(value: Any) -> Any:
+    """stdlib `default=` hook: dataclass instances as their field dict (no copy of nested values)."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        try:
+            return vars(value)
+        except TypeError:  # slots=True
+            return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _finite(value: Any) -> Any:
+    """`value` with NaN / infinite floats replaced by None, as orjson and msgspec write them."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _finite(_record(value))
+    return value
+
+
+def _stdlib() -> Codec:
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_record, allow_nan=False)
+
+    def dumps(value: Any) -> bytes:
+        try:
+            return encoder.encode(value).encode("utf-8")
+        except ValueError:
+            # NaN or an infinity somewhere (rare): only then is the value copied.
+            return encoder.encode(_finite(value)).encode("utf-8")
+
+    return Codec("json", dumps, json.loads)
+
+
+def _orjson() -> Codec:
+    orjson = importlib.import_module("orjson")
+    option = orjson.OPT_SERIALIZE_NUMPY
+    return Codec("orjson", lambda value: orjson.dumps(value, option=option), orjson.loads)
+
+
+def _msgspec() -> Codec:
+    msgspec = importlib.import_module("msgspec")
+    decoder = msgspec.json.Decoder()
+
+    def loads(data: bytes | str) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as exc:  # not a ValueError, unlike json/orjson
+            raise ValueError(str(exc)) from exc
+
+    return Codec("msgspec", msgspec.json.Encoder().encode, loads)
+
+
+FACTORIES: dict[str, Callable[[], Codec]] = {"orjson": _orjson, "msgspec": _msgspec, "json": _stdlib}
+
+
+def codec(name: str = "auto") -> Codec:
+    """The named backend ("auto" = first installed of BACKENDS); json when it is not installed."""
+    for candidate in BACKENDS if name in {"", "auto"} else (name,):
+        if candidate not in FACTORIES:
+            raise SystemExit(f"Unsupported JSON backend {candidate!r}; use one of {', '.join(BACKENDS)}")
+        try:
+            return FACTORIES[candidate]()
+        except ImportError:
+            continue
+    return _stdlib()
+
+
+def available() -> list[str]:
+    return [name for name in BACKENDS if codec(name).name == name]
+
+
+def use(name: str) -> Codec:
+    """Make `name` the backend behind the module-level dumps/loads (benchmarks, tests)."""
+    global ACTIVE, BACKEND, dumps, loads
+    ACTIVE = codec(name)
+    BACKEND, dumps, loads = ACTIVE.name, ACTIVE.dumps, ACTIVE.loads
+    return ACTIVE
+
+
+ACTIVE: Codec
+BACKEND: str
+dumps: Callable[[Any], bytes]
+loads: Callable[[bytes | str], Any]
+use(os.getenv(BACKEND_ENV, "auto").strip().lower())
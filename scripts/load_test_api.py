@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""Load-test the dashboard API with a realistic request mix.
+
+Flow:
+- Generate synthetic history CSV files (or reuse --data-dir)
+- Start `scripts.api_server:app` under uvicorn in a subprocess
+- Drive it with an asyncio keep-alive HTTP client at fixed concurrency
+- Report p50/p95/p99 latency, requests/sec and server RSS
+- Save results JSON for comparison across versions (--compare)
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from journal_io import iter_rows, write_table
+from journal_schema import DAILY_SUMMARY, DAILY_SUMMARY_COLUMNS, RAW_EVENT_COLUMNS
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+VN_TZ = timezone(timedelta(hours=7))
+XM_TZ = timezone(timedelta(hours=2))
+UTC = timezone.utc
+
+SYMBOLS = ["XAUUSD", "EURUSD", "GBPUSD", "USDJPY", "BTCUSD", "US30"]
+DEFAULT_MIX = "summary=20,raw_page=40,raw_range=25,export=5,analytics=10"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test scripts/api_server.py under uvicorn")
+    parser.add_argument("--events", type=int, default=50_000, help="Synthetic raw events to generate.")
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--data-dir", default="", help="Use existing history CSV files instead of synthetic data.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration-sec", type=float, default=20.0)
+    parser.add_argument("--warmup-sec", type=float, default=2.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted request kinds, e.g. summary=20,raw_page=40")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn --workers")
+    parser.add_argument(
+        "--publish-snapshot",
+        action="store_true",
+        help="Publish the memory-mapped API snapshot for the synthetic data (default: serve CSV).",
+    )
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--api-token", default="loadtest")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--results-dir", default="out/loadtest")
+    parser.add_argument("--label", default="", help="Free text stored with the results, e.g. a version tag.")
+    parser.add_argument("--compare", default="", help="Previous results JSON to diff against.")
+    return parser.parse_args()
+
+
+def generate_history(data_dir: Path, events: int, accounts: int, seed: int) -> tuple[str, str]:
+    """Write synthetic open/close deal pairs; returns (first_day, last_day)."""
+    rng = random.Random(seed)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    synced_at = datetime.now(tz=UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    cursor = datetime(2022, 1, 3, 8, 0, tzinfo=UTC)
+    account_ids = [str(100000 + i) for i in range(max(accounts, 1))]
+    rows: list[dict[str, Any]] = []
+    days: dict[str, dict[str, Any]] = {}
+
+    for position in range(max(events // 2, 1)):
+        account_id = rng.choice(account_ids)
+        symbol = rng.choice(SYMBOLS)
+        lots = round(rng.choice([0.01, 0.05, 0.1, 0.2, 0.5, 1.0]), 2)
+        side = rng.choice(["Buy", "Sell"])
+        pnl = round(rng.gauss(1.5, 25.0) * lots * 10, 2)
+        for leg in range(2):
+            cursor += timedelta(seconds=rng.randint(30, 5400))
+            xm = cursor.astimezone(XM_TZ).isoformat(timespec="seconds")
+            vn = cursor.astimezone(VN_TZ).isoformat(timespec="seconds")
+            ticket = position * 2 + leg
+            profit = pnl if leg else 0.0
+            day_vn = vn[:10]
+            rows.append(
+                {
+                    "event_id": f"{account_id}:{ticket}",
+                    "ticket": str(ticket),
+                    "position_id": str(position),
+                    "event_type": "trade",
+                    "action": side if leg == 0 else ("Sell" if side == "Buy" else "Buy"),
+                    "symbol": symbol,
+                    "lots": lots,
+                    "close_price": round(rng.uniform(1, 2000), 5),
+                    "commission": -0.35 * lots * 10,
+                    "swap": 0.0 if leg == 0 else round(rng.uniform(-1, 0.2), 2),
+                    "profit": profit,
+                    "account_id": account_id,
+                    "account_label": f"acct_{account_id}",
+                    "account_currency": "USD",
+                    "open_time_xm": xm,
+                    "close_time_xm": xm,
+                    "open_time_vn": vn,
+                    "close_time_vn": vn,
+                    "trade_date_xm": xm[:10],
+                    "trade_date_vn": day_vn,
+                    "source_system": "MT5",
+                    "etl_run_id": "loadtest",
+                    "synced_at_utc": synced_at,
+                    "source_hash": f"{account_id}:{ticket}:{profit}",
+                    "is_deleted": False,
+                }
+            )
+            day = days.setdefault(day_vn, {h: 0 for h in DAILY_SUMMARY_COLUMNS})
+            day["trade_date_vn"] = day_vn
+            day["total_deals"] += 1
+            day["net_profit"] += profit
+            if leg:
+                day["total_positions"] += 1
+                day["win_positions"] += int(pnl > 0)
+                day["loss_positions"] += int(pnl < 0)
+
+    for day in days.values():
+        day["updated_at_utc"] = synced_at
+
+    rows.sort(key=lambda r: r["close_time_vn"], reverse=True)
+    write_table(data_dir / "raw_events_history.csv", RAW_EVENT_COLUMNS, rows)
+    write_table(data_dir / "daily_summary_history.csv", DAILY_SUMMARY_COLUMNS, (days[d] for d in sorted(days)))
+
+    ordered = sorted(days)
+    return ordered[0], ordered[-1]
+
+
+def date_bounds(data_dir: Path) -> tuple[str, str]:
+    path = data_dir / "daily_summary_history.csv"
+    dates = sorted(d for (d,) in iter_rows(path, DAILY_SUMMARY, columns=["trade_date_vn"]) if d)
+    if not dates:
+        raise SystemExit(f"No summary rows in {data_dir}")
+    return dates[0], dates[-1]
+
+
+def parse_mix(raw: str) -> list[tuple[str, float]]:
+    mix: list[tuple[str, float]] = []
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in REQUEST_BUILDERS:
+            raise SystemExit(f"Unknown request kind in --mix: {name} (known: {', '.join(REQUEST_BUILDERS)})")
+        mix.append((name, float(weight or 1)))
+    if not mix:
+        raise SystemExit("--mix is empty")
+    return mix
+
+
+def _random_range(rng: random.Random, first_day: str, last_day: str, max_days: int) -> tuple[str, str]:
+    start = datetime.strptime(first_day, "%Y-%m-%d")
+    span = max((datetime.strptime(last_day, "%Y-%m-%d") - start).days, 0)
+    offset = rng.randint(0, span)
+    length = rng.randint(0, max_days)
+    from_day = start + timedelta(days=offset)
+    return from_day.strftime("%Y-%m-%d"), (from_day + timedelta(days=length)).strftime("%Y-%m-%d")
+
+
+def _summary(ctx: dict[str, Any], rng: random.Random) -> str:
+    return "/api/summary"
+
+
+def _raw_page(ctx: dict[str, Any], rng: random.Random) -> str:
+    # Dashboard lazy-load: mostly the first pages, occasionally deep scrolling.
+    page = min(int(rng.expovariate(0.7)), 50)
+    return f"/api/raw-events?limit={ctx['page_size']}&offset={page * ctx['page_size']}"
+
+
+def _raw_range(ctx: dict[str, Any], rng: random.Random) -> str:
+    from_date, to_date = _random_range(rng, ctx["first_day"], ctx["last_day"], 31)
+    return f"/api/raw-events?from_date={from_date}&to_date={to_date}&limit={ctx['page_size']}"
+
+
+def _export(ctx: dict[str, Any], rng: random.Random) -> str:
+    return "/api/raw-events"
+
+
+def _analytics(ctx: dict[str, Any], rng: random.Random) -> str:
+    from_date, to_date = _random_range(rng, ctx["first_day"], ctx["last_day"], 90)
+    path = rng.choice(["/api/analytics/overview", "/api/analytics/by-symbol", "/api/equity-curve"])
+    return f"{path}?from_date={from_date}&to_date={to_date}"
+
+
+REQUEST_BUILDERS = {
+    "summary": _summary,
+    "raw_page": _raw_page,
+    "raw_range": _raw_range,
+    "export": _export,
+    "analytics": _analytics,
+}
+
+
+class HttpConnection:
+    """Minimal HTTP/1.1 keep-alive client on asyncio streams."""
+
+    def __init__(self, host: str, port: int, headers: dict[str, str]) -> None:
+        self.host = host
+        self.port = port
+        self.headers = headers
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def _connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def get(self, path: str) -> tuple[int, int]:
+        """Return (status, body_bytes); reconnects once on a dropped connection."""
+        for attempt in range(2):
+            if self.writer is None:
+                await self._connect()
+            try:
+                return await self._request(path)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+        raise ConnectionError("unreachable")
+
+    async def _request(self, path: str) -> tuple[int, int]:
+        assert self.reader is not None and self.writer is not None
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in self.headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("ascii"))
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        status = int(status_line.split(" ", 2)[1])
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+
+        size = 0
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                chunk_len = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self.reader.readexactly(chunk_len + 2)
+                size += chunk_len
+                if chunk_len == 0:
+                    break
+        else:
+            size = int(headers.get("content-length", "0"))
+            await self.reader.readexactly(size)
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, size
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree_rss_bytes(pid: int) -> int | None:
+    """Sum VmRSS of pid and its children (uvicorn workers). Linux only."""
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    children: dict[int, list[int]] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry.name))
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            status = (proc / str(current) / "status").read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def start_server(args: argparse.Namespace, data_dir: Path, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["API_DATA_DIR"] = str(data_dir)
+    env["API_TOKEN"] = args.api_token
+    cmd = [
+        sys.executable, "-m", "uvicorn", "scripts.api_server:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited early with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("uvicorn did not become healthy within 60s")
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    idx = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+def latency_stats(latencies: list[float]) -> dict[str, Any]:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": _ms(percentile(values, 0.50)),
+        "p95_ms": _ms(percentile(values, 0.95)),
+        "p99_ms": _ms(percentile(values, 0.99)),
+        "max_ms": _ms(values[-1] if values else None),
+    }
+
+
+def _ms(value: float | None) -> float | None:
+    return round(value * 1000, 2) if value is not None else None
+
+
+async def run_load(args: argparse.Namespace, port: int, ctx: dict[str, Any], server_pid: int) -> dict[str, Any]:
+    mix = parse_mix(args.mix)
+    kinds = [k for k, _ in mix]
+    weights = [w for _, w in mix]
+    headers = {"Authorization": f"Bearer {args.api_token}"}
+    samples: dict[str, list[float]] = {k: [] for k in kinds}
+    errors: dict[str, int] = {}
+    bytes_received = 0
+    rss_samples: list[int] = []
+    recording = False
+    stop_at = time.monotonic() + args.warmup_sec + args.duration_sec
+
+    async def worker(worker_id: int) -> None:
+        nonlocal bytes_received
+        rng = random.Random(args.seed * 1000 + worker_id)
+        conn = HttpConnection("127.0.0.1", port, headers)
+        try:
+            while time.monotonic() < stop_at:
+                kind = rng.choices(kinds, weights)[0]
+                path = REQUEST_BUILDERS[kind](ctx, rng)
+                started = time.perf_counter()
+                try:
+                    status, size = await conn.get(path)
+                except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+                    status, size = 0, 0
+                    await conn.close()
+                    errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+                elapsed = time.perf_counter() - started
+                if not recording:
+                    continue
+                if status == 200:
+                    samples[kind].append(elapsed)
+                    bytes_received += size
+                elif status:
+                    errors[f"http_{status}"] = errors.get(f"http_{status}", 0) + 1
+        finally:
+            await conn.close()
+
+    async def sample_rss() -> None:
+        while time.monotonic() < stop_at:
+            rss = process_tree_rss_bytes(server_pid)
+            if rss is not None and recording:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.5)
+
+    tasks = [asyncio.create_task(worker(i)) for i in range(args.concurrency)]
+    tasks.append(asyncio.create_task(sample_rss()))
+    await asyncio.sleep(args.warmup_sec)
+    recording = True
+    measured_from = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - measured_from
+
+    all_latencies = [x for values in samples.values() for x in values]
+    return {
+        "elapsed_sec": round(elapsed, 3),
+        "requests": len(all_latencies),
+        "requests_per_sec": round(len(all_latencies) / elapsed, 2) if elapsed else None,
+        "mb_per_sec": round(bytes_received / elapsed / 1e6, 2) if elapsed else None,
+        "errors": errors,
+        "latency": latency_stats(all_latencies),
+        "by_kind": {k: latency_stats(v) for k, v in samples.items()},
+        "server_rss_mb": {
+            "peak": round(max(rss_samples) / 1e6, 1) if rss_samples else None,
+            "mean": round(sum(rss_samples) / len(rss_samples) / 1e6, 1) if rss_samples else None,
+        },
+    }
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current: dict[str, Any], previous_path: Path) -> dict[str, Any]:
+    previous = json.loads(previous_path.read_text(encoding="utf-8"))
+    cur, prev = current["results"], previous["results"]
+
+    def delta(a: float | None, b: float | None) -> float | None:
+        if a is None or b in (None, 0):
+            return None
+        return round((a - b) / b * 100, 1)
+
+    return {
+        "previous": str(previous_path),
+        "previous_revision": previous.get("revision"),
+        "requests_per_sec_pct": delta(cur["requests_per_sec"], prev["requests_per_sec"]),
+        "p50_ms_pct": delta(cur["latency"]["p50_ms"], prev["latency"]["p50_ms"]),
+        "p95_ms_pct": delta(cur["latency"]["p95_ms"], prev["latency"]["p95_ms"]),
+        "p99_ms_pct": delta(cur["latency"]["p99_ms"], prev["latency"]["p99_ms"]),
+        "rss_peak_pct": delta(cur["server_rss_mb"]["peak"], prev["server_rss_mb"]["peak"]),
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory(prefix="journal_loadtest_") as tmp:
+        if args.data_dir:
+            data_dir = Path(args.data_dir).resolve()
+            first_day, last_day = date_bounds(data_dir)
+        else:
+            data_dir = Path(tmp)
+            first_day, last_day = generate_history(data_dir, args.events, args.accounts, args.seed)
+            print(f"generated {args.events} synthetic events in {data_dir}", file=sys.stderr)
+            if args.publish_snapshot:
+                from api_data import publish_snapshot
+
+                publish_snapshot(
+                    data_dir / "daily_summary_history.csv",
+                    data_dir / "raw_events_history.csv",
+                    data_dir / "snapshot",
+                )
+
+        port = args.port or free_port()
+        proc = start_server(args, data_dir, port)
+        try:
+            ctx = {"first_day": first_day, "last_day": last_day, "page_size": args.page_size}
+            idle_rss = process_tree_rss_bytes(proc.pid)
+            results = asyncio.run(run_load(args, port, ctx, proc.pid))
+            results["server_rss_mb"]["idle"] = round(idle_rss / 1e6, 1) if idle_rss else None
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    report: dict[str, Any] = {
+        "label": args.label,
+        "revision": git_revision(),
+        "created_at_utc": datetime.now(tz=UTC).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "config": {
+            "events": None if args.data_dir else args.events,
+            "data_dir": args.data_dir or None,
+            "concurrency": args.concurrency,
+            "duration_sec": args.duration_sec,
+            "workers": args.workers,
+            "snapshot": bool(args.publish_snapshot),
+            "mix": args.mix,
+            "page_size": args.page_size,
+        },
+        "results": results,
+    }
+    if args.compare:
+        report["compare"] = compare(report, Path(args.compare))
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(tz=UTC).strftime("%Y%m%d_%H%M%S")
+    out_path = results_dir / f"load_{stamp}_{report['revision'] or 'norev'}.json"
+    out_path.write_text(json.dumps(report, ensure_ascii=True, indent=2), encoding="utf-8")
+    report["output"] = str(out_path)
+    print(json.dumps(report, ensure_ascii=True, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
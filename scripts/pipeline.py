@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""Run the daily pipeline (extract -> build -> Google Sheets -> Worker) in one process.
+
+Replaces the per-day chain of four Python processes in run_daily_pipeline.ps1:
+- all missed XM days since `last_success_day_xm` are handled as one batch:
+  one `history_deals_get` window per account, one history merge, one
+  Sheets push and one Worker push
+- stages hand rows over in memory; the per-day CSVs in out/ and the history
+  CSVs are still written for the dashboard and manual reruns
+- stages run on stage_scheduler.py: extract -> build -> {gsheet, worker},
+  with the two sinks pushed concurrently and retried separately
+  (`--sink-retries`); per-stage timings are printed and kept in the state
+- `state/pipeline_runner_state.json` keeps the same `last_success_day_xm`
+  contract (advanced only when every stage succeeded) plus
+  `built_through_day_xm` and per-sink `ok_through_day_xm`: a sink that
+  failed is pushed again on the next run without re-extracting
+- `--deals-file` replays MT5 deal records from JSONL instead of logging in
+  to a terminal, so the pipeline runs on Linux for testing
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import shlex
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+import push_to_cloudflare_worker
+import push_to_gsheet
+from build_dashboard_data import DEFAULT_RATES_PATH, build_history, read_csv
+from deal_sources import file_source, mt5_source
+from extract_mt5_events import (
+    UTC,
+    XM_TZ,
+    DailySummary,
+    RawEvent,
+    build_daily_summaries,
+    format_iso_utc,
+    full_day_window_utc_from_xm_date,
+    load_accounts,
+    load_state,
+    record_run_state,
+    save_state,
+    setup_logging,
+    warn_if_abnormal_positions,
+    write_csv,
+    write_daily_summary_csv,
+)
+from journal_io import as_csv_rows, as_lists
+from retry_policy import RetryPolicy
+from stage_scheduler import BLOCKED, FAILED, OK, Stage, StageScheduler
+
+SINKS = ("gsheet", "worker")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run extract, build and both pushes for all missed days")
+    parser.add_argument("--state-file", default="state/pipeline_runner_state.json")
+    parser.add_argument("--extract-state-file", default="state/mt5_sync_state.json")
+    parser.add_argument("--accounts-file", default="", help="Multi-account config; default state/accounts.json if present.")
+    parser.add_argument("--deals-file", default="", help="Replay MT5 deals from JSONL instead of the terminal.")
+    parser.add_argument("--until-day", default="", help="Last XM day to process (YYYY-MM-DD); default yesterday XM.")
+    parser.add_argument("--deal-cache-dir", default="state/deal_cache", help="Raw MT5 deal cache for renormalize.py (empty = off).")
+    parser.add_argument("--out-dir", default="out")
+    parser.add_argument("--summary-history", default="dashboard/data/daily_summary_history.csv")
+    parser.add_argument("--raw-history", default="dashboard/data/raw_events_history.csv")
+    parser.add_argument("--snapshot-dir", default="", help="API snapshot directory; default <raw-history dir>/snapshot.")
+    parser.add_argument("--no-snapshot", action="store_true")
+    parser.add_argument("--fx-rates", default=DEFAULT_RATES_PATH, help="USD/VND rate cache for the *_vnd columns (fx_rates.py).")
+    parser.add_argument(
+        "--skip-sink",
+        dest="skip_sinks",
+        action="append",
+        choices=SINKS,
+        default=[],
+        help="Do not push to this sink (repeatable).",
+    )
+    parser.add_argument("--sink-retries", type=int, default=2, help="Retries per sink stage before it is marked failed.")
+    parser.add_argument("--gsheet-args", default="", help="Extra push_to_gsheet.py arguments, e.g. \"--partition month\".")
+    parser.add_argument("--worker-args", default="", help="Extra push_to_cloudflare_worker.py arguments.")
+    parser.add_argument("--warn-position-delta-ratio", type=float, default=0.5)
+    parser.add_argument("--log-file", default="logs/pipeline.log")
+    return parser.parse_args()
+
+
+def load_runner_state(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    # Written with a BOM by older PowerShell runners.
+    state = json.loads(path.read_text(encoding="utf-8-sig"))
+    if "last_success_day_xm" not in state and state.get("last_success_day_vn"):
+        # Backward compatibility with old state key.
+        state["last_success_day_xm"] = state["last_success_day_vn"]
+    return state
+
+
+def parse_day(value: str, flag: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise SystemExit(f"Invalid {flag} format. Use YYYY-MM-DD, e.g. 2026-02-22") from exc
+
+
+def days_to_process(last_success_day: str | None, target_day: date) -> list[date]:
+    """Days after the last successful one up to `target_day`; first run -> target day only."""
+    start = parse_day(last_success_day, "last_success_day_xm") + timedelta(days=1) if last_success_day else target_day
+    return [start + timedelta(days=i) for i in range((target_day - start).days + 1)]
+
+
+def write_day_outputs(out_dir: Path, days: list[date], events: list[RawEvent], summaries: list[DailySummary]) -> None:
+    """Same files the per-day runner produced: out/raw_events_<day>.csv and the latest summary."""
+    by_day: dict[str, list[RawEvent]] = {d.isoformat(): [] for d in days}
+    for event in events:
+        by_day.setdefault(event.trade_date_xm, []).append(event)
+    for day, day_events in by_day.items():
+        write_csv(out_dir / f"raw_events_{day}.csv", day_events)
+    write_daily_summary_csv(out_dir / "daily_summary_latest.csv", summaries)
+
+
+def sink_stages(args: argparse.Namespace) -> list[Stage]:
+    def gsheet(inputs: dict[str, Any]) -> dict[str, Any]:
+        history = inputs["build"]
+        gsheet_args = push_to_gsheet.parse_args(shlex.split(args.gsheet_args))
+        return push_to_gsheet.push_tables(
+            gsheet_args,
+            history["raw_headers"],
+            as_lists(history["raw_headers"], history["raw_rows"]),
+            history["summary_headers"],
+            as_lists(history["summary_headers"], history["summary_rows"]),
+        )
+
+    def worker(inputs: dict[str, Any]) -> dict[str, Any]:
+        history = inputs["build"]
+        # The ledger makes a retried push resend only rows not acknowledged yet.
+        worker_args = push_to_cloudflare_worker.parse_args(["--skip-if-missing", *shlex.split(args.worker_args)])
+        target = push_to_cloudflare_worker.worker_target(worker_args)
+        if target is None:
+            return push_to_cloudflare_worker.SKIPPED
+        return push_to_cloudflare_worker.sync_rows(worker_args, *target, history["summary_rows"], history["raw_rows"])
+
+    return [
+        Stage("gsheet", gsheet, deps=("build",), retries=args.sink_retries),
+        Stage("worker", worker, deps=("build",), retries=args.sink_retries),
+    ]
+
+
+def main() -> int:
+    project_root = Path(__file__).resolve().parent.parent
+    load_dotenv(dotenv_path=project_root / ".env", override=False, encoding="utf-8-sig")
+    args = parse_args()
+    setup_logging(Path(args.log_file))
+
+    state_path = Path(args.state_file)
+    runner_state = load_runner_state(state_path)
+    last_success = runner_state.get("last_success_day_xm")
+    built_through = runner_state.get("built_through_day_xm") or last_success
+    sink_state: dict[str, dict[str, Any]] = runner_state.setdefault("sinks", {})
+    target_day = parse_day(args.until_day, "--until-day") if args.until_day else datetime.now(tz=XM_TZ).date() - timedelta(days=1)
+    days = days_to_process(built_through, target_day)
+
+    enabled = [name for name in SINKS if name not in set(args.skip_sinks)]
+    # A sink behind the built history (failed last time) is pushed again without re-extracting.
+    behind = [
+        name
+        for name in enabled
+        if built_through and (sink_state.get(name, {}).get("ok_through_day_xm") or last_success or "") < built_through
+    ]
+    if not days and not behind:
+        logging.info("No missing XM day to process. Exit.")
+        print(json.dumps({"status": "noop", "last_success_day_xm": last_success}, ensure_ascii=True))
+        return 0
+    if days:
+        logging.info("Catch-up days: %s", ", ".join(d.isoformat() for d in days))
+    else:
+        logging.info("Retrying sinks only: %s", ", ".join(behind))
+
+    raw_headers = list(RawEvent.__annotations__.keys())
+    summary_headers = list(DailySummary.__annotations__.keys())
+    summary_dst = Path(args.summary_history)
+    raw_dst = Path(args.raw_history)
+
+    def extract(_: dict[str, Any]) -> tuple[list[RawEvent], list[DailySummary]]:
+        # One window covering every missed day.
+        since_utc = full_day_window_utc_from_xm_date(days[0])[0]
+        until_utc = full_day_window_utc_from_xm_date(days[-1])[1]
+        etl_run_id = str(uuid.uuid4())
+        synced_at_utc = format_iso_utc(datetime.now(tz=UTC))
+        if args.deals_file:
+            source = file_source(Path(args.deals_file))
+        else:
+            accounts_file = args.accounts_file
+            if not accounts_file and Path("state/accounts.json").exists():
+                accounts_file = "state/accounts.json"
+            # deal_cache and fx_rates need NumPy: imported by the stages, not for --help.
+            from deal_cache import DealCache
+
+            deal_cache = DealCache(Path(args.deal_cache_dir)) if args.deal_cache_dir else None
+            source = mt5_source(load_accounts(argparse.Namespace(accounts_file=accounts_file)), deal_cache)
+        events = source(since_utc, until_utc, etl_run_id, synced_at_utc)
+        summaries = build_daily_summaries(events, synced_at_utc)
+        write_day_outputs(Path(args.out_dir), days, events, summaries)
+
+        extract_state_path = Path(args.extract_state_file)
+        extract_state = load_state(extract_state_path)
+        warn_if_abnormal_positions(extract_state, summaries, args.warn_position_delta_ratio)
+        record_run_state(extract_state, until_utc, len(events), etl_run_id, summaries)
+        save_state(extract_state_path, extract_state)
+        logging.info("Extract completed: days=%s events=%s", len(days), len(events))
+        return events, summaries
+
+    def build(inputs: dict[str, Any]) -> dict[str, Any]:
+        if inputs["extract"] is None:
+            # Sink retry only: the history on disk is already current.
+            summary_h, summary_r = read_csv(summary_dst)
+            raw_h, raw_r = read_csv(raw_dst)
+            return {"summary_headers": summary_h, "summary_rows": summary_r, "raw_headers": raw_h, "raw_rows": raw_r, "snapshot_version": None}
+        events, _ = inputs["extract"]
+        from fx_rates import load_rate_table
+
+        snapshot_dir = None
+        if not args.no_snapshot:
+            snapshot_dir = Path(args.snapshot_dir) if args.snapshot_dir else raw_dst.parent / "snapshot"
+        # A VN day spans two XM-day batches: its summary is recomputed from the merged raw history.
+        history = build_history(
+            summary_headers,
+            [],
+            raw_headers,
+            as_csv_rows(events, raw_headers),
+            summary_dst,
+            raw_dst,
+            snapshot_dir,
+            load_rate_table(Path(args.fx_rates)),
+            resummarize_at=format_iso_utc(datetime.now(tz=UTC)),
+        )
+        logging.info(
+            "History updated: raw_rows=%s summary_rows=%s fx=%s quality=%s",
+            len(history["raw_rows"]),
+            len(history["summary_rows"]),
+            history["fx"],
+            history["quality"]["counts"],
+        )
+        return history
+
+    stages = [Stage("extract", extract), Stage("build", build, deps=("extract",)), *sink_stages(args)]
+    pending_sinks = enabled if days else behind
+    scheduler = StageScheduler(
+        stages,
+        retry=RetryPolicy(max_attempts=args.sink_retries + 1, base_delay_sec=2.0, max_delay_sec=60.0),
+        log=logging.info,
+    )
+    skip = {name for name in SINKS if name not in pending_sinks}
+    if not days:
+        skip.add("extract")
+    results = scheduler.run(skip=skip)
+
+    now_utc = format_iso_utc(datetime.now(tz=UTC))
+    if days and results["build"].status == OK:
+        built_through = days[-1].isoformat()
+        runner_state["built_through_day_xm"] = built_through
+        runner_state["last_batch_days"] = [d.isoformat() for d in days]
+    for name in pending_sinks:
+        if results[name].status == OK:
+            sink_state[name] = {
+                "ok_through_day_xm": built_through,
+                "elapsed_sec": round(results[name].elapsed_sec, 3),
+                "updated_at_utc": now_utc,
+            }
+    # Fully successful up to the oldest enabled sink.
+    done = [built_through, *(sink_state.get(n, {}).get("ok_through_day_xm") or last_success for n in enabled)]
+    if all(done):
+        runner_state["last_success_day_xm"] = min(done)
+    runner_state["last_run"] = {"updated_at_utc": now_utc, "stages": {n: r.as_dict() for n, r in results.items()}}
+    runner_state["updated_at_utc"] = now_utc
+    save_state(state_path, runner_state)
+    logging.info("Runner state updated: last_success_day_xm=%s", runner_state.get("last_success_day_xm"))
+
+    failed = [n for n, r in results.items() if r.status in {FAILED, BLOCKED}]
+    history = results["build"].value or {}
+    extracted = results["extract"].value
+    print(
+        json.dumps(
+            {
+                "status": "failed" if failed else "ok",
+                "days": [d.isoformat() for d in days],
+                "events": len(extracted[0]) if extracted else 0,
+                "raw_history_rows": len(history.get("raw_rows", [])),
+                "summary_history_rows": len(history.get("summary_rows", [])),
+                "snapshot_version": history.get("snapshot_version"),
+                "last_success_day_xm": runner_state.get("last_success_day_xm"),
+                "stages": {n: r.as_dict() for n, r in results.items()},
+                "gsheet": results["gsheet"].value,
+                "worker": results["worker"].value,
+            },
+            ensure_ascii=True,
+            default=str,
+        )
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+"""Per-account daily summaries and a consolidated portfolio view in one reporting currency.
+
+- `daily_summary` mixes accounts (and their currencies) into one row per day;
+  the tables here keep them apart:
+  - `account_daily_summary_history.csv`: one row per (trade_date_vn,
+    account_id) with the daily_summary metrics in the account currency, plus
+    the money columns converted to the reporting currency (`*_reporting`)
+  - `portfolio_daily_summary_history.csv`: one row per day, the sum of the
+    converted account rows; counts cover every account, money only the
+    converted ones (`accounts_unconverted` says how many were left out)
+- conversion is per event, at its close time: USD/USC by fixed factor, VND
+  through the USD/VND rate cache (fx_rates.py); an account-day with an event
+  that cannot be converted keeps its `*_reporting` columns empty
+- incremental: each account row stores the digest tree leaf digest of its
+  raw rows (digest_tree.py); only leaves whose digest, reporting currency or
+  (when rates are used) rate cache version changed are recomputed, and only
+  their days are re-aggregated
+- reporting currency: `REPORTING_CURRENCY` env (USD or VND, default USD)
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from digest_tree import Leaf, is_live, leaf_of
+from extract_mt5_events import build_daily_summaries, summary_input
+from fx_rates import RateTable, asof_join, event_times
+from journal_io import to_float
+
+ACCOUNT_SUMMARY_FILE = "account_daily_summary_history.csv"
+PORTFOLIO_FILE = "portfolio_daily_summary_history.csv"
+DEFAULT_REPORTING_CURRENCY = "USD"
+# Fixed units per 1 USD; VND comes from the rate cache.
+UNITS_PER_USD = {"USD": 1.0, "USC": 100.0}
+RATE_CURRENCIES = {"VND"}
+REPORTING_CURRENCIES = (*UNITS_PER_USD, *RATE_CURRENCIES)
+
+COUNT_FIELDS = ("total_positions", "total_deals", "buy_deals", "sell_deals", "win_positions", "loss_positions")
+MONEY_FIELDS = (
+    "net_profit",
+    "gross_profit",
+    "gross_loss",
+    "total_commission",
+    "total_swap",
+    "total_deposit",
+    "total_withdrawal",
+)
+REPORTING_FIELDS = tuple(f"{f}_reporting" for f in MONEY_FIELDS)
+ACCOUNT_SUMMARY_COLUMNS = [
+    "trade_date_vn",
+    "account_id",
+    "account_label",
+    "account_currency",
+    *COUNT_FIELDS,
+    *MONEY_FIELDS,
+    "reporting_currency",
+    *REPORTING_FIELDS,
+    "source_digest",
+    "fx_version",
+    "updated_at_utc",
+]
+PORTFOLIO_COLUMNS = [
+    "trade_date_vn",
+    "reporting_currency",
+    "accounts",
+    "accounts_unconverted",
+    *COUNT_FIELDS,
+    *MONEY_FIELDS,
+    "updated_at_utc",
+]
+
+
+def reporting_currency(value: str | None = None) -> str:
+    currency = (value or os.getenv("REPORTING_CURRENCY") or DEFAULT_REPORTING_CURRENCY).strip().upper()
+    if currency not in REPORTING_CURRENCIES:
+        raise SystemExit(f"Unsupported reporting currency {currency!r}; use one of {', '.join(REPORTING_CURRENCIES)}")
+    return currency
+
+
+def uses_rates(account_currency: str, reporting: str) -> bool:
+    return account_currency.upper() in RATE_CURRENCIES or reporting in RATE_CURRENCIES
+
+
+def units_per_usd(currencies: np.ndarray, usd_vnd: np.ndarray) -> np.ndarray:
+    """Units of each currency per 1 USD; NaN when unknown (or VND without a rate)."""
+    out = np.full(len(currencies), np.nan)
+    for code, units in UNITS_PER_USD.items():
+        out[currencies == code] = units
+    is_vnd = currencies == "VND"
+    out[is_vnd] = usd_vnd[is_vnd]
+    return out
+
+
+def conversion_factors(rows: list[dict[str, str]], reporting: str, table: RateTable | None) -> np.ndarray:
+    """Multiplier from each row's account currency to `reporting` at the row's close time."""
+    usd_vnd = np.full(len(rows), np.nan)
+    if table is not None and len(table) and rows:
+        idx = asof_join(table, event_times(rows))
+        usd_vnd = np.where(idx >= 0, table.rates[np.clip(idx, 0, None)], np.nan)
+    currencies = np.array([(r.get("account_currency") or "").upper() for r in rows], dtype=np.str_)
+    target = usd_vnd if reporting in RATE_CURRENCIES else UNITS_PER_USD[reporting]
+    return target / units_per_usd(currencies, usd_vnd)
+
+
+def _money(value: float, currency: str) -> str:
+    return f"{value:.0f}" if currency in RATE_CURRENCIES else str(round(float(value), 2))
+
+
+def account_day_row(
+    leaf: Leaf,
+    digest: str,
+    rows: list[dict[str, str]],
+    factors: np.ndarray,
+    reporting: str,
+    fx_version: str,
+    updated_at_utc: str,
+) -> dict[str, str]:
+    account_id, day = leaf
+    events = [summary_input(r) for r in rows]
+    native = build_daily_summaries(events, updated_at_utc)[0]  # type: ignore[arg-type]
+    currency = (rows[0].get("account_currency") or "").upper()
+    out = {
+        "trade_date_vn": day,
+        "account_id": account_id,
+        "account_label": rows[0].get("account_label") or "",
+        "account_currency": currency,
+        **{f: str(getattr(native, f)) for f in COUNT_FIELDS},
+        **{f: _money(getattr(native, f), currency) for f in MONEY_FIELDS},
+        "reporting_currency": reporting,
+        **{f: "" for f in REPORTING_FIELDS},
+        "source_digest": digest,
+        "fx_version": fx_version if uses_rates(currency, reporting) else "",
+        "updated_at_utc": updated_at_utc,
+    }
+    if np.isfinite(factors).all():
+        converted = [
+            SimpleNamespace(**{**vars(e), "profit": e.profit * f, "commission": e.commission * f, "swap": e.swap * f})
+            for e, f in zip(events, factors.tolist())
+        ]
+        summary = build_daily_summaries(converted, updated_at_utc)[0]  # type: ignore[arg-type]
+        for field, reporting_field in zip(MONEY_FIELDS, REPORTING_FIELDS):
+            out[reporting_field] = _money(getattr(summary, field), reporting)
+    return out
+
+
+def portfolio_day_row(day: str, account_rows: list[dict[str, str]], reporting: str, updated_at_utc: str) -> dict[str, str]:
+    converted = [r for r in account_rows if r.get("net_profit_reporting")]
+    return {
+        "trade_date_vn": day,
+        "reporting_currency": reporting,
+        "accounts": str(len(account_rows)),
+        "accounts_unconverted": str(len(account_rows) - len(converted)),
+        **{f: str(sum(int(to_float(r.get(f))) for r in account_rows)) for f in COUNT_FIELDS},
+        **{f: _money(sum(to_float(r.get(rf)) for r in converted), reporting) for f, rf in zip(MONEY_FIELDS, REPORTING_FIELDS)},
+        "updated_at_utc": updated_at_utc,
+    }
+
+
+def update_portfolio(
+    raw_rows: Iterable[dict[str, str]],
+    leaves: Mapping[Leaf, str],
+    account_rows: list[dict[str, str]],
+    portfolio_rows: list[dict[str, str]],
+    table: RateTable | None,
+    reporting: str,
+) -> tuple[list[dict[str, str]], list[dict[str, str]], dict[str, Any]]:
+    """Bring the account and portfolio tables up to date with `leaves` (digest tree leaf digests).
+
+    Returns the new account rows, portfolio rows and a small report.
+    """
+    updated_at_utc = datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    fx_version = str(table.version) if table is not None else ""
+    existing = {(r.get("account_id") or "", r.get("trade_date_vn") or ""): r for r in account_rows}
+
+    def fresh(row: dict[str, str] | None, digest: str) -> bool:
+        if row is None or row.get("source_digest") != digest or row.get("reporting_currency") != reporting:
+            return False
+        return not uses_rates(row.get("account_currency") or "", reporting) or row.get("fx_version") == fx_version
+
+    stale = {leaf for leaf, digest in leaves.items() if not fresh(existing.get(leaf), digest)}
+    removed = set(existing) - set(leaves)
+    groups: dict[Leaf, list[dict[str, str]]] = {}
+    if stale:
+        for row in raw_rows:
+            if row.get("event_id") and is_live(row):
+                leaf = leaf_of(row)
+                if leaf in stale:
+                    groups.setdefault(leaf, []).append(row)
+
+    # One vectorized as-of join for every row that is recomputed.
+    ordered = sorted(groups)
+    flat = [row for leaf in ordered for row in groups[leaf]]
+    factors = conversion_factors(flat, reporting, table)
+    start = 0
+    for leaf in ordered:
+        end = start + len(groups[leaf])
+        existing[leaf] = account_day_row(leaf, leaves[leaf], groups[leaf], factors[start:end], reporting, fx_version, updated_at_utc)
+        start = end
+    for leaf in removed:
+        del existing[leaf]
+
+    portfolio = {r.get("trade_date_vn") or "": r for r in portfolio_rows}
+    if any(r.get("reporting_currency") != reporting for r in portfolio.values()) or (existing and not portfolio):
+        days = {day for _, day in existing} | set(portfolio)
+    else:
+        days = {day for _, day in stale | removed}
+    by_day: dict[str, list[dict[str, str]]] = {}
+    for (_, day), row in existing.items():
+        if day in days:
+            by_day.setdefault(day, []).append(row)
+    for day in days:
+        if day in by_day:
+            portfolio[day] = portfolio_day_row(day, by_day[day], reporting, updated_at_utc)
+        else:
+            portfolio.pop(day, None)
+
+    account_out = [existing[k] for k in sorted(existing, key=lambda k: (k[1], k[0]))]
+    portfolio_out = [portfolio[d] for d in sorted(portfolio)]
+    report = {
+        "reporting_currency": reporting,
+        "account_days": len(account_out),
+        "account_days_recomputed": len(stale),
+        "account_days_removed": len(removed),
+        "account_days_unconverted": sum(1 for r in account_out if not r.get("net_profit_reporting")),
+        "portfolio_days": len(portfolio_out),
+        "portfolio_days_recomputed": len(days),
+    }
+    return account_out, portfolio_out, report
@@ -3,23 +3,70 @@
 
 Expected Worker endpoint:
 - POST {worker_base_url}/api/sync
+
+Only rows that are new or changed since the last acknowledged sync are sent
+(see sync_ledger.py); `--full` sends everything.
+
+Chunks are cut by a byte budget that adapts to Worker latency, encoded as
+columnar JSON and gzip when the Worker advertises support for it (older
+Workers keep receiving the original JSON; see sync_payload.py), and sent over
+keep-alive connections `--concurrency` at a time with jittered retries on
+429/5xx (see worker_upload.py). Acknowledged rows are checkpointed so
+`--resume` continues a failed run.
+
+`--reconcile` ignores the ledger and compares digest trees instead
+(digest_tree.py, `POST /api/digest`): root, then month digests, then the
+leaves of differing months and the row fingerprints of differing
+(account, day) leaves. Only rows of those days are sent again, plus
+tombstones for rows the Worker has but local history does not.
+
+Tombstones are the Worker's own rows (read back with
+`GET /api/raw-events` for their days) with `is_deleted=True`, so the upsert
+keeps every other column of the deleted event.
+
+`--dry-run` plans offline: no request to the Worker and no ledger or
+checkpoint written (`--dry-run-remote` asks for capabilities and tombstones).
 """
 
 from __future__ import annotations
 
 import argparse
-import csv
+import http.client
 import json
 import os
 import sys
-import urllib.error
-import urllib.request
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Any, Mapping
+from urllib.parse import urlencode
 
 from dotenv import load_dotenv
 
+from digest_tree import DigestTree, diverging_keys, flatten_days, rows_in
+from digest_tree import compare_rows as compare_leaf_rows
+from journal_io import read_dicts
+from journal_schema import RAW_EVENT_KEY
+from retry_policy import RetryPolicy
+from sync_ledger import SyncLedger, raw_fingerprint, summary_fingerprint, tombstone
+from sync_payload import (
+    CAPABILITIES_PATH,
+    COMPRESSION_MODES,
+    PAYLOAD_FORMATS,
+    ByteBudget,
+    Chunk,
+    ChunkPlanner,
+    EncodedRows,
+    negotiate,
+)
+from worker_upload import UploadCheckpoint, UploadEngine, UploadError
 
-def parse_args() -> argparse.Namespace:
+SKIPPED = {"status": "skipped", "reason": "missing WORKER_API_URL or WORKER_API_TOKEN"}
+DIGEST_PATH = "/api/digest"
+# Leaves per /api/digest fingerprint request.
+DIGEST_LEAVES_PER_REQUEST = 500
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Upload dashboard history CSV to Cloudflare Worker")
     parser.add_argument("--worker-url", help="Base Worker URL; fallback env WORKER_API_URL")
     parser.add_argument("--api-token", help="API token; fallback env WORKER_API_TOKEN")
@@ -30,16 +77,54 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("--summary-input", default="dashboard/data/daily_summary_history.csv")
     parser.add_argument("--raw-input", default="dashboard/data/raw_events_history.csv")
-    parser.add_argument("--chunk-size", type=int, default=80)
+    parser.add_argument("--chunk-bytes", type=int, default=256 * 1024, help="Initial payload budget per chunk (bytes, before gzip).")
+    parser.add_argument("--chunk-min-bytes", type=int, default=16 * 1024)
+    parser.add_argument("--chunk-max-bytes", type=int, default=2 * 1024 * 1024)
+    parser.add_argument(
+        "--target-latency-ms",
+        type=int,
+        default=1500,
+        help="Budget grows while chunks are acknowledged faster than half of this and shrinks above it.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=0, help="Optional cap on rows per chunk (0 = bytes only).")
+    parser.add_argument("--payload-format", choices=PAYLOAD_FORMATS, default="auto")
+    parser.add_argument("--compress", choices=COMPRESSION_MODES, default="auto")
     parser.add_argument("--timeout-sec", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4, help="Max chunks in flight.")
+    parser.add_argument("--max-retries", type=int, default=4, help="Retries per chunk on 429/5xx/connection errors.")
+    parser.add_argument("--checkpoint", default="state/worker_sync_checkpoint.jsonl")
+    parser.add_argument("--resume", action="store_true", help="Skip chunks acknowledged by the previous failed run.")
     parser.add_argument(
         "--user-agent",
         default="Mozilla/5.0 (Windows NT 10.0; Win64; x64) WindowsPowerShell/5.1",
         help="HTTP User-Agent for Worker sync requests.",
     )
-    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--ledger", default="state/worker_sync_ledger.db", help="Local delta sync ledger (SQLite).")
+    parser.add_argument("--full", action="store_true", help="Ignore the ledger and send every input row.")
+    parser.add_argument(
+        "--tombstone-missing",
+        action="store_true",
+        help="Send tombstones for synced rows missing from --raw-input (use only with full-history input).",
+    )
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="Compare digest trees with the Worker and resend only diverging days (ignores the ledger).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Plan the chunks and print the report without sending. Offline: no requests to the Worker (legacy JSON "
+        "unless --payload-format/--compress say otherwise, tombstones only counted), the ledger is only read if it "
+        "exists. With --reconcile the digests are still compared with the Worker.",
+    )
+    parser.add_argument(
+        "--dry-run-remote",
+        action="store_true",
+        help="With --dry-run, ask the Worker for its payload capabilities and the rows to tombstone, as a real run does.",
+    )
     parser.add_argument("--skip-if-missing", action="store_true")
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def getenv_required(name: str) -> str:
@@ -52,130 +137,303 @@ def getenv_required(name: str) -> str:
 def read_csv_rows(path: Path) -> list[dict[str, str]]:
     if not path.exists():
         raise SystemExit(f"Input file not found: {path}")
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        return list(csv.DictReader(f))
+    return read_dicts(path)[1]
 
 
-def post_sync(
-    worker_url: str,
+def build_headers(
     api_token: str,
-    summary_rows: list[dict[str, str]],
-    raw_rows: list[dict[str, str]],
-    timeout_sec: int,
     user_agent: str,
     cf_access_client_id: str = "",
     cf_access_client_secret: str = "",
-) -> dict:
-    payload = json.dumps({"summary_rows": summary_rows, "raw_rows": raw_rows}, ensure_ascii=True).encode("utf-8")
+) -> dict[str, str]:
     headers = {
-        "Content-Type": "application/json",
         "Authorization": f"Bearer {api_token}",
         "User-Agent": user_agent,
     }
     if cf_access_client_id and cf_access_client_secret:
         headers["CF-Access-Client-Id"] = cf_access_client_id
         headers["CF-Access-Client-Secret"] = cf_access_client_secret
+    return headers
 
-    req = urllib.request.Request(
-        url=f"{worker_url.rstrip('/')}/api/sync",
-        data=payload,
-        method="POST",
-        headers=headers,
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=timeout_sec) as resp:
-            raw = resp.read().decode("utf-8")
-            return json.loads(raw)
-    except urllib.error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore")
-        raise SystemExit(f"Worker sync failed: HTTP {exc.code} {detail}") from exc
-    except urllib.error.URLError as exc:
-        raise SystemExit(f"Worker sync failed: {exc}") from exc
 
+def log_stderr(message: str) -> None:
+    print(message, file=sys.stderr)
 
-def chunks(rows: list[dict[str, str]], chunk_size: int) -> list[list[dict[str, str]]]:
-    if chunk_size <= 0:
-        return [rows]
-    return [rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)]
 
+def row_key(kind: str, row: dict[str, str]) -> str:
+    if kind == "summary":
+        return f"{row.get('trade_date_vn') or ''}:{summary_fingerprint(row)}"
+    return f"{row.get('event_id') or ''}:{raw_fingerprint(row)}"
 
-def main() -> int:
-    load_dotenv(encoding="utf-8-sig")
-    args = parse_args()
 
+def chunk_plan_report(chunks: list[Chunk]) -> list[dict]:
+    return [
+        {"kind": c.kind, "rows": len(c.rows), "bytes": c.raw_bytes, "wire_bytes": c.wire_bytes}
+        for c in chunks
+    ]
+
+
+def worker_target(args: argparse.Namespace) -> tuple[str, dict[str, str]] | None:
+    """(worker_url, request headers); None when not configured and --skip-if-missing."""
     worker_url = (args.worker_url or os.getenv("WORKER_API_URL", "")).strip()
     api_token = (args.api_token or os.getenv("WORKER_API_TOKEN", "")).strip()
     cf_access_client_id = (args.cf_access_client_id or os.getenv("CF_ACCESS_CLIENT_ID", "")).strip()
     cf_access_client_secret = (args.cf_access_client_secret or os.getenv("CF_ACCESS_CLIENT_SECRET", "")).strip()
     if not worker_url or not api_token:
         if args.skip_if_missing:
-            print(json.dumps({"status": "skipped", "reason": "missing WORKER_API_URL or WORKER_API_TOKEN"}, ensure_ascii=True))
-            return 0
+            return None
         if not worker_url:
             worker_url = getenv_required("WORKER_API_URL")
         if not api_token:
             api_token = getenv_required("WORKER_API_TOKEN")
+    return worker_url, build_headers(api_token, args.user_agent, cf_access_client_id, cf_access_client_secret)
 
-    summary_rows = read_csv_rows(Path(args.summary_input))
-    raw_rows = read_csv_rows(Path(args.raw_input))
 
-    if args.dry_run:
-        print(
-            json.dumps(
-                {
-                    "status": "dry_run",
-                    "worker_url": worker_url,
-                    "summary_rows": len(summary_rows),
-                    "raw_rows": len(raw_rows),
-                    "chunk_size": args.chunk_size,
-                    "raw_chunks": len(chunks(raw_rows, args.chunk_size)),
-                    "use_cf_access_service_token": bool(cf_access_client_id and cf_access_client_secret),
-                },
-                ensure_ascii=True,
-            )
-        )
-        return 0
+def remote_tombstones(engine: UploadEngine, missing: Mapping[str, str]) -> list[dict[str, Any]]:
+    """Tombstones for `missing` (event_id -> trade_date_vn), built from the rows the Worker holds.
+
+    Rows the Worker no longer has need no tombstone. Undated rows cannot be
+    looked up by day and are left alone.
+    """
+    tombstones = []
+    for day in sorted({d for d in missing.values() if d}):
+        body = engine.get_json(f"/api/raw-events?{urlencode({'from_date': day, 'to_date': day})}")
+        if body is None:
+            raise SystemExit(f"Worker raw events for {day} could not be read; tombstones not sent")
+        tombstones.extend(tombstone(r) for r in body.get("rows") or [] if missing.get(r.get(RAW_EVENT_KEY) or "") == day)
+    return tombstones
+
 
-    # First sync summary in one call.
-    summary_resp = post_sync(
-        worker_url=worker_url,
-        api_token=api_token,
-        summary_rows=summary_rows,
-        raw_rows=[],
-        timeout_sec=args.timeout_sec,
-        user_agent=args.user_agent,
-        cf_access_client_id=cf_access_client_id,
-        cf_access_client_secret=cf_access_client_secret,
+def sync_rows(
+    args: argparse.Namespace,
+    worker_url: str,
+    headers: dict[str, str],
+    summary_rows: list[dict[str, str]],
+    raw_rows: list[dict[str, str]],
+    deleted: Mapping[str, str] | None = None,
+) -> dict:
+    """Send pending summary/raw rows to the Worker; returns the run report.
+
+    `deleted` (event_id -> trade_date_vn) are tombstoned in addition to the
+    ledger rows missing from `raw_rows` (`--tombstone-missing`).
+    """
+    retry = RetryPolicy(max_attempts=max(args.max_retries, 0) + 1)
+    budget = ByteBudget(
+        current=args.chunk_bytes,
+        min_bytes=min(args.chunk_min_bytes, args.chunk_bytes),
+        max_bytes=max(args.chunk_max_bytes, args.chunk_bytes),
+        target_latency_sec=args.target_latency_ms / 1000,
     )
 
-    raw_chunks = chunks(raw_rows, args.chunk_size)
-    sent_rows = 0
-    for idx, part in enumerate(raw_chunks, start=1):
-        post_sync(
-            worker_url=worker_url,
-            api_token=api_token,
-            summary_rows=[],
-            raw_rows=part,
-            timeout_sec=args.timeout_sec,
-            user_agent=args.user_agent,
-            cf_access_client_id=cf_access_client_id,
-            cf_access_client_secret=cf_access_client_secret,
+    # A dry run has no side effects: the ledger is not created, and the Worker is not asked unless --dry-run-remote.
+    ledger_path = Path(args.ledger)
+    remote = not args.dry_run or args.dry_run_remote
+    ledger_context = (
+        nullcontext(None)
+        if args.dry_run and not ledger_path.exists()
+        else SyncLedger(ledger_path, worker_url, read_only=args.dry_run)
+    )
+    with (
+        ledger_context as ledger,
+        UploadEngine(worker_url, headers, args.concurrency, retry, args.timeout_sec, log_stderr) as engine,
+    ):
+        if args.full or ledger is None:
+            pending_summary, pending_raw = summary_rows, raw_rows
+            unchanged_summary = unchanged_raw = 0
+        else:
+            pending_summary, unchanged_summary = ledger.pending_summary(summary_rows)
+            pending_raw, unchanged_raw = ledger.pending_raw(raw_rows)
+        missing = ledger.missing_raw(raw_rows) if args.tombstone_missing and ledger is not None else {}
+        to_delete = {**missing, **(deleted or {})}
+        tombstones = remote_tombstones(engine, to_delete) if remote else []
+        pending_raw = pending_raw + tombstones
+
+        checkpoint = UploadCheckpoint(Path(args.checkpoint), worker_url, resume=args.resume and not args.dry_run)
+        pending = {"summary": pending_summary, "raw": pending_raw}
+        resumed: dict[str, list[dict[str, str]]] = {}
+        for kind, rows in pending.items():
+            resumed[kind] = [r for r in rows if checkpoint.is_acked(kind, row_key(kind, r))]
+            if resumed[kind]:
+                pending[kind] = [r for r in rows if not checkpoint.is_acked(kind, row_key(kind, r))]
+
+        need_capabilities = "auto" in {args.payload_format, args.compress} and any(pending.values())
+        fmt = negotiate(
+            engine.get_json(CAPABILITIES_PATH) if need_capabilities and remote else None,
+            args.payload_format,
+            args.compress,
+        )
+        # Summary first, then raw rows.
+        planner = ChunkPlanner(
+            [EncodedRows(kind, rows, fmt) for kind, rows in pending.items() if rows],
+            budget,
+            max_rows=args.chunk_size,
         )
-        sent_rows += len(part)
-        print(f"chunk {idx}/{len(raw_chunks)} synced: {len(part)} rows", file=sys.stderr)
 
-    print(
-        json.dumps(
-            {
-                "status": "ok",
+        if args.dry_run:
+            plan = planner.plan()
+            return {
+                "status": "dry_run",
+                "worker_url": worker_url,
                 "summary_rows": len(summary_rows),
+                "summary_rows_pending": len(pending_summary),
+                "summary_rows_unchanged": unchanged_summary,
                 "raw_rows": len(raw_rows),
-                "raw_rows_synced": sent_rows,
-                "summary_response_status": summary_resp.get("status"),
-            },
-            ensure_ascii=True,
+                "raw_rows_pending": len(pending_raw),
+                "raw_rows_unchanged": unchanged_raw,
+                "raw_tombstones": len(tombstones),
+                "raw_tombstone_candidates": len(to_delete),
+                "remote": remote,
+                "ledger": str(ledger_path) if ledger is not None else None,
+                "full": args.full,
+                "payload_format": fmt.name,
+                "chunk_bytes": args.chunk_bytes,
+                "chunks": len(plan),
+                "total_bytes": sum(c.raw_bytes for c in plan),
+                "total_wire_bytes": sum(c.wire_bytes for c in plan),
+                "chunk_plan": chunk_plan_report(plan),
+                "use_cf_access_service_token": "CF-Access-Client-Id" in headers,
+            }
+
+        # Delivered by the failed run but possibly not recorded in the ledger yet.
+        ledger.mark_summary(resumed["summary"])
+        ledger.mark_raw(resumed["raw"])
+
+        summary_status = "resumed" if resumed["summary"] else "skipped"
+        sent_rows = len(resumed["raw"])
+
+        def on_ack(chunk: Chunk, resp: dict) -> None:
+            nonlocal summary_status, sent_rows
+            # Only acknowledged chunks enter the ledger; a failed run resends the rest.
+            if chunk.kind == "summary":
+                ledger.mark_summary(chunk.rows)
+                summary_status = resp.get("status")
+            else:
+                ledger.mark_raw(chunk.rows)
+                sent_rows += len(chunk.rows)
+                print(
+                    f"raw rows synced: {sent_rows}/{len(pending_raw)} "
+                    f"(chunk {len(chunk.rows)} rows, {chunk.wire_bytes} B, budget {budget.current} B)",
+                    file=sys.stderr,
+                )
+            checkpoint.mark(chunk.kind, [row_key(chunk.kind, r) for r in chunk.rows])
+
+        try:
+            engine.upload("/api/sync", planner, fmt.headers(), on_ack)
+        except UploadError as exc:
+            checkpoint.close()
+            raise SystemExit(
+                f"Worker sync failed: {exc} ({checkpoint.chunks} chunks acknowledged; rerun with --resume)"
+            ) from exc
+        checkpoint.clear()
+
+    return {
+        "status": "ok",
+        "summary_rows": len(summary_rows),
+        "summary_rows_synced": len(pending_summary),
+        "raw_rows": len(raw_rows),
+        "raw_rows_synced": sent_rows,
+        "raw_rows_unchanged": unchanged_raw,
+        "raw_tombstones": len(tombstones),
+        "summary_response_status": summary_status,
+        "raw_rows_resumed": len(resumed["raw"]),
+        "payload_format": fmt.name,
+        "chunks": engine.stats.chunks,
+        "chunks_split": engine.stats.split_chunks,
+        "bytes": engine.stats.raw_bytes,
+        "wire_bytes": engine.stats.wire_bytes,
+        "final_chunk_bytes": budget.current,
+        "requests": engine.stats.requests,
+        "retries": engine.stats.retries,
+        "connections_opened": engine.pool.opened,
+    }
+
+
+def reconcile_rows(
+    args: argparse.Namespace,
+    worker_url: str,
+    headers: dict[str, str],
+    summary_rows: list[dict[str, str]],
+    raw_rows: list[dict[str, str]],
+    repair: bool = True,
+) -> dict[str, Any]:
+    """Find (account, day) leaves that differ from the Worker; with `repair`, resend just those rows."""
+    local = DigestTree.from_rows(raw_rows)
+    retry = RetryPolicy(max_attempts=max(args.max_retries, 0) + 1)
+    with UploadEngine(worker_url, headers, 1, retry, args.timeout_sec, log_stderr) as engine:
+        try:
+            remote = engine.post_json(DIGEST_PATH, {})
+            round_trips = 1
+            months = diverging_keys(local.months, remote["months"])
+            leaves: list[tuple[str, str]] = []
+            fingerprints: dict[str, str] = {}
+            remote_dates: dict[str, str] = {}
+            if months:
+                remote_days = engine.post_json(DIGEST_PATH, {"months": months})["days"]
+                round_trips += 1
+                leaves = diverging_keys(local.leaves(set(months)), flatten_days(remote_days))
+            for start in range(0, len(leaves), DIGEST_LEAVES_PER_REQUEST):
+                batch = leaves[start : start + DIGEST_LEAVES_PER_REQUEST]
+                for event_id, day, fingerprint in engine.post_json(DIGEST_PATH, {"leaves": batch})["leaf_rows"]:
+                    fingerprints[event_id] = fingerprint
+                    remote_dates[event_id] = day
+                round_trips += 1
+        except UploadError as exc:
+            if exc.status == 404:
+                return {"status": "unsupported", "worker_url": worker_url, "reason": f"{DIGEST_PATH} not available"}
+            raise SystemExit(f"Worker digest request failed: {exc}") from exc
+
+    changed, stale = compare_leaf_rows(rows_in(raw_rows, leaves), fingerprints)
+    days = sorted({day for _, day in leaves})
+    report: dict[str, Any] = {
+        "status": "in_sync" if not leaves else "diverged",
+        "worker_url": worker_url,
+        "local_root": local.root,
+        "remote_root": remote["root"],
+        "local_rows": local.rows,
+        "remote_rows": remote["rows"],
+        "round_trips": round_trips,
+        "months_diverging": months,
+        "days_diverging": days,
+        "leaves_diverging": [f"{account}@{day}" for account, day in leaves],
+        "raw_rows_to_send": len(changed),
+        "raw_rows_to_tombstone": len(stale),
+    }
+    if repair and leaves:
+        sync_args = argparse.Namespace(**{**vars(args), "full": True, "tombstone_missing": False, "resume": False})
+        report["sync"] = sync_rows(
+            sync_args,
+            worker_url,
+            headers,
+            [r for r in summary_rows if (r.get("trade_date_vn") or "") in set(days)],
+            changed,
+            deleted={e: remote_dates[e] for e in stale},
         )
-    )
+        report["status"] = "repaired"
+    return report
+
+
+def main() -> int:
+    load_dotenv(encoding="utf-8-sig")
+    args = parse_args()
+
+    target = worker_target(args)
+    if target is None:
+        print(json.dumps(SKIPPED, ensure_ascii=True))
+        return 0
+    worker_url, headers = target
+    summary_rows = read_csv_rows(Path(args.summary_input))
+    raw_rows = read_csv_rows(Path(args.raw_input))
+    try:
+        if args.reconcile:
+            report = reconcile_rows(args, worker_url, headers, summary_rows, raw_rows, repair=not args.dry_run)
+        else:
+            report = sync_rows(args, worker_url, headers, summary_rows, raw_rows)
+    except UploadError as exc:
+        raise SystemExit(f"Worker sync failed: {exc}") from exc
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        # Bad Worker URL, local I/O or an unreadable response: a message, not a traceback.
+        raise SystemExit(f"Worker sync failed: {type(exc).__name__}: {exc}") from exc
+    print(json.dumps(report, ensure_ascii=True))
     return 0
 
 
@@ -5,24 +5,61 @@ Writes/refreshes:
 - raw_events worksheet from raw events CSV
 - daily_summary worksheet from summary CSV
 - config worksheet with last_sync_time_utc and run metadata
+
+`--mode upsert` (default) diffs each tab by key (event_id / trade_date_vn) and
+writes only inserted/changed/deleted rows (see sheet_sync.py); `--mode replace`
+clears and rewrites the tabs. `--fake-sheet` runs against a local JSON file
+instead of Google Sheets (see gsheet_fake.py).
+
+`--partition month` splits raw events into one tab per trade month
+(`raw_events_2026_02`, ...) listed in `raw_events_index`; only months whose
+content changed are written and months older than `--freeze-after-months`
+are skipped (see sheet_partitions.py).
+
+`--reconcile` compares the raw events in the sheet with the local file through
+a digest tree (digest_tree.py) and reports the diverging months/days; Sheets
+cannot hash server-side, so only the key, leaf and compare columns are read
+(one batch_get per tab) and the remote tree is built locally. Unless
+`--dry-run`, the diverging months are then upserted, frozen months included.
+
+All API calls are throttled to the Sheets quota, retried on 429/5xx and split
+into bounded requests (see sheets_writer.py); the output reports calls and
+cells written.
 """
 
 from __future__ import annotations
 
 import argparse
-import csv
 import os
-from datetime import datetime, timezone
+import sys
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Any, Collection, Iterable, Mapping
 
-import gspread
 from dotenv import load_dotenv
 
+from digest_tree import DigestTree, compare_rows, diverging_keys, is_live, rows_in
+from journal_io import read_table
+from journal_schema import DAILY_SUMMARY_KEY, RAW_EVENT_KEY
+from sheet_partitions import index_tab_name, month_of, partition_rows, read_index, sync_partitioned, tab_name
+from sheet_sync import normalize_cell, read_columns, rewrite_sheet, upsert_sheet
+from sheets_writer import DEFAULT_MAX_CELLS_PER_REQUEST, DEFAULT_REQUESTS_PER_MINUTE, SheetsWriter
+
+if TYPE_CHECKING:
+    import gspread
+
 UTC = timezone.utc
+VN_TZ = timezone(timedelta(hours=7))
+# raw rows carry source_hash and the applied FX rate, the same change signals the Worker ledger uses.
+RAW_COMPARE_COLUMNS = ["source_hash", "is_deleted", "usd_vnd_rate", "fx_rate_time_utc"]
+# Columns read back from raw tabs by --reconcile: key, digest leaf and compare columns.
+DIGEST_COLUMNS = [RAW_EVENT_KEY, "account_id", "trade_date_vn", *RAW_COMPARE_COLUMNS]
+# Tab order after an upsert, the same as the history CSVs: raw events newest first, summary by day.
+RAW_ORDER = {"sort_column": "close_time_vn", "descending": True}
+SUMMARY_ORDER = {"sort_column": DAILY_SUMMARY_KEY, "descending": False}
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Upload MT5 extracted CSV data to Google Sheets")
     parser.add_argument("--raw-events", default="out/raw_events_today.csv")
     parser.add_argument("--daily-summary", default="out/daily_summary_latest.csv")
@@ -31,7 +68,39 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--raw-sheet", default="raw_events")
     parser.add_argument("--summary-sheet", default="daily_summary")
     parser.add_argument("--config-sheet", default="config")
-    return parser.parse_args()
+    parser.add_argument(
+        "--mode",
+        choices=["upsert", "replace"],
+        default="upsert",
+        help="upsert: write only changed rows by key; replace: clear + full rewrite.",
+    )
+    parser.add_argument(
+        "--partition",
+        choices=["none", "month"],
+        default="none",
+        help="month: one raw events tab per trade month plus an index tab.",
+    )
+    parser.add_argument(
+        "--freeze-after-months",
+        type=int,
+        default=3,
+        help="With --partition month: skip month tabs older than N months (0 = never freeze).",
+    )
+    parser.add_argument("--fake-sheet", help="Use a local JSON-backed fake spreadsheet instead of Google Sheets.")
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help="Throttle for Sheets read and write calls (each quota separately).",
+    )
+    parser.add_argument("--max-cells-per-request", type=int, default=DEFAULT_MAX_CELLS_PER_REQUEST)
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="Compare raw events in the sheet with the local file by digest tree and re-push diverging months.",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="With --reconcile: report only, write nothing.")
+    return parser.parse_args(argv)
 
 
 def getenv_required(name: str) -> str:
@@ -44,61 +113,148 @@ def getenv_required(name: str) -> str:
 def read_csv_rows(path: Path) -> tuple[list[str], list[list[str]]]:
     if not path.exists():
         raise SystemExit(f"Input file not found: {path}")
-    with path.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-    if not rows:
+    table = read_table(path, typed=False)
+    if not table.headers:
         raise SystemExit(f"CSV is empty: {path}")
-    header = rows[0]
-    data = rows[1:]
-    return header, data
+    return table.headers, [list(row) for row in table.rows]
+
 
+def ensure_worksheet(
+    sh: gspread.Spreadsheet,
+    title: str,
+    cols: int,
+    rows: int = 1000,
+    writer: SheetsWriter | None = None,
+) -> gspread.Worksheet:
+    from gspread.exceptions import WorksheetNotFound
 
-def ensure_worksheet(sh: gspread.Spreadsheet, title: str, cols: int) -> gspread.Worksheet:
+    writer = writer or SheetsWriter()
     try:
-        ws = sh.worksheet(title)
-    except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=title, rows=1000, cols=max(cols, 26))
+        ws = writer.call(sh.worksheet, title, kind="read")
+    except WorksheetNotFound:
+        # Created at its final size so the first write needs no resize.
+        ws = writer.call(sh.add_worksheet, title=title, rows=max(rows, 1000), cols=max(cols, 26))
     return ws
 
 
-def replace_sheet_content(ws: gspread.Worksheet, header: list[str], data_rows: list[list[str]]) -> None:
-    values = [header] + data_rows
-    ws.clear()
-    # Single update keeps result deterministic and avoids duplicate append behavior.
-    ws.update(values, value_input_option="USER_ENTERED")
+def replace_sheet_content(
+    ws: gspread.Worksheet,
+    header: list[str],
+    data_rows: list[list[str]],
+    writer: SheetsWriter | None = None,
+) -> None:
+    rewrite_sheet(ws, header, data_rows, writer)
 
 
-def upsert_config(ws: gspread.Worksheet, kv_rows: Iterable[tuple[str, str]]) -> None:
-    ws.clear()
-    rows = [["key", "value"]] + [[k, v] for k, v in kv_rows]
-    ws.update(rows, value_input_option="USER_ENTERED")
+def sync_sheet(
+    ws: gspread.Worksheet,
+    header: list[str],
+    data_rows: list[list[str]],
+    key: str,
+    mode: str,
+    writer: SheetsWriter,
+    **diff_options: object,
+) -> dict:
+    if mode == "replace" or key not in header:
+        replace_sheet_content(ws, header, data_rows, writer)
+        return {"mode": "rewrite", "inserted": len(data_rows), "reason": "" if mode == "replace" else f"no {key} column"}
+    return upsert_sheet(ws, header, data_rows, key, writer=writer, **diff_options).as_dict()
 
 
-def main() -> int:
-    load_dotenv(encoding="utf-8-sig")
-    args = parse_args()
+def upsert_config(ws: gspread.Worksheet, kv_rows: Iterable[tuple[str, str]], writer: SheetsWriter | None = None) -> None:
+    rewrite_sheet(ws, ["key", "value"], [[k, v] for k, v in kv_rows], writer)
+
+
+def open_existing_worksheet(sh: gspread.Spreadsheet, title: str, writer: SheetsWriter) -> gspread.Worksheet | None:
+    from gspread.exceptions import WorksheetNotFound
+
+    try:
+        return writer.call(sh.worksheet, title, kind="read")
+    except WorksheetNotFound:
+        return None
+
+
+def sheet_fingerprint(row: Mapping[str, Any]) -> str:
+    """Compare columns of a raw row, normalized the way sheet_sync compares cells."""
+    return "\x1f".join(normalize_cell(row.get(c)) for c in RAW_COMPARE_COLUMNS)
+
+
+def log_stderr(message: str) -> None:
+    print(message, file=sys.stderr)
 
-    raw_path = Path(args.raw_events)
-    summary_path = Path(args.daily_summary)
 
+def open_spreadsheet(args: argparse.Namespace) -> tuple[gspread.Spreadsheet, str]:
+    if args.fake_sheet:
+        from gsheet_fake import FakeSpreadsheet
+
+        sh = FakeSpreadsheet.load(Path(args.fake_sheet))
+        return sh, sh.id
     sheet_id = args.sheet_id or getenv_required("GOOGLE_SHEET_ID")
     service_account_file = args.service_account or getenv_required("GOOGLE_SERVICE_ACCOUNT_FILE")
+    # Imported here so --help, the fake sheet and the other scripts that import
+    # this module do not pay for google-auth at startup.
+    import gspread
 
     gc = gspread.service_account(filename=service_account_file)
-    sh = gc.open_by_key(sheet_id)
+    return gc.open_by_key(sheet_id), sheet_id
 
-    raw_header, raw_rows = read_csv_rows(raw_path)
-    summary_header, summary_rows = read_csv_rows(summary_path)
 
-    raw_ws = ensure_worksheet(sh, args.raw_sheet, len(raw_header))
-    summary_ws = ensure_worksheet(sh, args.summary_sheet, len(summary_header))
-    config_ws = ensure_worksheet(sh, args.config_sheet, 2)
+def push_tables(
+    args: argparse.Namespace,
+    raw_header: list[str],
+    raw_rows: list[list[str]],
+    summary_header: list[str],
+    summary_rows: list[list[str]],
+    force_months: Collection[str] = (),
+) -> dict:
+    """Sync raw events, daily summary and config tabs; returns the run report."""
+    sh, sheet_id = open_spreadsheet(args)
+    writer = SheetsWriter(args.requests_per_minute, args.max_cells_per_request, log=log_stderr)
+    summary_ws = ensure_worksheet(sh, args.summary_sheet, len(summary_header), len(summary_rows) + 1, writer)
+    config_ws = ensure_worksheet(sh, args.config_sheet, 2, writer=writer)
 
-    replace_sheet_content(raw_ws, raw_header, raw_rows)
-    replace_sheet_content(summary_ws, summary_header, summary_rows)
+    now = datetime.now(tz=UTC)
+    if args.partition == "month":
+        raw_result = sync_partitioned(
+            lambda title, rows, cols: ensure_worksheet(sh, title, cols, rows, writer),
+            args.raw_sheet,
+            raw_header,
+            raw_rows,
+            RAW_EVENT_KEY,
+            writer,
+            today=now.astimezone(VN_TZ).date(),
+            now_utc=now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            freeze_after_months=args.freeze_after_months,
+            mode=args.mode,
+            fingerprint_columns=[RAW_EVENT_KEY, *RAW_COMPARE_COLUMNS],
+            compare_columns=RAW_COMPARE_COLUMNS,
+            force_months=force_months,
+            **RAW_ORDER,
+        )
+    else:
+        raw_ws = ensure_worksheet(sh, args.raw_sheet, len(raw_header), len(raw_rows) + 1, writer)
+        raw_result = sync_sheet(
+            raw_ws,
+            raw_header,
+            raw_rows,
+            RAW_EVENT_KEY,
+            args.mode,
+            writer,
+            compare_columns=RAW_COMPARE_COLUMNS,
+            **RAW_ORDER,
+        )
+    summary_result = sync_sheet(
+        summary_ws,
+        summary_header,
+        summary_rows,
+        DAILY_SUMMARY_KEY,
+        args.mode,
+        writer,
+        ignore_columns=["updated_at_utc"],
+        **SUMMARY_ORDER,
+    )
 
-    now_utc = datetime.now(tz=UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    now_utc = now.strftime("%Y-%m-%dT%H:%M:%SZ")
     upsert_config(
         config_ws,
         [
@@ -107,17 +263,97 @@ def main() -> int:
             ("daily_summary_row_count", str(len(summary_rows))),
             ("updated_at_utc", now_utc),
         ],
+        writer,
     )
+    if args.fake_sheet:
+        sh.save()
 
-    print(
-        {
-            "status": "ok",
-            "sheet_id": sheet_id,
-            "raw_rows": len(raw_rows),
-            "summary_rows": len(summary_rows),
-            "updated_at_utc": now_utc,
-        }
-    )
+    return {
+        "status": "ok",
+        "sheet_id": sheet_id,
+        "raw_rows": len(raw_rows),
+        "summary_rows": len(summary_rows),
+        "raw_sheet": raw_result,
+        "summary_sheet": summary_result,
+        "sheets_api": writer.stats.as_dict(),
+        "updated_at_utc": now_utc,
+    }
+
+
+def reconcile_sheet(
+    args: argparse.Namespace,
+    raw_header: list[str],
+    raw_rows: list[list[str]],
+    summary_header: list[str],
+    summary_rows: list[list[str]],
+    repair: bool = False,
+) -> dict:
+    """Find (account, day) leaves whose raw rows differ from the sheet; with `repair`, re-push their months."""
+    missing = [c for c in DIGEST_COLUMNS if c not in raw_header]
+    if missing:
+        raise SystemExit(f"Raw events CSV has no {', '.join(missing)} column(s); cannot reconcile")
+    sh, sheet_id = open_spreadsheet(args)
+    writer = SheetsWriter(args.requests_per_minute, args.max_cells_per_request, log=log_stderr)
+
+    if args.partition == "month":
+        index_ws = open_existing_worksheet(sh, index_tab_name(args.raw_sheet), writer)
+        tabs = {month: entry.tab for month, entry in (read_index(index_ws, writer) if index_ws else {}).items()}
+        for month in partition_rows(raw_header, raw_rows):
+            tabs.setdefault(month, tab_name(args.raw_sheet, month))
+    else:
+        tabs = {"": args.raw_sheet}
+    remote_rows: list[dict[str, str]] = []
+    unreadable: list[str] = []
+    for title in sorted(set(tabs.values())):
+        ws = open_existing_worksheet(sh, title, writer)
+        rows = read_columns(ws, raw_header, DIGEST_COLUMNS, writer) if ws is not None else None
+        if rows is None:
+            # Missing tab or different header: every local row in it counts as diverging.
+            unreadable.append(title)
+            continue
+        remote_rows.extend(rows)
+
+    local_rows = [dict(zip(raw_header, row)) for row in raw_rows]
+    local = DigestTree.from_rows(local_rows, sheet_fingerprint)
+    remote = DigestTree.from_rows(remote_rows, sheet_fingerprint)
+    months = set(diverging_keys(local.months, remote.months))
+    leaves = diverging_keys(local.leaves(months), remote.leaves(months))
+    remote_fps = {r[RAW_EVENT_KEY]: sheet_fingerprint(r) for r in rows_in(remote_rows, leaves) if is_live(r)}
+    changed, stale = compare_rows(rows_in(local_rows, leaves), remote_fps, sheet_fingerprint)
+    report: dict[str, Any] = {
+        "status": "in_sync" if not leaves else "diverged",
+        "sheet_id": sheet_id,
+        "local_root": local.root,
+        "remote_root": remote.root,
+        "local_rows": local.rows,
+        "remote_rows": remote.rows,
+        "tabs_read": len(tabs),
+        "tabs_unreadable": unreadable,
+        "months_diverging": sorted(months),
+        "days_diverging": sorted({day for _, day in leaves}),
+        "leaves_diverging": [f"{account}@{day}" for account, day in leaves],
+        "raw_rows_to_send": len(changed),
+        "raw_rows_to_delete": len(stale),
+        "sheets_api": writer.stats.as_dict(),
+    }
+    if repair and leaves:
+        upsert_args = argparse.Namespace(**{**vars(args), "mode": "upsert"})
+        force_months = {month_of(day) for _, day in leaves}
+        report["sync"] = push_tables(upsert_args, raw_header, raw_rows, summary_header, summary_rows, force_months)
+        report["status"] = "repaired"
+    return report
+
+
+def main() -> int:
+    load_dotenv(encoding="utf-8-sig")
+    args = parse_args()
+
+    raw_header, raw_rows = read_csv_rows(Path(args.raw_events))
+    summary_header, summary_rows = read_csv_rows(Path(args.daily_summary))
+    if args.reconcile:
+        print(reconcile_sheet(args, raw_header, raw_rows, summary_header, summary_rows, repair=not args.dry_run))
+        return 0
+    print(push_tables(args, raw_header, raw_rows, summary_header, summary_rows))
     return 0
 
 
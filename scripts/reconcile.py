@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Check that the Worker/D1 and Google Sheets hold the same raw events as the local history.
+
+- compares digest trees (digest_tree.py): root, then months, then the
+  (account, day) leaves of differing months, then the rows of differing leaves
+- Worker: hashes are computed server-side (`POST /api/digest`), so the number
+  of round trips does not grow with the history
+- Sheets: the pusher reads the key/fingerprint columns and hashes locally
+- `--repair` re-sends only the diverging days (Worker) or months (Sheets)
+- prints one JSON line per target; exit code 1 when a target diverged and was
+  not repaired
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shlex
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+import push_to_cloudflare_worker
+import push_to_gsheet
+from build_dashboard_data import read_csv
+from digest_tree import DigestTree, digest_path
+from journal_io import as_lists
+
+TARGETS = ("worker", "gsheet")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Reconcile local history with the Worker and Google Sheets")
+    parser.add_argument("--target", dest="targets", action="append", choices=TARGETS, help="Target to check (repeatable); default both.")
+    parser.add_argument("--repair", action="store_true", help="Re-send the diverging days/months.")
+    parser.add_argument("--summary-history", default="dashboard/data/daily_summary_history.csv")
+    parser.add_argument("--raw-history", default="dashboard/data/raw_events_history.csv")
+    parser.add_argument("--gsheet-args", default="", help="Extra push_to_gsheet.py arguments, e.g. \"--partition month\".")
+    parser.add_argument("--worker-args", default="", help="Extra push_to_cloudflare_worker.py arguments.")
+    return parser.parse_args()
+
+
+def local_digest_status(raw_path: Path, raw_rows: list[dict[str, str]]) -> str:
+    """Whether the digest saved by the last build still matches the history CSV."""
+    saved = DigestTree.load(digest_path(raw_path))
+    if saved is None:
+        return "missing"
+    return "ok" if saved.root == DigestTree.from_rows(raw_rows).root else "stale"
+
+
+def reconcile_worker(args: argparse.Namespace, summary_rows: list[dict[str, str]], raw_rows: list[dict[str, str]]) -> dict[str, Any]:
+    worker_args = push_to_cloudflare_worker.parse_args(["--skip-if-missing", *shlex.split(args.worker_args)])
+    target = push_to_cloudflare_worker.worker_target(worker_args)
+    if target is None:
+        return push_to_cloudflare_worker.SKIPPED
+    return push_to_cloudflare_worker.reconcile_rows(worker_args, *target, summary_rows, raw_rows, repair=args.repair)
+
+
+def reconcile_gsheet(
+    args: argparse.Namespace,
+    summary_headers: list[str],
+    summary_rows: list[dict[str, str]],
+    raw_headers: list[str],
+    raw_rows: list[dict[str, str]],
+) -> dict[str, Any]:
+    gsheet_args = push_to_gsheet.parse_args(shlex.split(args.gsheet_args))
+    return push_to_gsheet.reconcile_sheet(
+        gsheet_args,
+        raw_headers,
+        as_lists(raw_headers, raw_rows),
+        summary_headers,
+        as_lists(summary_headers, summary_rows),
+        repair=args.repair,
+    )
+
+
+def main() -> int:
+    project_root = Path(__file__).resolve().parent.parent
+    load_dotenv(dotenv_path=project_root / ".env", override=False, encoding="utf-8-sig")
+    args = parse_args()
+
+    raw_path = Path(args.raw_history)
+    summary_headers, summary_rows = read_csv(Path(args.summary_history))
+    raw_headers, raw_rows = read_csv(raw_path)
+    local_digest = local_digest_status(raw_path, raw_rows)
+
+    diverged = False
+    for target in args.targets or TARGETS:
+        if target == "worker":
+            report = reconcile_worker(args, summary_rows, raw_rows)
+        else:
+            report = reconcile_gsheet(args, summary_headers, summary_rows, raw_headers, raw_rows)
+        diverged = diverged or report.get("status") == "diverged"
+        print(json.dumps({"target": target, "local_digest": local_digest, **report}, ensure_ascii=True))
+    return 1 if diverged else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
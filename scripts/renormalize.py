@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Rebuild raw_events and daily summaries from the raw MT5 deal cache.
+
+- reads `state/deal_cache` (written by every MT5 fetch, see deal_cache.py);
+  no terminal login
+- runs the current `normalize_deal`, so schema changes (e.g. new derived
+  columns) can be applied to all cached history at once
+- optional filters: `--since-day` / `--until-day` (XM days), `--account`
+- writes `--output` / `--summary-output`; `--merge-history` also upserts the
+  rows into the history CSVs, recomputes daily summaries from the merged raw
+  history and publishes the API snapshot
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from build_dashboard_data import DEFAULT_RATES_PATH, build_history
+from extract_mt5_events import (
+    UTC,
+    DailySummary,
+    RawEvent,
+    build_daily_summaries,
+    format_iso_utc,
+    normalize_deal,
+    setup_logging,
+    write_csv,
+    write_daily_summary_csv,
+)
+from journal_io import as_csv_rows
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-normalize cached MT5 deals into raw_events")
+    parser.add_argument("--cache-dir", default="state/deal_cache")
+    parser.add_argument("--since-day", default="", help="First XM day (YYYY-MM-DD); default first cached day.")
+    parser.add_argument("--until-day", default="", help="Last XM day (YYYY-MM-DD); default last cached day.")
+    parser.add_argument("--account", dest="accounts", action="append", default=None, help="Account id to include (repeatable).")
+    parser.add_argument("--output", default="out/raw_events_renormalized.csv")
+    parser.add_argument("--summary-output", default="out/daily_summary_renormalized.csv")
+    parser.add_argument("--merge-history", action="store_true", help="Upsert the rebuilt rows into the history CSVs.")
+    parser.add_argument("--summary-history", default="dashboard/data/daily_summary_history.csv")
+    parser.add_argument("--raw-history", default="dashboard/data/raw_events_history.csv")
+    parser.add_argument("--no-snapshot", action="store_true")
+    parser.add_argument("--fx-rates", default=DEFAULT_RATES_PATH, help="USD/VND rate cache for the *_vnd columns (fx_rates.py).")
+    parser.add_argument("--log-file", default="logs/renormalize.log")
+    return parser.parse_args()
+
+
+def parse_day(value: str, flag: str) -> date | None:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise SystemExit(f"Invalid {flag} format. Use YYYY-MM-DD, e.g. 2026-02-22") from exc
+
+
+def main() -> int:
+    project_root = Path(__file__).resolve().parent.parent
+    load_dotenv(dotenv_path=project_root / ".env", override=False, encoding="utf-8-sig")
+    args = parse_args()
+    setup_logging(Path(args.log_file))
+    # deal_cache and fx_rates need NumPy: imported after parsing, so --help stays fast.
+    from deal_cache import DealCache
+    from fx_rates import load_rate_table
+
+    cache = DealCache(Path(args.cache_dir))
+    cached = cache.days(args.accounts, parse_day(args.since_day, "--since-day"), parse_day(args.until_day, "--until-day"))
+    if not cached:
+        raise SystemExit(f"No cached deals in {cache.root} for the selected accounts/days")
+
+    started = time.perf_counter()
+    etl_run_id = str(uuid.uuid4())
+    synced_at_utc = format_iso_utc(datetime.now(tz=UTC))
+    events: list[RawEvent] = []
+    for meta, deals in cache.read(cached):
+        events.extend(
+            normalize_deal(
+                deal=deal,
+                account_id=meta["account_id"],
+                account_label=meta["account_label"],
+                account_currency=meta["account_currency"],
+                etl_run_id=etl_run_id,
+                synced_at_utc=synced_at_utc,
+            )
+            for deal in deals
+        )
+    summaries = build_daily_summaries(events, synced_at_utc)
+    write_csv(Path(args.output), events)
+    write_daily_summary_csv(Path(args.summary_output), summaries)
+    logging.info("Renormalized: days=%s events=%s elapsed=%.2fs", len(cached), len(events), time.perf_counter() - started)
+
+    merged = None
+    if args.merge_history:
+        raw_headers = list(RawEvent.__annotations__.keys())
+        summary_headers = list(DailySummary.__annotations__.keys())
+        raw_dst = Path(args.raw_history)
+        # Summaries cover every account of a day: rebuilt from the merged raw history, not the filtered subset.
+        history = build_history(
+            summary_headers,
+            [],
+            raw_headers,
+            as_csv_rows(events, raw_headers),
+            Path(args.summary_history),
+            raw_dst,
+            None if args.no_snapshot else raw_dst.parent / "snapshot",
+            load_rate_table(Path(args.fx_rates)),
+            resummarize_at=synced_at_utc,
+        )
+        merged = {
+            "raw_history_rows": len(history["raw_rows"]),
+            "summary_history_rows": len(history["summary_rows"]),
+            "snapshot_version": history["snapshot_version"],
+            "fx": history["fx"],
+            "quality": history["quality"],
+        }
+
+    print(
+        json.dumps(
+            {
+                "status": "ok",
+                "accounts": sorted({c.account_id for c in cached}),
+                "first_day_xm": min(c.day_xm for c in cached).isoformat(),
+                "last_day_xm": max(c.day_xm for c in cached).isoformat(),
+                "cached_days": len(cached),
+                "events": len(events),
+                "elapsed_sec": round(time.perf_counter() - started, 3),
+                "output": args.output,
+                "summary_output": args.summary_output,
+                "merged": merged,
+            },
+            ensure_ascii=True,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,24 @@
+"""Retry backoff shared by the Worker upload, the Sheets writer and the pipeline stages.
+
+Which failures are retried stays with each caller (HTTP statuses differ per
+API); this module only decides how long to wait between attempts.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay_sec: float = 0.5
+    max_delay_sec: float = 20.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Full jitter: uniform(0, min(cap, base * 2^attempt)); Retry-After is a floor."""
+        backoff = random.uniform(0, min(self.max_delay_sec, self.base_delay_sec * (2**attempt)))
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.max_delay_sec))
+        return backoff
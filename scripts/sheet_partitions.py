@@ -0,0 +1,202 @@
+"""Month-partitioned worksheets: `raw_events_2026_02`, ... plus an index tab.
+
+Index tab (`<base>_index`) columns: INDEX_COLUMNS, one row per month. A push
+- groups input rows by the month of `trade_date_vn`
+- skips months whose content fingerprint matches the index (untouched)
+- skips frozen months: already written and older than `freeze_after_months`
+  full months before the current VN month
+- `force_months` (from a reconcile) are upserted even when untouched or frozen
+- upserts each remaining month into its own tab (sheet_sync.upsert_sheet)
+- empties the tab of an indexed month that has no rows left (unless frozen)
+  and drops it from the index
+- rewrites the small index tab
+
+so a daily push touches a bounded number of cells regardless of history length.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Any, Callable, Collection, Sequence
+
+from sheet_sync import rewrite_sheet, upsert_sheet
+from sheets_writer import SheetsWriter
+
+INDEX_COLUMNS = ["month", "tab", "rows", "first_trade_date", "last_trade_date", "fingerprint", "frozen", "updated_at_utc"]
+DATE_COLUMN = "trade_date_vn"
+UNDATED = "undated"
+
+
+@dataclass
+class MonthEntry:
+    month: str
+    tab: str
+    rows: int
+    first_trade_date: str
+    last_trade_date: str
+    fingerprint: str
+    frozen: bool = False
+    updated_at_utc: str = ""
+
+    def as_row(self) -> list[str]:
+        values = asdict(self)
+        values["rows"] = str(self.rows)
+        values["frozen"] = "TRUE" if self.frozen else "FALSE"
+        return [str(values[c]) for c in INDEX_COLUMNS]
+
+    @classmethod
+    def from_row(cls, row: Sequence[str]) -> "MonthEntry":
+        values = dict(zip(INDEX_COLUMNS, [*row, *[""] * len(INDEX_COLUMNS)]))
+        return cls(
+            month=values["month"],
+            tab=values["tab"],
+            rows=int(values["rows"] or 0),
+            first_trade_date=values["first_trade_date"],
+            last_trade_date=values["last_trade_date"],
+            fingerprint=values["fingerprint"],
+            frozen=values["frozen"].strip().lower() == "true",
+            updated_at_utc=values["updated_at_utc"],
+        )
+
+
+def tab_name(base: str, month: str) -> str:
+    return f"{base}_{month.replace('-', '_')}"
+
+
+def index_tab_name(base: str) -> str:
+    return f"{base}_index"
+
+
+def month_of(value: str) -> str:
+    """'2026-02-23...' -> '2026-02'; rows without a usable date go to UNDATED."""
+    text = (value or "").strip()
+    if len(text) >= 7 and text[4] == "-" and text[:4].isdigit() and text[5:7].isdigit():
+        return text[:7]
+    return UNDATED
+
+
+def partition_rows(header: list[str], rows: list[list[str]], date_column: str = DATE_COLUMN) -> dict[str, list[list[str]]]:
+    idx = header.index(date_column)
+    parts: dict[str, list[list[str]]] = {}
+    for row in rows:
+        parts.setdefault(month_of(row[idx] if idx < len(row) else ""), []).append(row)
+    return dict(sorted(parts.items()))
+
+
+def month_fingerprint(header: list[str], rows: list[list[str]], columns: Sequence[str] | None = None) -> str:
+    """Order-independent hash of the given columns (all columns when None)."""
+    idx = [header.index(c) for c in columns or header if c in header]
+    lines = sorted("\x1f".join(row[i] if i < len(row) else "" for i in idx) for row in rows)
+    digest = hashlib.sha256("\x1e".join([",".join(header), *lines]).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def is_frozen(month: str, today: date, freeze_after_months: int) -> bool:
+    if freeze_after_months <= 0 or month == UNDATED:
+        return False
+    year, mon = int(month[:4]), int(month[5:7])
+    return (today.year * 12 + today.month) - (year * 12 + mon) > freeze_after_months
+
+
+def read_index(ws: Any, writer: SheetsWriter) -> dict[str, MonthEntry]:
+    (values,) = writer.call(ws.batch_get, ["A1:H"], kind="read")
+    if not values or [str(v) for v in values[0]] != INDEX_COLUMNS:
+        return {}
+    entries = [MonthEntry.from_row([str(v) for v in row]) for row in values[1:] if row and row[0]]
+    return {e.month: e for e in entries}
+
+
+def sync_partitioned(
+    open_tab: Callable[[str, int, int], Any],
+    base: str,
+    header: list[str],
+    rows: list[list[str]],
+    key: str,
+    writer: SheetsWriter,
+    today: date,
+    now_utc: str,
+    freeze_after_months: int = 3,
+    mode: str = "upsert",
+    fingerprint_columns: Sequence[str] | None = None,
+    force_months: Collection[str] = (),
+    **diff_options: Any,
+) -> dict[str, Any]:
+    """Write `rows` into per-month tabs of `base`; `open_tab(title, rows, cols)` returns a worksheet."""
+    if DATE_COLUMN not in header:
+        raise ValueError(f"{DATE_COLUMN} column is required for month partitions")
+    parts = partition_rows(header, rows)
+    index_ws = open_tab(index_tab_name(base), len(parts) + 1, len(INDEX_COLUMNS))
+    index = read_index(index_ws, writer)
+    date_idx = header.index(DATE_COLUMN)
+
+    written: dict[str, dict[str, Any]] = {}
+    unchanged: list[str] = []
+    frozen: list[str] = []
+    frozen_changed: list[str] = []
+    for month, month_rows in parts.items():
+        fingerprint = month_fingerprint(header, month_rows, fingerprint_columns)
+        previous = index.get(month)
+        forced = month in force_months
+        if previous is not None and not forced and is_frozen(month, today, freeze_after_months):
+            # Frozen months are never rewritten by a routine push; changes are only reported.
+            frozen.append(month)
+            if previous.fingerprint != fingerprint:
+                frozen_changed.append(month)
+            continue
+        if previous is not None and not forced and previous.fingerprint == fingerprint:
+            unchanged.append(month)
+            continue
+        tab = tab_name(base, month)
+        ws = open_tab(tab, len(month_rows) + 1, len(header))
+        if mode == "replace":
+            rewrite_sheet(ws, header, month_rows, writer)
+            written[month] = {"mode": "rewrite", "inserted": len(month_rows)}
+        else:
+            written[month] = upsert_sheet(ws, header, month_rows, key, writer=writer, **diff_options).as_dict()
+        dates = sorted(r[date_idx] for r in month_rows if date_idx < len(r) and r[date_idx])
+        index[month] = MonthEntry(
+            month=month,
+            tab=tab,
+            rows=len(month_rows),
+            first_trade_date=dates[0] if dates else "",
+            last_trade_date=dates[-1] if dates else "",
+            fingerprint=fingerprint,
+            updated_at_utc=now_utc,
+        )
+
+    removed: list[str] = []
+    for month in sorted(set(index) - set(parts)):
+        if month not in force_months and is_frozen(month, today, freeze_after_months):
+            frozen.append(month)
+            frozen_changed.append(month)
+            continue
+        ws = open_tab(index[month].tab, 1, len(header))
+        if mode == "replace":
+            rewrite_sheet(ws, header, [], writer)
+            written[month] = {"mode": "rewrite", "inserted": 0}
+        else:
+            written[month] = upsert_sheet(ws, header, [], key, writer=writer, **diff_options).as_dict()
+        del index[month]
+        removed.append(month)
+
+    dirty = bool(written)
+    for entry in index.values():
+        flag = is_frozen(entry.month, today, freeze_after_months)
+        if entry.frozen != flag:
+            entry.frozen = flag
+            dirty = True
+    if dirty:
+        rewrite_sheet(index_ws, INDEX_COLUMNS, [index[m].as_row() for m in sorted(index)], writer)
+
+    return {
+        "mode": "partitioned",
+        "months": len(parts),
+        "months_written": sorted(written),
+        "months_removed": removed,
+        "months_unchanged": len(unchanged),
+        "months_frozen": len(frozen),
+        "frozen_months_with_changes": frozen_changed,
+        "tabs": written,
+    }
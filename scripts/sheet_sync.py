@@ -0,0 +1,285 @@
+"""Keyed incremental upsert of CSV rows into a Google Sheets worksheet.
+
+Instead of `ws.clear()` + rewriting every row:
+- read the header row plus the key / compare columns once (one batch_get)
+- changed rows -> batch_update; consecutive rows share one range
+- new rows first reuse the slots of deleted rows, the rest is written
+  below the last row after one grid resize
+- remaining deleted rows are removed in one spreadsheet batch_update
+  (deleteDimension per block, bottom-up)
+- with `sort_column`, rows that were inserted or changed are put back in
+  order by one sortRange request (readers expect e.g. raw events newest first)
+- all calls go through a SheetsWriter (quota, retries, request sizing)
+- full rewrite only when the header differs (schema change), the sheet is
+  empty, or the input has duplicate keys
+
+Cells are compared leniently (numbers by value, booleans case-insensitive)
+because USER_ENTERED values come back formatted by Sheets.
+
+Works with any object exposing the gspread Worksheet methods used here;
+gsheet_fake.py is an in-memory implementation for local runs.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Sequence
+
+from sheets_writer import SheetsWriter, col_letter
+
+_A1_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+@dataclass
+class SheetDiff:
+    inserted: list[list[str]] = field(default_factory=list)
+    # 0-based data row index -> new values
+    updated: dict[int, list[str]] = field(default_factory=dict)
+    # 0-based data row indexes, ascending
+    deleted: list[int] = field(default_factory=list)
+    unchanged: int = 0
+
+
+@dataclass
+class UpsertResult:
+    mode: str
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    reason: str = ""
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def col_number(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def parse_a1(ref: str) -> tuple[int, int]:
+    """'B7' -> (row 7, col 2); missing parts are 0 ('B' -> (0, 2), '7' -> (7, 0))."""
+    match = _A1_RE.match(ref.strip().upper())
+    if not match:
+        raise ValueError(f"Invalid A1 reference: {ref}")
+    letters, digits = match.groups()
+    return int(digits or 0), col_number(letters) if letters else 0
+
+
+def normalize_cell(value: Any) -> str:
+    text = "" if value is None else str(value).strip()
+    lowered = text.lower()
+    if lowered in {"true", "false"}:
+        return lowered
+    try:
+        return repr(float(text))
+    except ValueError:
+        return text
+
+
+def same_cell(a: Any, b: Any) -> bool:
+    return a == b or normalize_cell(a) == normalize_cell(b)
+
+
+def diff_rows(
+    existing_keys: Sequence[str],
+    existing_compare: Sequence[Sequence[str]],
+    data_rows: Sequence[list[str]],
+    key_idx: int,
+    compare_idx: Sequence[int],
+) -> SheetDiff:
+    """Diff sheet rows (keys + compared cells per row) against the input rows."""
+    diff = SheetDiff()
+    position: dict[str, int] = {}
+    for i, key in enumerate(existing_keys):
+        if not key or key in position:
+            diff.deleted.append(i)  # blank or duplicate row
+        else:
+            position[key] = i
+
+    seen: set[str] = set()
+    for row in data_rows:
+        key = row[key_idx] if key_idx < len(row) else ""
+        seen.add(key)
+        i = position.get(key)
+        if i is None:
+            diff.inserted.append(row)
+            continue
+        old = existing_compare[i]
+        if all(same_cell(old[j] if j < len(old) else "", row[c] if c < len(row) else "") for j, c in enumerate(compare_idx)):
+            diff.unchanged += 1
+        else:
+            diff.updated[i] = row
+
+    diff.deleted.extend(i for key, i in position.items() if key not in seen)
+    diff.deleted.sort()
+    return diff
+
+
+def rewrite_sheet(ws: Any, header: list[str], data_rows: list[list[str]], writer: SheetsWriter | None = None) -> None:
+    (writer or SheetsWriter()).rewrite(ws, header, data_rows)
+
+
+def _row_ranges(updates: dict[int, list[str]], width: int) -> list[dict[str, Any]]:
+    """Group sheet-row -> values into one A1 range per run of consecutive rows."""
+    data: list[dict[str, Any]] = []
+    last = col_letter(width)
+    run: list[int] = []
+    for row in sorted(updates):
+        if run and row != run[-1] + 1:
+            data.append({"range": f"A{run[0]}:{last}{run[-1]}", "values": [updates[r] for r in run]})
+            run = []
+        run.append(row)
+    if run:
+        data.append({"range": f"A{run[0]}:{last}{run[-1]}", "values": [updates[r] for r in run]})
+    return data
+
+
+def _delete_requests(sheet_id: int, rows: list[int]) -> list[dict[str, Any]]:
+    """deleteDimension requests for ascending 1-based sheet rows, last block first."""
+    blocks: list[list[int]] = []
+    for row in rows:
+        if blocks and row == blocks[-1][1] + 1:
+            blocks[-1][1] = row
+        else:
+            blocks.append([row, row])
+    return [
+        {
+            "deleteDimension": {
+                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start - 1, "endIndex": end}
+            }
+        }
+        for start, end in reversed(blocks)
+    ]
+
+
+def _sort_request(sheet_id: int, rows: int, width: int, column: int, descending: bool) -> dict[str, Any]:
+    """sortRange request for the `rows` data rows below the header."""
+    return {
+        "sortRange": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": 1,
+                "endRowIndex": rows + 1,
+                "startColumnIndex": 0,
+                "endColumnIndex": width,
+            },
+            "sortSpecs": [{"dimensionIndex": column, "sortOrder": "DESCENDING" if descending else "ASCENDING"}],
+        }
+    }
+
+
+def upsert_sheet(
+    ws: Any,
+    header: list[str],
+    data_rows: list[list[str]],
+    key: str,
+    compare_columns: Sequence[str] | None = None,
+    ignore_columns: Sequence[str] = (),
+    writer: SheetsWriter | None = None,
+    sort_column: str | None = None,
+    descending: bool = False,
+) -> UpsertResult:
+    """Bring `ws` to header + data_rows keyed by `key`, touching only what changed.
+
+    `compare_columns` limits change detection to those columns (e.g. a content
+    hash); otherwise every column except `ignore_columns` is compared.
+    New keys fill the slots of deleted rows, then are appended; with
+    `sort_column` the data rows are re-sorted by it afterwards (in place, on
+    the Sheets side), otherwise row order for existing keys is kept.
+    """
+    writer = writer or SheetsWriter()
+    if key not in header:
+        raise ValueError(f"Key column {key!r} not in header")
+    key_idx = header.index(key)
+    keys_in = [row[key_idx] if key_idx < len(row) else "" for row in data_rows]
+    if len(set(keys_in)) != len(keys_in):
+        writer.rewrite(ws, header, data_rows)
+        return UpsertResult("rewrite", inserted=len(data_rows), reason="duplicate keys in input")
+
+    compare = [c for c in (compare_columns or ()) if c in header]
+    if not compare:
+        compare = [c for c in header if c not in set(ignore_columns) and c != key]
+    compare_idx = [header.index(c) for c in compare]
+
+    width = len(header)
+    ranges = ["1:1", f"{col_letter(key_idx + 1)}2:{col_letter(key_idx + 1)}"]
+    ranges += [f"{col_letter(i + 1)}2:{col_letter(i + 1)}" for i in compare_idx]
+    header_vr, key_vr, *compare_vrs = writer.call(ws.batch_get, ranges, kind="read")
+    sheet_header = [str(v) for v in (header_vr[0] if header_vr else [])]
+    while sheet_header and sheet_header[-1] == "":
+        sheet_header.pop()
+    if not sheet_header:
+        writer.rewrite(ws, header, data_rows)
+        return UpsertResult("rewrite", inserted=len(data_rows), reason="empty sheet")
+    if sheet_header != header:
+        writer.rewrite(ws, header, data_rows)
+        return UpsertResult("rewrite", inserted=len(data_rows), reason="schema changed")
+
+    # Column ranges drop trailing blank cells/rows; pad everything to the longest column.
+    n_rows = max([len(key_vr), *(len(vr) for vr in compare_vrs)], default=0)
+    existing_keys = [_cell(key_vr, r) for r in range(n_rows)]
+    existing_compare = [[_cell(vr, r) for vr in compare_vrs] for r in range(n_rows)]
+    diff = diff_rows(existing_keys, existing_compare, data_rows, key_idx, compare_idx)
+    if not (diff.inserted or diff.updated or diff.deleted):
+        return UpsertResult("noop", unchanged=diff.unchanged)
+
+    # Sheet row = data index + 2 (1-based, below the header).
+    updates = {i + 2: row for i, row in diff.updated.items()}
+    holes = [i + 2 for i in diff.deleted]
+    inserts = list(diff.inserted)
+    while holes and inserts:
+        updates[holes.pop(0)] = inserts.pop(0)
+    if updates:
+        writer.write_ranges(ws, _row_ranges(updates, width), width)
+    grid_rows = ws.row_count
+    if holes:
+        writer.call(ws.spreadsheet.batch_update, {"requests": _delete_requests(ws.id, holes)})
+        grid_rows -= len(holes)
+    if inserts:
+        first = n_rows + 2 - len(holes)
+        writer.ensure_grid(ws, first + len(inserts) - 1, width, current_rows=grid_rows)
+        writer.write_rows(ws, first, inserts, width)
+    if sort_column in header and (diff.inserted or diff.updated) and len(data_rows) > 1:
+        request = _sort_request(ws.id, len(data_rows), width, header.index(sort_column), descending)
+        writer.call(ws.spreadsheet.batch_update, {"requests": [request]})
+    return UpsertResult(
+        "upsert",
+        inserted=len(diff.inserted),
+        updated=len(diff.updated),
+        deleted=len(diff.deleted),
+        unchanged=diff.unchanged,
+    )
+
+
+def read_columns(
+    ws: Any,
+    header: list[str],
+    columns: Sequence[str],
+    writer: SheetsWriter | None = None,
+) -> list[dict[str, str]] | None:
+    """Values of `columns` per data row, read with one batch_get.
+
+    Returns None when the sheet header differs from `header` (or the sheet is
+    empty), since column positions are taken from `header`.
+    """
+    writer = writer or SheetsWriter()
+    letters = [col_letter(header.index(c) + 1) for c in columns]
+    header_vr, *column_vrs = writer.call(ws.batch_get, ["1:1", *(f"{c}2:{c}" for c in letters)], kind="read")
+    sheet_header = [str(v) for v in (header_vr[0] if header_vr else [])]
+    while sheet_header and sheet_header[-1] == "":
+        sheet_header.pop()
+    if sheet_header != header:
+        return None
+    n_rows = max((len(vr) for vr in column_vrs), default=0)
+    return [{c: _cell(vr, r) for c, vr in zip(columns, column_vrs)} for r in range(n_rows)]
+
+
+def _cell(value_range: Sequence[Sequence[Any]], row: int) -> str:
+    if row < len(value_range) and value_range[row]:
+        return str(value_range[row][0])
+    return ""
@@ -0,0 +1,198 @@
+"""Quota-aware Google Sheets writes.
+
+- every API call goes through a token bucket per quota (read / write),
+  sized to the per-user Sheets limits (60 requests/min each by default)
+- 429 / 5xx `APIError`s are retried with Google's truncated exponential
+  backoff (2^n s + jitter, capped at 64 s); a 429 also halves the bucket
+  rate, so a quota set too high corrects itself
+- large writes are split into `batch_update` requests of at most
+  `max_cells_per_request` cells, and the grid is resized once up front
+  instead of relying on append/auto-grow
+- `stats` reports API calls, retries, throttle wait and cells written
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+from retry_policy import RetryPolicy
+
+VALUE_INPUT_OPTION = "USER_ENTERED"
+# Quota (429) and server errors; other 4xx are request errors and fail at once.
+RETRY_STATUSES = {429, *range(500, 600)}
+DEFAULT_REQUESTS_PER_MINUTE = 60
+MIN_REQUESTS_PER_MINUTE = 6
+# Keeps each request well under the ~10 MB body limit even for wide rows.
+DEFAULT_MAX_CELLS_PER_REQUEST = 50_000
+
+if TYPE_CHECKING:
+    from gspread.exceptions import APIError
+
+
+def col_letter(n: int) -> str:
+    """1-based column number -> A1 letters."""
+    letters = ""
+    while n > 0:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate_per_sec: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take `tokens`, sleeping off any deficit; returns seconds waited.
+
+        The balance may go negative; later refills pay the debt back first.
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            delay = -self.tokens / self.rate
+        # The tokens are already taken: sleep without the lock so other threads can queue up behind.
+        self.sleep(delay)
+        return delay
+
+    def slow_down(self, floor_per_sec: float) -> None:
+        with self._lock:
+            self.rate = max(floor_per_sec, self.rate / 2)
+            self.tokens = 0.0
+
+
+@dataclass
+class WriterStats:
+    api_calls: int = 0
+    read_calls: int = 0
+    write_calls: int = 0
+    retries: int = 0
+    throttle_wait_sec: float = 0.0
+    cells_written: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        out = asdict(self)
+        out["throttle_wait_sec"] = round(self.throttle_wait_sec, 3)
+        return out
+
+
+def api_error_status(exc: APIError) -> int:
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return int(status if status is not None else getattr(exc, "code", 0) or 0)
+
+
+class SheetsWriter:
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        max_cells_per_request: int = DEFAULT_MAX_CELLS_PER_REQUEST,
+        retry: RetryPolicy | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        log: Callable[[str], None] | None = None,
+    ) -> None:
+        # Small burst so short runs are not throttled; burst + refill over any
+        # 60 s window stays within `requests_per_minute`.
+        burst = max(1.0, min(10.0, requests_per_minute / 6))
+        rate = max(requests_per_minute - burst, 1) / 60
+        self.buckets = {kind: TokenBucket(rate, burst, clock, sleep) for kind in ("read", "write")}
+        self.max_cells_per_request = max(max_cells_per_request, 1)
+        self.retry = retry or RetryPolicy(max_attempts=8, base_delay_sec=1.0, max_delay_sec=64.0)
+        self.sleep = sleep
+        self.log = log or (lambda _msg: None)
+        self.stats = WriterStats()
+
+    def call(self, fn: Callable[..., Any], *args: Any, kind: str = "write", cells: int = 0, **kwargs: Any) -> Any:
+        """Run one Sheets API call under the quota bucket, retrying 429/5xx."""
+        # Imported on first call: gspread pulls in google-auth (~0.2 s at startup).
+        from gspread.exceptions import APIError
+
+        for attempt in range(self.retry.max_attempts):
+            self.stats.throttle_wait_sec += self.buckets[kind].acquire()
+            self.stats.api_calls += 1
+            if kind == "read":
+                self.stats.read_calls += 1
+            else:
+                self.stats.write_calls += 1
+            try:
+                result = fn(*args, **kwargs)
+            except APIError as exc:
+                status = api_error_status(exc)
+                if status not in RETRY_STATUSES or attempt + 1 >= self.retry.max_attempts:
+                    raise
+                if status == 429:
+                    self.buckets[kind].slow_down(MIN_REQUESTS_PER_MINUTE / 60)
+                # Exponential floor + jitter, as recommended for the Sheets API.
+                delay = self.retry.delay(attempt, retry_after=self.retry.base_delay_sec * 2**attempt)
+                self.stats.retries += 1
+                self.log(f"sheets API {status}; retry {attempt + 1} in {delay:.1f}s")
+                self.sleep(delay)
+                continue
+            self.stats.cells_written += cells
+            return result
+        raise AssertionError("unreachable")
+
+    def ensure_grid(self, ws: Any, rows: int, cols: int, current_rows: int | None = None) -> None:
+        """Grow the grid in one resize call when it is smaller than rows x cols.
+
+        `current_rows` overrides `ws.row_count`, which gspread does not update
+        after deletions sent through `spreadsheet.batch_update`.
+        """
+        have_rows = ws.row_count if current_rows is None else current_rows
+        if have_rows >= rows and ws.col_count >= cols:
+            return
+        self.call(ws.resize, rows=max(have_rows, rows), cols=max(ws.col_count, cols))
+
+    def write_rows(self, ws: Any, start_row: int, rows: Sequence[Sequence[Any]], width: int) -> None:
+        """Write contiguous rows starting at 1-based `start_row`, split by cell budget."""
+        per_request = max(1, self.max_cells_per_request // max(width, 1))
+        last = col_letter(width)
+        for offset in range(0, len(rows), per_request):
+            part = rows[offset : offset + per_request]
+            first = start_row + offset
+            data = [{"range": f"A{first}:{last}{first + len(part) - 1}", "values": part}]
+            self.call(ws.batch_update, data, value_input_option=VALUE_INPUT_OPTION, cells=len(part) * width)
+
+    def write_ranges(self, ws: Any, data: Sequence[dict[str, Any]], width: int) -> None:
+        """Send many small ranges, packing as many per batch_update as the cell budget allows."""
+        batch: list[dict[str, Any]] = []
+        cells = 0
+        for item in data:
+            item_cells = len(item["values"]) * width
+            if batch and cells + item_cells > self.max_cells_per_request:
+                self.call(ws.batch_update, batch, value_input_option=VALUE_INPUT_OPTION, cells=cells)
+                batch, cells = [], 0
+            if item_cells > self.max_cells_per_request:
+                row = int(item["range"].split(":")[0][1:])
+                self.write_rows(ws, row, item["values"], width)
+                continue
+            batch.append(item)
+            cells += item_cells
+        if batch:
+            self.call(ws.batch_update, batch, value_input_option=VALUE_INPUT_OPTION, cells=cells)
+
+    def rewrite(self, ws: Any, header: list[str], data_rows: list[list[str]]) -> None:
+        """clear + resize once + chunked writes of header and rows."""
+        self.call(ws.clear)
+        self.ensure_grid(ws, len(data_rows) + 1, len(header))
+        self.write_rows(ws, 1, [header] + data_rows, len(header))
@@ -0,0 +1,131 @@
+"""Dependency-ordered stage runner for pipeline.py.
+
+- stages declare the stages they depend on; every stage whose dependencies
+  succeeded is started at once on a thread pool, so independent sinks
+  (Google Sheets, Worker) run concurrently
+- a failing stage is retried with jittered backoff (`retries` per stage),
+  except for configuration errors (bare SystemExit); when it still fails,
+  its dependents are marked `blocked` and the other branches keep running
+- each stage returns a value that later stages read from the shared results
+- every result records status, attempts, error and elapsed seconds
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from retry_policy import RetryPolicy
+
+OK = "ok"
+FAILED = "failed"
+BLOCKED = "blocked"
+SKIPPED = "skipped"
+
+
+@dataclass
+class Stage:
+    name: str
+    # Called with {dependency name: its value}.
+    run: Callable[[dict[str, Any]], Any]
+    deps: tuple[str, ...] = ()
+    retries: int = 0
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str
+    attempts: int = 0
+    elapsed_sec: float = 0.0
+    error: str = ""
+    value: Any = field(default=None, repr=False)
+
+    def as_dict(self) -> dict[str, Any]:
+        out: dict[str, Any] = {"status": self.status, "attempts": self.attempts, "elapsed_sec": round(self.elapsed_sec, 3)}
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+def retryable(exc: BaseException) -> bool:
+    """False for a bare SystemExit: a configuration or input error (missing env var, bad argument).
+
+    A SystemExit raised `from` another error wraps a runtime failure (e.g. an
+    upload that ran out of retries) and is retried like any exception.
+    """
+    return not isinstance(exc, SystemExit) or exc.__cause__ is not None
+
+
+class StageScheduler:
+    def __init__(
+        self,
+        stages: list[Stage],
+        max_workers: int = 4,
+        retry: RetryPolicy | None = None,
+        log: Callable[[str], None] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        names = [s.name for s in stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate stage names")
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in names]
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stages: {missing}")
+        self.stages = {s.name: s for s in stages}
+        self.max_workers = max(max_workers, 1)
+        self.retry = retry or RetryPolicy(max_attempts=1, base_delay_sec=2.0, max_delay_sec=60.0)
+        self.log = log or (lambda _msg: None)
+        self.sleep = sleep
+
+    def _attempt(self, stage: Stage, inputs: dict[str, Any]) -> StageResult:
+        started = time.perf_counter()
+        attempts = stage.retries + 1
+        for attempt in range(attempts):
+            try:
+                value = stage.run(inputs)
+            except (Exception, SystemExit) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                if not retryable(exc) or attempt + 1 >= attempts:
+                    return StageResult(stage.name, FAILED, attempt + 1, time.perf_counter() - started, error)
+                delay = self.retry.delay(attempt)
+                self.log(f"stage {stage.name} failed ({error}); retry {attempt + 1}/{stage.retries} in {delay:.1f}s")
+                self.sleep(delay)
+                continue
+            return StageResult(stage.name, OK, attempt + 1, time.perf_counter() - started, value=value)
+        raise AssertionError("unreachable")
+
+    def run(self, skip: set[str] | frozenset[str] = frozenset()) -> dict[str, StageResult]:
+        """Run every stage once; `skip` stages count as done (value None) for their dependents."""
+        results: dict[str, StageResult] = {n: StageResult(n, SKIPPED) for n in skip if n in self.stages}
+        waiting = [n for n in self.stages if n not in results]
+        running: dict[Future[StageResult], str] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+            while waiting or running:
+                progressed = False
+                for name in list(waiting):
+                    stage = self.stages[name]
+                    deps = [results.get(d) for d in stage.deps]
+                    if any(r is not None and r.status in {FAILED, BLOCKED} for r in deps):
+                        waiting.remove(name)
+                        progressed = True
+                        results[name] = StageResult(name, BLOCKED, error="dependency failed")
+                        self.log(f"stage {name} blocked")
+                    elif all(r is not None for r in deps):
+                        waiting.remove(name)
+                        progressed = True
+                        self.log(f"stage {name} started")
+                        running[pool.submit(self._attempt, stage, {d: results[d].value for d in stage.deps})] = name
+                if not running:
+                    if not progressed:
+                        raise ValueError(f"Dependency cycle between stages: {waiting}")
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[running.pop(future)] = result
+                    self.log(f"stage {result.name} {result.status} in {result.elapsed_sec:.2f}s")
+        return {n: results[n] for n in self.stages}
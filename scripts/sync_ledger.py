@@ -0,0 +1,138 @@
+"""Local ledger of rows acknowledged by the Worker `/api/sync`.
+
+- raw_events: event_id -> fingerprint (source_hash + USD/VND rate or its absence + is_deleted)
+- daily_summary: trade_date_vn -> hash of the row (excluding updated_at_utc)
+- Entries are scoped per Worker URL so several targets can share one file
+- Rows are recorded only after the chunk carrying them was acknowledged
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from journal_schema import DAILY_SUMMARY_KEY, RAW_EVENT_KEY
+
+SUMMARY_HASH_EXCLUDE = {"updated_at_utc"}
+TRUE_VALUES = {"true", "1", "yes"}
+
+
+def raw_fingerprint(row: dict[str, str]) -> str:
+    deleted = "1" if str(row.get("is_deleted") or "").strip().lower() in TRUE_VALUES else "0"
+    source_hash = row.get("source_hash") or hashlib.sha256(
+        json.dumps(row, sort_keys=True, ensure_ascii=True).encode("utf-8")
+    ).hexdigest()
+    # The rate is always part of it (empty = none): gaining, changing or losing one re-sends the row.
+    rate = f"{row.get('usd_vnd_rate') or ''}@{row.get('fx_rate_time_utc') or ''}"
+    return f"{source_hash}@{rate}:{deleted}"
+
+
+def summary_fingerprint(row: dict[str, str]) -> str:
+    payload = {k: v for k, v in row.items() if k not in SUMMARY_HASH_EXCLUDE}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=True).encode("utf-8")).hexdigest()
+
+
+def tombstone(row: Mapping[str, Any]) -> dict[str, Any]:
+    """`row` (as the Worker holds it) marked deleted.
+
+    The Worker upserts with INSERT OR REPLACE, so a tombstone carries every
+    column: a bare {event_id, is_deleted} row would blank the others.
+    """
+    return {**row, "is_deleted": "True"}
+
+
+class SyncLedger:
+    def __init__(self, path: Path, target: str, read_only: bool = False) -> None:
+        """Open (creating it if needed) the ledger; `read_only` opens an existing file without writing to it (dry runs)."""
+        self.path = path
+        self.target = target.rstrip("/")
+        if read_only:
+            # Without a live WAL nobody is writing; immutable also keeps SQLite from leaving -wal/-shm files behind.
+            live_wal = path.with_name(path.name + "-wal").exists()
+            mode = "mode=ro" if live_wal else "mode=ro&immutable=1"
+            self._conn = sqlite3.connect(f"{path.resolve().as_uri()}?{mode}", uri=True)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS raw_events ("
+                "target TEXT NOT NULL, event_id TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "trade_date_vn TEXT, synced_at_utc TEXT NOT NULL, PRIMARY KEY (target, event_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily_summary ("
+                "target TEXT NOT NULL, trade_date_vn TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "synced_at_utc TEXT NOT NULL, PRIMARY KEY (target, trade_date_vn))"
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "SyncLedger":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _load(self, table: str, key: str) -> dict[str, str]:
+        with closing(self._conn.execute(f"SELECT {key}, fingerprint FROM {table} WHERE target = ?", (self.target,))) as cur:
+            return dict(cur.fetchall())
+
+    def pending_raw(self, rows: list[dict[str, str]]) -> tuple[list[dict[str, str]], int]:
+        """Rows that are new or changed since the last acknowledged sync; also returns the unchanged count."""
+        known = self._load("raw_events", "event_id")
+        pending = [r for r in rows if known.get(r.get(RAW_EVENT_KEY) or "") != raw_fingerprint(r)]
+        return pending, len(rows) - len(pending)
+
+    def pending_summary(self, rows: list[dict[str, str]]) -> tuple[list[dict[str, str]], int]:
+        known = self._load("daily_summary", "trade_date_vn")
+        pending = [r for r in rows if known.get(r.get(DAILY_SUMMARY_KEY) or "") != summary_fingerprint(r)]
+        return pending, len(rows) - len(pending)
+
+    def missing_raw(self, rows: list[dict[str, str]]) -> dict[str, str]:
+        """event_id -> trade_date_vn of live ledger rows absent from `rows` (only meaningful for full-history input)."""
+        present = {r.get(RAW_EVENT_KEY) for r in rows}
+        with closing(
+            self._conn.execute(
+                "SELECT event_id, trade_date_vn FROM raw_events WHERE target = ? AND fingerprint NOT LIKE '%:1'",
+                (self.target,),
+            )
+        ) as cur:
+            return {event_id: trade_date or "" for event_id, trade_date in cur if event_id not in present}
+
+    def mark_raw(self, rows: Iterable[dict[str, str]]) -> None:
+        now = _now()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO raw_events (target, event_id, fingerprint, trade_date_vn, synced_at_utc) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (self.target, r[RAW_EVENT_KEY], raw_fingerprint(r), r.get("trade_date_vn") or "", now)
+                    for r in rows
+                    if r.get(RAW_EVENT_KEY)
+                ),
+            )
+
+    def mark_summary(self, rows: Iterable[dict[str, str]]) -> None:
+        now = _now()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO daily_summary (target, trade_date_vn, fingerprint, synced_at_utc) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (self.target, r[DAILY_SUMMARY_KEY], summary_fingerprint(r), now)
+                    for r in rows
+                    if r.get(DAILY_SUMMARY_KEY)
+                ),
+            )
+
+
+def _now() -> str:
+    return datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
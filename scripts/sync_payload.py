@@ -0,0 +1,231 @@
+"""Wire formats and byte-budgeted chunking for the Worker `/api/sync` endpoint.
+
+Formats (picked from `GET /api/sync/capabilities`; a Worker without that
+endpoint keeps receiving plain JSON):
+- json: {"summary_rows": [{...}], "raw_rows": [{...}]} (original contract)
+- columnar: {"summary": {"columns": [...], "rows": [[...]]}, "raw": {...}}
+  sent as COLUMNAR_CONTENT_TYPE, so keys are written once per chunk
+- either one optionally gzip-compressed (`Content-Encoding: gzip`)
+
+Chunks are cut by encoded size instead of row count. The byte budget grows
+while the Worker answers quickly and shrinks on slow answers, retries and 413.
+"""
+
+from __future__ import annotations
+
+import gzip
+import threading
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import accumulate
+from operator import itemgetter
+from typing import Any
+
+import json_codec
+
+JSON_CONTENT_TYPE = "application/json"
+COLUMNAR_CONTENT_TYPE = "application/vnd.tradingjournal.sync-columnar+json"
+CAPABILITIES_PATH = "/api/sync/capabilities"
+PAYLOAD_FORMATS = ("auto", "json", "columnar")
+COMPRESSION_MODES = ("auto", "gzip", "none")
+# Legacy JSON key and columnar key per row kind.
+KINDS = {"summary": "summary_rows", "raw": "raw_rows"}
+GZIP_LEVEL = 6
+
+
+class UnsupportedPayload(ValueError):
+    """Content type / encoding the receiver does not understand."""
+
+
+@dataclass(frozen=True)
+class WireFormat:
+    columnar: bool = False
+    gzip: bool = False
+
+    @property
+    def name(self) -> str:
+        return ("columnar" if self.columnar else "json") + ("+gzip" if self.gzip else "")
+
+    def headers(self) -> dict[str, str]:
+        headers = {"Content-Type": COLUMNAR_CONTENT_TYPE if self.columnar else JSON_CONTENT_TYPE}
+        if self.gzip:
+            headers["Content-Encoding"] = "gzip"
+        return headers
+
+
+def negotiate(capabilities: dict[str, Any] | None, payload_format: str = "auto", compression: str = "auto") -> WireFormat:
+    """Explicit choices win; `auto` uses what the Worker advertises (nothing -> legacy JSON)."""
+    formats = set((capabilities or {}).get("formats") or ["json"])
+    encodings = set((capabilities or {}).get("encodings") or [])
+    columnar = payload_format == "columnar" or (payload_format == "auto" and "columnar" in formats)
+    compressed = compression == "gzip" or (compression == "auto" and "gzip" in encodings)
+    return WireFormat(columnar=columnar, gzip=compressed)
+
+
+def capabilities() -> dict[str, Any]:
+    """What this module can decode; served by receivers at CAPABILITIES_PATH."""
+    return {"formats": ["json", "columnar"], "encodings": ["gzip"]}
+
+
+def decode_payload(body: bytes, content_type: str, content_encoding: str = "") -> dict[str, list[dict[str, Any]]]:
+    """Return {"summary_rows": [...], "raw_rows": [...]} from any supported wire format."""
+    encoding = (content_encoding or "").strip().lower()
+    if encoding == "gzip":
+        try:
+            body = gzip.decompress(body)
+        except (OSError, EOFError) as exc:
+            raise ValueError(f"Invalid gzip body: {exc}") from exc
+    elif encoding not in {"", "identity"}:
+        raise UnsupportedPayload(f"Unsupported Content-Encoding: {content_encoding}")
+
+    media_type = (content_type or JSON_CONTENT_TYPE).split(";", 1)[0].strip().lower()
+    if media_type not in {JSON_CONTENT_TYPE, COLUMNAR_CONTENT_TYPE}:
+        raise UnsupportedPayload(f"Unsupported Content-Type: {content_type}")
+    try:
+        payload = json_codec.loads(body)
+    except ValueError as exc:
+        raise ValueError(f"Invalid JSON body: {exc}") from exc
+    if not isinstance(payload, dict):
+        raise ValueError("Payload must be an object")
+
+    if media_type == JSON_CONTENT_TYPE:
+        return {key: payload.get(key) or [] for key in KINDS.values()}
+    out: dict[str, list[dict[str, Any]]] = {}
+    for kind, key in KINDS.items():
+        block = payload.get(kind) or {}
+        columns, rows = block.get("columns") or [], block.get("rows") or []
+        if not isinstance(columns, list) or not isinstance(rows, list):
+            raise ValueError(f"{kind}.columns and {kind}.rows must be arrays")
+        out[key] = [dict(zip(columns, values)) for values in rows]
+    return out
+
+
+class EncodedRows:
+    """Rows of one kind pre-encoded as JSON fragments (UTF-8), with cumulative sizes for cutting."""
+
+    def __init__(self, kind: str, rows: list[dict[str, Any]], fmt: WireFormat) -> None:
+        self.kind = kind
+        self.rows = rows
+        self.fmt = fmt
+        dumps = json_codec.dumps
+        if fmt.columnar:
+            self.columns = list(dict.fromkeys(k for r in rows for k in r))
+            cols = self.columns
+            if rows and all(len(r) == len(cols) for r in rows):
+                # Every row has every column (the usual case): one itemgetter per row.
+                get = itemgetter(*cols)
+                self.fragments = [dumps(list(get(r)) if len(cols) > 1 else [get(r)]) for r in rows]
+            else:
+                self.fragments = [dumps([r.get(c) for c in cols]) for r in rows]
+            self.prefix = b'{"' + kind.encode() + b'":{"columns":' + dumps(cols) + b',"rows":['
+            self.suffix = b"]}}"
+        else:
+            self.fragments = [dumps(r) for r in rows]
+            others = "".join(f',"{key}":[]' for k, key in KINDS.items() if k != kind)
+            self.prefix = f'{{"{KINDS[kind]}":['.encode()
+            self.suffix = ("]" + others + "}").encode()
+        # offsets[i] = bytes of rows[:i] including the separating commas.
+        self.offsets = [0, *accumulate(len(f) + 1 for f in self.fragments)]
+
+    def cut(self, start: int, end: int, budget: int, max_rows: int = 0) -> int:
+        """End index of the chunk starting at `start`; always at least one row."""
+        room = budget - len(self.prefix) - len(self.suffix)
+        stop = bisect_right(self.offsets, self.offsets[start] + room, lo=start + 1, hi=end + 1) - 1
+        if max_rows > 0:
+            stop = min(stop, start + max_rows)
+        return max(stop, start + 1)
+
+    def body(self, start: int, end: int) -> bytes:
+        return self.prefix + b",".join(self.fragments[start:end]) + self.suffix
+
+
+@dataclass
+class Chunk:
+    part: int
+    kind: str
+    start: int
+    end: int
+    rows: list[dict[str, Any]]
+    body: bytes
+    raw_bytes: int
+
+    @property
+    def wire_bytes(self) -> int:
+        return len(self.body)
+
+
+@dataclass
+class ByteBudget:
+    """AIMD-style budget: +25% on fast answers, -30% on slow ones, halved on retries and 413."""
+
+    current: int
+    min_bytes: int
+    max_bytes: int
+    target_latency_sec: float
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def _set(self, value: float) -> None:
+        self.current = int(min(self.max_bytes, max(self.min_bytes, value)))
+
+    def on_success(self, elapsed_sec: float) -> None:
+        with self._lock:
+            if elapsed_sec < self.target_latency_sec / 2:
+                self._set(self.current * 1.25)
+            elif elapsed_sec > self.target_latency_sec:
+                self._set(self.current * 0.7)
+
+    def on_retry(self) -> None:
+        with self._lock:
+            self._set(self.current * 0.5)
+
+    def on_too_large(self, chunk_bytes: int) -> None:
+        """The Worker's size limit is below `chunk_bytes`: never grow back past it."""
+        with self._lock:
+            self.max_bytes = max(self.min_bytes, min(self.max_bytes, int(chunk_bytes * 0.8)))
+            self._set(min(self.current, chunk_bytes) * 0.5)
+
+
+class ChunkPlanner:
+    """Hands out chunks cut to the current budget; rejected chunks go back to the front."""
+
+    def __init__(self, parts: list[EncodedRows], budget: ByteBudget, max_rows: int = 0) -> None:
+        self.parts = parts
+        self.budget = budget
+        self.max_rows = max_rows
+        self._queue: deque[tuple[int, int, int]] = deque(
+            (idx, 0, len(part.rows)) for idx, part in enumerate(parts) if part.rows
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._queue)
+
+    def next_chunk(self) -> Chunk | None:
+        if not self._queue:
+            return None
+        idx, start, end = self._queue.popleft()
+        part = self.parts[idx]
+        stop = part.cut(start, end, self.budget.current, self.max_rows)
+        if stop < end:
+            self._queue.appendleft((idx, stop, end))
+        text = part.body(start, stop)
+        body = gzip.compress(text, compresslevel=GZIP_LEVEL, mtime=0) if part.fmt.gzip else text
+        return Chunk(idx, part.kind, start, stop, part.rows[start:stop], body, len(text))
+
+    def reject(self, chunk: Chunk, status: int) -> bool:
+        """Requeue a chunk the Worker refused as too large; False when it cannot be split."""
+        if status != 413 or chunk.end - chunk.start <= 1:
+            return False
+        self.budget.on_too_large(chunk.raw_bytes)
+        # Split explicitly so progress does not depend on the budget floor.
+        mid = (chunk.start + chunk.end) // 2
+        self._queue.appendleft((chunk.part, mid, chunk.end))
+        self._queue.appendleft((chunk.part, chunk.start, mid))
+        return True
+
+    def plan(self) -> list[Chunk]:
+        """Drain the planner at the current (static) budget; used by dry runs."""
+        chunks = []
+        while (chunk := self.next_chunk()) is not None:
+            chunks.append(chunk)
+        return chunks
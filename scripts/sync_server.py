@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Reference implementation of the Cloudflare Worker API backed by SQLite.
+
+Local stand-in for the Worker + D1 so push_to_cloudflare_worker.py can be
+exercised and benchmarked offline, and the dashboard served from the same store.
+
+Contract (same as the Worker):
+- POST /api/sync {"summary_rows": [...], "raw_rows": [...]}
+  - INSERT OR REPLACE by raw_events.event_id / daily_summary.trade_date_vn
+  - one transaction per request
+  - requires `Authorization: Bearer <token>`
+  - also accepts the columnar format and gzip bodies (see sync_payload.py),
+    advertised at GET /api/sync/capabilities
+- POST /api/digest {"months": [...], "leaves": [[account_id, day], ...]}
+  - digest tree of the live raw events (see digest_tree.py): root and month
+    digests, the leaf digests of the requested months and
+    [event_id, trade_date_vn, fingerprint] of the live rows in the requested
+    leaves; used by reconcile.py
+  - requires the sync token
+- GET /api/summary
+- GET /api/raw-events?from_date=&to_date=&limit=&offset=
+- When CF Access client id/secret are configured, every /api/* call must send
+  matching `CF-Access-Client-Id` / `CF-Access-Client-Secret` headers (emulates
+  the Access Service Auth policy)
+
+Run:
+- uvicorn scripts.sync_server:app --port 8788
+- python scripts/sync_server.py --port 8788 --db state/sync_reference.db
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager, closing
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from dotenv import load_dotenv
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    # Allow sibling imports when served as `scripts.sync_server:app`.
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from digest_tree import UNDATED, DigestTree, is_live, leaf_of  # noqa: E402
+from journal_schema import (  # noqa: E402
+    DAILY_SUMMARY_COLUMNS,
+    DAILY_SUMMARY_KEY,
+    RAW_EVENT_COLUMNS,
+    RAW_EVENT_KEY,
+)
+from sync_ledger import raw_fingerprint  # noqa: E402
+from sync_payload import CAPABILITIES_PATH, UnsupportedPayload, capabilities, decode_payload  # noqa: E402
+
+
+def _split_csv_env(name: str) -> list[str]:
+    raw = os.getenv(name, "")
+    return [x.strip() for x in raw.split(",") if x.strip()]
+
+
+load_dotenv(encoding="utf-8-sig")
+
+DB_PATH = Path(os.getenv("SYNC_DB_PATH", "state/sync_reference.db"))
+SYNC_API_TOKEN = (os.getenv("SYNC_API_TOKEN") or os.getenv("WORKER_API_TOKEN", "")).strip()
+CF_ACCESS_CLIENT_ID = os.getenv("SYNC_CF_ACCESS_CLIENT_ID", "").strip()
+CF_ACCESS_CLIENT_SECRET = os.getenv("SYNC_CF_ACCESS_CLIENT_SECRET", "").strip()
+PROTECT_READS = os.getenv("SYNC_PROTECT_READS", "").strip() == "1"
+DASHBOARD_DIR = Path(os.getenv("SYNC_DASHBOARD_DIR", "dashboard"))
+CORS_ALLOW_ORIGINS = _split_csv_env("CORS_ALLOW_ORIGINS")
+
+TABLES = {
+    "raw_events": (RAW_EVENT_KEY, RAW_EVENT_COLUMNS),
+    "daily_summary": (DAILY_SUMMARY_KEY, DAILY_SUMMARY_COLUMNS),
+}
+DIGEST_COLUMNS = ("event_id", "account_id", "trade_date_vn", "source_hash", "usd_vnd_rate", "fx_rate_time_utc", "is_deleted")
+DIGEST_PATH = "/api/digest"
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    init_db()
+    yield
+
+
+app = FastAPI(title="Trading Sync Reference API", version="1.0.0", lifespan=lifespan)
+
+if CORS_ALLOW_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ALLOW_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["GET", "POST"],
+        allow_headers=["*"],
+    )
+
+
+def connect(path: Path = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def init_db(path: Path = DB_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with closing(connect(path)) as conn, conn:
+        for table, (key, columns) in TABLES.items():
+            cols = ", ".join(f'"{c}" PRIMARY KEY' if c == key else f'"{c}"' for c in columns)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
+            # Columns added to the schema later (e.g. the VND totals) on databases created before.
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for c in columns:
+                if c not in existing:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN "{c}"')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_raw_events_trade_date_vn ON raw_events (trade_date_vn)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_raw_events_close_time_vn ON raw_events (close_time_vn)")
+
+
+def upsert_rows(conn: sqlite3.Connection, table: str, rows: list[dict[str, Any]]) -> int:
+    key, columns = TABLES[table]
+    rows = [r for r in rows if r.get(key)]
+    if not rows:
+        return 0
+    placeholders = ", ".join("?" for _ in columns)
+    names = ", ".join(f'"{c}"' for c in columns)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({placeholders})",
+        ([r.get(c) for c in columns] for r in rows),
+    )
+    return len(rows)
+
+
+def require_cf_access(
+    cf_access_client_id: str | None = Header(default=None),
+    cf_access_client_secret: str | None = Header(default=None),
+) -> None:
+    if not (CF_ACCESS_CLIENT_ID and CF_ACCESS_CLIENT_SECRET):
+        return
+    if cf_access_client_id != CF_ACCESS_CLIENT_ID or cf_access_client_secret != CF_ACCESS_CLIENT_SECRET:
+        # Cloudflare Access answers a failed Service Auth with 403.
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def _bearer(authorization: str | None) -> str:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return ""
+
+
+def require_sync_token(
+    authorization: str | None = Header(default=None),
+    _: None = Depends(require_cf_access),
+) -> None:
+    if not SYNC_API_TOKEN or _bearer(authorization) != SYNC_API_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+def require_read_access(
+    authorization: str | None = Header(default=None),
+    _: None = Depends(require_cf_access),
+) -> None:
+    if PROTECT_READS and (not SYNC_API_TOKEN or _bearer(authorization) != SYNC_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+@app.get("/health")
+def health() -> dict[str, Any]:
+    with closing(connect()) as conn:
+        counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in TABLES}
+    return {"status": "ok", "db_path": str(DB_PATH), "rows": counts}
+
+
+@app.get(CAPABILITIES_PATH)
+def sync_capabilities(_: None = Depends(require_sync_token)) -> dict[str, Any]:
+    return capabilities()
+
+
+def apply_sync(summary_rows: list[dict[str, Any]], raw_rows: list[dict[str, Any]]) -> dict[str, Any]:
+    started = time.perf_counter()
+    with closing(connect()) as conn, conn:
+        summary_upserted = upsert_rows(conn, "daily_summary", summary_rows)
+        raw_upserted = upsert_rows(conn, "raw_events", raw_rows)
+    return {
+        "status": "ok",
+        "summary_upserted": summary_upserted,
+        "raw_upserted": raw_upserted,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+@app.post("/api/sync")
+async def post_sync(request: Request, _: None = Depends(require_sync_token)) -> dict[str, Any]:
+    body = await request.body()
+    try:
+        payload = decode_payload(
+            body,
+            request.headers.get("content-type", ""),
+            request.headers.get("content-encoding", ""),
+        )
+    except UnsupportedPayload as exc:
+        raise HTTPException(status_code=415, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    summary_rows = payload["summary_rows"]
+    raw_rows = payload["raw_rows"]
+    if not isinstance(summary_rows, list) or not isinstance(raw_rows, list):
+        raise HTTPException(status_code=400, detail="summary_rows and raw_rows must be arrays")
+    return await run_in_threadpool(apply_sync, summary_rows, raw_rows)
+
+
+_digest_lock = threading.Lock()
+_digest_cache: dict[tuple[int, int], DigestTree] = {}
+
+
+def _digest_rows(conn: sqlite3.Connection, where: str = "", params: list[Any] | None = None) -> list[dict[str, Any]]:
+    cols = ", ".join(f'"{c}"' for c in DIGEST_COLUMNS)
+    return [dict(r) for r in conn.execute(f"SELECT {cols} FROM raw_events {where}", params or [])]
+
+
+def current_digest(conn: sqlite3.Connection) -> DigestTree:
+    # INSERT OR REPLACE always assigns a new rowid, so (count, max rowid) changes with every write.
+    count, max_rowid = conn.execute("SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM raw_events").fetchone()
+    with _digest_lock:
+        tree = _digest_cache.get((count, max_rowid))
+        if tree is None:
+            tree = DigestTree.from_rows(_digest_rows(conn))
+            _digest_cache.clear()
+            _digest_cache[(count, max_rowid)] = tree
+        return tree
+
+
+def digest_report(months: list[str], leaves: list[tuple[str, str]]) -> dict[str, Any]:
+    with closing(connect()) as conn:
+        report = current_digest(conn).as_dict(set(months))
+        if leaves:
+            wanted = set(leaves)
+            days = sorted({day for _, day in wanted})
+            where = f"WHERE trade_date_vn IN ({', '.join('?' for _ in days)})"
+            if UNDATED in days:
+                where += " OR trade_date_vn IS NULL OR trade_date_vn = ''"
+            rows = _digest_rows(conn, where, days)
+            report["leaf_rows"] = [
+                [r["event_id"], r["trade_date_vn"] or "", raw_fingerprint(r)] for r in rows if leaf_of(r) in wanted and is_live(r)
+            ]
+    return report
+
+
+@app.post(DIGEST_PATH)
+async def post_digest(request: Request, _: None = Depends(require_sync_token)) -> dict[str, Any]:
+    try:
+        body = await request.json()
+        months = [str(m) for m in body.get("months") or []]
+        leaves = [(str(a), str(d)) for a, d in body.get("leaves") or []]
+    except (ValueError, TypeError, AttributeError) as exc:
+        raise HTTPException(status_code=400, detail="expected {\"months\": [...], \"leaves\": [[account_id, day], ...]}") from exc
+    return await run_in_threadpool(digest_report, months, leaves)
+
+
+@app.get("/api/summary")
+def get_summary(_: None = Depends(require_read_access)) -> dict[str, Any]:
+    with closing(connect()) as conn:
+        rows = [dict(r) for r in conn.execute("SELECT * FROM daily_summary ORDER BY trade_date_vn")]
+    return {"rows": rows, "count": len(rows)}
+
+
+@app.get("/api/raw-events")
+def get_raw_events(
+    from_date: str = "",
+    to_date: str = "",
+    limit: int = 0,
+    offset: int = 0,
+    _: None = Depends(require_read_access),
+) -> dict[str, Any]:
+    where: list[str] = []
+    params: list[Any] = []
+    if from_date:
+        where.append("trade_date_vn >= ?")
+        params.append(from_date)
+    if to_date:
+        where.append("trade_date_vn <= ?")
+        params.append(to_date)
+    sql = "SELECT * FROM raw_events"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY close_time_vn DESC, event_id"
+    if (limit and limit > 0) or (offset and offset > 0):
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit if limit and limit > 0 else -1, max(offset, 0)]
+    with closing(connect()) as conn:
+        rows = [dict(r) for r in conn.execute(sql, params)]
+    return {"rows": rows, "count": len(rows)}
+
+
+if DASHBOARD_DIR.is_dir():
+    app.mount("/dashboard", StaticFiles(directory=DASHBOARD_DIR, html=True), name="dashboard")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the SQLite-backed reference Worker API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--db", default="", help="SQLite path; fallback env SYNC_DB_PATH")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.db:
+        os.environ["SYNC_DB_PATH"] = args.db
+    import uvicorn
+
+    uvicorn.run("scripts.sync_server:app", host=args.host, port=args.port, app_dir=str(SCRIPTS_DIR.parent))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
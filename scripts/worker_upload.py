@@ -0,0 +1,301 @@
+"""Upload engine for the Worker `/api/sync` endpoint.
+
+- keep-alive HTTP connections (http.client) reused across chunks
+- chunks (see sync_payload.py) sent concurrently with a bounded number of
+  in-flight requests; each one feeds its latency back into the byte budget
+- retry with full-jitter exponential backoff on 429 / 5xx / connection
+  errors, honouring `Retry-After`
+- checkpoint of acknowledged rows so `--resume` skips what a failed run
+  already delivered
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+import json_codec
+from retry_policy import RetryPolicy
+from sync_payload import Chunk, ChunkPlanner
+
+# Cloudflare answers 520/522/524 when the Worker or its origin fails.
+RETRY_STATUSES = {429, 500, 502, 503, 504, 520, 522, 524}
+# Failures of a reused keep-alive socket the server already closed.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class UploadError(RuntimeError):
+    def __init__(self, message: str, status: int = 0) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent connections to one origin."""
+
+    def __init__(self, base_url: str, size: int, timeout_sec: float) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise ValueError(f"Unsupported Worker URL: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout_sec = timeout_sec
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=max(size, 1))
+        self.opened = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.opened += 1
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout_sec)
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method: str, path: str, body: bytes, headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        conn = self._acquire()
+        for fresh in (False, True):
+            reused = conn.sock is not None
+            try:
+                conn.request(method, self.base_path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused or fresh:
+                    raise
+                conn = self._connect()
+                continue
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return resp.status, {k.lower(): v for k, v in resp.getheaders()}, data
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class UploadCheckpoint:
+    """Append-only log of acknowledged rows (`kind`, key:fingerprint) for one Worker URL.
+
+    Rows rather than chunks are recorded because chunk boundaries depend on
+    the adaptive byte budget and differ between runs.
+    """
+
+    def __init__(self, path: Path, worker_url: str, resume: bool) -> None:
+        self.path = path
+        self.worker_url = worker_url.rstrip("/")
+        self.acked: dict[str, set[str]] = {}
+        self.chunks = 0
+        if resume and path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("worker_url") == self.worker_url:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break  # torn last line of a killed run
+                        self.acked.setdefault(entry["kind"], set()).update(entry["keys"])
+                        self.chunks += 1
+        self._file = None
+
+    def is_acked(self, kind: str, key: str) -> bool:
+        return key in self.acked.get(kind, ())
+
+    def mark(self, kind: str, keys: list[str]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            resumed = [{"kind": k, "keys": sorted(v)} for k, v in self.acked.items()]
+            self._file = self.path.open("w", encoding="utf-8")
+            header = {
+                "worker_url": self.worker_url,
+                "started_at_utc": datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+            for entry in [header, *resumed]:
+                self._file.write(json.dumps(entry, ensure_ascii=True) + "\n")
+        self.acked.setdefault(kind, set()).update(keys)
+        self.chunks += 1
+        self._file.write(json.dumps({"kind": kind, "keys": keys}, ensure_ascii=True) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self) -> None:
+        self.close()
+        self.acked.clear()
+        self.path.unlink(missing_ok=True)
+
+
+@dataclass
+class UploadStats:
+    requests: int = 0
+    retries: int = 0
+    chunks: int = 0
+    split_chunks: int = 0
+    raw_bytes: int = 0
+    wire_bytes: int = 0
+
+
+class UploadEngine:
+    def __init__(
+        self,
+        base_url: str,
+        headers: dict[str, str],
+        concurrency: int = 4,
+        retry: RetryPolicy | None = None,
+        timeout_sec: float = 30,
+        log: Callable[[str], None] | None = None,
+    ) -> None:
+        self.concurrency = max(concurrency, 1)
+        self.pool = ConnectionPool(base_url, self.concurrency, timeout_sec)
+        self.headers = headers
+        self.retry = retry or RetryPolicy()
+        self.log = log or (lambda _msg: None)
+        self.stats = UploadStats()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "UploadEngine":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.pool.close()
+
+    def get_json(self, path: str) -> dict[str, Any] | None:
+        """Single GET without retries; None when the endpoint is missing or fails."""
+        try:
+            status, _, data = self.pool.request("GET", path, b"", {**self.headers, "Accept": "application/json"})
+            return json.loads(data.decode("utf-8")) if status == 200 else None
+        except (OSError, http.client.HTTPException, ValueError):
+            return None
+
+    def post(
+        self,
+        path: str,
+        body: bytes,
+        headers: dict[str, str],
+        on_retry: Callable[[], None] | None = None,
+    ) -> dict[str, Any]:
+        headers = {**self.headers, **headers}
+        for attempt in range(self.retry.max_attempts):
+            retry_after: float | None = None
+            try:
+                status, resp_headers, data = self.pool.request("POST", path, body, headers)
+            except (OSError, http.client.HTTPException) as exc:
+                error = UploadError(f"{type(exc).__name__}: {exc}")
+            else:
+                with self._lock:
+                    self.stats.requests += 1
+                if 200 <= status < 300:
+                    try:
+                        return json.loads(data.decode("utf-8")) if data else {}
+                    except ValueError as exc:
+                        raise UploadError(f"HTTP {status} with an invalid JSON body: {exc}", status) from exc
+                detail = data.decode("utf-8", errors="ignore")
+                error = UploadError(f"HTTP {status} {detail}", status)
+                if status not in RETRY_STATUSES:
+                    raise error
+                retry_after = _parse_retry_after(resp_headers.get("retry-after"))
+            if attempt + 1 >= self.retry.max_attempts:
+                raise error
+            delay = self.retry.delay(attempt, retry_after)
+            with self._lock:
+                self.stats.retries += 1
+            if on_retry is not None:
+                on_retry()
+            self.log(f"retry {attempt + 1}/{self.retry.max_attempts - 1} in {delay:.2f}s: {error}")
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def post_json(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        return self.post(path, json_codec.dumps(payload), {"Content-Type": "application/json"})
+
+    def _send(self, path: str, planner: ChunkPlanner, chunk: Chunk, headers: dict[str, str]) -> dict[str, Any]:
+        started = time.perf_counter()
+        resp = self.post(path, chunk.body, headers, on_retry=planner.budget.on_retry)
+        planner.budget.on_success(time.perf_counter() - started)
+        return resp
+
+    def upload(
+        self,
+        path: str,
+        planner: ChunkPlanner,
+        headers: dict[str, str],
+        on_ack: Callable[[Chunk, dict[str, Any]], None],
+    ) -> None:
+        """POST every chunk the planner hands out, `concurrency` at a time.
+
+        Chunks are cut when a slot frees up, so each one uses the latest byte
+        budget. `on_ack(chunk, response)` runs on this thread. A 413 splits the
+        chunk; on any other failure no new requests are started, in-flight
+        ones are drained (and acknowledged if they succeed), then the error
+        is raised.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending: dict[Future, Chunk] = {}
+            failure: BaseException | None = None
+            while pending or (planner and failure is None):
+                while failure is None and len(pending) < self.concurrency:
+                    chunk = planner.next_chunk()
+                    if chunk is None:
+                        break
+                    pending[executor.submit(self._send, path, planner, chunk, headers)] = chunk
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = pending.pop(future)
+                    exc = future.exception()
+                    if exc is not None:
+                        if isinstance(exc, UploadError) and planner.reject(chunk, exc.status):
+                            self.stats.split_chunks += 1
+                            self.log(f"chunk of {len(chunk.rows)} rows ({chunk.raw_bytes} B) too large; splitting")
+                            continue
+                        failure = failure or exc
+                        continue
+                    self.stats.chunks += 1
+                    self.stats.raw_bytes += chunk.raw_bytes
+                    self.stats.wire_bytes += chunk.wire_bytes
+                    on_ack(chunk, future.result())
+            if failure is not None:
+                raise failure
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
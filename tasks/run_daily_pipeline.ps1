@@ -12,7 +12,8 @@ if (!(Test-Path $logDir)) {
 
 $stamp = Get-Date -Format "yyyyMMdd_HHmmss"
 $runLog = Join-Path $logDir "pipeline_$stamp.log"
-$stateFile = Join-Path $ProjectRoot "state\pipeline_runner_state.json"
+# pipeline.py writes its own log; Write-Log keeps $runLog for this wrapper only.
+$pythonLog = Join-Path $logDir "pipeline_py_$stamp.log"
 $runtimeLockFile = Join-Path $ProjectRoot "state\python_runtime_lock.json"
 
 function Write-Log {
@@ -21,31 +22,6 @@ function Write-Log {
     $line | Tee-Object -FilePath $runLog -Append
 }
 
-function Load-RunnerState {
-    if (Test-Path $stateFile) {
-        $s = Get-Content $stateFile -Raw | ConvertFrom-Json
-        if (-not ($s.PSObject.Properties.Name -contains "last_success_day_xm")) {
-            # Backward compatibility with old state key.
-            $fallback = $null
-            if ($s.PSObject.Properties.Name -contains "last_success_day_vn") {
-                $fallback = $s.last_success_day_vn
-            }
-            return [PSCustomObject]@{ last_success_day_xm = $fallback }
-        }
-        return $s
-    }
-    return [PSCustomObject]@{ last_success_day_xm = $null }
-}
-
-function Save-RunnerState {
-    param([string]$LastDay)
-    $dir = Split-Path $stateFile -Parent
-    if (!(Test-Path $dir)) {
-        New-Item -ItemType Directory -Path $dir | Out-Null
-    }
-    [PSCustomObject]@{ last_success_day_xm = $LastDay } | ConvertTo-Json | Set-Content $stateFile -Encoding UTF8
-}
-
 function Resolve-PythonExe {
     param([string]$Root)
 
@@ -154,34 +130,6 @@ function Assert-PythonRuntimeLock {
     $current | ConvertTo-Json | Set-Content $LockFile -Encoding UTF8
 }
 
-function Get-DayRangeToProcess {
-    param([string]$LastSuccessDay)
-
-    # XM server timezone: UTC+2
-    $todayXm = (Get-Date).ToUniversalTime().AddHours(2).Date
-    $targetDay = $todayXm.AddDays(-1) # process up to yesterday XM
-
-    if ($LastSuccessDay) {
-        $startDay = [datetime]::ParseExact($LastSuccessDay, "yyyy-MM-dd", $null).AddDays(1)
-    }
-    else {
-        # First run fallback: process yesterday only
-        $startDay = $targetDay
-    }
-
-    if ($startDay -gt $targetDay) {
-        return @()
-    }
-
-    $days = @()
-    $cursor = $startDay
-    while ($cursor -le $targetDay) {
-        $days += $cursor.ToString("yyyy-MM-dd")
-        $cursor = $cursor.AddDays(1)
-    }
-    return $days
-}
-
 try {
     $python = Resolve-PythonExe -Root $ProjectRoot
     Write-Log "Python resolved: $python"
@@ -192,49 +140,17 @@ try {
     if (-not $probe.ok_deps) { throw "Pipeline dependencies import failed: $($probe.deps_error)" }
     Assert-PythonRuntimeLock -Probe $probe -LockFile $runtimeLockFile
 
+    # Catch-up days, extract, build and both pushes run as one batch in a single
+    # Python process; it reads/advances state\pipeline_runner_state.json itself.
     $accountsFile = Join-Path $ProjectRoot "state\accounts.json"
-    $runnerState = Load-RunnerState
-    $daysToProcess = Get-DayRangeToProcess -LastSuccessDay $runnerState.last_success_day_xm
-
-    if ($daysToProcess.Count -eq 0) {
-        Write-Log "No missing XM day to process. Exit."
-        exit 0
-    }
-
-    Write-Log "Catch-up days: $($daysToProcess -join ', ')"
-
-    foreach ($day in $daysToProcess) {
-        $rawOut = Join-Path $ProjectRoot ("out\raw_events_{0}.csv" -f $day)
-        Write-Log "Start processing day=$day"
-
-        if (Test-Path $accountsFile) {
-            Write-Log "Using multi-account config: $accountsFile"
-            & $python "scripts/extract_mt5_events.py" --accounts-file $accountsFile --day-xm $day --output $rawOut --output-format csv
-        }
-        else {
-            & $python "scripts/extract_mt5_events.py" --day-xm $day --output $rawOut --output-format csv
-        }
-        if ($LASTEXITCODE -ne 0) { throw "extract_mt5_events failed (day=$day) with exit code $LASTEXITCODE" }
-        Write-Log "Extract completed: $rawOut"
-
-        & $python "scripts/build_dashboard_data.py" --raw-input $rawOut
-        if ($LASTEXITCODE -ne 0) { throw "build_dashboard_data failed (day=$day) with exit code $LASTEXITCODE" }
-        Write-Log "Dashboard data updated for day=$day"
-
-        # Push full merged history to avoid overwriting sheet with only latest day.
-        & $python "scripts/push_to_gsheet.py" --raw-events "dashboard/data/raw_events_history.csv" --daily-summary "dashboard/data/daily_summary_history.csv"
-        if ($LASTEXITCODE -ne 0) { throw "push_to_gsheet failed (day=$day) with exit code $LASTEXITCODE" }
-        Write-Log "Push full history to Google Sheets completed for day=$day"
-
-        # Optional: push incremental day output to Cloudflare Worker API (D1-backed).
-        # Enabled when WORKER_API_URL and WORKER_API_TOKEN are configured in environment/.env.
-        & $python "scripts/push_to_cloudflare_worker.py" --summary-input "out/daily_summary_latest.csv" --raw-input $rawOut --skip-if-missing
-        if ($LASTEXITCODE -ne 0) { throw "push_to_cloudflare_worker failed (day=$day) with exit code $LASTEXITCODE" }
-        Write-Log "Push incremental day data to Cloudflare Worker completed for day=$day"
-
-        Save-RunnerState -LastDay $day
-        Write-Log "Runner state updated: last_success_day_xm=$day"
-    }
+    $pipelineArgs = @("scripts/pipeline.py", "--log-file", $pythonLog)
+    Write-Log "Pipeline log: $pythonLog"
+    if (Test-Path $accountsFile) {
+        Write-Log "Using multi-account config: $accountsFile"
+        $pipelineArgs += @("--accounts-file", $accountsFile)
+    }
+    & $python @pipelineArgs
+    if ($LASTEXITCODE -ne 0) { throw "pipeline failed with exit code $LASTEXITCODE" }
 
     Write-Log "Pipeline finished successfully"
     exit 0
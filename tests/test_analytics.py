@@ -0,0 +1,73 @@
+"""Analytics aggregates against a hand-computed set of positions."""
+
+from __future__ import annotations
+
+from analytics import Filters, by_hour, by_symbol, equity_curve, overview
+from api_data import build_raw_columns
+
+
+def deal(event_id: str, account: str, position: str, symbol: str, close: str, **amounts: str) -> dict[str, str]:
+    return {
+        "event_id": event_id,
+        "event_type": "trade",
+        "account_id": account,
+        "position_id": position,
+        "symbol": symbol,
+        "trade_date_vn": close[:10],
+        "close_time_vn": f"{close}:00+07:00",
+        "lots": "0.1",
+        "profit": amounts.get("profit", "0"),
+        "commission": amounts.get("commission", "0"),
+        "swap": amounts.get("swap", "0"),
+        "is_deleted": "False",
+    }
+
+
+# Positions in close order: A1:p1 +9, A1:p2 -5, A2:p1 +6, A1:p3 -2.
+RAW = [
+    deal("e1", "A1", "p1", "EURUSD", "2026-01-05T08:00", commission="-1"),
+    deal("e2", "A1", "p1", "EURUSD", "2026-01-05T09:30", profit="10"),
+    deal("e3", "A1", "p2", "XAUUSD", "2026-01-05T14:00", profit="-4", swap="-1"),
+    deal("e4", "A2", "p1", "EURUSD", "2026-01-06T10:00", profit="6"),
+    deal("e5", "A1", "p3", "EURUSD", "2026-01-12T11:00", profit="-2"),
+    {**deal("e6", "A1", "p4", "EURUSD", "2026-01-12T12:00", profit="100"), "is_deleted": "True"},
+    {**deal("e7", "A1", "", "", "2026-01-12T13:00", profit="500"), "event_type": "balance"},
+]
+
+
+def test_overview_matches_hand_computed_figures() -> None:
+    stats = overview(build_raw_columns(RAW), Filters())
+
+    assert (stats["positions"], stats["deals"], stats["wins"], stats["losses"]) == (4, 5, 2, 2)
+    assert stats["net_profit"] == 8.0
+    assert (stats["gross_profit"], stats["gross_loss"]) == (15.0, -7.0)
+    assert stats["profit_factor"] == 15 / 7
+    assert (stats["win_rate"], stats["expectancy"]) == (0.5, 2.0)
+    assert (stats["largest_win"], stats["largest_loss"]) == (9.0, -5.0)
+    # Equity 9, 4, 10, 8: the deepest fall is 9 -> 4.
+    assert stats["max_drawdown"] == 5.0
+    assert (stats["max_win_streak"], stats["max_loss_streak"], stats["current_streak"]) == (1, 1, -1)
+    assert (stats["first_trade_date_vn"], stats["last_trade_date_vn"]) == ("2026-01-05", "2026-01-12")
+
+
+def test_filters_select_deals_then_positions_by_close_date() -> None:
+    cols = build_raw_columns(RAW)
+
+    assert overview(cols, Filters(account_id="A1"))["net_profit"] == 2.0
+    assert overview(cols, Filters(to_date="2026-01-06"))["net_profit"] == 10.0
+    assert overview(cols, Filters(symbol="XAUUSD"))["positions"] == 1
+
+
+def test_breakdowns_by_symbol_hour_and_week() -> None:
+    cols = build_raw_columns(RAW)
+
+    symbols = {r["symbol"]: r for r in by_symbol(cols, Filters())}
+    assert (symbols["EURUSD"]["positions"], symbols["EURUSD"]["deals"], symbols["EURUSD"]["net_profit"]) == (3, 4, 13.0)
+    assert symbols["XAUUSD"]["net_profit"] == -5.0
+
+    hours = by_hour(cols, Filters())
+    assert (hours[9]["positions"], hours[9]["net_profit"]) == (1, 9.0)
+    assert sum(h["positions"] for h in hours) == 4
+
+    weeks = equity_curve(cols, Filters(), "week")
+    assert [(w["t"], w["pnl"], w["equity"]) for w in weeks] == [("2026-01-05", 10.0, 10.0), ("2026-01-12", -2.0, 8.0)]
@@ -0,0 +1,115 @@
+"""Snapshot types and change records of the API data layer."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from api_data import (
+    POINTER_NAME,
+    CsvSnapshot,
+    HistorySnapshot,
+    MappedSnapshot,
+    SnapshotStore,
+    build_raw_columns,
+    publish_tables,
+    read_changes,
+)
+from journal_io import write_table
+
+RAW_HEADERS = ["event_id", "event_type", "account_id", "position_id", "symbol", "trade_date_vn", "close_time_vn", "profit", "is_deleted"]
+SUMMARY_HEADERS = ["trade_date_vn", "net_profit"]
+
+
+def raw_row(n: int, day: str, profit: str = "1") -> dict[str, str]:
+    return {
+        "event_id": f"e{n}",
+        "event_type": "trade",
+        "account_id": "A1",
+        "position_id": f"p{n}",
+        "symbol": "EURUSD",
+        "trade_date_vn": day,
+        "close_time_vn": f"{day}T{n % 24:02d}:00:00+07:00",
+        "profit": profit,
+        "is_deleted": "False",
+    }
+
+
+def summary_row(day: str, net_profit: str) -> dict[str, str]:
+    return {"trade_date_vn": day, "net_profit": net_profit}
+
+
+def publish(snapshot_dir: Path, raw: list[dict[str, str]], summary: list[dict[str, str]]) -> int:
+    return publish_tables(SUMMARY_HEADERS, summary, RAW_HEADERS, raw, snapshot_dir)["version"]
+
+
+def test_incomplete_snapshot_type_fails_when_created() -> None:
+    class SummaryOnly(HistorySnapshot):
+        def summary_rows(self) -> list[dict[str, str]]:
+            return []
+
+    with pytest.raises(TypeError, match="abstract"):
+        SummaryOnly()  # type: ignore[abstract]
+
+
+def test_mapped_snapshot_serves_the_published_rows_and_columns(tmp_path: Path) -> None:
+    raw = [raw_row(n, "2026-01-05" if n < 3 else "2026-01-06", str(n)) for n in range(1, 6)]
+    summary = [summary_row("2026-01-05", "3"), summary_row("2026-01-06", "12")]
+    snapshot_dir = tmp_path / "snapshot"
+    publish(snapshot_dir, raw, summary)
+    store = SnapshotStore(tmp_path / "daily_summary_history.csv", tmp_path / "raw_events_history.csv", snapshot_dir)
+
+    snapshot = store.get()
+
+    assert isinstance(snapshot, MappedSnapshot)
+    assert snapshot.summary_rows() == summary
+    assert [r["event_id"] for r in snapshot.raw_rows(from_date="2026-01-06", offset=1, limit=1)] == ["e4"]
+    expected = build_raw_columns(raw)
+    assert np.array_equal(snapshot.columns.profit, expected.profit)
+    assert np.array_equal(snapshot.columns.position_key, expected.position_key)
+    assert store.get() is snapshot
+
+
+def test_store_follows_new_publishes_and_serves_csvs_newer_than_the_pointer(tmp_path: Path) -> None:
+    snapshot_dir = tmp_path / "snapshot"
+    summary_path, raw_path = tmp_path / "daily_summary_history.csv", tmp_path / "raw_events_history.csv"
+    store = SnapshotStore(summary_path, raw_path, snapshot_dir)
+    publish(snapshot_dir, [raw_row(1, "2026-01-05")], [summary_row("2026-01-05", "1")])
+    assert store.get().version == "1"
+
+    publish(snapshot_dir, [raw_row(1, "2026-01-05"), raw_row(2, "2026-01-05")], [summary_row("2026-01-05", "2")])
+    assert (store.get().version, len(store.get().raw_rows())) == ("2", 2)
+
+    # CSVs rewritten without publishing: the pointer is stale until the next publish.
+    write_table(summary_path, SUMMARY_HEADERS, [summary_row("2026-01-05", "9")])
+    write_table(raw_path, RAW_HEADERS, [raw_row(3, "2026-01-05", "9")])
+    pointer_time = (snapshot_dir / POINTER_NAME).stat().st_mtime_ns
+    for path in (summary_path, raw_path):
+        os.utime(path, ns=(pointer_time + 10**9, pointer_time + 10**9))
+    snapshot = store.get()
+    assert isinstance(snapshot, CsvSnapshot)
+    assert snapshot.summary_rows() == [summary_row("2026-01-05", "9")]
+
+
+def test_change_records_of_several_versions_merge_to_the_last_state(tmp_path: Path) -> None:
+    snapshot_dir = tmp_path / "snapshot"
+    raw = [raw_row(n, "2026-01-05") for n in range(1, 11)]
+    summary = [summary_row("2026-01-05", "10")]
+    publish(snapshot_dir, raw, summary)
+    # v2: e1 changed, e2 deleted; v3: e2 back, e1 deleted, the day's total changed.
+    v2 = [raw_row(1, "2026-01-05", "5"), *raw[2:]]
+    publish(snapshot_dir, v2, summary)
+    v3 = [raw[1], *raw[2:]]
+    publish(snapshot_dir, v3, [summary_row("2026-01-05", "9")])
+
+    assert read_changes(snapshot_dir, 1, 2)["raw"] == {"upserted": [raw_row(1, "2026-01-05", "5")], "deleted": ["e2"]}
+    merged = read_changes(snapshot_dir, 1, 3)
+    assert merged["raw"] == {"upserted": [raw[1]], "deleted": ["e1"]}
+    assert merged["summary"] == {"upserted": [summary_row("2026-01-05", "9")], "deleted": []}
+    assert read_changes(snapshot_dir, 3, 3)["raw"] == {"upserted": [], "deleted": []}
+    # Version 1 has no predecessor, and version 4 does not exist yet: the client reloads.
+    assert read_changes(snapshot_dir, 0, 3) == {"reset": True}
+    assert read_changes(snapshot_dir, 4, 3) == {"reset": True}
@@ -0,0 +1,28 @@
+"""Prometheus text rendering of the API request metrics."""
+
+from __future__ import annotations
+
+from api_metrics import ApiMetrics
+
+
+def test_histograms_are_cumulative_and_counters_labelled() -> None:
+    metrics = ApiMetrics()
+    metrics.observe_request("GET", "/api/summary", 200, 0.003, 500)
+    metrics.observe_request("GET", "/api/summary", 200, 0.2, 50_000)
+    metrics.observe_request("GET", "/api/summary", 401, 0.001, 30)
+    metrics.register_cache("snapshot", lambda: (7, 2))
+
+    lines = set(metrics.render().splitlines())
+
+    labels = 'method="GET",route="/api/summary"'
+    assert f'api_requests_total{{{labels},status="200"}} 2' in lines
+    assert f'api_requests_total{{{labels},status="401"}} 1' in lines
+    assert f'api_request_duration_seconds_bucket{{{labels},le="0.005"}} 2' in lines
+    assert f'api_request_duration_seconds_bucket{{{labels},le="0.1"}} 2' in lines
+    assert f'api_request_duration_seconds_bucket{{{labels},le="0.25"}} 3' in lines
+    assert f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"api_request_duration_seconds_count{{{labels}}} 3" in lines
+    assert f'api_response_size_bytes_bucket{{{labels},le="1000"}} 2' in lines
+    assert 'api_cache_hits_total{cache="snapshot"} 7' in lines
+    assert 'api_cache_misses_total{cache="snapshot"} 2' in lines
+    assert "# TYPE api_request_duration_seconds histogram" in lines
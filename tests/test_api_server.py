@@ -0,0 +1,111 @@
+"""HTTP endpoints of the dashboard API over a temporary data directory."""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import threading
+import time
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+from api_data import publish_tables
+from journal_io import write_table
+
+# fastapi's TestClient runs on httpx, which the server itself does not need.
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+RAW_HEADERS = ["event_id", "event_type", "account_id", "position_id", "symbol", "trade_date_vn", "close_time_vn", "profit", "is_deleted"]
+SUMMARY_HEADERS = ["trade_date_vn", "net_profit"]
+
+
+def raw_row(n: int, day: str, profit: str, symbol: str = "EURUSD") -> dict[str, str]:
+    return {
+        "event_id": f"e{n}",
+        "event_type": "trade",
+        "account_id": "A1",
+        "position_id": f"p{n}",
+        "symbol": symbol,
+        "trade_date_vn": day,
+        "close_time_vn": f"{day}T{9 + n:02d}:00:00+07:00",
+        "profit": profit,
+        "is_deleted": "False",
+    }
+
+
+def load_server(data_dir: Path, monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+    """A fresh api_server module: its paths and settings are read from the environment at import."""
+    monkeypatch.setenv("API_DATA_DIR", str(data_dir))
+    monkeypatch.setenv("API_TOKEN", "")
+    monkeypatch.setenv("API_CHANGES_POLL_SEC", "0.05")
+    monkeypatch.delitem(sys.modules, "api_server", raising=False)
+    return importlib.import_module("api_server")
+
+
+@pytest.fixture
+def csv_server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> tuple[ModuleType, TestClient]:
+    raw = [raw_row(1, "2026-01-05", "10"), raw_row(2, "2026-01-05", "-4", "XAUUSD"), raw_row(3, "2026-01-06", "6")]
+    write_table(tmp_path / "raw_events_history.csv", RAW_HEADERS, raw)
+    write_table(tmp_path / "daily_summary_history.csv", SUMMARY_HEADERS, [{"trade_date_vn": "2026-01-05", "net_profit": "6"}])
+    server = load_server(tmp_path, monkeypatch)
+    return server, TestClient(server.app)
+
+
+def test_analytics_endpoints_serve_cached_aggregates(csv_server: tuple[ModuleType, TestClient]) -> None:
+    server, client = csv_server
+
+    overview = client.get("/api/analytics/overview", params={"to_date": "2026-01-05"}).json()
+    assert overview["filters"] == {"to_date": "2026-01-05"}
+    assert (overview["overview"]["positions"], overview["overview"]["net_profit"]) == (2, 6.0)
+    symbols = client.get("/api/analytics/by-symbol").json()["rows"]
+    assert [(r["symbol"], r["net_profit"]) for r in symbols] == [("EURUSD", 16.0), ("XAUUSD", -4.0)]
+    assert [r["t"] for r in client.get("/api/equity-curve").json()["rows"]] == ["2026-01-05", "2026-01-06"]
+    assert client.get("/api/equity-curve", params={"granularity": "month"}).status_code == 400
+
+    # Same data version and filters: answered from the analytics cache.
+    hits = server.analytics_cache.hits
+    client.get("/api/analytics/overview", params={"to_date": "2026-01-05"})
+    assert server.analytics_cache.hits == hits + 1
+
+
+def test_metrics_label_requests_by_route_template(csv_server: tuple[ModuleType, TestClient]) -> None:
+    _, client = csv_server
+    client.get("/api/raw-events", params={"from_date": "2026-01-06"})
+    client.get("/api/raw-events", params={"limit": "1"})
+    client.get("/no-such-route")
+
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = set(response.text.splitlines())
+    assert 'api_requests_total{method="GET",route="/api/raw-events",status="200"} 2' in lines
+    assert 'api_requests_total{method="GET",route="unmatched",status="404"} 1' in lines
+    assert 'api_cache_misses_total{cache="snapshot"} 1' in lines
+    assert "api_snapshot_reload_duration_seconds_count 1" in lines
+
+
+def test_changes_long_poll_times_out_or_returns_the_new_version(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    snapshot_dir = tmp_path / "snapshot"
+    raw = [raw_row(n, "2026-01-05", "1") for n in range(1, 11)]
+    summary = [{"trade_date_vn": "2026-01-05", "net_profit": "10"}]
+    publish_tables(SUMMARY_HEADERS, summary, RAW_HEADERS, raw, snapshot_dir)
+    client = TestClient(load_server(tmp_path, monkeypatch).app)
+
+    started = time.monotonic()
+    body = client.get("/api/changes", params={"since": "1", "wait": 0.3}).json()
+    assert time.monotonic() - started >= 0.3
+    assert (body["version"], body["reset"], body["count"]) == ("1", False, 0)
+
+    changed = raw_row(1, "2026-01-05", "5")
+    publisher = threading.Timer(0.2, publish_tables, (SUMMARY_HEADERS, summary, RAW_HEADERS, [changed, *raw[1:]], snapshot_dir))
+    publisher.start()
+    started = time.monotonic()
+    body = client.get("/api/changes", params={"since": "1", "wait": 30}).json()
+    publisher.join()
+    assert time.monotonic() - started < 10
+    assert (body["version"], body["count"], body["raw"]["upserted"]) == ("2", 1, [changed])
+
+    assert client.get("/api/changes", params={"since": "not-a-version"}).json()["reset"] is True
@@ -0,0 +1,99 @@
+"""Summaries recomputed from the merged raw history when a subset is merged."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from pathlib import Path
+
+from build_dashboard_data import build_history, read_csv
+from load_test_api import generate_history
+
+UPDATED_AT = "2026-01-01T00:00:00Z"
+
+
+def merge(data: Path, raw_rows: list[dict[str, str]]) -> dict:
+    raw_headers = read_csv(data / "raw_events_history.csv")[0]
+    return build_history(
+        [],
+        [],
+        raw_headers,
+        raw_rows,
+        data / "daily_summary_history.csv",
+        data / "raw_events_history.csv",
+        None,
+        quality_cache=None,
+        resummarize_at=UPDATED_AT,
+    )
+
+
+def net_profit_by_day(raw_rows: list[dict[str, str]]) -> dict[str, float]:
+    totals: dict[str, float] = defaultdict(float)
+    for r in raw_rows:
+        totals[r["trade_date_vn"]] += float(r["profit"] or 0)
+    return totals
+
+
+def test_subset_merge_keeps_other_accounts_in_day_totals(tmp_path: Path) -> None:
+    generate_history(tmp_path, 400, accounts=2, seed=3)
+    _, raw = read_csv(tmp_path / "raw_events_history.csv")
+    merge(tmp_path, raw)  # summaries as build_history computes them
+    summary_before = {r["trade_date_vn"]: r for r in read_csv(tmp_path / "daily_summary_history.csv")[1]}
+
+    # Re-merge one account only, with one closing deal changed.
+    account = raw[0]["account_id"]
+    subset = [dict(r) for r in raw if r["account_id"] == account]
+    changed = next(r for r in subset if float(r["profit"] or 0))
+    changed["profit"] = str(float(changed["profit"]) + 100)
+    history = merge(tmp_path, subset)
+
+    summary = {r["trade_date_vn"]: r for r in history["summary_rows"]}
+    assert summary.keys() == summary_before.keys()
+    for day, total in net_profit_by_day(history["raw_rows"]).items():
+        assert abs(float(summary[day]["net_profit"]) - total) < 1e-6
+    # Only the changed day is rewritten.
+    rewritten = {d for d, r in summary.items() if r != summary_before[d]}
+    assert rewritten == {changed["trade_date_vn"]}
+    assert "None" not in {v for r in summary.values() for v in r.values()}
+    assert history["quality"]["by_rule"].get("summary_mismatch", 0) == 0
+
+
+def test_days_without_live_events_are_dropped(tmp_path: Path) -> None:
+    generate_history(tmp_path, 40, accounts=1, seed=5)
+    _, raw = read_csv(tmp_path / "raw_events_history.csv")
+    merge(tmp_path, raw)  # summaries as build_history computes them
+    day = raw[0]["trade_date_vn"]
+    deleted = [{**r, "is_deleted": "True"} for r in raw if r["trade_date_vn"] == day]
+
+    history = merge(tmp_path, deleted)
+
+    assert day not in {r["trade_date_vn"] for r in history["summary_rows"]}
+
+
+def test_xm_day_batches_splitting_a_vn_day_keep_its_full_summary(tmp_path: Path) -> None:
+    source = tmp_path / "source"
+    generate_history(source, 400, accounts=2, seed=7)
+    raw_headers, raw = read_csv(source / "raw_events_history.csv")
+    split = {r["trade_date_vn"] for r in raw if r["trade_date_xm"] != r["trade_date_vn"]}
+    day = sorted(split & {r["trade_date_vn"] for r in raw if r["trade_date_xm"] == r["trade_date_vn"]})[0]
+
+    data = tmp_path / "data"
+    for xm_day in sorted({r["trade_date_xm"] for r in raw}):
+        batch = [r for r in raw if r["trade_date_xm"] == xm_day]
+        history = build_history(
+            [],
+            [],
+            raw_headers,
+            batch,
+            data / "daily_summary_history.csv",
+            data / "raw_events_history.csv",
+            None,
+            quality_cache=None,
+            resummarize_at=UPDATED_AT,
+        )
+
+    summary = {r["trade_date_vn"]: r for r in history["summary_rows"]}
+    expected = net_profit_by_day(history["raw_rows"])
+    assert summary.keys() == expected.keys()
+    assert abs(float(summary[day]["net_profit"]) - expected[day]) < 1e-6
+    assert int(summary[day]["total_deals"]) == sum(r["trade_date_vn"] == day for r in raw)
+    assert history["quality"]["by_rule"].get("summary_mismatch", 0) == 0
@@ -0,0 +1,149 @@
+"""Each data-quality rule fires on a crafted bad row of an otherwise clean history."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from build_dashboard_data import resummarize
+from data_quality import run_checks
+
+ACCOUNTS = ("A1", "A2")
+# Six weeks: the first positions are older than the 30 days an unbalanced one may stay open.
+DAYS = 30
+LAST_A2_CLOSE = f"A2:{1000 + 4 * DAYS - 1}"
+Rows = list[dict[str, str]]
+
+
+def weekdays(start: date, count: int) -> list[str]:
+    days = [start + timedelta(days=n) for n in range(count * 2)]
+    return [d.isoformat() for d in days if d.weekday() < 5][:count]
+
+
+def deal(ticket: int, account: str, position: str, day: str, hour: int, action: str, profit: float) -> dict[str, str]:
+    return {
+        "event_id": f"{account}:{ticket}",
+        "position_id": position,
+        "event_type": "trade",
+        "action": action,
+        "account_id": account,
+        "open_time_vn": "",
+        "close_time_vn": f"{day}T{hour:02d}:00:00+07:00",
+        # Same instant on the XM (UTC+2) clock; the trading hours keep it on the same date.
+        "close_time_xm": f"{day}T{hour - 5:02d}:00:00+02:00",
+        "trade_date_vn": day,
+        "trade_date_xm": day,
+        "source_hash": f"h{ticket}",
+        "is_deleted": "False",
+        "lots": "0.1",
+        "profit": str(profit),
+        "commission": "0",
+        "swap": "0",
+    }
+
+
+def clean_history() -> tuple[Rows, Rows]:
+    """Per account and weekday one position: a buy at 09:00 and the closing sell at 15:00."""
+    raw = []
+    ticket = 1000
+    for n, day in enumerate(weekdays(date(2026, 1, 5), DAYS)):
+        for account in ACCOUNTS:
+            position = str(ticket)
+            raw.append(deal(ticket, account, position, day, 9, "Buy", 0.0))
+            raw.append(deal(ticket + 1, account, position, day, 15, "Sell", 10.0 + n % 3))
+            ticket += 2
+    summary, _ = resummarize([], raw, "2026-02-01T00:00:00Z")
+    return raw, summary
+
+
+def edit(event_id: str, **values: str) -> Callable[[Rows, Rows], None]:
+    def apply(raw: Rows, _: Rows) -> None:
+        next(r for r in raw if r["event_id"] == event_id).update(values)
+
+    return apply
+
+
+def set_summary(day: str, **values: str) -> Callable[[Rows, Rows], None]:
+    def apply(_: Rows, summary: Rows) -> None:
+        next(r for r in summary if r["trade_date_vn"] == day).update(values)
+
+    return apply
+
+
+def drop_summary(raw: Rows, summary: Rows) -> None:
+    summary[:] = [r for r in summary if r["trade_date_vn"] != "2026-01-07"]
+
+
+def orphan_summary(raw: Rows, summary: Rows) -> None:
+    summary.append({**summary[0], "trade_date_vn": "2026-01-10"})
+
+
+def duplicate(raw: Rows, _: Rows) -> None:
+    raw.append(dict(raw[4]))
+
+
+def collision(raw: Rows, _: Rows) -> None:
+    raw.append({**raw[4], "source_hash": "other", "profit": "99"})
+
+
+def drop_closing_deal(raw: Rows, _: Rows) -> None:
+    raw.remove(next(r for r in raw if r["event_id"] == "A1:1001"))
+
+
+def gap(raw: Rows, _: Rows) -> None:
+    raw[:] = [r for r in raw if not (r["account_id"] == "A2" and "2026-01-07" <= r["trade_date_vn"] <= "2026-01-15")]
+
+
+def huge_day(raw: Rows, _: Rows) -> None:
+    next(r for r in raw if r["event_id"] == LAST_A2_CLOSE)["profit"] = "5000"
+
+
+CASES = [
+    ("event_id_account_mismatch", "A2:1003", edit("A2:1003", account_id="A1")),
+    ("missing_position_id", "A1:1004", edit("A1:1004", position_id="")),
+    ("missing_time", "A1:1004", edit("A1:1004", close_time_vn="")),
+    ("trade_date_mismatch", "A1:1004", edit("A1:1004", trade_date_xm="2026-01-05")),
+    ("timezone_mismatch", "A1:1004", edit("A1:1004", close_time_xm="2026-01-06T05:00:00+02:00")),
+    ("open_after_close", "A1:1005", edit("A1:1005", open_time_vn="2026-01-06T16:00:00+07:00")),
+    ("summary_mismatch", "2026-01-06", set_summary("2026-01-06", net_profit="999")),
+    ("summary_missing", "2026-01-07", drop_summary),
+    ("summary_orphan", "2026-01-10", orphan_summary),
+    ("duplicate_event_id", "A1:1004", duplicate),
+    ("event_id_collision", "A1:1004", collision),
+    ("unbalanced_position", "A1:1000", drop_closing_deal),
+    ("ticket_time_inversion", "A1:1005", edit("A1:1005", close_time_vn="2026-01-06T08:00:00+07:00")),
+    ("coverage_gap", "A2", gap),
+    ("outlier", "A2", huge_day),
+]
+
+
+def fired(raw: Rows, summary: Rows) -> set[tuple[str, str]]:
+    return {(f["rule"], f["key"]) for f in run_checks(summary, raw, cache_path=None)["findings"]}
+
+
+def test_clean_history_has_no_findings() -> None:
+    assert fired(*clean_history()) == set()
+
+
+@pytest.mark.parametrize(("rule", "key", "corrupt"), CASES, ids=[c[0] for c in CASES])
+def test_rule_fires_on_its_bad_row(rule: str, key: str, corrupt: Callable[[Rows, Rows], None]) -> None:
+    raw, summary = clean_history()
+    corrupt(raw, summary)
+
+    assert (rule, key) in fired(raw, summary)
+
+
+def test_cached_days_are_not_checked_again(tmp_path: Path) -> None:
+    raw, summary = clean_history()
+    cache = tmp_path / "cache.json"
+    first = run_checks(summary, raw, cache_path=cache)
+    # A re-extracted row carries a new source_hash, which changes its day's digest leaf.
+    edit("A1:1004", close_time_vn="", source_hash="changed")(raw, summary)
+
+    second = run_checks(summary, raw, cache_path=cache)
+
+    assert (first["days_checked"], second["days_checked"], second["days_cached"]) == (DAYS, 1, DAYS - 1)
+    assert [(f["rule"], f["key"]) for f in second["findings"]] == [("missing_time", "A1:1004")]
@@ -0,0 +1,60 @@
+"""Top-down digest comparison finds exactly the diverging months, days and rows."""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+from digest_tree import DigestTree, compare_rows, diverging_keys, flatten_days, rows_in
+from sync_ledger import raw_fingerprint
+
+
+def history() -> list[dict[str, str]]:
+    rows = []
+    for n in range(120):
+        month = ("2026-01", "2026-02", "2026-03")[n % 3]
+        rows.append(
+            {
+                "event_id": f"e{n}",
+                "account_id": ("A1", "A2")[n % 2],
+                "trade_date_vn": f"{month}-{1 + n % 20:02d}",
+                "source_hash": f"h{n}",
+                "is_deleted": "False",
+            }
+        )
+    return rows
+
+
+def test_only_differing_months_days_and_rows_are_reported(tmp_path: Path) -> None:
+    local = history()
+    remote = [dict(r) for r in local]
+    random.Random(1).shuffle(remote)  # row order does not matter
+    changed = next(r for r in remote if r["trade_date_vn"].startswith("2026-02"))
+    changed["source_hash"] = "stale"
+    extra = {"event_id": "gone", "account_id": "A2", "trade_date_vn": "2026-03-05", "source_hash": "x", "is_deleted": "False"}
+    remote.append(extra)
+    # Deleted locally, and absent remotely: both sides agree.
+    local.append({**extra, "event_id": "deleted", "is_deleted": "True"})
+
+    local_tree, remote_tree = DigestTree.from_rows(local), DigestTree.from_rows(remote)
+    local_tree.save(tmp_path / "digest.json")
+    local_tree = DigestTree.load(tmp_path / "digest.json")
+    assert local_tree is not None and local_tree.root != remote_tree.root
+
+    months = diverging_keys(local_tree.months, remote_tree.months)
+    assert months == ["2026-02", "2026-03"]
+    leaves = diverging_keys(local_tree.leaves(months), flatten_days(remote_tree.as_dict(months)["days"]))
+    assert leaves == sorted({(changed["account_id"], changed["trade_date_vn"]), ("A2", "2026-03-05")})
+
+    remote_fingerprints = {r["event_id"]: raw_fingerprint(r) for r in rows_in(remote, leaves)}
+    resend, tombstones = compare_rows(rows_in(local, leaves), remote_fingerprints)
+    assert [r["event_id"] for r in resend] == [changed["event_id"]]
+    assert tombstones == ["gone"]
+
+
+def test_identical_histories_have_equal_roots() -> None:
+    rows = history()
+    shuffled = [dict(r) for r in reversed(rows)]
+
+    assert DigestTree.from_rows(rows).root == DigestTree.from_rows(shuffled).root
+    assert DigestTree.from_rows(rows).rows == len(rows)
@@ -0,0 +1,68 @@
+"""USD/VND enrichment rolls up only the days it touched."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from fx_rates import RateTable, enrich_history, load_rate_table, save_rate_table
+
+RATE_TIME = 1767225600  # 2026-01-01T00:00:00Z
+
+
+def rate_table(version: int = 1, rate: float = 25000.0) -> RateTable:
+    return RateTable(
+        version=version,
+        times=np.array([RATE_TIME], dtype=np.int64),
+        rates=np.array([rate]),
+        source_code=np.array([0], dtype=np.int32),
+        sources=["manual"],
+    )
+
+
+def raw_row(event_id: str, day: str, profit: str) -> dict[str, str]:
+    return {
+        "event_id": event_id,
+        "trade_date_vn": day,
+        "close_time_vn": f"{day}T10:00:00+07:00",
+        "account_currency": "USD",
+        "profit": profit,
+        "commission": "0",
+        "swap": "0",
+        "is_deleted": "False",
+    }
+
+
+def test_only_days_of_reenriched_or_rewritten_rows_are_rolled_up() -> None:
+    table = rate_table()
+    # 2025-11-01 has no rate within MAX_RATE_AGE_DAYS, so its VND totals stay empty.
+    raw = [raw_row("e1", "2026-01-02", "10"), raw_row("e2", "2025-11-01", "5")]
+    summary = [{"trade_date_vn": "2026-01-02", "updated_at_utc": ""}, {"trade_date_vn": "2025-11-01", "updated_at_utc": ""}]
+    headers = ["trade_date_vn", "updated_at_utc"]
+
+    first = enrich_history(headers, summary, raw, table)
+    assert (first["raw_rows_enriched"], first["summary_days_rolled_up"]) == (1, 1)
+    assert summary[0]["net_profit_vnd"] == "250000"
+    assert headers[-1] == "updated_at_utc"
+
+    # Nothing changed: the day without VND totals is not scanned again.
+    assert enrich_history(headers, summary, raw, table)["summary_days_rolled_up"] == 0
+
+    # A rewritten summary row (e.g. a recomputed day) gets its totals back.
+    summary[0] = {"trade_date_vn": "2026-01-02", "updated_at_utc": ""}
+    again = enrich_history(headers, summary, raw, table, {"2026-01-02"})
+    assert again["summary_days_rolled_up"] == 1
+    assert summary[0]["net_profit_vnd"] == "250000"
+
+
+def test_loaded_table_outlives_the_replaced_cache_file(tmp_path: Path) -> None:
+    path = tmp_path / "usd_vnd.rates"
+    save_rate_table(path, rate_table())
+    loaded = load_rate_table(path)
+
+    save_rate_table(path, rate_table(version=2, rate=26000.0))
+
+    assert loaded is not None
+    assert loaded.rates.tolist() == [25000.0]
+    assert load_rate_table(path).version == 2  # type: ignore[union-attr]
@@ -0,0 +1,25 @@
+"""`journal <command> --help` stays within the startup budget without heavy imports."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+JOURNAL = Path(__file__).resolve().parent.parent / "scripts" / "journal.py"
+
+
+def test_every_command_starts_fast_without_heavy_imports() -> None:
+    result = subprocess.run(
+        [sys.executable, str(JOURNAL), "startup", "--runs", "1", "--top", "0"],
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    reports = [json.loads(line) for line in result.stdout.splitlines()]
+
+    assert reports, result.stderr
+    assert {r["command"]: r["eager_heavy_imports"] for r in reports if r["eager_heavy_imports"]} == {}
+    assert {r["command"]: r["median_ms"] for r in reports if r["status"] != "ok"} == {}
+    assert result.returncode == 0
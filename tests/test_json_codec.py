@@ -0,0 +1,17 @@
+"""Every installed JSON backend writes the same bytes, non-finite floats included."""
+
+from __future__ import annotations
+
+import json_codec
+
+VALUE = {"rates": [25400.5, float("nan"), float("inf"), -float("inf")], "label": "lãi", "pair": (1, 2)}
+
+
+def test_backends_agree_on_non_finite_floats() -> None:
+    active = json_codec.BACKEND
+    try:
+        encoded = {name: json_codec.use(name).dumps(VALUE) for name in json_codec.available()}
+    finally:
+        json_codec.use(active)
+
+    assert set(encoded.values()) == {'{"rates":[25400.5,null,null,null],"label":"lãi","pair":[1,2]}'.encode("utf-8")}
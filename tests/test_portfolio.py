@@ -0,0 +1,81 @@
+"""Per-account and portfolio tables against hand-computed figures."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from digest_tree import DigestTree
+from fx_rates import RateTable
+from portfolio import update_portfolio
+
+DAY = "2026-01-05"
+# 25,000 VND per USD from 2026-01-01T00:00:00Z.
+RATES = RateTable(1, np.array([1767225600], dtype=np.int64), np.array([25000.0]), np.array([0], dtype=np.int32), ["manual"])
+
+
+def event(n: int, account: str, currency: str, event_type: str, profit: str, **extra: str) -> dict[str, str]:
+    return {
+        "event_id": f"{account}-{n}",
+        "account_id": account,
+        "account_currency": currency,
+        "event_type": event_type,
+        "action": extra.get("action", ""),
+        "position_id": extra.get("position_id", ""),
+        "trade_date_vn": DAY,
+        "close_time_vn": f"{DAY}T{9 + n:02d}:00:00+07:00",
+        "profit": profit,
+        "commission": extra.get("commission", "0"),
+        "swap": extra.get("swap", "0"),
+        "source_hash": f"{account}{n}{profit}",
+        "is_deleted": "False",
+    }
+
+
+RAW = [
+    event(1, "U", "USD", "trade", "10", action="Buy", position_id="p1", commission="-1"),
+    event(2, "U", "USD", "trade", "-4", action="Sell", position_id="p2", swap="-0.5"),
+    event(3, "U", "USD", "deposit", "100"),
+    event(1, "C", "USC", "trade", "500", action="Buy", position_id="p1", commission="-20"),
+    event(1, "V", "VND", "trade", "250000", action="Sell", position_id="p1"),
+    event(1, "E", "EUR", "trade", "7", action="Buy", position_id="p1"),
+]
+
+
+def update(raw: list[dict[str, str]], accounts: list[dict[str, str]], portfolio: list[dict[str, str]], reporting: str) -> tuple:
+    return update_portfolio(raw, DigestTree.from_rows(raw).leaves(), accounts, portfolio, RATES, reporting)
+
+
+def test_accounts_are_converted_per_currency_and_summed_per_day() -> None:
+    accounts, portfolio, report = update(RAW, [], [], "USD")
+
+    by_account = {r["account_id"]: r for r in accounts}
+    usd = by_account["U"]
+    assert (usd["total_positions"], usd["total_deals"], usd["win_positions"], usd["loss_positions"]) == ("2", "2", "1", "1")
+    assert (usd["net_profit"], usd["gross_profit"], usd["gross_loss"], usd["total_deposit"]) == ("106.0", "110.0", "-4.0", "100.0")
+    assert (usd["net_profit_reporting"], usd["total_swap_reporting"]) == ("106.0", "-0.5")
+    assert (by_account["C"]["net_profit"], by_account["C"]["net_profit_reporting"]) == ("500.0", "5.0")
+    assert by_account["C"]["total_commission_reporting"] == "-0.2"
+    assert (by_account["V"]["net_profit_reporting"], by_account["V"]["fx_version"]) == ("10.0", "1")
+    assert by_account["E"]["net_profit_reporting"] == ""
+
+    [day] = portfolio
+    assert (day["accounts"], day["accounts_unconverted"], day["total_positions"], day["total_deals"]) == ("4", "1", "5", "5")
+    # 106 + 5 + 10; EUR has no rate and is left out of the money columns.
+    assert (day["net_profit"], day["gross_profit"], day["total_commission"]) == ("121.0", "125.0", "-1.2")
+    assert report["account_days_unconverted"] == 1
+
+
+def test_only_changed_leaves_are_recomputed_and_vnd_reporting_uses_the_rate() -> None:
+    accounts, portfolio, _ = update(RAW, [], [], "USD")
+
+    assert update(RAW, accounts, portfolio, "USD")[2]["account_days_recomputed"] == 0
+
+    changed = [dict(r, profit="-2", source_hash="changed") if r["event_id"] == "U-2" else r for r in RAW]
+    accounts, portfolio, report = update(changed, accounts, portfolio, "USD")
+    assert (report["account_days_recomputed"], report["portfolio_days_recomputed"]) == (1, 1)
+    assert portfolio[0]["net_profit"] == "123.0"
+
+    accounts, portfolio, report = update(changed, accounts, portfolio, "VND")
+    assert report["account_days_recomputed"] == 4
+    assert {r["account_id"]: r["net_profit_reporting"] for r in accounts}["U"] == "2700000"
+    assert (portfolio[0]["reporting_currency"], portfolio[0]["net_profit"]) == ("VND", "3075000")
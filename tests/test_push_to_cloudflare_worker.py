@@ -0,0 +1,48 @@
+"""`push_to_cloudflare_worker.py --dry-run` plans without side effects."""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+import push_to_cloudflare_worker
+from journal_io import write_table
+from sync_ledger import SyncLedger
+
+# Nothing listens on the discard port: any request would fail the run.
+UNREACHABLE = "http://127.0.0.1:9"
+
+
+def run_dry(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], *extra: str) -> dict:
+    argv = ["push_to_cloudflare_worker.py", "--summary-input", "summary.csv", "--raw-input", "raw.csv", "--dry-run", *extra]
+    monkeypatch.setattr(sys, "argv", argv)
+    assert push_to_cloudflare_worker.main() == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_dry_run_sends_nothing_and_writes_no_state(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("WORKER_API_URL", UNREACHABLE)
+    monkeypatch.setenv("WORKER_API_TOKEN", "token")
+    raw = [{"event_id": f"e{i}", "trade_date_vn": "2026-01-05", "source_hash": f"h{i}", "is_deleted": "False"} for i in range(3)]
+    write_table(tmp_path / "raw.csv", list(raw[0]), raw)
+    write_table(tmp_path / "summary.csv", ["trade_date_vn", "net_profit"], [{"trade_date_vn": "2026-01-05", "net_profit": "1"}])
+
+    report = run_dry(monkeypatch, capsys, "--tombstone-missing")
+    assert (report["status"], report["remote"], report["ledger"]) == ("dry_run", False, None)
+    assert (report["payload_format"], report["raw_rows_pending"]) == ("json", 3)
+    assert not (tmp_path / "state").exists()
+
+    # An existing ledger is only read; e9, gone from the input, is counted as a tombstone but not fetched.
+    ledger_path = tmp_path / "state" / "worker_sync_ledger.db"
+    with SyncLedger(ledger_path, UNREACHABLE) as ledger:
+        ledger.mark_raw(raw + [{**raw[0], "event_id": "e9"}])
+    before = sorted(p.name for p in ledger_path.parent.iterdir())
+    report = run_dry(monkeypatch, capsys, "--tombstone-missing")
+    assert (report["raw_rows_unchanged"], report["raw_tombstone_candidates"], report["raw_tombstones"]) == (3, 1, 0)
+    assert sorted(p.name for p in ledger_path.parent.iterdir()) == before
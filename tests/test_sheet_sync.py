@@ -0,0 +1,105 @@
+"""Keyed upsert and month partitions against the in-memory gspread fake."""
+
+from __future__ import annotations
+
+from datetime import date
+
+from gsheet_fake import FakeSpreadsheet
+from sheet_partitions import index_tab_name, read_index, sync_partitioned
+from sheet_sync import upsert_sheet
+from sheets_writer import SheetsWriter
+
+HEADER = ["event_id", "trade_date_vn", "close_time_vn", "source_hash"]
+ORDER = {"sort_column": "close_time_vn", "descending": True}
+
+
+def row(n: int, day: str = "2026-02-10", version: str = "") -> list[str]:
+    return [f"e{n}", day, f"{day}T{n % 24:02d}:00:00+07:00", f"h{n}{version}"]
+
+
+def newest_first(rows: list[list[str]]) -> list[list[str]]:
+    return sorted(rows, key=lambda r: r[2], reverse=True)
+
+
+def writer() -> SheetsWriter:
+    return SheetsWriter(requests_per_minute=6000, sleep=lambda _: None)
+
+
+def test_upsert_writes_only_changes_and_keeps_order() -> None:
+    sh = FakeSpreadsheet()
+    ws = sh.add_worksheet("raw_events", rows=10, cols=len(HEADER))
+    before = newest_first([row(n) for n in range(1, 9)])
+    assert upsert_sheet(ws, HEADER, before, "event_id", writer=writer(), **ORDER).mode == "rewrite"
+
+    # e3 and e6 deleted (their slots are reused), e2 changed, e10/e11/e12 new.
+    after = newest_first([row(n, version="b" if n == 2 else "") for n in (1, 2, 4, 5, 7, 8, 10, 11, 12)])
+    calls, ws_calls = sh.api_calls(), len(ws.calls)
+    result = upsert_sheet(ws, HEADER, after, "event_id", writer=writer(), **ORDER)
+
+    assert (result.mode, result.inserted, result.updated, result.deleted) == ("upsert", 3, 1, 2)
+    assert ws.get_all_values() == [HEADER, *after]
+    # Read, ranges, delete, resize, append and sort; never a clear + rewrite.
+    assert "clear" not in ws.calls[ws_calls:]
+    assert sh.api_calls() - calls <= 6
+
+
+def test_upsert_unchanged_is_noop() -> None:
+    sh = FakeSpreadsheet()
+    ws = sh.add_worksheet("raw_events", rows=10, cols=len(HEADER))
+    rows = newest_first([row(n) for n in range(1, 6)])
+    upsert_sheet(ws, HEADER, rows, "event_id", writer=writer(), **ORDER)
+    calls = sh.api_calls()
+
+    assert upsert_sheet(ws, HEADER, rows, "event_id", writer=writer(), **ORDER).mode == "noop"
+    assert sh.api_calls() - calls == 1
+
+
+def test_upsert_rewrites_on_schema_change() -> None:
+    sh = FakeSpreadsheet()
+    ws = sh.add_worksheet("raw_events", rows=10, cols=len(HEADER) + 1)
+    upsert_sheet(ws, HEADER, [row(1)], "event_id", writer=writer())
+    header = [*HEADER, "usd_vnd_rate"]
+
+    result = upsert_sheet(ws, header, [[*row(1), "25000"]], "event_id", writer=writer())
+
+    assert (result.mode, result.reason) == ("rewrite", "schema changed")
+    assert ws.get_all_values() == [header, [*row(1), "25000"]]
+
+
+def push_months(sh: FakeSpreadsheet, rows: list[list[str]]) -> dict:
+    def open_tab(title: str, n_rows: int, cols: int):
+        if title in sh.worksheets_by_title:
+            return sh.worksheets_by_title[title]
+        return sh.add_worksheet(title, rows=n_rows, cols=cols)
+
+    return sync_partitioned(
+        open_tab,
+        "raw_events",
+        HEADER,
+        rows,
+        "event_id",
+        writer(),
+        today=date(2026, 3, 15),
+        now_utc="2026-03-15T00:00:00Z",
+        **ORDER,
+    )
+
+
+def test_partitions_write_touched_months_and_drop_empty_ones() -> None:
+    sh = FakeSpreadsheet()
+    feb = newest_first([row(n, "2026-02-10") for n in range(1, 4)])
+    mar = newest_first([row(n, "2026-03-02") for n in range(4, 7)])
+    push_months(sh, [*mar, *feb])
+
+    mar_new = newest_first([*mar, row(7, "2026-03-03")])
+    report = push_months(sh, mar_new)
+
+    assert report["months_written"] == ["2026-02", "2026-03"]
+    assert report["months_removed"] == ["2026-02"]
+    assert sh.worksheets_by_title["raw_events_2026_03"].get_all_values() == [HEADER, *mar_new]
+    assert sh.worksheets_by_title["raw_events_2026_02"].get_all_values() == [HEADER]
+    index = read_index(sh.worksheets_by_title[index_tab_name("raw_events")], writer())
+    assert sorted(index) == ["2026-03"]
+    assert index["2026-03"].rows == 4
+
+    assert push_months(sh, mar_new)["months_written"] == []
@@ -0,0 +1,81 @@
+"""Quota buckets, retries and cell-budget splitting of the Sheets writer."""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import pytest
+from gspread.exceptions import APIError
+
+from gsheet_fake import FakeSpreadsheet, _ErrorResponse
+from retry_policy import RetryPolicy
+from sheets_writer import MIN_REQUESTS_PER_MINUTE, SheetsWriter, TokenBucket
+
+
+def failing(*statuses: int) -> Callable[[], str]:
+    """A call failing with `statuses` in turn, then succeeding."""
+    remaining = list(statuses)
+
+    def call() -> str:
+        if remaining:
+            raise APIError(_ErrorResponse(remaining.pop(0), "error", "ERROR"))
+        return "ok"
+
+    return call
+
+
+def test_bucket_allows_a_burst_then_paces_at_its_rate() -> None:
+    now = [0.0]
+    slept: list[float] = []
+    bucket = TokenBucket(rate_per_sec=2.0, capacity=3.0, clock=lambda: now[0], sleep=slept.append)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == 0.5
+    now[0] = 2.0  # refills 4 tokens, first paying back the one borrowed
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert slept == [0.5]
+
+
+def test_quota_errors_are_retried_and_halve_the_rate() -> None:
+    slept: list[float] = []
+    writer = SheetsWriter(requests_per_minute=6000, sleep=slept.append, retry=RetryPolicy(max_attempts=4, base_delay_sec=1.0))
+    rate = writer.buckets["write"].rate
+
+    assert writer.call(failing(429, 503)) == "ok"
+
+    assert (writer.stats.retries, writer.stats.write_calls) == (2, 3)
+    assert writer.buckets["write"].rate == rate / 2
+    # Google's exponential floor (1 s, then 2 s; the jitter never exceeds it), plus
+    # the throttle wait of the bucket the 429 emptied.
+    assert [s for s in slept if s >= 1] == [1.0, 2.0]
+    assert 0 < writer.stats.throttle_wait_sec < 1
+
+
+def test_retries_stop_at_the_limit_and_request_errors_fail_at_once() -> None:
+    writer = SheetsWriter(requests_per_minute=6000, sleep=lambda _: None, retry=RetryPolicy(max_attempts=3, base_delay_sec=0.0))
+    with pytest.raises(APIError):
+        writer.call(failing(429, 429, 429, 429))
+    assert (writer.stats.api_calls, writer.stats.retries) == (3, 2)
+    assert writer.buckets["write"].rate >= MIN_REQUESTS_PER_MINUTE / 60
+
+    with pytest.raises(APIError):
+        writer.call(failing(400))
+    assert writer.stats.api_calls == 4
+
+
+def test_writes_are_split_and_packed_by_the_cell_budget() -> None:
+    ws = FakeSpreadsheet().add_worksheet("raw", rows=1, cols=2)
+    writer = SheetsWriter(requests_per_minute=6000, max_cells_per_request=10, sleep=lambda _: None)
+    rows = [[f"e{i}", str(i)] for i in range(12)]
+
+    writer.rewrite(ws, ["event_id", "n"], rows)
+
+    # 13 rows x 2 columns at 5 rows per request, after one clear and one resize.
+    assert ws.calls == ["clear", "resize", "batch_update:1", "batch_update:1", "batch_update:1"]
+    assert ws.get_all_values() == [["event_id", "n"], *rows]
+    assert writer.stats.cells_written == 26
+
+    ws.calls.clear()
+    ranges: list[dict[str, Any]] = [{"range": f"A{r}:B{r}", "values": [["x", str(r)]]} for r in (2, 4, 6, 8, 10, 12)]
+    writer.write_ranges(ws, ranges, 2)
+    assert ws.calls == ["batch_update:5", "batch_update:1"]
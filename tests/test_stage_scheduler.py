@@ -0,0 +1,90 @@
+"""Dependency order, retries and blocking in the pipeline stage scheduler."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable
+
+import pytest
+
+from retry_policy import RetryPolicy
+from stage_scheduler import BLOCKED, FAILED, OK, SKIPPED, Stage, StageScheduler
+
+NO_WAIT = RetryPolicy(max_attempts=1, base_delay_sec=0.0)
+
+
+def flaky(failures: int, value: Any = None, exc: BaseException | None = None) -> Callable[[dict[str, Any]], Any]:
+    """A stage body that fails `failures` times, then returns `value`."""
+    calls = [0]
+
+    def run(_: dict[str, Any]) -> Any:
+        calls[0] += 1
+        if calls[0] <= failures:
+            raise exc or RuntimeError(f"attempt {calls[0]}")
+        return value
+
+    return run
+
+
+def test_failed_stage_is_retried_then_blocks_its_dependents_only() -> None:
+    stages = [
+        Stage("extract", lambda _: ["row"]),
+        Stage("build", flaky(1, "built"), deps=("extract",), retries=1),
+        Stage("sheets", flaky(5), deps=("build",), retries=2),
+        Stage("sheets_report", lambda _: "report", deps=("sheets",)),
+        Stage("worker", lambda inputs: inputs["build"] + "+sent", deps=("build",)),
+    ]
+
+    results = StageScheduler(stages, retry=NO_WAIT, sleep=lambda _: None).run()
+
+    assert {n: r.status for n, r in results.items()} == {
+        "extract": OK,
+        "build": OK,
+        "sheets": FAILED,
+        "sheets_report": BLOCKED,
+        "worker": OK,
+    }
+    assert (results["build"].attempts, results["sheets"].attempts, results["sheets_report"].attempts) == (2, 3, 0)
+    assert results["sheets"].error == "RuntimeError: attempt 3"
+    assert results["worker"].value == "built+sent"
+
+
+def test_configuration_errors_are_not_retried_but_wrapped_failures_are() -> None:
+    wrapped = SystemExit("upload failed")
+    wrapped.__cause__ = RuntimeError("HTTP 503")
+    stages = [
+        Stage("config", flaky(1, exc=SystemExit("Missing WORKER_API_URL")), retries=3),
+        Stage("upload", flaky(1, "ok", exc=wrapped), retries=3),
+    ]
+
+    results = StageScheduler(stages, retry=NO_WAIT, sleep=lambda _: None).run()
+
+    assert (results["config"].status, results["config"].attempts) == (FAILED, 1)
+    assert (results["upload"].status, results["upload"].attempts) == (OK, 2)
+
+
+def test_independent_stages_run_concurrently_and_skipped_ones_unblock() -> None:
+    # Each sink waits for the other to start: only concurrent runs finish.
+    barrier = threading.Barrier(2, timeout=5)
+
+    def sink(inputs: dict[str, Any]) -> Any:
+        barrier.wait()
+        return inputs["build"]
+
+    stages = [
+        Stage("build", lambda _: "never run"),
+        Stage("sheets", sink, deps=("build",)),
+        Stage("worker", sink, deps=("build",)),
+    ]
+
+    results = StageScheduler(stages, max_workers=2).run(skip={"build"})
+
+    assert results["build"].status == SKIPPED
+    assert [(results[n].status, results[n].value) for n in ("sheets", "worker")] == [(OK, None), (OK, None)]
+
+
+def test_unknown_dependencies_and_cycles_are_rejected() -> None:
+    with pytest.raises(ValueError, match="unknown stages"):
+        StageScheduler([Stage("a", lambda _: None, deps=("b",))])
+    with pytest.raises(ValueError, match="cycle"):
+        StageScheduler([Stage("a", lambda _: None, deps=("b",)), Stage("b", lambda _: None, deps=("a",))]).run()
@@ -0,0 +1,23 @@
+"""Ledger fingerprints follow the USD/VND enrichment of a row."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from sync_ledger import SyncLedger
+
+
+def test_rate_gained_changed_and_lost_are_pending(tmp_path: Path) -> None:
+    plain = {"event_id": "e1", "trade_date_vn": "2026-02-10", "source_hash": "h1", "is_deleted": "False"}
+    versions = [
+        plain,
+        {**plain, "usd_vnd_rate": "25400", "fx_rate_time_utc": "2026-02-10T00:00:00Z"},
+        {**plain, "usd_vnd_rate": "25500", "fx_rate_time_utc": "2026-02-11T00:00:00Z"},
+        plain,
+    ]
+    with SyncLedger(tmp_path / "ledger.sqlite", "https://worker.example") as ledger:
+        ledger.mark_raw([versions[0]])
+        assert ledger.pending_raw([versions[0]]) == ([], 1)
+        for row in versions[1:]:
+            assert ledger.pending_raw([row]) == ([row], 0)
+            ledger.mark_raw([row])
@@ -0,0 +1,58 @@
+"""Wire formats, negotiation and the adaptive byte budget of /api/sync."""
+
+from __future__ import annotations
+
+import pytest
+
+from sync_payload import ByteBudget, ChunkPlanner, EncodedRows, WireFormat, decode_payload, negotiate
+
+
+def budget(current: int = 1000) -> ByteBudget:
+    return ByteBudget(current=current, min_bytes=100, max_bytes=2000, target_latency_sec=1.0)
+
+
+def test_budget_grows_on_fast_answers_and_shrinks_on_slow_ones_retries_and_413() -> None:
+    b = budget()
+    b.on_success(0.1)
+    assert b.current == 1250
+    b.on_success(0.8)  # between half the target and the target: unchanged
+    assert b.current == 1250
+    b.on_success(2.0)
+    assert b.current == 875
+    b.on_retry()
+    assert b.current == 437
+    for _ in range(10):
+        b.on_success(0.1)
+    assert b.current == 2000
+
+    b.on_too_large(1500)
+    assert (b.current, b.max_bytes) == (750, 1200)
+    for _ in range(10):
+        b.on_success(0.1)
+    assert b.current == 1200
+    for _ in range(10):
+        b.on_retry()
+    assert b.current == 100
+
+
+def test_explicit_choices_win_and_auto_follows_capabilities() -> None:
+    assert negotiate(None) == WireFormat()
+    assert negotiate({"formats": ["json", "columnar"], "encodings": ["gzip"]}) == WireFormat(columnar=True, gzip=True)
+    assert negotiate({"formats": ["json", "columnar"], "encodings": ["gzip"]}, "json", "none") == WireFormat()
+    assert negotiate(None, "columnar", "gzip") == WireFormat(columnar=True, gzip=True)
+
+
+@pytest.mark.parametrize("fmt", [WireFormat(), WireFormat(columnar=True), WireFormat(columnar=True, gzip=True)])
+def test_chunks_fit_the_budget_and_decode_to_the_rows(fmt: WireFormat) -> None:
+    rows = [{"event_id": f"e{i}", "profit": str(i), "comment": "x" * (i % 7)} for i in range(50)]
+    planner = ChunkPlanner([EncodedRows("raw", rows, fmt)], budget(400))
+
+    chunks = planner.plan()
+
+    assert len(chunks) > 1
+    assert all(c.raw_bytes <= 400 for c in chunks)
+    headers = fmt.headers()
+    decoded = [
+        r for c in chunks for r in decode_payload(c.body, headers["Content-Type"], headers.get("Content-Encoding", ""))["raw_rows"]
+    ]
+    assert decoded == rows
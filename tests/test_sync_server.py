@@ -0,0 +1,77 @@
+"""Reference Worker API (SQLite) over the same contract as the Worker."""
+
+from __future__ import annotations
+
+import gzip
+import importlib
+import json
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from sync_payload import COLUMNAR_CONTENT_TYPE
+
+# fastapi's TestClient runs on httpx, which the server itself does not need.
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+TOKEN = "local-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+def raw_row(n: int, day: str, profit: str = "1") -> dict[str, str]:
+    return {
+        "event_id": f"e{n}",
+        "account_id": "A1",
+        "trade_date_vn": day,
+        "close_time_vn": f"{day}T{n % 24:02d}:00:00+07:00",
+        "profit": profit,
+        "source_hash": f"h{n}",
+        "is_deleted": "False",
+    }
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    # Settings are read from the environment at import, so each test imports a fresh module.
+    monkeypatch.setenv("SYNC_DB_PATH", str(tmp_path / "sync.db"))
+    monkeypatch.setenv("SYNC_API_TOKEN", TOKEN)
+    monkeypatch.setenv("SYNC_DASHBOARD_DIR", str(tmp_path / "no-dashboard"))
+    monkeypatch.setenv("SYNC_CF_ACCESS_CLIENT_ID", "")
+    monkeypatch.setenv("SYNC_PROTECT_READS", "")
+    monkeypatch.delitem(sys.modules, "sync_server", raising=False)
+    server = importlib.import_module("sync_server")
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def test_sync_upserts_by_key_in_any_wire_format(client: TestClient) -> None:
+    first = {
+        "summary_rows": [{"trade_date_vn": "2026-01-05", "net_profit": "2"}],
+        "raw_rows": [raw_row(1, "2026-01-05"), raw_row(2, "2026-01-05")],
+    }
+    assert client.post("/api/sync", json=first, headers=AUTH).json()["raw_upserted"] == 2
+
+    # Columnar + gzip, replacing e2 and adding e3.
+    columns = list(raw_row(0, "").keys())
+    body = {"raw": {"columns": columns, "rows": [list(raw_row(2, "2026-01-05", "5").values()), list(raw_row(3, "2026-01-06").values())]}}
+    headers = {**AUTH, "Content-Type": COLUMNAR_CONTENT_TYPE, "Content-Encoding": "gzip"}
+    response = client.post("/api/sync", content=gzip.compress(json.dumps(body).encode()), headers=headers)
+    assert (response.json()["summary_upserted"], response.json()["raw_upserted"]) == (0, 2)
+
+    rows = client.get("/api/raw-events", params={"from_date": "2026-01-05", "to_date": "2026-01-05"}).json()["rows"]
+    assert {r["event_id"]: r["profit"] for r in rows} == {"e1": "1", "e2": "5"}
+    assert [r["event_id"] for r in client.get("/api/raw-events", params={"limit": 1}).json()["rows"]] == ["e3"]
+    assert client.get("/api/summary").json()["count"] == 1
+
+
+def test_sync_rejects_bad_tokens_and_unknown_payloads(client: TestClient) -> None:
+    payload = {"summary_rows": [], "raw_rows": [raw_row(1, "2026-01-05")]}
+
+    assert client.post("/api/sync", json=payload).status_code == 401
+    assert client.post("/api/sync", json=payload, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.post("/api/sync", content=b"<rows/>", headers={**AUTH, "Content-Type": "text/xml"}).status_code == 415
+    assert client.post("/api/sync", content=b"{", headers={**AUTH, "Content-Type": "application/json"}).status_code == 400
+    assert client.get("/api/raw-events").json()["count"] == 0
@@ -0,0 +1,122 @@
+"""Upload engine against a scripted local HTTP server."""
+
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pytest
+
+from retry_policy import RetryPolicy
+from sync_payload import ByteBudget, Chunk, ChunkPlanner, EncodedRows, negotiate
+from worker_upload import UploadCheckpoint, UploadEngine, UploadError
+
+# (request number, body) -> (status, response body)
+Script = Callable[[int, bytes], tuple[int, bytes]]
+NO_WAIT = RetryPolicy(max_attempts=3, base_delay_sec=0.0)
+
+
+class ScriptedWorker:
+    def __init__(self, script: Script) -> None:
+        self.script = script
+        self.bodies: list[bytes] = []
+        self._lock = threading.Lock()
+        worker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with worker._lock:
+                    worker.bodies.append(body)
+                    status, data = worker.script(len(worker.bodies), body)
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+
+@pytest.fixture
+def serve() -> Iterator[Callable[[Script], ScriptedWorker]]:
+    started: list[ScriptedWorker] = []
+
+    def start(script: Script) -> ScriptedWorker:
+        worker = ScriptedWorker(script)
+        threading.Thread(target=worker.server.serve_forever, daemon=True).start()
+        started.append(worker)
+        return worker
+
+    yield start
+    for worker in started:
+        worker.server.shutdown()
+        worker.server.server_close()
+
+
+def test_retries_stop_at_the_configured_attempts(serve: Callable[[Script], ScriptedWorker]) -> None:
+    worker = serve(lambda n, body: (503, b"busy"))
+
+    with UploadEngine(worker.url, {}, retry=NO_WAIT) as engine, pytest.raises(UploadError) as error:
+        engine.post_json("/api/sync", {"raw_rows": []})
+
+    assert error.value.status == 503
+    assert len(worker.bodies) == NO_WAIT.max_attempts
+    assert engine.stats.retries == NO_WAIT.max_attempts - 1
+
+
+def test_retryable_failures_recover_and_request_errors_do_not_retry(serve: Callable[[Script], ScriptedWorker]) -> None:
+    worker = serve(lambda n, body: (429, b"slow down") if n == 1 else (200, b'{"status": "ok"}'))
+    with UploadEngine(worker.url, {}, retry=NO_WAIT) as engine:
+        assert engine.post_json("/api/sync", {"raw_rows": []}) == {"status": "ok"}
+        assert (engine.stats.requests, engine.stats.retries) == (2, 1)
+        # Both requests went over one keep-alive connection.
+        assert engine.pool.opened == 1
+
+    rejected = serve(lambda n, body: (400, b"bad row"))
+    with UploadEngine(rejected.url, {}, retry=NO_WAIT) as engine, pytest.raises(UploadError, match="HTTP 400 bad row"):
+        engine.post_json("/api/sync", {"raw_rows": []})
+    assert len(rejected.bodies) == 1
+
+
+def test_checkpoint_resumes_acknowledged_rows_of_the_same_worker(tmp_path: Path) -> None:
+    path = tmp_path / "checkpoint.jsonl"
+    first = UploadCheckpoint(path, "https://worker.example/", resume=False)
+    first.mark("raw", ["e1:h1", "e2:h2"])
+    first.mark("summary", ["2026-01-05:s1"])
+    first.close()
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"kind": "raw", "keys": ["e3')  # torn by a killed run
+
+    resumed = UploadCheckpoint(path, "https://worker.example", resume=True)
+    assert resumed.is_acked("raw", "e2:h2") and resumed.is_acked("summary", "2026-01-05:s1")
+    assert not resumed.is_acked("raw", "e3:h3")
+    assert resumed.chunks == 2
+    assert not UploadCheckpoint(path, "https://other.example", resume=True).acked
+    assert json.loads(path.read_text(encoding="utf-8").splitlines()[0])["worker_url"] == "https://worker.example"
+
+
+def test_a_413_splits_the_chunk_and_caps_the_budget(serve: Callable[[Script], ScriptedWorker]) -> None:
+    limit = 2_000
+    worker = serve(lambda n, body: (413, b"too large") if len(body) > limit else (200, b"{}"))
+    rows = [{"event_id": f"e{i}", "comment": "x" * 80} for i in range(60)]
+    budget = ByteBudget(current=64_000, min_bytes=256, max_bytes=64_000, target_latency_sec=10.0)
+    planner = ChunkPlanner([EncodedRows("raw", rows, negotiate(None))], budget)
+    acked: list[Chunk] = []
+
+    with UploadEngine(worker.url, {}, concurrency=2, retry=NO_WAIT) as engine:
+        engine.upload("/api/sync", planner, negotiate(None).headers(), lambda chunk, _: acked.append(chunk))
+
+    # Every row delivered exactly once, in chunks under the Worker's limit.
+    assert sorted(r["event_id"] for c in acked for r in c.rows) == sorted(r["event_id"] for r in rows)
+    assert all(c.wire_bytes <= limit for c in acked)
+    assert engine.stats.split_chunks >= 1
+    assert budget.max_bytes < 64_000